@@ -8,15 +8,37 @@ Prerequisites:
 - Preset.io account and workspace
 - Database connection configured in Preset
 - API credentials from Preset
+- For --use-rollups: sp_refresh_bi_rollups.sql installed and run at least once
+
+Usage:
+  python Create-preset-dashboard.py
+  python Create-preset-dashboard.py --use-rollups   # charts read the bi_rollup_* tables
+  python Create-preset-dashboard.py --provision --workspace https://a.app.preset.io --workspace https://b.app.preset.io
+  python Create-preset-dashboard.py --spec dashboard_spec.json --dry-run   # diff only
+  python Create-preset-dashboard.py --spec dashboard_spec.json             # PUT what changed
+
+--provision indexes what already exists (paginated, filtered list queries) and
+creates only what is missing, concurrently. Re-running it is a no-op. Try it
+against the local mock first: python mock_superset_api.py
 """
 
+import argparse
 import requests
 import json
-from typing import Dict, List, Optional
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from superset_api import list_all, rison_list, rison_string
+
 
 class PresetDashboardBuilder:
     def __init__(self, workspace_url: str, api_token: str = None, 
-                 username: str = None, password: str = None):
+                 username: str = None, password: str = None,
+                 max_workers: int = 8, max_retries: int = 3):
         """
         Initialize the Preset Dashboard Builder
         
@@ -25,10 +47,29 @@ class PresetDashboardBuilder:
             api_token: Preset API token (preferred) OR
             username: Preset username (if not using token)
             password: Preset password (if not using token)
+            max_workers: Concurrent requests when provisioning (also the connection pool size)
+            max_retries: Retries for connection errors, 429 and 5xx (POSTs only on connection errors)
         """
         self.base_url = workspace_url.rstrip('/')
         self.session = requests.Session()
         self.access_token = None
+        self.max_workers = max_workers
+        
+        # Keep-alive pool sized for the worker threads; POST is left out of
+        # allowed_methods so a 5xx after a create is never replayed as a duplicate
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset(["GET", "PUT", "DELETE"]),
+            respect_retry_after_header=True
+        )
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
+        # Existing objects by natural key, filled by build_index()
+        self.index = {"datasets": {}, "charts": {}, "dashboards": {}}
         
         if api_token:
             # Use API token (Preset Team/Enterprise feature)
@@ -141,12 +182,8 @@ class PresetDashboardBuilder:
     
     def _find_dataset_by_name(self, table_name: str) -> Optional[int]:
         """Find dataset ID by table name"""
-        response = self.session.get(f"{self.base_url}/api/v1/dataset/")
-        
-        if response.status_code != 200:
-            return None
-            
-        datasets = response.json()['result']
+        datasets = self._list_all("dataset", f"(col:table_name,opr:eq,value:{rison_string(table_name)})",
+                                  ["id", "table_name"])
         
         for ds in datasets:
             if ds['table_name'] == table_name:
@@ -154,6 +191,116 @@ class PresetDashboardBuilder:
                 return ds['id']
         return None
     
+    # -------------------------------------------------------------
+    # Provisioning: index what exists, create only what is missing
+    # -------------------------------------------------------------
+    
+    def _list_all(self, resource: str, filters: str, columns: List[str],
+                  page_size: int = 100) -> List[Dict]:
+        """
+        Every row of a list endpoint matching the filters, following pages
+        
+        Args:
+            resource: 'dataset', 'chart' or 'dashboard'
+            filters: Rison filter tuples, e.g. "(col:slice_name,opr:in,value:!('a','b'))"
+            columns: Columns to return (keeps list responses small)
+            page_size: Rows per request
+        """
+        return list_all(self.session, self.base_url, resource, filters, columns, page_size)
+    
+    def build_index(self, database_id: int, table_names: List[str],
+                    dashboard_titles: List[str]) -> Dict:
+        """
+        Index existing datasets (by table_name) and dashboards (by title) -
+        only the objects this dashboard needs. Charts are indexed by
+        ensure_charts() once their datasets are known.
+        """
+        datasets = self._list_all(
+            "dataset",
+            f"(col:database,opr:rel_o_m,value:{database_id}),"
+            f"(col:table_name,opr:in,value:{rison_list(table_names)})",
+            ["id", "table_name"]
+        )
+        dashboards = self._list_all(
+            "dashboard",
+            f"(col:dashboard_title,opr:in,value:{rison_list(dashboard_titles)})",
+            ["id", "dashboard_title"]
+        )
+        self.index["datasets"] = {ds['table_name']: ds['id'] for ds in datasets}
+        self.index["dashboards"] = {d['dashboard_title']: d['id'] for d in dashboards}
+        print(f"🔎 Found {len(datasets)} dataset(s), {len(dashboards)} dashboard(s) already in {self.base_url}")
+        return self.index
+    
+    def _create_missing(self, missing: List, create) -> List:
+        """Run create(item) for each missing item with bounded parallelism"""
+        if not missing:
+            return []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(create, missing))
+    
+    def ensure_datasets(self, database_id: int, tables: List[Tuple[str, str]],
+                        schema: Optional[str] = None) -> Dict[str, int]:
+        """{key: dataset id} for (key, table_name) pairs, creating missing datasets concurrently"""
+        missing = [table for _, table in tables if table not in self.index["datasets"]]
+        created = self._create_missing(missing, lambda table: self.create_dataset(database_id, table, schema))
+        for table, dataset_id in zip(missing, created):
+            if dataset_id:
+                self.index["datasets"][table] = dataset_id
+        if not missing:
+            print(f"✅ All {len(tables)} datasets already exist")
+        return {key: self.index["datasets"][table] for key, table in tables if table in self.index["datasets"]}
+    
+    def ensure_charts(self, chart_configs: List[Dict]) -> List[int]:
+        """Chart ids in config order, creating missing charts (same name + dataset) concurrently"""
+        def chart_key(config: Dict):
+            return (config['slice_name'], config['datasource_id'])
+        
+        if chart_configs:
+            charts = self._list_all(
+                "chart",
+                f"(col:slice_name,opr:in,value:{rison_list([c['slice_name'] for c in chart_configs])})",
+                ["id", "slice_name", "datasource_id"]
+            )
+            self.index["charts"] = {(c['slice_name'], c.get('datasource_id')): c['id'] for c in charts}
+            print(f"🔎 Found {len(charts)} chart(s) already in {self.base_url}")
+        
+        missing = [c for c in chart_configs if chart_key(c) not in self.index["charts"]]
+        created = self._create_missing(missing, self.create_chart)
+        for config, chart_id in zip(missing, created):
+            if chart_id:
+                self.index["charts"][chart_key(config)] = chart_id
+        if not missing:
+            print(f"✅ All {len(chart_configs)} charts already exist")
+        return [self.index["charts"][chart_key(c)] for c in chart_configs if chart_key(c) in self.index["charts"]]
+    
+    def ensure_dashboard(self, dashboard_name: str, chart_ids: List[int]) -> Optional[int]:
+        """Create the dashboard if missing; re-lay it out only when its charts differ"""
+        dashboard_id = self.index["dashboards"].get(dashboard_name)
+        if not dashboard_id:
+            dashboard_id = self.create_dashboard(dashboard_name, chart_ids)
+            if dashboard_id:
+                self.index["dashboards"][dashboard_name] = dashboard_id
+            return dashboard_id
+        
+        response = self.session.get(f"{self.base_url}/api/v1/dashboard/{dashboard_id}/charts")
+        if response.status_code != 200:
+            print(f"❌ Failed to fetch dashboard charts: {response.text}")
+            return None
+        current = {c['id'] for c in response.json().get('result', [])}
+        
+        if current != set(chart_ids):
+            response = self.session.put(
+                f"{self.base_url}/api/v1/dashboard/{dashboard_id}",
+                json={"position_json": json.dumps(self._build_dashboard_layout(chart_ids))}
+            )
+            if response.status_code != 200:
+                print(f"❌ Failed to update dashboard layout: {response.text}")
+                return None
+            print(f"✅ Updated dashboard layout: {dashboard_name} (ID: {dashboard_id})")
+        else:
+            print(f"✅ Dashboard already exists: {dashboard_name} (ID: {dashboard_id})")
+        return dashboard_id
+    
     def create_chart(self, chart_config: Dict) -> Optional[int]:
         """Create a chart with given configuration"""
         response = self.session.post(
@@ -202,8 +349,16 @@ class PresetDashboardBuilder:
             print(f"❌ Failed to create dashboard: {response.text}")
             return None
     
-    def _build_dashboard_layout(self, chart_ids: List[int]) -> Dict:
-        """Build dashboard position JSON for Preset/Superset"""
+    def _build_dashboard_layout(self, chart_ids: List[int], rows: Optional[List[List[int]]] = None,
+                                row_height: int = 50) -> Dict:
+        """
+        Build dashboard position JSON for Preset/Superset
+        
+        Args:
+            chart_ids: Charts in display order, one full-width chart per row
+            rows: Chart ids per row instead (the 12 grid columns are split evenly)
+            row_height: Row height in grid units
+        """
         position_json = {
             "DASHBOARD_VERSION_KEY": "v2",
             "ROOT_ID": {
@@ -220,44 +375,283 @@ class PresetDashboardBuilder:
         }
         
         # Add charts in rows
-        row_height = 50  # Grid units
-        chart_width = 12  # Full width (12 columns)
-        y_position = 0
+        if rows is None:
+            rows = [[chart_id] for chart_id in chart_ids]
         
-        for idx, chart_id in enumerate(chart_ids):
-            chart_key = f"CHART-{chart_id}"
+        for idx, row_chart_ids in enumerate(rows):
             row_key = f"ROW-{idx}"
+            chart_keys = [f"CHART-{chart_id}" for chart_id in row_chart_ids]
+            chart_width = 12 // max(len(row_chart_ids), 1)  # 12 grid columns per row
             
             # Add row
             position_json[row_key] = {
                 "type": "ROW",
                 "id": row_key,
-                "children": [chart_key],
+                "children": chart_keys,
                 "parents": ["ROOT_ID", "GRID_ID"]
             }
             
-            # Add chart
-            position_json[chart_key] = {
-                "type": "CHART",
-                "id": chart_key,
-                "children": [],
-                "parents": [row_key, "ROOT_ID", "GRID_ID"],
-                "meta": {
-                    "width": chart_width,
-                    "height": row_height,
-                    "chartId": chart_id
+            # Add charts
+            for chart_key, chart_id in zip(chart_keys, row_chart_ids):
+                position_json[chart_key] = {
+                    "type": "CHART",
+                    "id": chart_key,
+                    "children": [],
+                    "parents": [row_key, "ROOT_ID", "GRID_ID"],
+                    "meta": {
+                        "width": chart_width,
+                        "height": row_height,
+                        "chartId": chart_id
+                    }
                 }
-            }
             
             position_json["GRID_ID"]["children"].append(row_key)
-            y_position += row_height
         
         return position_json
+    
+    # -------------------------------------------------------------
+    # Declarative spec: diff against the workspace, send only changes
+    # -------------------------------------------------------------
+    
+    def _apply_changes(self, changes: List[Dict]) -> List[Optional[int]]:
+        """POST creates / PUT updates concurrently; returns ids in order (None on failure)"""
+        def apply(change: Dict) -> Optional[int]:
+            url = f"{self.base_url}/api/v1/{change['resource']}/"
+            if change['action'] == 'create':
+                response = self.session.post(url, json=change['payload'])
+            else:
+                response = self.session.put(f"{url}{change['id']}", json=change['payload'])
+            if response.status_code in [200, 201]:
+                verb = "Created" if change['action'] == 'create' else "Updated"
+                print(f"✅ {verb} {change['resource']}: {change['name']} (ID: {response.json().get('id', change.get('id'))})")
+                return response.json().get('id', change.get('id'))
+            print(f"❌ Failed to {change['action']} {change['resource']} '{change['name']}': {response.text}")
+            return None
+        
+        return self._create_missing(changes, apply)
+    
+    @staticmethod
+    def _print_plan(changes: List[Dict], unchanged: int, resource: str):
+        for change in changes:
+            if change['action'] == 'create':
+                print(f"   + {resource} {change['name']}")
+            else:
+                print(f"   ~ {resource} {change['name']} (ID: {change['id']}): {', '.join(change['fields'])}")
+        if unchanged:
+            print(f"   = {unchanged} {resource}(s) unchanged")
+    
+    def sync_spec(self, spec: Dict, database_id: int, dry_run: bool = False) -> Dict[str, int]:
+        """
+        Bring the workspace in line with a dashboard spec (see dashboard_spec.json)
+        
+        Datasets are matched by table_name, charts by slice_name and dashboards by
+        title. Missing objects are POSTed; existing ones get a PUT carrying only the
+        fields that differ. Unchanged objects cost nothing beyond the list queries.
+        
+        Args:
+            spec: Parsed spec (load_dashboard_spec)
+            database_id: Database the datasets belong to
+            dry_run: Print the plan without sending changes
+        
+        Returns:
+            {"created": n, "updated": n, "unchanged": n}
+        """
+        totals = {"created": 0, "updated": 0, "unchanged": 0}
+        
+        def tally(changes: List[Dict], unchanged: int):
+            for change in changes:
+                totals["created" if change['action'] == 'create' else "updated"] += 1
+            totals["unchanged"] += unchanged
+        
+        # 1. Datasets
+        tables = [(key, ds['table_name']) for key, ds in spec['datasets'].items()]
+        self.build_index(database_id, [table for _, table in tables], [d['title'] for d in spec['dashboards']])
+        missing = [table for _, table in tables if table not in self.index["datasets"]]
+        self._print_plan([{"action": "create", "name": table} for table in missing],
+                         len(tables) - len(missing), "dataset")
+        tally([{"action": "create"}] * len(missing), len(tables) - len(missing))
+        if missing and not dry_run:
+            schema = spec.get('schema')
+            created = self._create_missing(missing, lambda table: self.create_dataset(database_id, table, schema))
+            for table, dataset_id in zip(missing, created):
+                if dataset_id:
+                    self.index["datasets"][table] = dataset_id
+        dataset_ids = {key: self.index["datasets"].get(table) for key, table in tables}
+        
+        # 2. Charts
+        live_charts = {}
+        for chart in self._list_all(
+            "chart",
+            f"(col:slice_name,opr:in,value:{rison_list([c['slice_name'] for c in spec['charts'].values()])})",
+            ["id", "slice_name", "viz_type", "datasource_id", "datasource_type", "params",
+             "description", "cache_timeout"]
+        ):
+            live_charts.setdefault(chart['slice_name'], chart)  # oldest wins on duplicate names
+        
+        chart_changes = []
+        for key, chart in spec['charts'].items():
+            desired = {
+                "slice_name": chart['slice_name'],
+                "viz_type": chart['viz_type'],
+                "datasource_id": dataset_ids.get(chart['dataset']),
+                "datasource_type": "table",
+                "params": json.dumps(chart.get('params', {}), sort_keys=True),
+            }
+            for optional in ("description", "cache_timeout"):
+                if optional in chart:
+                    desired[optional] = chart[optional]
+            live = live_charts.get(chart['slice_name'])
+            if live is None:
+                chart_changes.append({"action": "create", "resource": "chart", "key": key,
+                                      "name": chart['slice_name'], "payload": desired})
+                continue
+            fields = []
+            for field, value in desired.items():
+                if field == "params":
+                    # Compare parsed: key order / whitespace differences are not changes
+                    if json.loads(live.get('params') or "{}") != chart.get('params', {}):
+                        fields.append(field)
+                elif live.get(field) != value:
+                    fields.append(field)
+            if fields:
+                chart_changes.append({"action": "update", "resource": "chart", "key": key, "id": live['id'],
+                                      "name": chart['slice_name'], "fields": fields,
+                                      "payload": {f: desired[f] for f in fields}})
+        self._print_plan(chart_changes, len(spec['charts']) - len(chart_changes), "chart")
+        tally(chart_changes, len(spec['charts']) - len(chart_changes))
+        
+        chart_ids = {key: live_charts[c['slice_name']]['id']
+                     for key, c in spec['charts'].items() if c['slice_name'] in live_charts}
+        if chart_changes and not dry_run:
+            for change, chart_id in zip(chart_changes, self._apply_changes(chart_changes)):
+                if chart_id:
+                    chart_ids[change['key']] = chart_id
+        
+        # 3. Dashboards
+        live_dashboards = {}
+        for dashboard in self._list_all(
+            "dashboard",
+            f"(col:dashboard_title,opr:in,value:{rison_list([d['title'] for d in spec['dashboards']])})",
+            ["id", "dashboard_title", "slug", "published", "css", "json_metadata", "position_json"]
+        ):
+            live_dashboards.setdefault(dashboard['dashboard_title'], dashboard)
+        
+        dashboard_changes = []
+        for dashboard in spec['dashboards']:
+            layout = dashboard.get('layout', {})
+            rows = [[chart_ids[key] for key in row if chart_ids.get(key)] for row in layout.get('rows', [])]
+            position = self._build_dashboard_layout([], rows=rows, row_height=layout.get('row_height', 50))
+            metadata = dashboard.get('json_metadata', {})
+            desired = {
+                "dashboard_title": dashboard['title'],
+                "slug": dashboard.get('slug', dashboard['title'].lower().replace(' ', '-').replace('_', '-')),
+                "published": dashboard.get('published', True),
+                "css": dashboard.get('css', ""),
+            }
+            live = live_dashboards.get(dashboard['title'])
+            if live is None:
+                dashboard_changes.append({"action": "create", "resource": "dashboard", "name": dashboard['title'],
+                                          "payload": {**desired, "position_json": json.dumps(position),
+                                                      "json_metadata": json.dumps(metadata)}})
+                continue
+            
+            fields = [f for f, value in desired.items() if live.get(f) != value]
+            payload = {f: desired[f] for f in fields}
+            if json.loads(live.get('position_json') or "{}") != position:
+                fields.append("position_json")
+                payload["position_json"] = json.dumps(position)
+            # Superset adds its own keys to json_metadata - only compare the spec's keys
+            live_metadata = json.loads(live.get('json_metadata') or "{}")
+            if any(live_metadata.get(k) != v for k, v in metadata.items()):
+                fields.append("json_metadata")
+                payload["json_metadata"] = json.dumps({**live_metadata, **metadata})
+            if fields:
+                dashboard_changes.append({"action": "update", "resource": "dashboard", "id": live['id'],
+                                          "name": dashboard['title'], "fields": fields, "payload": payload})
+        self._print_plan(dashboard_changes, len(spec['dashboards']) - len(dashboard_changes), "dashboard")
+        tally(dashboard_changes, len(spec['dashboards']) - len(dashboard_changes))
+        
+        if dashboard_changes and not dry_run:
+            self._apply_changes(dashboard_changes)
+        return totals
+
+
+def load_dashboard_spec(path: str) -> Dict:
+    """Read a dashboard spec (.json, or .yaml/.yml with PyYAML) and check its references"""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise SystemExit("❌ Reading a YAML spec needs PyYAML: pip install pyyaml")
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+    
+    for section in ("database", "datasets", "charts", "dashboards"):
+        if section not in spec:
+            raise ValueError(f"Spec {path} has no '{section}' section")
+    for key, chart in spec['charts'].items():
+        if chart.get('dataset') not in spec['datasets']:
+            raise ValueError(f"Chart '{key}' uses unknown dataset '{chart.get('dataset')}'")
+    for dashboard in spec['dashboards']:
+        for row in dashboard.get('layout', {}).get('rows', []):
+            for key in row:
+                if key not in spec['charts']:
+                    raise ValueError(f"Dashboard '{dashboard['title']}' lays out unknown chart '{key}'")
+    return spec
+
+
+def sync_dashboard_spec(spec_path: str, workspace_urls: List[str], dry_run: bool = False,
+                        max_workers: int = 8) -> bool:
+    """
+    Apply a dashboard spec to each workspace, sending only the changes
+    
+    Credentials come from PRESET_API_TOKEN, or PRESET_USERNAME + PRESET_PASSWORD.
+    Workspaces default to the spec's "workspaces" list.
+    """
+    spec = load_dashboard_spec(spec_path)
+    ok = True
+    for workspace_url in workspace_urls or spec.get('workspaces', []):
+        print("\n" + "="*70)
+        print(f"{'PLAN' if dry_run else 'SYNC'}: {spec_path} → {workspace_url}")
+        print("="*70)
+        try:
+            builder = PresetDashboardBuilder(
+                workspace_url,
+                api_token=os.getenv("PRESET_API_TOKEN"),
+                username=os.getenv("PRESET_USERNAME"),
+                password=os.getenv("PRESET_PASSWORD"),
+                max_workers=max_workers
+            )
+            database_id = builder.get_database_id(spec['database'])
+            if not database_id:
+                ok = False
+                continue
+            totals = builder.sync_spec(spec, database_id, dry_run=dry_run)
+        except Exception as e:
+            print(f"❌ {workspace_url}: {e}")
+            ok = False
+            continue
+        print(f"📋 {'Would create' if dry_run else 'Created'} {totals['created']}, "
+              f"{'would update' if dry_run else 'updated'} {totals['updated']}, "
+              f"{totals['unchanged']} unchanged")
+    return ok
 
 
-def create_preset_pharmaceutical_dashboard():
+def create_preset_pharmaceutical_dashboard(use_rollups: bool = False, provision: bool = False,
+                                           workspace_url: Optional[str] = None, max_workers: int = 8):
     """
     Main function to create the pharmaceutical pricing dashboard in Preset.io
+
+    Args:
+        use_rollups: Point the % change and history charts at the pre-aggregated
+            bi_rollup_* tables (sp_refresh_bi_rollups.sql) instead of the
+            detail tables
+        provision: Index existing objects and create only what is missing,
+            concurrently (re-running is a no-op)
+        workspace_url: Workspace to provision (default: PRESET_WORKSPACE_URL below)
+        max_workers: Concurrent requests in provision mode
     """
     
     print("="*70)
@@ -265,11 +659,11 @@ def create_preset_pharmaceutical_dashboard():
     print("="*70)
     
     # Configuration - UPDATE THESE VALUES FOR YOUR PRESET WORKSPACE
-    PRESET_WORKSPACE_URL = "https://c9a32755.us1a.app.preset.io"  # Change this!
+    PRESET_WORKSPACE_URL = workspace_url or "https://c9a32755.us1a.app.preset.io"  # Change this!
     
     # Option 1: Use API Token (Preset Team/Enterprise)
     # Get token from: Settings → API Tokens
-    PRESET_API_TOKEN = None  # "your-api-token-here"
+    PRESET_API_TOKEN = os.getenv("PRESET_API_TOKEN")  # "your-api-token-here"
     
     # Option 2: Use Username/Password (if no API token)
     USERNAME = "haranathg@gmail.com"  # Change this!
@@ -286,9 +680,11 @@ def create_preset_pharmaceutical_dashboard():
     # Initialize builder
     try:
         if PRESET_API_TOKEN:
-            builder = PresetDashboardBuilder(PRESET_WORKSPACE_URL, api_token=PRESET_API_TOKEN)
+            builder = PresetDashboardBuilder(PRESET_WORKSPACE_URL, api_token=PRESET_API_TOKEN,
+                                             max_workers=max_workers)
         else:
-            builder = PresetDashboardBuilder(PRESET_WORKSPACE_URL, username=USERNAME, password=PASSWORD)
+            builder = PresetDashboardBuilder(PRESET_WORKSPACE_URL, username=USERNAME, password=PASSWORD,
+                                             max_workers=max_workers)
     except Exception as e:
         print(f"\n❌ Failed to authenticate: {e}")
         print("\nTroubleshooting:")
@@ -313,32 +709,65 @@ def create_preset_pharmaceutical_dashboard():
     print("\n📁 Creating datasets...")
     print("-"*70)
     
+    DASHBOARD_TITLE = "Buy and Bill - Pharmaceutical Pricing"
     datasets = {}
+    # Views over the compact facts (sp_refresh_bi_dimensions.sql), refreshed
+    # with the BI tables
     tables_to_create = [
-        ('consolidated', 'bi_consolidated_drug_data'),
-        ('hist_asp', 'bi_historical_asp'),
-        ('hist_wac', 'bi_historical_wac'),
-        ('hist_awp', 'bi_historical_awp'),
+        ('consolidated', 'vw_bi_consolidated_drug_data'),
+        ('hist_asp', 'vw_bi_historical_asp'),
+        ('hist_wac', 'vw_bi_historical_wac'),
+        ('hist_awp', 'vw_bi_historical_awp'),
         ('drug_class', 'bi_drug_class')
     ]
+    if use_rollups:
+        tables_to_create += [
+            ('rollup_hcpcs', 'bi_rollup_hcpcs_quarter'),
+            ('rollup_manufacturer', 'bi_rollup_manufacturer_quarter'),
+            ('top_movers', 'bi_rollup_top_movers')
+        ]
     
-    for key, table_name in tables_to_create:
-        dataset_id = builder.create_dataset(database_id, table_name, SCHEMA)
-        if dataset_id:
-            datasets[key] = dataset_id
-        else:
-            print(f"⚠️  Warning: Could not create/find dataset for {table_name}")
+    if provision:
+        builder.build_index(database_id, [table for _, table in tables_to_create], [DASHBOARD_TITLE])
+        datasets = builder.ensure_datasets(database_id, tables_to_create, SCHEMA)
+        for key, table_name in tables_to_create:
+            if key not in datasets:
+                print(f"⚠️  Warning: Could not create/find dataset for {table_name}")
+    else:
+        for key, table_name in tables_to_create:
+            dataset_id = builder.create_dataset(database_id, table_name, SCHEMA)
+            if dataset_id:
+                datasets[key] = dataset_id
+            else:
+                print(f"⚠️  Warning: Could not create/find dataset for {table_name}")
     
     if not datasets.get('consolidated'):
         print("\n❌ Critical: Could not create main consolidated dataset")
-        print("Please verify the table 'bi_consolidated_drug_data' exists in your database")
+        print("Please verify the view 'vw_bi_consolidated_drug_data' exists in your database "
+              "(sp_refresh_bi_dimensions.sql)")
         return
     
     # Create charts
     print("\n📊 Creating charts...")
     print("-"*70)
     
-    chart_ids = []
+    chart_configs = []
+    
+    # History charts: (dataset key, metric column, time column) per measure.
+    # The rollup has one typed row per HCPCS per quarter, so the chart query
+    # reads a few rows per code instead of aggregating the detail table.
+    if use_rollups:
+        history_sources = {
+            'asp': ('rollup_hcpcs', 'asp', 'quarter_date'),
+            'wac': ('rollup_hcpcs', 'median_wac', 'quarter_date'),
+            'awp': ('rollup_hcpcs', 'median_awp', 'quarter_date'),
+        }
+    else:
+        history_sources = {
+            'asp': ('hist_asp', 'asp', 'Date'),
+            'wac': ('hist_wac', 'Median_WAC', 'Date'),
+            'awp': ('hist_awp', 'Median_AWP', 'Date'),
+        }
     
     # Chart 1: Data Table
     if datasets.get('consolidated'):
@@ -355,7 +784,7 @@ def create_preset_pharmaceutical_dashboard():
                     "ASP_per_Unit_Current_Quarter",
                     "ASP_per_Unit_Previous_Quarter",
                     "ASP_Quarterly_Change_Pct",
-                    "product_category"
+                    "Drug_Class"
                 ],
                 "metrics": [],
                 "adhoc_filters": [],
@@ -363,12 +792,28 @@ def create_preset_pharmaceutical_dashboard():
                 "order_desc": True
             })
         }
-        chart_id = builder.create_chart(chart_1_config)
-        if chart_id:
-            chart_ids.append(chart_id)
+        chart_configs.append(chart_1_config)
     
     # Chart 2: ASP Quarterly Change
-    if datasets.get('consolidated'):
+    if use_rollups and datasets.get('top_movers'):
+        chart_2_config = {
+            "slice_name": "ASP Quarterly % Change",
+            "viz_type": "dist_bar",
+            "datasource_id": datasets['top_movers'],
+            "datasource_type": "table",
+            "params": json.dumps({
+                "metrics": [{
+                    "expressionType": "SIMPLE",
+                    "column": {"column_name": "ASP_Quarterly_Change_Pct"},
+                    "aggregate": "MAX",
+                    "label": "ASP Change %"
+                }],
+                "groupby": ["hcpcs_drug"],
+                "row_limit": 50,
+                "order_desc": True
+            })
+        }
+    elif datasets.get('consolidated'):
         chart_2_config = {
             "slice_name": "ASP Quarterly % Change",
             "viz_type": "dist_bar",
@@ -386,9 +831,10 @@ def create_preset_pharmaceutical_dashboard():
                 "order_desc": True
             })
         }
-        chart_id = builder.create_chart(chart_2_config)
-        if chart_id:
-            chart_ids.append(chart_id)
+    else:
+        chart_2_config = None
+    if chart_2_config:
+        chart_configs.append(chart_2_config)
     
     # Chart 3: ASP Ratios
     if datasets.get('consolidated'):
@@ -416,87 +862,119 @@ def create_preset_pharmaceutical_dashboard():
                 "row_limit": 20
             })
         }
-        chart_id = builder.create_chart(chart_3_config)
-        if chart_id:
-            chart_ids.append(chart_id)
+        chart_configs.append(chart_3_config)
     
     # Chart 4: ASP History
-    if datasets.get('hist_asp'):
+    asp_dataset, asp_column, asp_time_column = history_sources['asp']
+    if datasets.get(asp_dataset):
         chart_4_config = {
             "slice_name": "ASP Historical Trends",
             "viz_type": "line",
-            "datasource_id": datasets['hist_asp'],
+            "datasource_id": datasets[asp_dataset],
             "datasource_type": "table",
             "params": json.dumps({
                 "metrics": [{
                     "expressionType": "SIMPLE",
-                    "column": {"column_name": "asp"},
+                    "column": {"column_name": asp_column},
                     "aggregate": "AVG",
                     "label": "ASP"
                 }],
                 "groupby": ["HCPCS_Code"],
-                "granularity_sqla": "Date",
+                "granularity_sqla": asp_time_column,
                 "time_range": "Last year"
             })
         }
-        chart_id = builder.create_chart(chart_4_config)
-        if chart_id:
-            chart_ids.append(chart_id)
+        chart_configs.append(chart_4_config)
     
     # Chart 5: WAC History
-    if datasets.get('hist_wac'):
+    wac_dataset, wac_column, wac_time_column = history_sources['wac']
+    if datasets.get(wac_dataset):
         chart_5_config = {
             "slice_name": "WAC Historical Trends",
             "viz_type": "line",
-            "datasource_id": datasets['hist_wac'],
+            "datasource_id": datasets[wac_dataset],
             "datasource_type": "table",
             "params": json.dumps({
                 "metrics": [{
                     "expressionType": "SIMPLE",
-                    "column": {"column_name": "Median_WAC"},
+                    "column": {"column_name": wac_column},
                     "aggregate": "AVG",
                     "label": "WAC"
                 }],
                 "groupby": ["HCPCS_Code"],
-                "granularity_sqla": "Date",
+                "granularity_sqla": wac_time_column,
                 "time_range": "Last year"
             })
         }
-        chart_id = builder.create_chart(chart_5_config)
-        if chart_id:
-            chart_ids.append(chart_id)
+        chart_configs.append(chart_5_config)
     
     # Chart 6: AWP History
-    if datasets.get('hist_awp'):
+    awp_dataset, awp_column, awp_time_column = history_sources['awp']
+    if datasets.get(awp_dataset):
         chart_6_config = {
             "slice_name": "AWP Historical Trends",
             "viz_type": "line",
-            "datasource_id": datasets['hist_awp'],
+            "datasource_id": datasets[awp_dataset],
             "datasource_type": "table",
             "params": json.dumps({
                 "metrics": [{
                     "expressionType": "SIMPLE",
-                    "column": {"column_name": "Median_AWP"},
+                    "column": {"column_name": awp_column},
                     "aggregate": "AVG",
                     "label": "AWP"
                 }],
                 "groupby": ["HCPCS_Code"],
-                "granularity_sqla": "Date",
+                "granularity_sqla": awp_time_column,
                 "time_range": "Last year"
             })
         }
-        chart_id = builder.create_chart(chart_6_config)
-        if chart_id:
-            chart_ids.append(chart_id)
+        chart_configs.append(chart_6_config)
+    
+    # Chart 7: Manufacturer ASP History (rollups only - too slow on the detail tables)
+    if use_rollups and datasets.get('rollup_manufacturer'):
+        chart_7_config = {
+            "slice_name": "Manufacturer ASP Trends",
+            "viz_type": "line",
+            "datasource_id": datasets['rollup_manufacturer'],
+            "datasource_type": "table",
+            "params": json.dumps({
+                "metrics": [{
+                    "expressionType": "SIMPLE",
+                    "column": {"column_name": "avg_asp"},
+                    "aggregate": "AVG",
+                    "label": "Avg ASP"
+                }],
+                "groupby": ["Manufacturer"],
+                "granularity_sqla": "quarter_date",
+                "time_range": "Last year",
+                "timeseries_limit_metric": {
+                    "expressionType": "SIMPLE",
+                    "column": {"column_name": "hcpcs_count"},
+                    "aggregate": "MAX",
+                    "label": "HCPCS codes"
+                },
+                "limit": 10
+            })
+        }
+        chart_configs.append(chart_7_config)
+    
+    if provision:
+        chart_ids = builder.ensure_charts(chart_configs)
+    else:
+        chart_ids = []
+        for chart_config in chart_configs:
+            chart_id = builder.create_chart(chart_config)
+            if chart_id:
+                chart_ids.append(chart_id)
     
     # Create dashboard
     if chart_ids:
         print("\n📋 Creating dashboard...")
         print("-"*70)
-        dashboard_id = builder.create_dashboard(
-            "Buy and Bill - Pharmaceutical Pricing",
-            chart_ids
-        )
+        if provision:
+            dashboard_id = builder.ensure_dashboard(DASHBOARD_TITLE, chart_ids)
+        else:
+            dashboard_id = builder.create_dashboard(DASHBOARD_TITLE, chart_ids)
         
         if dashboard_id:
             dashboard_url = f"{PRESET_WORKSPACE_URL}/superset/dashboard/{dashboard_id}/"
@@ -532,4 +1010,21 @@ if __name__ == "__main__":
     print("   - DATABASE_NAME")
     print("\n" + "="*70 + "\n")
     
-    create_preset_pharmaceutical_dashboard()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create the pharmaceutical pricing dashboard in Preset/Superset")
+    parser.add_argument("--use-rollups", action="store_true",
+                        help="Point the %% change and history charts at the bi_rollup_* tables")
+    parser.add_argument("--provision", action="store_true",
+                        help="Create only missing datasets/charts/dashboard, concurrently (safe to re-run)")
+    parser.add_argument("--workspace", action="append",
+                        help="Workspace URL; repeat for several workspaces (default: PRESET_WORKSPACE_URL)")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent requests in --provision / --spec mode")
+    parser.add_argument("--spec", help="Sync this dashboard spec (JSON/YAML) instead - only changed objects are sent")
+    parser.add_argument("--dry-run", action="store_true", help="With --spec: print the plan, change nothing")
+    args = parser.parse_args()
+    
+    if args.spec:
+        raise SystemExit(0 if sync_dashboard_spec(args.spec, args.workspace, args.dry_run, args.workers) else 1)
+    
+    for workspace in args.workspace or [None]:
+        create_preset_pharmaceutical_dashboard(use_rollups=args.use_rollups, provision=args.provision,
+                                               workspace_url=workspace, max_workers=args.workers)
\ No newline at end of file
@@ -0,0 +1,513 @@
+"""
+BI Refresh Benchmark Harness
+Measures sp_refresh_bi_tables_v3 on synthetic data instead of production
+
+For each scale (default 1x, 5x, 20x):
+  1. Creates a scratch database on a LOCAL MariaDB server
+  2. Generates synthetic cms_drug_pricing rows with production-like mess:
+       - many NDCs per HCPCS code (heavy-tailed: most codes 1-3, a few 50+)
+       - month_year strings like 'January.2024' and the 'Feburary.2024' typo
+       - re-imported CSV header rows and blank HCPCS rows
+       - every price stored as text, BILLUNITSPKG of 0 / missing
+  3. Installs the repo's SQL (migration + procedures) in setup order
+  4. Times CALL sp_refresh_bi_tables_v3() end to end and per step
+     (bi_refresh_step_log), plus a no-change incremental run
+  5. Writes everything to a JSON file
+
+Compare a change to sp_process_single_quarter.sql against a baseline:
+  python benchmark_refresh.py --output bench_baseline.json
+  ... edit SQL ...
+  python benchmark_refresh.py --output bench_new.json --baseline bench_baseline.json
+
+Prerequisites:
+- pip install -r requirements.txt  (PyMySQL)
+- Local MariaDB 10.5+ (the migration uses ADD COLUMN / INDEX IF NOT EXISTS)
+  and a user allowed to CREATE / DROP DATABASE
+
+The generator is seeded: the same --seed and scale always produce the same rows.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pymysql
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Same order as the README setup steps
+SETUP_SQL_FILES = [
+    "sp_refresh_step_log.sql",
+    "sp_refresh_lock.sql",
+    "migrate_period_columns.sql",
+    "sp_validate_cms_drug_pricing.sql",
+    "sp_stage_cms_drug_pricing.sql",
+    "sp_process_single_quarter.sql",
+    "sp_refresh_bi_dimensions.sql",
+    "sp_refresh_bi_rollups.sql",
+    "sp_refresh_digest.sql",
+    "sp_refresh_bi_tables_incremental.sql",
+    "sp_refresh_bi_tables_v4.sql",
+    "sp_refresh_bi_tables_shadow.sql",
+]
+
+SOURCE_COLUMNS = [
+    "HCPCS_Code", "Short_Description", "LABELER_NAME", "NDC2", "Drug_Name",
+    "BILLUNITSPKG", "HCPCS_Code_Dosage", "Payment_Limit", "Current_WAC_Package_Price",
+    "Current_WAC_Effect_Date", "Current_AWP_Package_Price", "Current_AWP_Effect_Date",
+    "J_Code_Desc", "product", "route_of_administration", "brand_generic",
+    "month_name", "year_name", "month_year", "ASP_Override",
+]
+
+MONTH_NAMES = [
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+]
+
+LABELERS = [
+    "Pfizer Laboratories", "Amgen USA", "Sandoz Inc", "Fresenius Kabi USA", "Hikma Pharmaceuticals",
+    "Teva Parenteral", "Genentech", "Merck Sharp & Dohme", "Baxter Healthcare", "Mylan Institutional",
+    "Hospira", "Sagent Pharmaceuticals", "Novartis", "Eli Lilly", "AstraZeneca",
+    "Bristol-Myers Squibb", "Janssen Biotech", "Accord Healthcare", "Dr. Reddy's", "Apotex Corp",
+]
+
+DRUG_STEMS = [
+    "ritux", "trastu", "bevaci", "pembro", "nivol", "denos", "pegfil", "epoet", "inflix", "adali",
+    "ocreli", "zoledr", "leupro", "fulves", "bortez", "carbop", "oxalip", "gemcit", "docet", "paclit",
+]
+DRUG_SUFFIXES = ["imab", "umab", "mab", "ate", "ide", "ine", "astim", "in", "ol", "ib"]
+ROUTES = ["INTRAVENOUS", "SUBCUTANEOUS", "INTRAMUSCULAR", "INTRAVITREAL"]
+UNITS = ["1", "1", "1", "2", "5", "10", "10", "20", "25", "50", "100", "0", None]
+
+
+# =============================================================
+# Synthetic data
+# =============================================================
+
+class SyntheticCmsData:
+    def __init__(self, scale: int = 1, base_hcpcs: int = 300, months: int = 36,
+                 end_month: date = date(2025, 9, 1), seed: int = 42):
+        """
+        Initialize the generator
+
+        Args:
+            scale: Multiplier on the number of HCPCS codes (and so NDCs / rows)
+            base_hcpcs: HCPCS codes at scale 1
+            months: Number of monthly files ending at end_month
+            end_month: Last month generated
+            seed: Random seed (same seed + scale -> same rows)
+        """
+        self.scale = scale
+        self.hcpcs_count = base_hcpcs * scale
+        self.months = months
+        self.end_month = end_month
+        self.rng = random.Random(f"{seed}-{scale}")
+
+    def month_list(self) -> List[date]:
+        result = []
+        year, month = self.end_month.year, self.end_month.month
+        for _ in range(self.months):
+            result.append(date(year, month, 1))
+            month -= 1
+            if month == 0:
+                year, month = year - 1, 12
+        return list(reversed(result))
+
+    def _price(self, value: Optional[float]) -> Optional[str]:
+        """Prices arrive as text with inconsistent precision"""
+        if value is None:
+            return None
+        return self.rng.choice(["{:.2f}", "{:.3f}", "{:.4f}", "{:.5f}"]).format(value)
+
+    def _effect_date(self, month: date) -> str:
+        """'m/d/yy' like the CMS files (parsed with %c/%e/%y)"""
+        d = date(month.year, month.month, self.rng.randint(1, 28))
+        return f"{d.month}/{d.day}/{d.strftime('%y')}"
+
+    def _products(self) -> List[Dict]:
+        """One entry per HCPCS code with its NDCs (heavy-tailed NDC count)"""
+        products = []
+        for i in range(self.hcpcs_count):
+            prefix = self.rng.choices(["J", "Q", "C"], weights=[85, 10, 5])[0]
+            code = f"{prefix}{1000 + i % 9000:04d}" if i < 9000 else f"{prefix}{i:05d}"
+            drug = (self.rng.choice(DRUG_STEMS) + self.rng.choice(DRUG_SUFFIXES)).capitalize()
+            ndc_count = min(80, int(self.rng.paretovariate(1.1)))
+            base_asp = round(self.rng.lognormvariate(3.0, 1.8), 4)
+            ndcs = []
+            for n in range(ndc_count):
+                ndcs.append({
+                    "ndc": f"{self.rng.randint(10000, 99999)}-{self.rng.randint(100, 999)}-{n % 100:02d}",
+                    "labeler": self.rng.choices(LABELERS, weights=range(len(LABELERS), 0, -1))[0],
+                    "units": self.rng.choice(UNITS),
+                    "markup": self.rng.uniform(1.05, 1.6),
+                })
+            products.append({
+                "code": code,
+                "drug": drug,
+                "dosage": f"{self.rng.choice([1, 5, 10, 50, 100])} MG",
+                "desc": f"Injection, {drug.lower()}, {self.rng.choice([1, 5, 10, 50, 100])} mg",
+                "route": self.rng.choice(ROUTES),
+                "brand": self.rng.choice(["Brand", "Generic", "Biosimilar"]),
+                "base_asp": base_asp,
+                "ndcs": ndcs,
+            })
+        return products
+
+    def rows(self) -> Iterator[Tuple]:
+        """Yield source rows in SOURCE_COLUMNS order, month by month"""
+        products = self._products()
+        for month in self.month_list():
+            month_word = MONTH_NAMES[month.month - 1]
+            if month.month == 2 and self.rng.random() < 0.5:
+                month_word = "Feburary"  # the real typo in the CMS files
+            month_year = f"{month_word}.{month.year}"
+
+            # CSV header re-imported as data + a blank line
+            yield tuple(SOURCE_COLUMNS)
+            yield (None,) * (len(SOURCE_COLUMNS) - 2) + (month_year, None)
+
+            drift = 1 + (month.year - 2015) * 0.03 + month.month * 0.002
+            for product in products:
+                asp = product["base_asp"] * drift * self.rng.uniform(0.97, 1.03)
+                payment_limit = asp * 1.06
+                override = None
+                roll = self.rng.random()
+                if roll < 0.04:
+                    override = self._price(asp * self.rng.uniform(0.9, 1.1))
+                elif roll < 0.06:
+                    override = "0"
+
+                for ndc in product["ndcs"]:
+                    units = ndc["units"]
+                    unit_count = float(units) if units not in (None, "0") else 1.0
+                    wac = asp * ndc["markup"] * unit_count if self.rng.random() > 0.05 else None
+                    awp = wac * 1.2 if wac is not None and self.rng.random() > 0.05 else None
+                    yield (
+                        product["code"],
+                        product["desc"][:60],
+                        ndc["labeler"],
+                        ndc["ndc"],
+                        product["drug"],
+                        units,
+                        product["dosage"],
+                        self._price(payment_limit),
+                        self._price(wac),
+                        self._effect_date(month) if wac is not None else None,
+                        self._price(awp),
+                        self._effect_date(month) if awp is not None else None,
+                        product["desc"],
+                        product["drug"].upper(),
+                        product["route"],
+                        product["brand"],
+                        str(month.month),
+                        str(month.year),
+                        month_year,
+                        override,
+                    )
+
+
+# =============================================================
+# SQL helpers
+# =============================================================
+
+def split_sql_script(text: str) -> List[str]:
+    """
+    Split a phpMyAdmin-style script into statements, honouring DELIMITER
+
+    Statements end where a line ends with the current delimiter; comment-only
+    lines never end a statement.
+    """
+    statements = []
+    buffer: List[str] = []
+    delimiter = ";"
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.upper().startswith("DELIMITER "):
+            delimiter = stripped.split(None, 1)[1]
+            continue
+        if not buffer and (not stripped or stripped.startswith("--")):
+            continue
+        buffer.append(line)
+        if not stripped.startswith("--") and stripped.endswith(delimiter):
+            statement = "\n".join(buffer).rstrip()
+            statements.append(statement[: -len(delimiter)].rstrip())
+            buffer = []
+    if buffer and "".join(buffer).strip():
+        statements.append("\n".join(buffer).strip())
+    return [s for s in statements if s]
+
+
+def run_sql_file(conn: pymysql.connections.Connection, path: str) -> float:
+    """Execute every statement of a .sql file; returns elapsed seconds"""
+    with open(path, encoding="utf-8") as f:
+        statements = split_sql_script(f.read())
+    start = time.time()
+    with conn.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+            while cursor.nextset():
+                pass
+    conn.commit()
+    return time.time() - start
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# =============================================================
+# Benchmark
+# =============================================================
+
+class RefreshBenchmark:
+    def __init__(self, connect_args: Dict, database_prefix: str = "bnb_bench",
+                 base_hcpcs: int = 300, months: int = 36, seed: int = 42,
+                 batch_size: int = 5000, keep: bool = False):
+        """
+        Initialize the benchmark
+
+        Args:
+            connect_args: pymysql.connect() arguments (no database)
+            database_prefix: Scratch databases are named <prefix>_<scale>x
+            base_hcpcs: HCPCS codes at scale 1
+            months: Months of data generated
+            seed: Generator seed
+            batch_size: Rows per multi-row INSERT while loading
+            keep: Keep the scratch databases after the run
+        """
+        self.connect_args = connect_args
+        self.database_prefix = database_prefix
+        self.base_hcpcs = base_hcpcs
+        self.months = months
+        self.seed = seed
+        self.batch_size = batch_size
+        self.keep = keep
+
+    def _connect(self, database: Optional[str] = None) -> pymysql.connections.Connection:
+        args = dict(self.connect_args)
+        if database:
+            args["database"] = database
+        return pymysql.connect(charset="utf8mb4", autocommit=False, **args)
+
+    def _scalar(self, conn: pymysql.connections.Connection, sql: str):
+        with conn.cursor() as cursor:
+            cursor.execute(sql)
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    def load(self, conn: pymysql.connections.Connection, scale: int) -> Tuple[int, float]:
+        generator = SyntheticCmsData(scale=scale, base_hcpcs=self.base_hcpcs,
+                                     months=self.months, seed=self.seed)
+        sql = (f"INSERT INTO cms_drug_pricing ({', '.join(SOURCE_COLUMNS)}) "
+               f"VALUES ({', '.join(['%s'] * len(SOURCE_COLUMNS))})")
+        start = time.time()
+        total = 0
+        batch: List[Tuple] = []
+        with conn.cursor() as cursor:
+            for row in generator.rows():
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    cursor.executemany(sql, batch)  # PyMySQL sends one multi-row INSERT
+                    total += len(batch)
+                    batch = []
+            if batch:
+                cursor.executemany(sql, batch)
+                total += len(batch)
+        conn.commit()
+        return total, time.time() - start
+
+    def step_stats(self, conn: pymysql.connections.Connection, run_id: str) -> Dict[str, Dict]:
+        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+            cursor.execute(
+                "SELECT step, COUNT(*) AS calls, SUM(elapsed_ms) AS total_ms, MAX(elapsed_ms) AS max_ms, "
+                "SUM(rows_out) AS rows_out, SUM(errno != 0) AS errors "
+                "FROM bi_refresh_step_log WHERE run_id = %s GROUP BY step ORDER BY total_ms DESC",
+                (run_id,),
+            )
+            return {
+                row["step"]: {
+                    "calls": int(row["calls"]),
+                    "total_ms": int(row["total_ms"] or 0),
+                    "max_ms": int(row["max_ms"] or 0),
+                    "rows_out": int(row["rows_out"] or 0),
+                    "errors": int(row["errors"] or 0),
+                }
+                for row in cursor.fetchall()
+            }
+
+    def run_scale(self, scale: int) -> Dict:
+        database = f"{self.database_prefix}_{scale}x"
+        print(f"\n{'=' * 70}\n📦 Scale {scale}x → database {database}\n{'=' * 70}")
+
+        admin = self._connect()
+        with admin.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+            cursor.execute(f"CREATE DATABASE `{database}` CHARACTER SET utf8mb4")
+        admin.close()
+
+        conn = self._connect(database)
+        result: Dict = {"scale": scale, "database": database}
+        try:
+            run_sql_file(conn, os.path.join(REPO_DIR, "benchmark_schema.sql"))
+
+            rows, load_s = self.load(conn, scale)
+            result["source_rows"] = rows
+            result["load_s"] = round(load_s, 3)
+            print(f"   Loaded {rows:,} source rows in {load_s:.1f}s")
+
+            setup: Dict[str, float] = {}
+            for name in SETUP_SQL_FILES:
+                setup[name] = round(run_sql_file(conn, os.path.join(REPO_DIR, name)), 3)
+            result["setup_s"] = setup
+            print(f"   Migration (period columns + backfill): {setup['migrate_period_columns.sql']:.1f}s")
+
+            # Full refresh, end to end
+            start = time.time()
+            with conn.cursor() as cursor:
+                cursor.execute("CALL sp_refresh_bi_tables_v3()")
+                while cursor.nextset():
+                    pass
+            conn.commit()
+            result["refresh_s"] = round(time.time() - start, 3)
+            run_id = self._scalar(conn, "SELECT @bi_refresh_run_id")
+            result["run_id"] = run_id
+            result["steps"] = self.step_stats(conn, run_id) if run_id else {}
+            print(f"   ⏱️  sp_refresh_bi_tables_v3: {result['refresh_s']:.1f}s")
+
+            # Incremental with nothing changed (watermark check only)
+            start = time.time()
+            with conn.cursor() as cursor:
+                cursor.execute("CALL sp_refresh_bi_tables_incremental()")
+                while cursor.nextset():
+                    pass
+            conn.commit()
+            result["incremental_noop_s"] = round(time.time() - start, 3)
+            print(f"   ⏱️  sp_refresh_bi_tables_incremental (no changes): {result['incremental_noop_s']:.1f}s")
+
+            result["output_rows"] = {
+                "bi_hcpcs_drug_pricing": self._scalar(conn, "SELECT COUNT(*) FROM bi_hcpcs_drug_pricing"),
+                "bi_historical_pricing": self._scalar(conn, "SELECT COUNT(*) FROM bi_historical_pricing"),
+                "quarters": self._scalar(conn, "SELECT COUNT(DISTINCT Quarter) FROM bi_historical_pricing"),
+            }
+            result["log_errors"] = self._scalar(
+                conn, "SELECT COUNT(*) FROM bi_refresh_log WHERE status IN ('ERROR', 'FAILED')"
+            )
+            if result["log_errors"]:
+                print(f"   ⚠️  {result['log_errors']} ERROR/FAILED rows in bi_refresh_log - timings not comparable")
+
+            for step, stats in list(result["steps"].items())[:5]:
+                print(f"      {step:<26}{stats['total_ms']:>10} ms  ({stats['calls']} calls)")
+        finally:
+            conn.close()
+            if not self.keep:
+                admin = self._connect()
+                with admin.cursor() as cursor:
+                    cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+                admin.close()
+        return result
+
+    def run(self, scales: List[int]) -> Dict:
+        conn = self._connect()
+        server_version = self._scalar(conn, "SELECT VERSION()")
+        conn.close()
+
+        report = {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "server_version": server_version,
+            "host": platform.node(),
+            "seed": self.seed,
+            "base_hcpcs": self.base_hcpcs,
+            "months": self.months,
+            "results": [],
+        }
+        for scale in scales:
+            report["results"].append(self.run_scale(scale))
+        return report
+
+
+def compare(report: Dict, baseline: Dict):
+    """Print refresh time and per-step deltas against a baseline report"""
+    print(f"\n{'=' * 70}\n📊 vs baseline {baseline.get('git_commit')} ({baseline.get('generated_at')})\n{'=' * 70}")
+    if (baseline.get("seed"), baseline.get("base_hcpcs"), baseline.get("months")) != \
+            (report["seed"], report["base_hcpcs"], report["months"]):
+        print("⚠️  Baseline used a different seed / size - results are not directly comparable")
+
+    base_by_scale = {r["scale"]: r for r in baseline.get("results", [])}
+    for current in report["results"]:
+        base = base_by_scale.get(current["scale"])
+        if not base:
+            print(f"   {current['scale']}x: no baseline")
+            continue
+        ratio = current["refresh_s"] / base["refresh_s"] if base.get("refresh_s") else 0
+        print(f"\n   {current['scale']}x: {base['refresh_s']:.1f}s → {current['refresh_s']:.1f}s ({ratio:.2f}x)")
+        for step, stats in current.get("steps", {}).items():
+            before = base.get("steps", {}).get(step, {}).get("total_ms")
+            if before:
+                print(f"      {step:<26}{before:>10} → {stats['total_ms']:>10} ms ({stats['total_ms'] / before:.2f}x)")
+            else:
+                print(f"      {step:<26}{'new':>10} → {stats['total_ms']:>10} ms")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the BI refresh on synthetic cms_drug_pricing data")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--base-hcpcs", type=int, default=300, help="HCPCS codes at scale 1")
+    parser.add_argument("--months", type=int, default=36)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default=os.environ.get("BENCH_DB_USER", "root"))
+    parser.add_argument("--password", default=os.environ.get("BENCH_DB_PASSWORD", ""))
+    parser.add_argument("--defaults-file", help="MySQL option file instead of --host/--user/--password")
+    parser.add_argument("--database-prefix", default="bnb_bench")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch databases")
+    parser.add_argument("--output", default=f"bench_refresh_{datetime.now():%Y%m%d_%H%M%S}.json")
+    parser.add_argument("--baseline", help="Earlier JSON output to compare against")
+    args = parser.parse_args(argv)
+
+    if args.defaults_file:
+        connect_args = {"read_default_file": os.path.expanduser(args.defaults_file)}
+    else:
+        connect_args = {"host": args.host, "port": args.port, "user": args.user, "password": args.password}
+
+    if args.database_prefix.startswith("buyandbill"):
+        print("❌ Refusing to use a production-looking database prefix")
+        return 1
+
+    benchmark = RefreshBenchmark(
+        connect_args,
+        database_prefix=args.database_prefix,
+        base_hcpcs=args.base_hcpcs,
+        months=args.months,
+        seed=args.seed,
+        batch_size=args.batch_size,
+        keep=args.keep,
+    )
+    report = benchmark.run(args.scales)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\n✅ Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(report, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+-- =====================================================
+-- BENCHMARK SCHEMA - local copy of the production tables
+-- Used by benchmark_refresh.py on a scratch database.
+-- DO NOT run against buyandbill_cms.
+-- =====================================================
+--
+-- cms_drug_pricing mirrors the CSV import: every column is text,
+-- prices included. The BI tables are in their pre-migration shape;
+-- migrate_period_columns.sql is run on top, like in production.
+
+CREATE TABLE IF NOT EXISTS cms_drug_pricing (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    HCPCS_Code VARCHAR(100),
+    Short_Description VARCHAR(255),
+    LABELER_NAME VARCHAR(255),
+    NDC2 VARCHAR(50),
+    Drug_Name VARCHAR(500),
+    BILLUNITSPKG VARCHAR(50),
+    HCPCS_Code_Dosage VARCHAR(100),
+    Payment_Limit VARCHAR(50),
+    Current_WAC_Package_Price VARCHAR(50),
+    Current_WAC_Effect_Date VARCHAR(20),
+    Current_AWP_Package_Price VARCHAR(50),
+    Current_AWP_Effect_Date VARCHAR(20),
+    J_Code_Desc VARCHAR(500),
+    product VARCHAR(255),
+    route_of_administration VARCHAR(100),
+    brand_generic VARCHAR(20),
+    month_name VARCHAR(20),
+    year_name VARCHAR(10),
+    month_year VARCHAR(50),
+    ASP_Override VARCHAR(50)
+);
+
+CREATE TABLE IF NOT EXISTS bi_refresh_log (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    refresh_type VARCHAR(50),
+    status VARCHAR(20),
+    message TEXT,
+    started_at DATETIME,
+    completed_at DATETIME,
+    INDEX idx_started_at (started_at)
+);
+
+CREATE TABLE IF NOT EXISTS bi_hcpcs_drug_pricing (
+    HCPCS_Code VARCHAR(100) NOT NULL,
+    Manufacturer VARCHAR(255),
+    Drug_Name VARCHAR(500),
+    hcpcs_drug VARCHAR(620),
+    BILLUNITSPKG DECIMAL(18,4),
+    HCPCS_Code_Dosage VARCHAR(100),
+    Payment_Limit DECIMAL(18,4),
+    Current_WAC_Effect_Date DATE,
+    Current_AWP_Effect_Date DATE,
+    J_Code_Desc VARCHAR(500),
+    month_name VARCHAR(20),
+    year_name VARCHAR(10),
+    month_year VARCHAR(20) NOT NULL,
+    ASP_Override DECIMAL(18,4),
+    ASP_current_quarter DECIMAL(18,4),
+    ASP_prev_quarter DECIMAL(18,4),
+    ASP_Quarterly_Change_Pct DECIMAL(10,4),
+    Median_WAC DECIMAL(18,4),
+    Median_AWP DECIMAL(18,4),
+    ASP_by_WAC_ratio DECIMAL(10,4),
+    ASP_by_AWP_ratio DECIMAL(10,4),
+    Updated_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (HCPCS_Code, month_year),
+    INDEX idx_hcpcs (HCPCS_Code),
+    INDEX idx_month_year (month_year)
+);
+
+CREATE TABLE IF NOT EXISTS bi_historical_pricing (
+    HCPCS_Code VARCHAR(100) NOT NULL,
+    Quarter VARCHAR(10) NOT NULL,
+    Manufacturer VARCHAR(255),
+    hcpcs_drug VARCHAR(620),
+    ASP VARCHAR(20),
+    Median_WAC VARCHAR(20),
+    Median_AWP VARCHAR(20),
+    Updated_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (HCPCS_Code, Quarter),
+    INDEX idx_hist_hcpcs (HCPCS_Code),
+    INDEX idx_hist_quarter (Quarter)
+);
@@ -0,0 +1,698 @@
+"""
+BI Refresh Pipeline (pluggable engine)
+The refresh transformations written once, runnable on MySQL in production
+or on an embedded SQLite / DuckDB file on a laptop
+
+What it does:
+1. Stage: per-unit WAC/AWP (package price / BILLUNITSPKG) and ASP
+   (ASP_Override, else Payment_Limit / 1.06), rounded like the DECIMAL(18,4)
+   staging columns
+2. Historical (every quarter at once): each HCPCS code's first month in the
+   quarter, WAC/AWP medians over that month, average ASP
+   -> pl_historical_pricing (same columns as bi_historical_pricing)
+3. Pricing (latest quarter): medians per HCPCS_Code / month_year, the
+   previous quarter's ASP from step 2, change % and ASP/median ratios
+   -> pl_hcpcs_drug_pricing (same columns as bi_hcpcs_drug_pricing)
+4. --compare: cross-checks the output row for row against another engine,
+   or against the stored procedures' bi_* tables (mysql-live)
+
+Each step is one portable SQL statement (window functions, no procedures);
+an Engine only supplies the handful of dialect pieces (string concat,
+2-decimal text, DECIMAL type) and the connection. Source parsing stays in
+MySQL's vw_cms_drug_pricing_parsed: local files are loaded either from that
+view (--source mysql) or from the synthetic generator in benchmark_refresh.py
+(--source synthetic, parsed here with the same rules as the view).
+
+Where the stored procedures keep whichever duplicate MySQL happens to upsert
+last (several NDC rows disagreeing on Manufacturer / BILLUNITSPKG for one
+HCPCS_Code and month), the pipeline keeps a defined row instead - see
+PRICING_TIE_BREAK - so two engines always agree with each other.
+
+Engines:
+  mysql              the server in ~/.my.cnf (pl_* tables next to the bi_* ones)
+  sqlite[:PATH]      stdlib sqlite3 (default bi_pipeline.sqlite)
+  duckdb[:PATH]      pip install duckdb (default bi_pipeline.duckdb)
+  mysql-live         --compare only: the bi_* tables the procedures built
+
+Prerequisites:
+- pip install -r requirements.txt
+- ~/.my.cnf with [client] credentials (mysql engine / --source mysql)
+
+Usage:
+  python bi_pipeline.py --engine sqlite --source mysql          # copy the parsed source, rebuild locally
+  python bi_pipeline.py --engine sqlite --compare mysql-live    # rerun, diff against production
+  python bi_pipeline.py --engine duckdb --source synthetic --months 123
+  python bi_pipeline.py --engine mysql --compare sqlite
+"""
+
+import argparse
+import re
+import sqlite3
+import sys
+import time
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pymysql
+
+from refresh_bi_tables import DEFAULT_DATABASE, DEFAULT_DEFAULTS_FILE, connect, quarter_key
+
+BATCH_SIZE = 10000
+
+# Typed source columns (vw_cms_drug_pricing_parsed) -> SQL type
+SOURCE_COLUMNS = [
+    ("HCPCS_Code", "VARCHAR(100)"),
+    ("Manufacturer", "VARCHAR(255)"),
+    ("NDC2", "VARCHAR(50)"),
+    ("Drug_Name", "VARCHAR(500)"),
+    ("BILLUNITSPKG", "{decimal}"),
+    ("HCPCS_Code_Dosage", "VARCHAR(100)"),
+    ("Payment_Limit", "{decimal}"),
+    ("Current_WAC_Package_Price", "{decimal}"),
+    ("Current_WAC_Effect_Date", "DATE"),
+    ("Current_AWP_Package_Price", "{decimal}"),
+    ("Current_AWP_Effect_Date", "DATE"),
+    ("J_Code_Desc", "VARCHAR(500)"),
+    ("month_name", "VARCHAR(20)"),
+    ("year_name", "VARCHAR(10)"),
+    ("month_year", "VARCHAR(20)"),
+    ("ASP_Override", "{decimal}"),
+    ("period_date", "DATE"),
+    ("quarter_key", "INTEGER"),
+    ("Quarter", "VARCHAR(20)"),
+]
+
+HISTORICAL_COLUMNS = [
+    "HCPCS_Code", "Quarter", "Manufacturer", "hcpcs_drug", "ASP", "Median_WAC", "Median_AWP", "quarter_key",
+]
+
+PRICING_COLUMNS = [
+    "HCPCS_Code", "Manufacturer", "Drug_Name", "hcpcs_drug", "BILLUNITSPKG", "HCPCS_Code_Dosage",
+    "Payment_Limit", "Current_WAC_Effect_Date", "Current_AWP_Effect_Date", "J_Code_Desc",
+    "month_name", "year_name", "month_year", "ASP_Override", "ASP_current_quarter",
+    "ASP_prev_quarter", "ASP_Quarterly_Change_Pct", "Median_WAC", "Median_AWP",
+    "ASP_by_WAC_ratio", "ASP_by_AWP_ratio", "period_date", "quarter_key",
+]
+
+# Which of several rows for one key survives. The procedures upsert every row
+# and keep the last one MySQL inserts; MariaDB emits GROUP BY groups in sort
+# order, so for historical that is the greatest Manufacturer / hcpcs_drug.
+HISTORICAL_TIE_BREAK = "Manufacturer IS NULL, Manufacturer DESC, hcpcs_drug IS NULL, hcpcs_drug DESC"
+PRICING_TIE_BREAK = ", ".join(f"{col} IS NULL, {col}" for col in (
+    "Manufacturer", "Drug_Name", "BILLUNITSPKG", "Payment_Limit", "ASP_Override",
+    "Current_WAC_Effect_Date", "Current_AWP_Effect_Date", "HCPCS_Code_Dosage", "J_Code_Desc",
+))
+
+INTERMEDIATE_TABLES = ["pl_stg", "pl_hist_first_month", "pl_hist_medians", "pl_pricing_rows",
+                       "pl_pricing_medians", "pl_prev_asp"]
+
+# (key columns, value columns, tolerance on numeric values) per compared table.
+# One unit in the last stored decimal: SQLite works in binary floats, so a
+# value ending in exactly 5 can round the other way.
+COMPARE_TABLES = {
+    "historical_pricing": (["HCPCS_Code", "Quarter"], HISTORICAL_COLUMNS[2:], Decimal("0.01")),
+    "hcpcs_drug_pricing": (["HCPCS_Code", "month_year"],
+                           [c for c in PRICING_COLUMNS if c not in ("HCPCS_Code", "month_year")],
+                           Decimal("0.0001")),
+}
+
+MONTHS = ["january", "february", "march", "april", "may", "june", "july", "august",
+          "september", "october", "november", "december"]
+NUMERIC_PREFIX = re.compile(r"\s*([+-]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)")
+MDY = re.compile(r"\s*(\d{1,2})/(\d{1,2})/(\d{2})\s*$")
+FOUR_PLACES = Decimal("0.0001")
+
+
+# =============================================================
+# Source parsing (same rules as vw_cms_drug_pricing_parsed)
+# =============================================================
+
+def mysql_decimal(value) -> Optional[Decimal]:
+    """CAST(x AS DECIMAL(18,4)): leading number, '' / text -> 0, half-up to 4 places"""
+    if value is None:
+        return None
+    match = NUMERIC_PREFIX.match(str(value))
+    number = Decimal(match.group(1)) if match else Decimal(0)
+    return number.quantize(FOUR_PLACES, rounding=ROUND_HALF_UP)
+
+
+def parse_month_year(value: Optional[str]) -> Optional[date]:
+    """fn_parse_month_year: 'January.2024' / 'Feburary.2024' -> first of the month"""
+    if value is None or value == "month_year" or "." not in value or len(value) < 8:
+        return None
+    month_word, _, year = value.replace("Feburary", "February").partition(".")
+    if month_word.lower() not in MONTHS or not re.fullmatch(r"\d{4}", year.strip()):
+        return None
+    return date(int(year), MONTHS.index(month_word.lower()) + 1, 1)
+
+
+def parse_mdy(value: Optional[str]) -> Optional[date]:
+    """STR_TO_DATE(x, '%c/%e/%y'): two-digit years 70-99 are 19xx"""
+    match = MDY.match(value) if value else None
+    if not match:
+        return None
+    month, day, year = (int(part) for part in match.groups())
+    try:
+        return date(year + (1900 if year >= 70 else 2000), month, day)
+    except ValueError:
+        return None
+
+
+def parse_source_row(raw: Dict) -> Optional[Tuple]:
+    """One raw cms_drug_pricing row -> SOURCE_COLUMNS tuple (None if the view would skip it)"""
+    period_date = parse_month_year(raw["month_year"])
+    code = raw["HCPCS_Code"]
+    if code is None or not code.strip() or code == "HCPCS_Code" or period_date is None:
+        return None
+    key = quarter_key(period_date)
+    return (
+        raw["HCPCS_Code"], raw["LABELER_NAME"], raw["NDC2"], raw["Drug_Name"],
+        mysql_decimal(raw["BILLUNITSPKG"]), raw["HCPCS_Code_Dosage"],
+        mysql_decimal(raw["Payment_Limit"]), mysql_decimal(raw["Current_WAC_Package_Price"]),
+        parse_mdy(raw["Current_WAC_Effect_Date"]), mysql_decimal(raw["Current_AWP_Package_Price"]),
+        parse_mdy(raw["Current_AWP_Effect_Date"]), raw["J_Code_Desc"], raw["month_name"],
+        raw["year_name"], raw["month_year"], mysql_decimal(raw["ASP_Override"]),
+        period_date, key, f"Q{key % 10}{key // 10}",
+    )
+
+
+# =============================================================
+# Engines
+# =============================================================
+
+class Engine:
+    """DB-API connection plus the few dialect pieces the pipeline SQL needs"""
+
+    name = ""
+    decimal = "DECIMAL(18,4)"
+    placeholder = "?"
+    source_table = "pl_source"
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def concat(self, *parts: str) -> str:
+        return " || ".join(parts)
+
+    def fixed2(self, expr: str) -> str:
+        """Number -> text with exactly 2 decimals ('12.30'), NULL stays NULL"""
+        return f"CASE WHEN {expr} IS NULL THEN NULL ELSE printf('%.2f', ROUND({expr}, 2)) END"
+
+    def param(self, value):
+        return value
+
+    def execute(self, sql: str, params: Optional[Tuple] = None) -> int:
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql, params or ())
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    def executemany(self, sql: str, rows: List[Tuple]):
+        cursor = self.conn.cursor()
+        try:
+            cursor.executemany(sql, [tuple(self.param(v) for v in row) for row in rows])
+        finally:
+            cursor.close()
+
+    def query(self, sql: str) -> List[Tuple]:
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def table_exists(self, table: str) -> bool:
+        return bool(self.query(f"SELECT COUNT(*) FROM information_schema.tables WHERE table_name = '{table}'")[0][0])
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class MySQLEngine(Engine):
+    name = "mysql"
+    placeholder = "%s"
+    source_table = "vw_cms_drug_pricing_parsed"
+
+    def __init__(self, database: str, defaults_file: str):
+        super().__init__(connect(database, defaults_file))
+
+    def concat(self, *parts: str) -> str:
+        return f"CONCAT({', '.join(parts)})"
+
+    def fixed2(self, expr: str) -> str:
+        return f"CAST(ROUND({expr}, 2) AS CHAR(20))"
+
+
+class SqliteEngine(Engine):
+    name = "sqlite"
+    decimal = "REAL"
+
+    def __init__(self, path: str):
+        super().__init__(sqlite3.connect(path))
+
+    def table_exists(self, table: str) -> bool:
+        return bool(self.query(f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = '{table}'")[0][0])
+
+    def param(self, value):
+        # sqlite3 has no DECIMAL / DATE storage: REAL and ISO text
+        if isinstance(value, Decimal):
+            return float(value)
+        if isinstance(value, date):
+            return value.isoformat()
+        return value
+
+
+class DuckDBEngine(Engine):
+    name = "duckdb"
+
+    def __init__(self, path: str):
+        try:
+            import duckdb
+        except ImportError:
+            raise SystemExit("❌ The duckdb engine needs DuckDB: pip install duckdb")
+        super().__init__(duckdb.connect(path))
+
+
+def open_engine(spec: str, database: str, defaults_file: str) -> Tuple[Engine, str]:
+    """'sqlite:/tmp/bi.sqlite' -> (engine, output table prefix)"""
+    kind, _, path = spec.partition(":")
+    if kind == "mysql":
+        return MySQLEngine(database, defaults_file), "pl_"
+    if kind == "mysql-live":
+        return MySQLEngine(database, defaults_file), "bi_"
+    if kind == "sqlite":
+        return SqliteEngine(path or "bi_pipeline.sqlite"), "pl_"
+    if kind == "duckdb":
+        return DuckDBEngine(path or "bi_pipeline.duckdb"), "pl_"
+    raise SystemExit(f"❌ Unknown engine '{spec}' (mysql, mysql-live, sqlite[:PATH], duckdb[:PATH])")
+
+
+# =============================================================
+# Source loading (local engines)
+# =============================================================
+
+def mysql_source_rows(database: str, defaults_file: str) -> Iterator[Tuple]:
+    """Stream the parsed source out of MySQL (its own parsing, so results are comparable)"""
+    conn = connect(database, defaults_file)
+    try:
+        with conn.cursor(pymysql.cursors.SSCursor) as cursor:
+            cursor.execute(f"SELECT {', '.join(col for col, _ in SOURCE_COLUMNS)} FROM vw_cms_drug_pricing_parsed")
+            while True:
+                rows = cursor.fetchmany(BATCH_SIZE)
+                if not rows:
+                    break
+                yield from rows
+    finally:
+        conn.close()
+
+
+def synthetic_source_rows(scale: int, months: int, seed: int) -> Iterator[Tuple]:
+    """benchmark_refresh.py's generator, parsed like the view"""
+    from benchmark_refresh import SOURCE_COLUMNS as RAW_COLUMNS, SyntheticCmsData
+
+    for raw in SyntheticCmsData(scale=scale, months=months, seed=seed).rows():
+        row = parse_source_row(dict(zip(RAW_COLUMNS, raw)))
+        if row is not None:
+            yield row
+
+
+def load_source(engine: Engine, rows: Iterator[Tuple]) -> int:
+    """Replace pl_source in a local engine"""
+    columns = ", ".join(f"{col} {sql_type.format(decimal=engine.decimal)}" for col, sql_type in SOURCE_COLUMNS)
+    engine.execute("DROP TABLE IF EXISTS pl_source")
+    engine.execute(f"CREATE TABLE pl_source ({columns})")
+    insert = (f"INSERT INTO pl_source ({', '.join(col for col, _ in SOURCE_COLUMNS)}) "
+              f"VALUES ({', '.join([engine.placeholder] * len(SOURCE_COLUMNS))})")
+    total = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            engine.executemany(insert, batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        engine.executemany(insert, batch)
+        total += len(batch)
+    engine.commit()
+    return total
+
+
+# =============================================================
+# Pipeline
+# =============================================================
+
+def median_of(value: str, rank: str, count: str) -> str:
+    """Middle value(s) of ranked non-NULL values: odd n -> rank (n+1)/2, even n -> ranks n/2 and n/2+1
+    (2 * rank BETWEEN n AND n + 2 needs no integer division, which every dialect spells differently)"""
+    return f"AVG(CASE WHEN 2 * {rank} BETWEEN {count} AND {count} + 2 THEN {value} END)"
+
+
+def ranked(value: str, partition: str) -> str:
+    """Row number (NULLs last) and non-NULL count of a value within a partition"""
+    return (f"ROW_NUMBER() OVER (PARTITION BY {partition} ORDER BY {value} IS NULL, {value}) AS {value}_rn, "
+            f"COUNT({value}) OVER (PARTITION BY {partition}) AS {value}_cnt")
+
+
+class RefreshPipeline:
+    def __init__(self, engine: Engine):
+        """
+        Initialize the pipeline
+
+        Args:
+            engine: Where the SQL runs (reads engine.source_table, writes pl_* tables)
+        """
+        self.engine = engine
+        self.timings: Dict[str, float] = {}
+
+    def _create(self, table: str, select: str, index: Optional[str] = None) -> int:
+        start = time.time()
+        self.engine.execute(f"DROP TABLE IF EXISTS {table}")
+        self.engine.execute(f"CREATE TABLE {table} AS {select}")
+        if index:
+            self.engine.execute(f"CREATE INDEX idx_{table} ON {table} ({index})")
+        rows = self.engine.query(f"SELECT COUNT(*) FROM {table}")[0][0]
+        self.timings[table] = time.time() - start
+        return rows
+
+    def stage(self) -> int:
+        return self._create("pl_stg", f"""
+            SELECT
+                HCPCS_Code, Manufacturer, Drug_Name, BILLUNITSPKG, HCPCS_Code_Dosage, Payment_Limit,
+                Current_WAC_Effect_Date, Current_AWP_Effect_Date, J_Code_Desc,
+                month_name, year_name, month_year, ASP_Override,
+                ROUND(CASE
+                    WHEN BILLUNITSPKG IS NOT NULL AND BILLUNITSPKG != 0 AND Current_WAC_Package_Price IS NOT NULL
+                    THEN Current_WAC_Package_Price / BILLUNITSPKG
+                END, 4) AS WAC_per_unit,
+                ROUND(CASE
+                    WHEN BILLUNITSPKG IS NOT NULL AND BILLUNITSPKG != 0 AND Current_AWP_Package_Price IS NOT NULL
+                    THEN Current_AWP_Package_Price / BILLUNITSPKG
+                END, 4) AS AWP_per_unit,
+                ROUND(CASE
+                    WHEN ASP_Override IS NOT NULL AND ASP_Override != 0 THEN ASP_Override
+                    WHEN Payment_Limit IS NOT NULL AND Payment_Limit != 0 THEN Payment_Limit / 1.06
+                END, 4) AS ASP,
+                period_date,
+                quarter_key,
+                Quarter,
+                MIN(period_date) OVER (PARTITION BY HCPCS_Code, quarter_key) AS first_period_date
+            FROM {self.engine.source_table}
+            WHERE HCPCS_Code IS NOT NULL
+                AND period_date IS NOT NULL
+        """, index="period_date")
+
+    def historical(self) -> int:
+        """Every quarter at once - quarters never read each other here"""
+        key = "HCPCS_Code, quarter_key"
+        self._create("pl_hist_first_month", f"""
+            SELECT
+                HCPCS_Code, Quarter, quarter_key, Manufacturer, Drug_Name, ASP, WAC_per_unit, AWP_per_unit,
+                {ranked("WAC_per_unit", key)},
+                {ranked("AWP_per_unit", key)}
+            FROM pl_stg
+            WHERE period_date = first_period_date
+        """, index=key)
+        self._create("pl_hist_medians", f"""
+            SELECT
+                HCPCS_Code, quarter_key,
+                {median_of("WAC_per_unit", "WAC_per_unit_rn", "WAC_per_unit_cnt")} AS Median_WAC,
+                {median_of("AWP_per_unit", "AWP_per_unit_rn", "AWP_per_unit_cnt")} AS Median_AWP
+            FROM pl_hist_first_month
+            GROUP BY HCPCS_Code, quarter_key
+        """, index=key)
+
+        hcpcs_drug = self.engine.concat("fm.Drug_Name", "' ('", "fm.HCPCS_Code", "')'")
+        return self._create("pl_historical_pricing", f"""
+            SELECT {", ".join(HISTORICAL_COLUMNS)}
+            FROM (
+                SELECT
+                    grouped.*,
+                    ROW_NUMBER() OVER (PARTITION BY HCPCS_Code, quarter_key ORDER BY {HISTORICAL_TIE_BREAK}) AS pick
+                FROM (
+                    SELECT
+                        fm.HCPCS_Code,
+                        fm.Quarter,
+                        fm.Manufacturer,
+                        {hcpcs_drug} AS hcpcs_drug,
+                        COALESCE({self.engine.fixed2("AVG(fm.ASP)")}, 'NA') AS ASP,
+                        COALESCE({self.engine.fixed2("mc.Median_WAC")}, 'NA') AS Median_WAC,
+                        COALESCE({self.engine.fixed2("mc.Median_AWP")}, 'NA') AS Median_AWP,
+                        fm.quarter_key
+                    FROM pl_hist_first_month fm
+                    LEFT JOIN pl_hist_medians mc
+                        ON mc.HCPCS_Code = fm.HCPCS_Code
+                        AND mc.quarter_key = fm.quarter_key
+                    GROUP BY fm.HCPCS_Code, fm.Quarter, fm.quarter_key, fm.Manufacturer, {hcpcs_drug},
+                        mc.Median_WAC, mc.Median_AWP
+                ) grouped
+            ) picked
+            WHERE pick = 1
+        """, index="HCPCS_Code, quarter_key")
+
+    def pricing(self) -> Tuple[int, Optional[int]]:
+        """Latest quarter only (first month, like sp_process_quarter_pricing(quarter_start))"""
+        latest = self.engine.query("SELECT MAX(quarter_key) FROM pl_stg")[0][0]
+        if latest is None:
+            self._create("pl_hcpcs_drug_pricing", f"SELECT {', '.join(PRICING_COLUMNS)} FROM pl_stg WHERE 1 = 0")
+            return 0, None
+        latest = int(latest)
+        target = date(latest // 10, (latest % 10 - 1) * 3 + 1, 1).isoformat()
+        key = "HCPCS_Code, month_year"
+
+        self._create("pl_pricing_rows", f"""
+            SELECT
+                s.*,
+                {ranked("WAC_per_unit", key)},
+                {ranked("AWP_per_unit", key)},
+                ROW_NUMBER() OVER (PARTITION BY {key} ORDER BY {PRICING_TIE_BREAK}) AS pick
+            FROM pl_stg s
+            WHERE period_date = '{target}'
+        """, index=key)
+        self._create("pl_pricing_medians", f"""
+            SELECT
+                HCPCS_Code, month_year,
+                {median_of("WAC_per_unit", "WAC_per_unit_rn", "WAC_per_unit_cnt")} AS Median_WAC,
+                {median_of("AWP_per_unit", "AWP_per_unit_rn", "AWP_per_unit_cnt")} AS Median_AWP,
+                MAX(CASE WHEN ASP IS NOT NULL THEN 1 ELSE 0 END) AS has_asp
+            FROM pl_pricing_rows
+            GROUP BY HCPCS_Code, month_year
+        """, index=key)
+        # Latest non-NA ASP before this quarter, for codes priced this quarter
+        self._create("pl_prev_asp", f"""
+            SELECT HCPCS_Code, ASP_prev_quarter
+            FROM (
+                SELECT
+                    h.HCPCS_Code,
+                    CAST(h.ASP AS {self.engine.decimal}) AS ASP_prev_quarter,
+                    ROW_NUMBER() OVER (PARTITION BY h.HCPCS_Code ORDER BY h.quarter_key DESC) AS rn
+                FROM pl_historical_pricing h
+                WHERE h.quarter_key < {latest}
+                    AND h.ASP != 'NA'
+                    AND h.HCPCS_Code IN (SELECT HCPCS_Code FROM pl_pricing_rows WHERE ASP IS NOT NULL)
+            ) ranked_prev
+            WHERE rn = 1
+        """, index="HCPCS_Code")
+
+        # ASP_prev_quarter only reaches rows whose code/month had an ASP (temp_quarter_data)
+        prev = "CASE WHEN mc.has_asp = 1 THEN pq.ASP_prev_quarter END"
+        hcpcs_drug = self.engine.concat("r.Drug_Name", "' ('", "r.HCPCS_Code", "')'")
+        rows = self._create("pl_hcpcs_drug_pricing", f"""
+            SELECT
+                r.HCPCS_Code, r.Manufacturer, r.Drug_Name, {hcpcs_drug} AS hcpcs_drug,
+                r.BILLUNITSPKG, r.HCPCS_Code_Dosage, r.Payment_Limit,
+                r.Current_WAC_Effect_Date, r.Current_AWP_Effect_Date, r.J_Code_Desc,
+                r.month_name, r.year_name, r.month_year, r.ASP_Override,
+                r.ASP AS ASP_current_quarter,
+                {prev} AS ASP_prev_quarter,
+                CASE
+                    WHEN {prev} IS NOT NULL AND {prev} != 0 AND r.ASP IS NOT NULL
+                    THEN ROUND(((r.ASP - {prev}) / {prev}) * 100, 4)
+                END AS ASP_Quarterly_Change_Pct,
+                ROUND(mc.Median_WAC, 4) AS Median_WAC,
+                ROUND(mc.Median_AWP, 4) AS Median_AWP,
+                CASE
+                    WHEN mc.Median_WAC IS NOT NULL AND mc.Median_WAC != 0 AND r.ASP IS NOT NULL
+                    THEN ROUND(r.ASP / mc.Median_WAC, 4)
+                END AS ASP_by_WAC_ratio,
+                CASE
+                    WHEN mc.Median_AWP IS NOT NULL AND mc.Median_AWP != 0 AND r.ASP IS NOT NULL
+                    THEN ROUND(r.ASP / mc.Median_AWP, 4)
+                END AS ASP_by_AWP_ratio,
+                r.period_date,
+                r.quarter_key
+            FROM pl_pricing_rows r
+            INNER JOIN pl_pricing_medians mc
+                ON mc.HCPCS_Code = r.HCPCS_Code
+                AND mc.month_year = r.month_year
+            LEFT JOIN pl_prev_asp pq
+                ON pq.HCPCS_Code = r.HCPCS_Code
+            WHERE r.pick = 1
+        """)
+        return rows, latest
+
+    def run(self, keep_intermediate: bool = False) -> Dict:
+        start = time.time()
+        staged = self.stage()
+        historical = self.historical()
+        pricing, latest = self.pricing()
+        if not keep_intermediate:
+            for table in INTERMEDIATE_TABLES:
+                self.engine.execute(f"DROP TABLE IF EXISTS {table}")
+        self.engine.commit()
+        return {
+            "staged_rows": staged,
+            "historical_rows": historical,
+            "pricing_rows": pricing,
+            "latest_quarter_key": latest,
+            "quarters": self.engine.query("SELECT COUNT(DISTINCT quarter_key) FROM pl_historical_pricing")[0][0],
+            "seconds": time.time() - start,
+        }
+
+
+# =============================================================
+# Cross-check
+# =============================================================
+
+def normalize(value):
+    """Engine-neutral value: dates as ISO text, numbers (and numeric text) as Decimal"""
+    if value is None:
+        return None
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (int, float, Decimal)):
+        return Decimal(str(value))
+    if isinstance(value, str) and NUMERIC_PREFIX.fullmatch(value):
+        return Decimal(value)
+    return str(value)
+
+
+def read_table(engine: Engine, table: str, columns: List[str], key: List[str]) -> Dict[Tuple, Tuple]:
+    rows = engine.query(f"SELECT {', '.join(key + columns)} FROM {table}")
+    return {tuple(row[:len(key)]): tuple(normalize(v) for v in row[len(key):]) for row in rows}
+
+
+def same(left, right, tolerance: Decimal) -> bool:
+    if isinstance(left, Decimal) and isinstance(right, Decimal):
+        return abs(left - right) <= tolerance
+    return left == right
+
+
+def compare_tables(left: Tuple[Engine, str], right: Tuple[Engine, str], show: int = 5) -> Dict[str, Dict]:
+    """Row-for-row diff of the pricing / historical output of two engines"""
+    report = {}
+    for name, (key, columns, tolerance) in COMPARE_TABLES.items():
+        left_rows = read_table(left[0], left[1] + name, columns, key)
+        right_rows = read_table(right[0], right[1] + name, columns, key)
+        column_diffs: Dict[str, int] = {}
+        examples = []
+        mismatched = 0
+        for row_key in sorted(left_rows.keys() & right_rows.keys(), key=str):
+            diffs = [
+                (col, a, b) for col, a, b in zip(columns, left_rows[row_key], right_rows[row_key])
+                if not same(a, b, tolerance)
+            ]
+            for col, _, _ in diffs:
+                column_diffs[col] = column_diffs.get(col, 0) + 1
+            if diffs:
+                mismatched += 1
+                if len(examples) < show:
+                    examples.append((row_key, diffs))
+        report[name] = {
+            "left_rows": len(left_rows),
+            "right_rows": len(right_rows),
+            "only_left": sorted(left_rows.keys() - right_rows.keys(), key=str),
+            "only_right": sorted(right_rows.keys() - left_rows.keys(), key=str),
+            "column_diffs": column_diffs,
+            "mismatched_rows": mismatched,
+            "examples": examples,
+        }
+    return report
+
+
+def print_compare(report: Dict[str, Dict], left: str, right: str, show: int = 5) -> bool:
+    clean = True
+    for name, result in report.items():
+        problems = len(result["only_left"]) + len(result["only_right"]) + result["mismatched_rows"]
+        clean = clean and problems == 0
+        print(f"{'✅' if problems == 0 else '❌'} {name}: {result['left_rows']:,} rows ({left}) "
+              f"vs {result['right_rows']:,} ({right})")
+        if result["only_left"]:
+            print(f"   only in {left}: {len(result['only_left']):,}  e.g. {result['only_left'][:show]}")
+        if result["only_right"]:
+            print(f"   only in {right}: {len(result['only_right']):,}  e.g. {result['only_right'][:show]}")
+        if result["mismatched_rows"]:
+            print(f"   {result['mismatched_rows']:,} rows differ: "
+                  + ", ".join(f"{col} {count:,}" for col, count in sorted(result["column_diffs"].items())))
+            for row_key, diffs in result["examples"]:
+                print(f"     {row_key}: " + "; ".join(f"{col} {a} != {b}" for col, a, b in diffs))
+    return clean
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the BI refresh transformations on MySQL, SQLite or DuckDB")
+    parser.add_argument("--engine", default="sqlite",
+                        help="mysql | sqlite[:PATH] | duckdb[:PATH] (default sqlite:bi_pipeline.sqlite)")
+    parser.add_argument("--source", choices=["mysql", "synthetic"],
+                        help="(Re)load the local engine's source first; without it the last load is reused")
+    parser.add_argument("--scale", type=int, default=1, help="Synthetic source: HCPCS multiplier")
+    parser.add_argument("--months", type=int, default=123, help="Synthetic source: months (123 = 41 quarters)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--compare", metavar="ENGINE",
+                        help="Cross-check the output against mysql | mysql-live | sqlite[:PATH] | duckdb[:PATH]")
+    parser.add_argument("--compare-only", action="store_true", help="Skip the run, only cross-check")
+    parser.add_argument("--show", type=int, default=5, help="Differences to print per table")
+    parser.add_argument("--keep-intermediate", action="store_true", help="Keep pl_stg and the step tables")
+    parser.add_argument("--database", default=DEFAULT_DATABASE)
+    parser.add_argument("--defaults-file", default=DEFAULT_DEFAULTS_FILE)
+    args = parser.parse_args(argv)
+
+    engine, prefix = open_engine(args.engine, args.database, args.defaults_file)
+    if prefix != "pl_":
+        raise SystemExit("❌ mysql-live is only a --compare target")
+    try:
+        if args.source:
+            if isinstance(engine, MySQLEngine):
+                raise SystemExit("❌ --source is for local engines; mysql reads vw_cms_drug_pricing_parsed")
+            start = time.time()
+            if args.source == "mysql":
+                rows = mysql_source_rows(args.database, args.defaults_file)
+            else:
+                rows = synthetic_source_rows(args.scale, args.months, args.seed)
+            loaded = load_source(engine, rows)
+            print(f"📥 Loaded {loaded:,} parsed source rows into {engine.name} in {time.time() - start:.1f}s")
+
+        if not args.compare_only:
+            if not isinstance(engine, MySQLEngine) and not engine.table_exists("pl_source"):
+                print(f"❌ No source loaded in {args.engine} - run once with --source mysql or --source synthetic")
+                return 1
+            stats = RefreshPipeline(engine).run(args.keep_intermediate)
+            print(f"⚙️  {engine.name}: {stats['staged_rows']:,} staged rows, {stats['quarters']} quarters "
+                  f"-> {stats['historical_rows']:,} historical, {stats['pricing_rows']:,} pricing "
+                  f"(latest {stats['latest_quarter_key']}) in {stats['seconds']:.2f}s")
+
+        if args.compare:
+            other = open_engine(args.compare, args.database, args.defaults_file)
+            try:
+                report = compare_tables((engine, prefix), other, args.show)
+            finally:
+                other[0].close()
+            if not print_compare(report, args.engine, args.compare, args.show):
+                return 1
+    except (pymysql.MySQLError, sqlite3.Error) as ex:
+        print(f"❌ Pipeline failed: {ex}")
+        return 1
+    finally:
+        engine.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,489 @@
+"""
+Drug Search (type-ahead)
+In-memory prefix + trigram index over the distinct HCPCS codes, drug names
+and manufacturers, replacing the FULLTEXT indexes on hcpcs_drug
+
+What it does:
+1. Loads one row per HCPCS code (latest drug name + manufacturer, number of
+   quarters with data) and one per manufacturer from the compact tables
+   (sp_refresh_bi_dimensions.sql) - a few thousand entries
+2. Indexes every word prefix ("hum" -> Humira (J0135)) and every word
+   trigram, so typos and infix matches still find the drug
+3. Serves it:
+   - --write-table: precomputed bi_search_suggestion (prefix -> top N),
+     rebuilt after each refresh and swapped in with one RENAME TABLE;
+     a filter box looks up WHERE prefix = 'hum' (primary key)
+   - --serve: GET /suggest?q=humira%2040&limit=10 (multi-word, fuzzy),
+     reloads itself when a newer 'search' row appears in bi_refresh_log
+
+Ranking: exact HCPCS code, then entries still priced in the latest quarter,
+then the number of quarters with data; fuzzy matches come after prefix
+matches, ordered by word similarity (one typo / swapped letters, else
+trigram overlap).
+
+Prerequisites:
+- pip install -r requirements.txt
+- ~/.my.cnf with [client] credentials
+- sp_refresh_bi_dimensions.sql installed and run at least once
+
+Usage:
+  python drug_search.py humira
+  python drug_search.py --write-table
+  python drug_search.py --serve --port 8091
+  python drug_search.py --bench
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+import unicodedata
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Set
+from urllib.parse import parse_qs, urlparse
+
+import pymysql
+
+from refresh_bi_tables import DEFAULT_DATABASE, DEFAULT_DEFAULTS_FILE, connect
+
+MAX_PREFIX = 12          # longer query words are checked against the entry's words
+TABLE_PREFIX_LENGTH = 8  # bi_search_suggestion holds prefixes up to this length
+TABLE_SUGGESTIONS = 10   # suggestions stored per prefix
+FUZZY_THRESHOLD = 0.5    # minimum word similarity (typo / trigram Dice) for a fuzzy match
+FUZZY_CANDIDATES = 40    # words sharing the most trigrams that get scored per query word
+
+ENTRIES_SQL = """
+    SELECT h.HCPCS_Code, d.Drug_Name, m.Manufacturer, s.quarters, s.last_quarter
+    FROM (
+        SELECT hcpcs_key, COUNT(*) AS quarters, MAX(quarter_key) AS last_quarter
+        FROM bi_fact_historical
+        GROUP BY hcpcs_key
+    ) s
+    INNER JOIN bi_fact_historical f ON f.hcpcs_key = s.hcpcs_key AND f.quarter_key = s.last_quarter
+    INNER JOIN bi_dim_hcpcs h ON h.hcpcs_key = f.hcpcs_key
+    LEFT JOIN bi_dim_manufacturer m ON m.manufacturer_key = f.manufacturer_key
+    LEFT JOIN bi_dim_drug d ON d.drug_key = f.drug_key
+"""
+
+SUGGESTION_TABLE_SQL = """
+    CREATE TABLE bi_search_suggestion_new (
+        prefix VARCHAR(32) NOT NULL,
+        suggestion_rank TINYINT UNSIGNED NOT NULL,
+        kind VARCHAR(12) NOT NULL,
+        label VARCHAR(620) NOT NULL,
+        HCPCS_Code VARCHAR(100),
+        Manufacturer VARCHAR(255),
+        PRIMARY KEY (prefix, suggestion_rank)
+    )
+"""
+
+
+def normalize(text: str) -> str:
+    """'Ábc-Pharma (J0135)' -> 'abc pharma j0135'"""
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode("ascii")
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text.lower()).split())
+
+
+def trigrams(word: str) -> Set[str]:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance counting a swap of adjacent letters as one edit"""
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def word_similarity(query_word: str, word: str) -> float:
+    """1 typo (2 for long words) against the word or its same-length prefix scores high, else trigram Dice"""
+    distance = min(edit_distance(query_word, word), edit_distance(query_word, word[:len(query_word)]))
+    if distance <= (1 if len(query_word) < 8 else 2):
+        return 0.9 - 0.1 * distance
+    q, w = trigrams(query_word), trigrams(word)
+    return 2 * len(q & w) / (len(q) + len(w))
+
+
+class SearchIndex:
+    def __init__(self, entries: List[Dict]):
+        """
+        Build the index
+
+        Args:
+            entries: Dicts with kind ('hcpcs' / 'manufacturer'), label, HCPCS_Code,
+                     Manufacturer, quarters and current (priced in the latest quarter)
+        """
+        self.built_at = datetime.now()
+        # Best first, so every posting list below is already in rank order
+        self.entries = sorted(entries, key=lambda e: (not e["current"], -e["quarters"], e["label"]))
+        self.words: List[List[str]] = []
+        self.prefixes: Dict[str, List[int]] = {}
+        self.vocabulary: Dict[str, List[int]] = {}   # word -> entries containing it
+        self.trigrams: Dict[str, List[str]] = {}      # trigram -> words containing it
+        self.codes: Dict[str, int] = {}
+
+        for entry_id, entry in enumerate(self.entries):
+            words = list(dict.fromkeys(normalize(entry["label"]).split()))
+            self.words.append(words)
+            seen: Set[str] = set()
+            for word in words:
+                for length in range(1, min(len(word), MAX_PREFIX) + 1):
+                    prefix = word[:length]
+                    if prefix not in seen:
+                        seen.add(prefix)
+                        self.prefixes.setdefault(prefix, []).append(entry_id)
+                self.vocabulary.setdefault(word, []).append(entry_id)
+            if entry["kind"] == "hcpcs":
+                self.codes[normalize(entry["HCPCS_Code"])] = entry_id
+
+        # Fuzzy matching works on the distinct words, far fewer than entries x words
+        for word in self.vocabulary:
+            for gram in trigrams(word):
+                self.trigrams.setdefault(gram, []).append(word)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _prefix_matches(self, words: List[str]) -> List[int]:
+        """Entries where every query word is a prefix of one of the entry's words, in rank order"""
+        postings = sorted((self.prefixes.get(word[:MAX_PREFIX], []) for word in words), key=len)
+        candidates = postings[0]
+        others = [set(p) for p in postings[1:]]
+        long_words = [w for w in words if len(w) > MAX_PREFIX]
+        return [
+            entry_id for entry_id in candidates
+            if all(entry_id in other for other in others)
+            and all(any(ew.startswith(w) for ew in self.words[entry_id]) for w in long_words)
+        ]
+
+    def _similar_words(self, query_word: str) -> Dict[str, float]:
+        """Indexed words resembling a query word (typo-tolerant), with their similarity"""
+        shared: Counter = Counter()
+        for gram in trigrams(query_word):
+            shared.update(self.trigrams.get(gram, ()))
+        similar = {}
+        for word, _ in shared.most_common(FUZZY_CANDIDATES):
+            score = word_similarity(query_word, word)
+            if score >= FUZZY_THRESHOLD:
+                similar[word] = score
+        return similar
+
+    def _fuzzy_matches(self, words: List[str], exclude: Set[int], limit: int) -> List[int]:
+        """Entries where every query word prefixes or resembles one of its words, best match first"""
+        scores: Optional[Dict[int, float]] = None
+        for query_word in words:
+            word_scores: Dict[int, float] = {}
+            if len(query_word) >= 3:
+                for word, score in self._similar_words(query_word).items():
+                    for entry_id in self.vocabulary[word]:
+                        if score > word_scores.get(entry_id, 0):
+                            word_scores[entry_id] = score
+            for entry_id in self.prefixes.get(query_word[:MAX_PREFIX], ()):
+                word_scores[entry_id] = 1.0
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {e: min(score, word_scores[e]) for e, score in scores.items() if e in word_scores}
+            if not scores:
+                return []
+        ranked = sorted((-score, entry_id) for entry_id, score in scores.items() if entry_id not in exclude)
+        return [entry_id for _, entry_id in ranked[:limit]]
+
+    def search(self, query: str, limit: int = 10, kind: Optional[str] = None) -> List[Dict]:
+        words = normalize(query).split()
+        if not words:
+            ids = list(range(len(self.entries)))
+        else:
+            ids = self._prefix_matches(words)
+            code = self.codes.get("".join(words))
+            if code is not None:
+                ids = [code] + [i for i in ids if i != code]
+            if len(ids) < limit and any(len(w) >= 3 for w in words):
+                ids += self._fuzzy_matches(words, set(ids), limit - len(ids))
+        if kind:
+            ids = [i for i in ids if self.entries[i]["kind"] == kind]
+        return [self.entries[i] for i in ids[:limit]]
+
+    def suggestion_rows(self, max_length: int = TABLE_PREFIX_LENGTH,
+                        per_prefix: int = TABLE_SUGGESTIONS) -> List[tuple]:
+        """(prefix, rank, kind, label, HCPCS_Code, Manufacturer) rows for bi_search_suggestion"""
+        rows = []
+        for prefix, ids in self.prefixes.items():
+            if len(prefix) > max_length:
+                continue
+            for rank, entry_id in enumerate(ids[:per_prefix], 1):
+                entry = self.entries[entry_id]
+                rows.append((prefix, rank, entry["kind"], entry["label"],
+                             entry["HCPCS_Code"], entry["Manufacturer"]))
+        return rows
+
+
+def load_entries(conn: pymysql.connections.Connection) -> List[Dict]:
+    """One entry per HCPCS code (label = hcpcs_drug) and one per manufacturer"""
+    with conn.cursor() as cursor:
+        cursor.execute(ENTRIES_SQL)
+        rows = cursor.fetchall()
+    latest = max((row[4] for row in rows), default=None)
+
+    entries = []
+    manufacturers: Dict[str, Dict] = {}
+    for code, drug_name, manufacturer, quarters, last_quarter in rows:
+        current = last_quarter == latest
+        entries.append({
+            "kind": "hcpcs",
+            "label": f"{drug_name} ({code})" if drug_name else code,
+            "HCPCS_Code": code,
+            "Manufacturer": manufacturer,
+            "quarters": quarters,
+            "current": current,
+        })
+        if manufacturer:
+            m = manufacturers.setdefault(manufacturer, {
+                "kind": "manufacturer", "label": manufacturer, "HCPCS_Code": None,
+                "Manufacturer": manufacturer, "quarters": 0, "current": False,
+            })
+            # Manufacturers rank by how many codes they price
+            m["quarters"] += 1
+            m["current"] = m["current"] or current
+    return entries + list(manufacturers.values())
+
+
+def build_index(database: str = DEFAULT_DATABASE, defaults_file: str = DEFAULT_DEFAULTS_FILE) -> SearchIndex:
+    conn = connect(database, defaults_file)
+    try:
+        return SearchIndex(load_entries(conn))
+    finally:
+        conn.close()
+
+
+def write_suggestion_table(conn: pymysql.connections.Connection, index: SearchIndex,
+                           batch_size: int = 5000) -> int:
+    """Rebuild bi_search_suggestion from the index and swap it in; returns rows written"""
+    started_at = datetime.now()
+    rows = index.suggestion_rows()
+    with conn.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS bi_search_suggestion_new")
+        cursor.execute(SUGGESTION_TABLE_SQL)
+        for i in range(0, len(rows), batch_size):
+            cursor.executemany(
+                "INSERT INTO bi_search_suggestion_new "
+                "(prefix, suggestion_rank, kind, label, HCPCS_Code, Manufacturer) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                rows[i:i + batch_size]
+            )
+        conn.commit()
+        # First run: give RENAME something to move aside
+        cursor.execute("CREATE TABLE IF NOT EXISTS bi_search_suggestion LIKE bi_search_suggestion_new")
+        cursor.execute("DROP TABLE IF EXISTS bi_search_suggestion_old")
+        cursor.execute("RENAME TABLE bi_search_suggestion TO bi_search_suggestion_old, "
+                       "bi_search_suggestion_new TO bi_search_suggestion")
+        cursor.execute("DROP TABLE IF EXISTS bi_search_suggestion_old")
+        # The API reloads when it sees a newer row
+        cursor.execute(
+            "INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at) "
+            "VALUES ('search', 'COMPLETED', %s, %s, NOW())",
+            (f"Search index rebuilt - {len(index)} entries, {len(rows)} suggestion rows", started_at)
+        )
+    conn.commit()
+    return len(rows)
+
+
+def last_build(conn: pymysql.connections.Connection) -> Optional[datetime]:
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT MAX(completed_at) FROM bi_refresh_log "
+                       "WHERE refresh_type = 'search' AND status = 'COMPLETED'")
+        return cursor.fetchone()[0]
+
+
+class SearchServer:
+    def __init__(self, database: str = DEFAULT_DATABASE, defaults_file: str = DEFAULT_DEFAULTS_FILE,
+                 reload_interval: int = 300):
+        """
+        Initialize the lookup API
+
+        Args:
+            database: Database holding the compact BI tables
+            defaults_file: MySQL option file with [client] credentials
+            reload_interval: Seconds between checks for a newer 'search' build (0 = never)
+        """
+        self.database = database
+        self.defaults_file = defaults_file
+        self.reload_interval = reload_interval
+        self.index = build_index(database, defaults_file)
+        self.loaded_build: Optional[datetime] = None
+        self._stop = threading.Event()
+
+    def reload(self) -> SearchIndex:
+        # Built off to the side, then one reference swap - lookups never wait
+        self.index = build_index(self.database, self.defaults_file)
+        return self.index
+
+    def _watch(self):
+        while not self._stop.wait(self.reload_interval):
+            try:
+                conn = connect(self.database, self.defaults_file)
+                try:
+                    build = last_build(conn)
+                finally:
+                    conn.close()
+                if build and build != self.loaded_build:
+                    self.reload()
+                    self.loaded_build = build
+                    print(f"🔄 Search index reloaded ({len(self.index)} entries)")
+            except pymysql.MySQLError as ex:
+                print(f"⚠️  Search index reload check failed: {ex}")
+
+    def serve(self, host: str = "127.0.0.1", port: int = 8091) -> ThreadingHTTPServer:
+        """Start the API in a background thread; returns the server (call .shutdown() to stop)"""
+        handler = type("Handler", (SearchHandler,), {"search_server": self})
+        server = ThreadingHTTPServer((host, port), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        if self.reload_interval:
+            threading.Thread(target=self._watch, daemon=True).start()
+        return server
+
+
+class SearchHandler(BaseHTTPRequestHandler):
+    search_server: SearchServer = None
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status: int, body: Dict):
+        payload = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        # Filter boxes call this straight from the browser
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        index = self.search_server.index
+        if url.path == "/health":
+            return self._send(200, {"entries": len(index), "built_at": index.built_at.isoformat()})
+        if url.path != "/suggest":
+            return self._send(404, {"message": "Not found"})
+
+        params = parse_qs(url.query)
+        try:
+            limit = min(max(int(params.get("limit", ["10"])[0]), 1), 100)
+        except ValueError:
+            return self._send(400, {"message": "limit must be an integer"})
+        start = time.perf_counter()
+        results = index.search(params.get("q", [""])[0], limit, params.get("kind", [None])[0])
+        took_ms = round((time.perf_counter() - start) * 1000, 3)
+        return self._send(200, {
+            "query": params.get("q", [""])[0],
+            "took_ms": took_ms,
+            "results": [{k: e[k] for k in ("kind", "label", "HCPCS_Code", "Manufacturer")} for e in results],
+        })
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/reload":
+            return self._send(404, {"message": "Not found"})
+        try:
+            index = self.search_server.reload()
+        except pymysql.MySQLError as ex:
+            return self._send(500, {"message": f"Reload failed: {ex}"})
+        return self._send(200, {"entries": len(index), "built_at": index.built_at.isoformat()})
+
+
+def benchmark(index: SearchIndex, queries: int = 2000, seed: int = 7) -> Dict[str, float]:
+    """Latency of typed prefixes (1-6 chars) and misspelled words sampled from the index"""
+    rng = random.Random(seed)
+    words = [w for ws in index.words for w in ws if len(w) >= 3]
+    samples = []
+    for _ in range(queries):
+        word = rng.choice(words)
+        if rng.random() < 0.2 and len(word) > 4:
+            i = rng.randrange(1, len(word) - 1)
+            word = word[:i] + word[i + 1] + word[i] + word[i + 2:]  # swap two letters
+        else:
+            word = word[:rng.randint(1, min(6, len(word)))]
+        samples.append(word)
+
+    timings = []
+    for query in samples:
+        start = time.perf_counter()
+        index.search(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "queries": len(timings),
+        "p50_ms": timings[len(timings) // 2],
+        "p99_ms": timings[int(len(timings) * 0.99) - 1],
+        "max_ms": timings[-1],
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Type-ahead search over HCPCS codes, drugs and manufacturers")
+    parser.add_argument("query", nargs="?", help="Look one query up and print the suggestions")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--write-table", action="store_true",
+                        help="Rebuild bi_search_suggestion (run after each refresh)")
+    parser.add_argument("--serve", action="store_true", help="Serve GET /suggest?q=...")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--reload-interval", type=int, default=300,
+                        help="Seconds between checks for a rebuilt index when serving (0 = never)")
+    parser.add_argument("--bench", action="store_true", help="Measure lookup latency")
+    parser.add_argument("--database", default=DEFAULT_DATABASE)
+    parser.add_argument("--defaults-file", default=DEFAULT_DEFAULTS_FILE)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.serve:
+            search_server = SearchServer(args.database, args.defaults_file, args.reload_interval)
+            search_server.serve(args.host, args.port)
+            print(f"🔎 Drug search on http://{args.host}:{args.port}/suggest?q= "
+                  f"({len(search_server.index)} entries) - Ctrl+C to stop")
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                return 0
+
+        start = time.time()
+        index = build_index(args.database, args.defaults_file)
+        print(f"📚 Indexed {len(index)} entries ({len(index.prefixes)} prefixes, "
+              f"{len(index.trigrams)} trigrams) in {time.time() - start:.2f}s")
+
+        if args.write_table:
+            conn = connect(args.database, args.defaults_file)
+            try:
+                rows = write_suggestion_table(conn, index)
+            finally:
+                conn.close()
+            print(f"💾 bi_search_suggestion rebuilt: {rows:,} rows")
+        if args.bench:
+            stats = benchmark(index)
+            print(f"⏱️  {stats['queries']} lookups: p50 {stats['p50_ms']:.3f} ms, "
+                  f"p99 {stats['p99_ms']:.3f} ms, max {stats['max_ms']:.3f} ms")
+        if args.query:
+            for entry in index.search(args.query, args.limit):
+                print(f"   [{entry['kind']}] {entry['label']}"
+                      + (f" - {entry['Manufacturer']}" if entry["kind"] == "hcpcs" and entry["Manufacturer"] else ""))
+    except pymysql.MySQLError as ex:
+        print(f"❌ Search index build failed: {ex}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
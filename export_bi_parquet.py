@@ -0,0 +1,329 @@
+"""
+BI Tables Parquet Export
+Exports the BI tables to Parquet, one partition per quarter, for offline
+analytics (pandas, DuckDB, Spark) - instead of phpMyAdmin / Power BI pulls
+of the whole table from the production database
+
+What it does:
+1. One cheap aggregate per table (row count + last Updated_date per
+   quarter_key) decides which quarters changed since the last export;
+   unchanged partitions are left alone, removed quarters are deleted.
+   With --use-digests the quarter digests recorded by the last refresh
+   (sp_refresh_digest.sql) decide instead, so quarters that were rebuilt
+   with identical content are not exported again
+2. Each changed quarter is streamed with a server-side cursor (SSCursor) in
+   --batch-size rows, one Parquet row group per batch - memory is bounded
+   by the batch, not the table
+3. HCPCS_Code and Manufacturer are dictionary-encoded; the VARCHAR price
+   columns of bi_historical_pricing ('NA' = missing) are written as decimals
+4. Partitions are written to a temp file and renamed into place, and
+   _export_manifest.json is updated after each one, so an interrupted export
+   resumes where it stopped
+
+Layout (Hive-style, readable as one dataset):
+  <out>/bi_historical_pricing/quarter_key=20244/part-0.parquet
+  <out>/bi_hcpcs_drug_pricing/quarter_key=20244/part-0.parquet
+
+Prerequisites:
+- pip install -r requirements.txt pyarrow
+- ~/.my.cnf with [client] credentials
+- period_date / quarter_key columns (migrate_period_columns.sql)
+
+Usage:
+  python export_bi_parquet.py --out /data/bi_parquet
+  python export_bi_parquet.py --out /data/bi_parquet --tables bi_historical_pricing --full
+  python export_bi_parquet.py --out /data/bi_parquet --use-digests   # skip re-upserted but unchanged quarters
+  python -c "import pyarrow.dataset as ds; print(ds.dataset('/data/bi_parquet/bi_historical_pricing', partitioning='hive').to_table().num_rows)"
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import pymysql
+import pymysql.cursors
+
+from refresh_bi_tables import DEFAULT_DATABASE, DEFAULT_DEFAULTS_FILE, connect
+
+DEFAULT_BATCH_SIZE = 50000
+MANIFEST_FILE = "_export_manifest.json"
+
+# Columns whose values repeat heavily - stored as dictionary<int32, string>
+DICTIONARY_COLUMNS = {"HCPCS_Code", "Manufacturer"}
+
+# table -> [(column, SQL expression, arrow type name)]; quarter_key is the partition column
+EXPORT_TABLES = {
+    "bi_historical_pricing": [
+        ("HCPCS_Code", "HCPCS_Code", "string"),
+        ("Quarter", "Quarter", "string"),
+        ("Manufacturer", "Manufacturer", "string"),
+        ("hcpcs_drug", "hcpcs_drug", "string"),
+        ("ASP", "CAST(NULLIF(ASP, 'NA') AS DECIMAL(18,4))", "decimal"),
+        ("Median_WAC", "CAST(NULLIF(Median_WAC, 'NA') AS DECIMAL(18,4))", "decimal"),
+        ("Median_AWP", "CAST(NULLIF(Median_AWP, 'NA') AS DECIMAL(18,4))", "decimal"),
+        ("Updated_date", "Updated_date", "timestamp"),
+    ],
+    "bi_hcpcs_drug_pricing": [
+        ("HCPCS_Code", "HCPCS_Code", "string"),
+        ("Manufacturer", "Manufacturer", "string"),
+        ("Drug_Name", "Drug_Name", "string"),
+        ("hcpcs_drug", "hcpcs_drug", "string"),
+        ("month_year", "month_year", "string"),
+        ("period_date", "period_date", "date"),
+        ("BILLUNITSPKG", "BILLUNITSPKG", "decimal"),
+        ("HCPCS_Code_Dosage", "HCPCS_Code_Dosage", "string"),
+        ("Payment_Limit", "Payment_Limit", "decimal"),
+        ("Current_WAC_Effect_Date", "Current_WAC_Effect_Date", "date"),
+        ("Current_AWP_Effect_Date", "Current_AWP_Effect_Date", "date"),
+        ("ASP_Override", "ASP_Override", "decimal"),
+        ("ASP_current_quarter", "ASP_current_quarter", "decimal"),
+        ("ASP_prev_quarter", "ASP_prev_quarter", "decimal"),
+        ("ASP_Quarterly_Change_Pct", "ASP_Quarterly_Change_Pct", "decimal"),
+        ("Median_WAC", "Median_WAC", "decimal"),
+        ("Median_AWP", "Median_AWP", "decimal"),
+        ("ASP_by_WAC_ratio", "ASP_by_WAC_ratio", "decimal"),
+        ("ASP_by_AWP_ratio", "ASP_by_AWP_ratio", "decimal"),
+        ("Updated_date", "Updated_date", "timestamp"),
+    ],
+}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise SystemExit("❌ Parquet export needs pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def arrow_schema(columns: Sequence[Tuple[str, str, str]]):
+    pa = _pyarrow()
+    types = {
+        "string": pa.string(),
+        "decimal": pa.decimal128(18, 4),
+        "date": pa.date32(),
+        "timestamp": pa.timestamp("s"),
+    }
+    return pa.schema([
+        pa.field(name, pa.dictionary(pa.int32(), pa.string()) if name in DICTIONARY_COLUMNS else types[kind])
+        for name, _, kind in columns
+    ])
+
+
+def write_partition(path: str, schema, batches: Iterator[List[tuple]],
+                    compression: str = "zstd") -> int:
+    """Write row batches (lists of tuples in schema order) as one Parquet file; returns rows written"""
+    pa = _pyarrow()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    rows = 0
+    writer = pa.parquet.ParquetWriter(tmp_path, schema, compression=compression,
+                                      use_dictionary=sorted(DICTIONARY_COLUMNS & set(schema.names)))
+    try:
+        for batch in batches:
+            arrays = []
+            for i, field in enumerate(schema):
+                values = [row[i] for row in batch]
+                if pa.types.is_dictionary(field.type):
+                    arrays.append(pa.array(values, pa.string()).dictionary_encode())
+                else:
+                    arrays.append(pa.array(values, field.type))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(batch)
+    except BaseException:
+        writer.close()
+        os.remove(tmp_path)
+        raise
+    writer.close()
+    os.replace(tmp_path, path)
+    return rows
+
+
+class ParquetExporter:
+    def __init__(self, out_dir: str, database: str = DEFAULT_DATABASE,
+                 defaults_file: str = DEFAULT_DEFAULTS_FILE,
+                 batch_size: int = DEFAULT_BATCH_SIZE, compression: str = "zstd",
+                 use_digests: bool = False):
+        """
+        Initialize the exporter
+
+        Args:
+            out_dir: Root directory of the Parquet datasets (one sub-directory per table)
+            database: Database holding the BI tables
+            defaults_file: MySQL option file with [client] credentials
+            batch_size: Rows fetched per round trip and written per row group
+            compression: Parquet codec (zstd, snappy, gzip, none)
+            use_digests: Fingerprint quarters by the content digests of the latest
+                refresh (sp_refresh_digest.sql) instead of row count + Updated_date
+        """
+        self.out_dir = out_dir
+        self.database = database
+        self.defaults_file = defaults_file
+        self.batch_size = max(1, batch_size)
+        self.compression = compression
+        self.use_digests = use_digests
+        self.conn: Optional[pymysql.connections.Connection] = None
+
+    def _connect(self) -> pymysql.connections.Connection:
+        if self.conn is None or not self.conn.open:
+            self.conn = connect(self.database, self.defaults_file)
+            with self.conn.cursor() as cursor:
+                # Exports are read-only; don't hold undo history for the whole run
+                cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL READ COMMITTED")
+        return self.conn
+
+    def close(self):
+        if self.conn and self.conn.open:
+            self.conn.close()
+
+    # -------------------------------------------------------------
+    # Manifest
+    # -------------------------------------------------------------
+
+    def _manifest_path(self, table: str) -> str:
+        return os.path.join(self.out_dir, table, MANIFEST_FILE)
+
+    def load_manifest(self, table: str) -> Dict[str, Dict]:
+        try:
+            with open(self._manifest_path(table), encoding="utf-8") as f:
+                return json.load(f).get("partitions", {})
+        except FileNotFoundError:
+            return {}
+
+    def save_manifest(self, table: str, partitions: Dict[str, Dict]):
+        path = self._manifest_path(table)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"table": table, "updated_at": datetime.now().isoformat(timespec="seconds"),
+                       "partitions": partitions}, f, indent=2, sort_keys=True)
+        os.replace(path + ".tmp", path)
+
+    # -------------------------------------------------------------
+    # Export
+    # -------------------------------------------------------------
+
+    def source_fingerprints(self, table: str) -> Dict[str, Dict]:
+        """{quarter_key: {"rows", "max_updated"}} - one grouped pass, no rows transferred"""
+        if self.use_digests:
+            # Re-upserted but identical quarters keep their digest (new Updated_date only)
+            from refresh_diff import latest_quarter_digests
+            return {
+                key: {"rows": rows, "digest": str(digest)}
+                for key, (rows, digest) in latest_quarter_digests(self._connect(), table).items()
+            }
+        with self._connect().cursor() as cursor:
+            cursor.execute(
+                f"SELECT quarter_key, COUNT(*), MAX(Updated_date) FROM {table} "
+                f"WHERE quarter_key IS NOT NULL GROUP BY quarter_key"
+            )
+            return {
+                str(key): {"rows": rows, "max_updated": updated.isoformat() if updated else None}
+                for key, rows, updated in cursor.fetchall()
+            }
+
+    def stream_quarter(self, table: str, quarter_key: int) -> Iterator[List[tuple]]:
+        """Rows of one quarter in batch_size lists, via an unbuffered server-side cursor"""
+        columns = ", ".join(f"{expr} AS `{name}`" for name, expr, _ in EXPORT_TABLES[table])
+        with self._connect().cursor(pymysql.cursors.SSCursor) as cursor:
+            # Sorted by HCPCS_Code so dictionary pages and row-group stats stay tight
+            cursor.execute(f"SELECT {columns} FROM {table} WHERE quarter_key = %s ORDER BY HCPCS_Code",
+                           (quarter_key,))
+            while True:
+                batch = cursor.fetchmany(self.batch_size)
+                if not batch:
+                    break
+                yield batch
+
+    def export_table(self, table: str, full: bool = False, dry_run: bool = False) -> Dict[str, int]:
+        """Rewrite the changed quarters of one table; returns counts per action"""
+        table_dir = os.path.join(self.out_dir, table)
+        schema = arrow_schema(EXPORT_TABLES[table])
+        manifest = {} if full else self.load_manifest(table)
+        source = self.source_fingerprints(table)
+
+        changed = sorted((key for key, fp in source.items()
+                          if manifest.get(key, {}).get("source") != fp
+                          or not os.path.exists(os.path.join(table_dir, manifest[key]["file"]))),
+                         key=int)
+        removed = sorted(set(manifest) - set(source), key=int)
+        counts = {"exported": 0, "unchanged": len(source) - len(changed), "removed": len(removed), "rows": 0}
+
+        print(f"📦 {table}: {len(source)} quarter(s) - {len(changed)} changed, "
+              f"{counts['unchanged']} unchanged, {len(removed)} removed")
+        if dry_run:
+            for key in changed:
+                print(f"   would export quarter_key={key} ({source[key]['rows']:,} rows)")
+            return counts
+
+        if full and os.path.isdir(table_dir):
+            shutil.rmtree(table_dir)
+
+        for key in removed:
+            shutil.rmtree(os.path.join(table_dir, f"quarter_key={key}"), ignore_errors=True)
+            manifest.pop(key, None)
+        if removed:
+            self.save_manifest(table, manifest)
+
+        for key in changed:
+            start = time.time()
+            relative = f"quarter_key={key}/part-0.parquet"
+            rows = write_partition(os.path.join(table_dir, relative), schema,
+                                   self.stream_quarter(table, int(key)), self.compression)
+            manifest[key] = {
+                "file": relative,
+                "rows": rows,
+                "source": source[key],
+                "exported_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            # Saved per partition: an interrupted run only redoes the quarter in progress
+            self.save_manifest(table, manifest)
+            counts["exported"] += 1
+            counts["rows"] += rows
+            print(f"   ✅ quarter_key={key}: {rows:,} rows in {time.time() - start:.1f}s")
+        return counts
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export BI tables to quarter-partitioned Parquet")
+    parser.add_argument("--out", required=True, help="Output directory (one sub-directory per table)")
+    parser.add_argument("--tables", nargs="+", choices=sorted(EXPORT_TABLES), default=list(EXPORT_TABLES))
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Rows per fetch / Parquet row group (bounds memory)")
+    parser.add_argument("--compression", default="zstd", choices=["zstd", "snappy", "gzip", "none"])
+    parser.add_argument("--full", action="store_true", help="Ignore the manifest and rewrite every quarter")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the quarters that would be exported")
+    parser.add_argument("--use-digests", action="store_true",
+                        help="Detect changed quarters by content digest (sp_refresh_digest.sql); "
+                             "the first run after switching re-exports every quarter")
+    parser.add_argument("--database", default=DEFAULT_DATABASE)
+    parser.add_argument("--defaults-file", default=DEFAULT_DEFAULTS_FILE)
+    args = parser.parse_args(argv)
+
+    _pyarrow()
+    exporter = ParquetExporter(args.out, args.database, args.defaults_file, args.batch_size, args.compression,
+                               use_digests=args.use_digests)
+    start = time.time()
+    try:
+        totals = {"exported": 0, "rows": 0}
+        for table in args.tables:
+            counts = exporter.export_table(table, full=args.full, dry_run=args.dry_run)
+            totals["exported"] += counts["exported"]
+            totals["rows"] += counts["rows"]
+    except pymysql.MySQLError as ex:
+        print(f"❌ Export failed: {ex}")
+        return 1
+    finally:
+        exporter.close()
+
+    print(f"🏁 {totals['exported']} partition(s), {totals['rows']:,} rows in {time.time() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,435 @@
+"""
+CMS Pricing File Loader
+Streams a CMS ASP/NDC file (CSV or XLSX) into cms_drug_pricing, replacing
+the manual phpMyAdmin import
+
+What it does:
+1. Reads the file in chunks (bounded memory - XLSX via openpyxl read-only mode)
+2. Normalizes up front, so downstream SQL has less to filter:
+   - drops repeated header rows and rows without an HCPCS code
+   - prices / units: '$1,234.50 ' -> 1234.5, non-numeric -> NULL
+   - month_year: 'Feburary.2025', 'Feb-2025', '2025-02' -> 'February.2025'
+   - effect dates -> 'm/d/yy' (the format sp_stage_cms_drug_pricing parses)
+3. Skips rows already loaded, by (HCPCS_Code, NDC2, period)
+4. Inserts in batched multi-row INSERTs
+5. Runs the incremental refresh - only the quarter(s) whose source changed
+   are reprocessed (see sp_refresh_bi_tables_incremental.sql)
+
+period_date / quarter_key are filled by the triggers from
+migrate_period_columns.sql.
+
+Prerequisites:
+- pip install -r requirements.txt  (PyMySQL; openpyxl for .xlsx files)
+- ~/.my.cnf with [client] credentials
+
+Usage:
+  python load_cms_pricing.py "Oct 2025 ASP NDC-HCPCS Crosswalk.csv" --period 2025-10
+  python load_cms_pricing.py crosswalk.xlsx --sheet "Crosswalk" --dry-run
+  python -m doctest load_cms_pricing.py -v   # normalization self-checks
+"""
+
+import argparse
+import csv
+import os
+import re
+import sys
+import time
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import pymysql
+
+from refresh_bi_tables import (DEFAULT_DATABASE, DEFAULT_DEFAULTS_FILE, RefreshOrchestrator,
+                               acquire_refresh_lock, connect)
+
+# cms_drug_pricing columns written by the loader
+TARGET_COLUMNS = [
+    "HCPCS_Code", "Short_Description", "LABELER_NAME", "NDC2", "Drug_Name",
+    "BILLUNITSPKG", "HCPCS_Code_Dosage", "Payment_Limit", "Current_WAC_Package_Price",
+    "Current_WAC_Effect_Date", "Current_AWP_Package_Price", "Current_AWP_Effect_Date",
+    "J_Code_Desc", "month_name", "year_name", "month_year", "ASP_Override",
+]
+
+NUMERIC_COLUMNS = {
+    "BILLUNITSPKG", "Payment_Limit", "Current_WAC_Package_Price",
+    "Current_AWP_Package_Price", "ASP_Override",
+}
+DATE_COLUMNS = {"Current_WAC_Effect_Date", "Current_AWP_Effect_Date"}
+
+# Normalized file header (lowercase, non-alphanumerics removed) -> column
+HEADER_ALIASES = {
+    "hcpcscode": "HCPCS_Code",
+    "hcpcs": "HCPCS_Code",
+    "shortdescription": "Short_Description",
+    "labelername": "LABELER_NAME",
+    "labeler": "LABELER_NAME",
+    "manufacturer": "LABELER_NAME",
+    "ndc2": "NDC2",
+    "ndc": "NDC2",
+    "ndc11": "NDC2",
+    "drugname": "Drug_Name",
+    "billunitspkg": "BILLUNITSPKG",
+    "billunitsperpackage": "BILLUNITSPKG",
+    "hcpcscodedosage": "HCPCS_Code_Dosage",
+    "hcpcsdosage": "HCPCS_Code_Dosage",
+    "paymentlimit": "Payment_Limit",
+    "currentwacpackageprice": "Current_WAC_Package_Price",
+    "currentwaceffectdate": "Current_WAC_Effect_Date",
+    "currentawppackageprice": "Current_AWP_Package_Price",
+    "currentawpeffectdate": "Current_AWP_Effect_Date",
+    "jcodedesc": "J_Code_Desc",
+    "jcodedescription": "J_Code_Desc",
+    "monthyear": "month_year",
+    "aspoverride": "ASP_Override",
+}
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+MONTH_NAMES = [
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+]
+
+
+# =============================================================
+# Normalization
+# =============================================================
+
+def normalize_header(value) -> str:
+    return re.sub(r"[^a-z0-9]", "", str(value or "").lower())
+
+
+def parse_numeric(value) -> Optional[Decimal]:
+    """'$1,234.50 ' -> Decimal('1234.50'); blanks / 'NA' / junk -> None"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float, Decimal)):
+        return Decimal(str(value))
+    text = str(value).strip().replace("$", "").replace(",", "")
+    if not text:
+        return None
+    try:
+        number = Decimal(text)
+    except InvalidOperation:
+        return None
+    return number if number.is_finite() else None
+
+
+def parse_period(value) -> Optional[date]:
+    """
+    First day of the month from the messy month_year spellings
+
+    'February.2025', 'Feburary.2025', 'Feb-2025', 'Feb 2025', '2025-02',
+    '02/2025' and real dates all map to 2025-02-01.
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return date(value.year, value.month, 1)
+    if isinstance(value, date):
+        return date(value.year, value.month, 1)
+    text = str(value).strip()
+    if not text or text.lower() == "month_year":
+        return None
+
+    match = re.match(r"^([A-Za-z]+)[\s.\-_/]*(\d{4})$", text)
+    if match:
+        month = MONTHS.get(match.group(1)[:3].lower())
+        return date(int(match.group(2)), month, 1) if month else None
+
+    match = re.match(r"^(\d{4})[\-/.](\d{1,2})(?:[\-/.]\d{1,2})?$", text)
+    if match and 1 <= int(match.group(2)) <= 12:
+        return date(int(match.group(1)), int(match.group(2)), 1)
+
+    match = re.match(r"^(\d{1,2})[\-/.](\d{4})$", text)
+    if match and 1 <= int(match.group(1)) <= 12:
+        return date(int(match.group(2)), int(match.group(1)), 1)
+    return None
+
+
+def format_effect_date(value) -> Optional[str]:
+    """Any date-ish value -> 'm/d/yy'; unparseable -> None"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        value = value.date()
+    if not isinstance(value, date):
+        text = str(value).strip()
+        if not text:
+            return None
+        for fmt in ("%m/%d/%y", "%m/%d/%Y", "%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%d-%b-%Y"):
+            try:
+                value = datetime.strptime(text, fmt).date()
+                break
+            except ValueError:
+                continue
+        else:
+            return None
+    return f"{value.month}/{value.day}/{value.strftime('%y')}"
+
+
+def clean_text(value) -> Optional[str]:
+    if value is None:
+        return None
+    text = str(value).strip()
+    return text or None
+
+
+def record_key(hcpcs, ndc) -> Tuple[Optional[str], Optional[str]]:
+    """
+    (HCPCS_Code, NDC2) duplicate key - applied to file rows and loaded rows alike
+
+    >>> record_key(" j9035 ", "50242-0060-01 ")
+    ('J9035', '50242-0060-01')
+    >>> record_key("J9035", "") == record_key("j9035", None)
+    True
+    """
+    hcpcs = clean_text(hcpcs)
+    return (hcpcs.upper() if hcpcs else None, clean_text(ndc))
+
+
+# =============================================================
+# Readers (streaming)
+# =============================================================
+
+def read_csv(path: str, encoding: str) -> Iterator[List]:
+    with open(path, newline="", encoding=encoding, errors="replace") as f:
+        for row in csv.reader(f):
+            yield row
+
+
+def read_xlsx(path: str, sheet: Optional[str]) -> Iterator[List]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise SystemExit("❌ Reading .xlsx needs openpyxl: pip install openpyxl")
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+        for row in worksheet.iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        workbook.close()
+
+
+# =============================================================
+# Loader
+# =============================================================
+
+class CmsPricingLoader:
+    def __init__(self, conn: pymysql.connections.Connection, period: Optional[date] = None,
+                 batch_size: int = 5000, dry_run: bool = False):
+        """
+        Initialize the loader
+
+        Args:
+            conn: Connection to the database holding cms_drug_pricing
+            period: Month of the file, used when it has no month_year column
+                    (or to override it)
+            batch_size: Rows per multi-row INSERT
+            dry_run: Parse and count only, insert nothing
+        """
+        self.conn = conn
+        self.period = period
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.stats = {"read": 0, "header_or_blank": 0, "bad_period": 0, "duplicate": 0, "inserted": 0}
+        self.periods: Set[date] = set()
+        self._existing: Dict[date, Set[Tuple[str, Optional[str]]]] = {}
+
+    def _column_map(self, header: List) -> Dict[int, str]:
+        mapping = {}
+        for index, name in enumerate(header):
+            column = HEADER_ALIASES.get(normalize_header(name))
+            if column and column not in mapping.values():
+                mapping[index] = column
+        missing = {"HCPCS_Code", "NDC2"} - set(mapping.values())
+        if missing:
+            raise SystemExit(f"❌ File header is missing required column(s): {', '.join(sorted(missing))}")
+        if "month_year" not in mapping.values() and self.period is None:
+            raise SystemExit("❌ File has no month_year column - pass --period YYYY-MM")
+        return mapping
+
+    def _existing_keys(self, period: date) -> Set[Tuple[str, Optional[str]]]:
+        """(HCPCS_Code, NDC2) already loaded for a month - one indexed range read per month"""
+        if period not in self._existing:
+            with self.conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT HCPCS_Code, NDC2 FROM cms_drug_pricing WHERE period_date = %s",
+                    (period,),
+                )
+                self._existing[period] = {record_key(row[0], row[1]) for row in cursor.fetchall()}
+        return self._existing[period]
+
+    def normalize(self, raw: List, mapping: Dict[int, str], header_values: Set[str]) -> Optional[Tuple]:
+        record = {column: raw[index] if index < len(raw) else None for index, column in mapping.items()}
+
+        hcpcs = clean_text(record.get("HCPCS_Code"))
+        if not hcpcs or normalize_header(hcpcs) in header_values:
+            self.stats["header_or_blank"] += 1
+            return None
+
+        period = self.period or parse_period(record.get("month_year"))
+        if period is None:
+            self.stats["bad_period"] += 1
+            return None
+
+        key = record_key(hcpcs, record.get("NDC2"))
+        existing = self._existing_keys(period)
+        if key in existing:
+            self.stats["duplicate"] += 1
+            return None
+        existing.add(key)  # also de-duplicates within the file
+        self.periods.add(period)
+
+        values = []
+        for column in TARGET_COLUMNS:
+            if column == "HCPCS_Code":
+                values.append(key[0])
+            elif column == "month_year":
+                values.append(f"{MONTH_NAMES[period.month - 1]}.{period.year}")
+            elif column == "month_name":
+                values.append(str(period.month))
+            elif column == "year_name":
+                values.append(str(period.year))
+            elif column in NUMERIC_COLUMNS:
+                number = parse_numeric(record.get(column))
+                values.append(None if number is None else str(number))
+            elif column in DATE_COLUMNS:
+                values.append(format_effect_date(record.get(column)))
+            else:
+                values.append(clean_text(record.get(column)))
+        return tuple(values)
+
+    def _insert(self, batch: List[Tuple]):
+        if self.dry_run or not batch:
+            return
+        sql = (f"INSERT INTO cms_drug_pricing ({', '.join(TARGET_COLUMNS)}) "
+               f"VALUES ({', '.join(['%s'] * len(TARGET_COLUMNS))})")
+        with self.conn.cursor() as cursor:
+            cursor.executemany(sql, batch)  # PyMySQL sends one multi-row INSERT
+        self.conn.commit()
+
+    def load(self, rows: Iterator[List]) -> Dict[str, int]:
+        header = None
+        mapping: Dict[int, str] = {}
+        header_values: Set[str] = set()
+        batch: List[Tuple] = []
+
+        for raw in rows:
+            if header is None:
+                if not any(value not in (None, "") for value in raw):
+                    continue
+                header = raw
+                mapping = self._column_map(header)
+                header_values = {normalize_header(v) for v in header if v not in (None, "")}
+                continue
+
+            self.stats["read"] += 1
+            values = self.normalize(raw, mapping, header_values)
+            if values is None:
+                continue
+            batch.append(values)
+            if len(batch) >= self.batch_size:
+                self._insert(batch)
+                self.stats["inserted"] += len(batch)
+                batch = []
+                print(f"   ... {self.stats['inserted']:,} rows inserted")
+
+        self._insert(batch)
+        self.stats["inserted"] += len(batch)
+        return self.stats
+
+    def log(self, path: str, started_at: str):
+        quarters = sorted({f"Q{(p.month - 1) // 3 + 1}-{p.year}" for p in self.periods})
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at) "
+                "VALUES ('load', 'COMPLETED', %s, %s, NOW())",
+                (f"Loaded {os.path.basename(path)}: {self.stats['inserted']} rows inserted, "
+                 f"{self.stats['duplicate']} already present, {self.stats['header_or_blank']} header/blank, "
+                 f"{self.stats['bad_period']} bad period - quarters: {', '.join(quarters) or 'none'}",
+                 started_at),
+            )
+        self.conn.commit()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load a CMS ASP/NDC file into cms_drug_pricing")
+    parser.add_argument("file", help=".csv or .xlsx file")
+    parser.add_argument("--period", help="Month of the file (YYYY-MM) when it has no month_year column")
+    parser.add_argument("--sheet", help="XLSX sheet name (default: first sheet)")
+    parser.add_argument("--encoding", default="utf-8-sig", help="CSV encoding")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--database", default=DEFAULT_DATABASE)
+    parser.add_argument("--defaults-file", default=DEFAULT_DEFAULTS_FILE)
+    parser.add_argument("--dry-run", action="store_true", help="Parse and count only")
+    parser.add_argument("--no-refresh", action="store_true", help="Skip the incremental refresh")
+    args = parser.parse_args(argv)
+
+    period = None
+    if args.period:
+        period = parse_period(args.period)
+        if period is None:
+            print(f"❌ Cannot parse --period {args.period!r} (expected YYYY-MM)")
+            return 1
+
+    if args.file.lower().endswith((".xlsx", ".xlsm")):
+        rows = read_xlsx(args.file, args.sheet)
+    else:
+        rows = read_csv(args.file, args.encoding)
+
+    print(f"📥 Loading {args.file}{' (dry run)' if args.dry_run else ''}...")
+    started_at = time.strftime("%Y-%m-%d %H:%M:%S")
+    start = time.time()
+
+    conn = connect(args.database, args.defaults_file)
+    try:
+        loader = CmsPricingLoader(conn, period=period, batch_size=args.batch_size, dry_run=args.dry_run)
+        stats = loader.load(rows)
+        if not args.dry_run:
+            loader.log(args.file, started_at)
+    finally:
+        conn.close()
+
+    print(f"✅ {stats['read']:,} rows read in {time.time() - start:.1f}s")
+    print(f"   Inserted:            {stats['inserted']:,}{' (dry run - nothing written)' if args.dry_run else ''}")
+    print(f"   Already present:     {stats['duplicate']:,}")
+    print(f"   Header/blank rows:   {stats['header_or_blank']:,}")
+    print(f"   Unparseable period:  {stats['bad_period']:,}")
+    print(f"   Months: {', '.join(p.strftime('%Y-%m') for p in sorted(loader.periods)) or 'none'}")
+
+    if args.dry_run or args.no_refresh or stats["inserted"] == 0:
+        return 0
+
+    # Watermarks detect the changed quarter(s); nothing else is reprocessed
+    lock_conn = connect(args.database, args.defaults_file)
+    if not acquire_refresh_lock(lock_conn, args.database, timeout=600):
+        lock_conn.close()
+        print("⚠️  Another refresh is still running - the next refresh picks the new rows up")
+        return 0
+    print("🔄 Running incremental refresh...")
+    orchestrator = RefreshOrchestrator(database=args.database, defaults_file=args.defaults_file)
+    orchestrator.lock_owner = lock_conn.thread_id()
+    try:
+        ok = orchestrator.run_incremental()
+    except pymysql.err.MySQLError as ex:
+        print(f"❌ Refresh failed: {ex}")
+        return 1
+    finally:
+        orchestrator.close()
+        lock_conn.close()
+    if not ok:
+        # Data-quality gate or failed quarters - see bi_refresh_log
+        print("❌ Refresh failed - BI tables not fully refreshed (see bi_refresh_log)")
+        return 1
+    print("✅ Refresh complete")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
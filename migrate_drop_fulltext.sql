@@ -0,0 +1,35 @@
+-- =====================================================
+-- ONE-TIME MIGRATION: Drop the FULLTEXT indexes on hcpcs_drug
+-- Every upsert into the BI tables paid for FULLTEXT maintenance;
+-- drug type-ahead now comes from drug_search.py
+-- (bi_search_suggestion table / GET /suggest)
+-- =====================================================
+--
+-- Run order:
+--   1. sp_refresh_bi_dimensions.sql installed and run once
+--   2. python drug_search.py --write-table  (builds bi_search_suggestion)
+--   3. This file
+--
+-- Nothing in the refresh or the dashboards queries these indexes
+-- (no MATCH ... AGAINST). The B-tree idx_hcpcs_drug / idx_hist_hcpcs_drug
+-- indexes go with migrate_drop_wide_indexes.sql.
+--
+-- Safe to re-run: uses IF EXISTS.
+
+ALTER TABLE bi_hcpcs_drug_pricing
+    DROP INDEX IF EXISTS idx_hcpcs_drug_ft;
+
+ALTER TABLE bi_historical_pricing
+    DROP INDEX IF EXISTS idx_hist_hcpcs_drug_ft;
+
+-- =====================================================
+-- Verify (expects no rows)
+-- =====================================================
+SELECT TABLE_NAME, INDEX_NAME
+FROM information_schema.STATISTICS
+WHERE TABLE_SCHEMA = DATABASE()
+    AND INDEX_TYPE = 'FULLTEXT'
+    AND TABLE_NAME IN ('bi_hcpcs_drug_pricing', 'bi_historical_pricing');
+
+-- Type-ahead lookup a filter box can use instead:
+-- SELECT label, HCPCS_Code FROM bi_search_suggestion WHERE prefix = 'hum' ORDER BY suggestion_rank;
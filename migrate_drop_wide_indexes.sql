@@ -0,0 +1,35 @@
+-- =====================================================
+-- ONE-TIME MIGRATION: Drop the Manufacturer / hcpcs_drug
+-- indexes on the wide BI tables
+-- The dashboards read the compact facts through the vw_bi_*
+-- views (sp_refresh_bi_dimensions.sql), so nothing filters the
+-- wide tables on these columns any more; every upsert paid for them
+-- =====================================================
+--
+-- Run order:
+--   1. sp_refresh_bi_dimensions.sql installed and run once
+--   2. python Create-preset-dashboard.py --spec dashboard_spec.json
+--      (moves the charts onto the vw_bi_* datasets)
+--   3. This file
+--
+-- New installs (sp_process_single_quarter.sql) no longer create them and
+-- the shadow refresh no longer rebuilds them.
+--
+-- Safe to re-run: uses IF EXISTS.
+
+ALTER TABLE bi_hcpcs_drug_pricing
+    DROP INDEX IF EXISTS idx_manufacturer,
+    DROP INDEX IF EXISTS idx_hcpcs_drug;
+
+ALTER TABLE bi_historical_pricing
+    DROP INDEX IF EXISTS idx_hist_manufacturer,
+    DROP INDEX IF EXISTS idx_hist_hcpcs_drug;
+
+-- =====================================================
+-- Verify (expects no rows)
+-- =====================================================
+SELECT TABLE_NAME, INDEX_NAME
+FROM information_schema.STATISTICS
+WHERE TABLE_SCHEMA = DATABASE()
+    AND INDEX_NAME IN ('idx_manufacturer', 'idx_hcpcs_drug', 'idx_hist_manufacturer', 'idx_hist_hcpcs_drug')
+    AND TABLE_NAME IN ('bi_hcpcs_drug_pricing', 'bi_historical_pricing');
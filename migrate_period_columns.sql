@@ -0,0 +1,152 @@
+-- =====================================================
+-- ONE-TIME MIGRATION: Persisted period_date / quarter_key
+-- Parses month_year ONCE per row and stores it, so every
+-- quarter filter becomes an index range scan
+-- =====================================================
+--
+-- quarter_key = sortable integer YYYYQ (e.g. 20244 = Q4 2024)
+--
+-- Run order:
+--   1. This file (adds columns, function, triggers, backfills)
+--   2. sp_stage_cms_drug_pricing.sql, sp_process_single_quarter.sql
+--      (they read the new columns)
+--
+-- Safe to re-run: uses IF NOT EXISTS and only fills NULLs.
+
+-- =====================================================
+-- STEP 1: Parse function (single definition of the rules)
+-- Returns NULL for header rows and unparseable month_year values
+-- =====================================================
+
+DELIMITER //
+
+DROP FUNCTION IF EXISTS fn_parse_month_year //
+
+CREATE FUNCTION fn_parse_month_year(p_month_year VARCHAR(50))
+RETURNS DATE
+DETERMINISTIC
+BEGIN
+    IF p_month_year IS NULL
+        OR p_month_year = 'month_year'
+        OR p_month_year NOT LIKE '%.%'
+        OR LENGTH(p_month_year) < 8 THEN
+        RETURN NULL;
+    END IF;
+
+    RETURN STR_TO_DATE(
+        CONCAT('01-', REPLACE(REPLACE(p_month_year, '.', '-'), 'Feburary', 'February')),
+        '%d-%M-%Y'
+    );
+END //
+
+DELIMITER ;
+
+-- =====================================================
+-- STEP 2: Validation - month_year values that will NOT parse
+-- Review before continuing; these rows are left with NULL period_date
+-- and are skipped by the refresh (same as today's inline filters)
+-- =====================================================
+
+SELECT
+    month_year,
+    COUNT(*) AS row_count
+FROM cms_drug_pricing
+WHERE HCPCS_Code IS NOT NULL
+    AND fn_parse_month_year(month_year) IS NULL
+GROUP BY month_year
+ORDER BY row_count DESC;
+
+-- =====================================================
+-- STEP 3: Source table columns + indexes
+-- =====================================================
+
+ALTER TABLE cms_drug_pricing
+    ADD COLUMN IF NOT EXISTS period_date DATE NULL,
+    ADD COLUMN IF NOT EXISTS quarter_key INT NULL,
+    ADD INDEX IF NOT EXISTS idx_cms_quarter_key (quarter_key, HCPCS_Code),
+    ADD INDEX IF NOT EXISTS idx_cms_period_date (period_date);
+
+UPDATE cms_drug_pricing
+SET period_date = fn_parse_month_year(month_year),
+    quarter_key = YEAR(fn_parse_month_year(month_year)) * 10 + QUARTER(fn_parse_month_year(month_year))
+WHERE period_date IS NULL
+    AND HCPCS_Code IS NOT NULL;
+
+-- Keep the columns current for future imports
+DELIMITER //
+
+DROP TRIGGER IF EXISTS trg_cms_drug_pricing_period_ins //
+
+CREATE TRIGGER trg_cms_drug_pricing_period_ins
+BEFORE INSERT ON cms_drug_pricing
+FOR EACH ROW
+BEGIN
+    SET NEW.period_date = fn_parse_month_year(NEW.month_year);
+    SET NEW.quarter_key = YEAR(NEW.period_date) * 10 + QUARTER(NEW.period_date);
+END //
+
+DROP TRIGGER IF EXISTS trg_cms_drug_pricing_period_upd //
+
+CREATE TRIGGER trg_cms_drug_pricing_period_upd
+BEFORE UPDATE ON cms_drug_pricing
+FOR EACH ROW
+BEGIN
+    IF NOT (NEW.month_year <=> OLD.month_year) THEN
+        SET NEW.period_date = fn_parse_month_year(NEW.month_year);
+        SET NEW.quarter_key = YEAR(NEW.period_date) * 10 + QUARTER(NEW.period_date);
+    END IF;
+END //
+
+DELIMITER ;
+
+-- =====================================================
+-- STEP 4: BI table columns + indexes
+-- =====================================================
+
+ALTER TABLE bi_hcpcs_drug_pricing
+    ADD COLUMN IF NOT EXISTS period_date DATE NULL,
+    ADD COLUMN IF NOT EXISTS quarter_key INT NULL,
+    ADD INDEX IF NOT EXISTS idx_quarter_key (quarter_key);
+
+UPDATE bi_hcpcs_drug_pricing
+SET period_date = fn_parse_month_year(month_year),
+    quarter_key = YEAR(fn_parse_month_year(month_year)) * 10 + QUARTER(fn_parse_month_year(month_year))
+WHERE period_date IS NULL;
+
+ALTER TABLE bi_historical_pricing
+    ADD COLUMN IF NOT EXISTS quarter_key INT NULL,
+    ADD INDEX IF NOT EXISTS idx_hist_quarter_key (quarter_key),
+    ADD INDEX IF NOT EXISTS idx_hist_hcpcs_quarter_key (HCPCS_Code, quarter_key);
+
+-- 'Q42024' -> 20244
+UPDATE bi_historical_pricing
+SET quarter_key = CAST(CONCAT(SUBSTRING(Quarter, 3), SUBSTRING(Quarter, 2, 1)) AS UNSIGNED)
+WHERE quarter_key IS NULL;
+
+-- =====================================================
+-- STEP 5: Verify
+-- =====================================================
+
+SELECT
+    'cms_drug_pricing' AS table_name,
+    COUNT(*) AS total_rows,
+    SUM(period_date IS NOT NULL) AS parsed_rows,
+    SUM(period_date IS NULL) AS unparsed_rows,
+    COUNT(DISTINCT quarter_key) AS quarters
+FROM cms_drug_pricing
+UNION ALL
+SELECT
+    'bi_hcpcs_drug_pricing',
+    COUNT(*),
+    SUM(period_date IS NOT NULL),
+    SUM(period_date IS NULL),
+    COUNT(DISTINCT quarter_key)
+FROM bi_hcpcs_drug_pricing
+UNION ALL
+SELECT
+    'bi_historical_pricing',
+    COUNT(*),
+    SUM(quarter_key IS NOT NULL),
+    SUM(quarter_key IS NULL),
+    COUNT(DISTINCT quarter_key)
+FROM bi_historical_pricing;
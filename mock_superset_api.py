@@ -0,0 +1,316 @@
+"""
+Mock Superset REST API (local development only)
+In-memory stand-in for the endpoints Create-preset-dashboard.py uses, so
+provisioning can be tried, timed and re-run without a real workspace
+
+Endpoints:
+- /api/v1/security/csrf_token/, /api/v1/security/login
+- /api/v1/database/
+- /api/v1/{dataset,chart,dashboard}/  GET (rison filters, columns, paging) + POST
+- /api/v1/{dataset,chart,dashboard}/<id>  GET + PUT
+- /api/v1/dashboard/<id>/charts
+- /mock/stats (requests per method/path), POST /mock/reset
+
+Usage:
+  python mock_superset_api.py --port 8088 --latency 50
+  python Create-preset-dashboard.py --provision --workspace http://localhost:8088
+  curl localhost:8088/mock/stats
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+RESOURCES = ("dataset", "chart", "dashboard")
+
+
+def rison_loads(text: str):
+    """Decode the rison subset Superset list queries use"""
+    value, pos = _rison_value(text, 0)
+    if pos != len(text):
+        raise ValueError(f"Trailing rison at {pos}: {text[pos:]}")
+    return value
+
+
+def _rison_value(s: str, i: int) -> Tuple[object, int]:
+    c = s[i]
+    if c == "(":
+        obj = {}
+        i += 1
+        while s[i] != ")":
+            key, i = _rison_value(s, i)
+            if s[i] != ":":
+                raise ValueError(f"Expected ':' at {i}")
+            obj[key], i = _rison_value(s, i + 1)
+            if s[i] == ",":
+                i += 1
+        return obj, i + 1
+    if c == "!":
+        if s[i + 1] == "(":
+            items = []
+            i += 2
+            while s[i] != ")":
+                item, i = _rison_value(s, i)
+                items.append(item)
+                if s[i] == ",":
+                    i += 1
+            return items, i + 1
+        return {"t": True, "f": False, "n": None}[s[i + 1]], i + 2
+    if c == "'":
+        chars = []
+        i += 1
+        while s[i] != "'":
+            if s[i] == "!":
+                i += 1
+            chars.append(s[i])
+            i += 1
+        return "".join(chars), i + 1
+
+    j = i
+    while j < len(s) and s[j] not in "(),:!'":
+        j += 1
+    token = s[i:j]
+    for cast in (int, float):
+        try:
+            return cast(token), j
+        except ValueError:
+            pass
+    return token, j
+
+
+def _field(obj: Dict, path: str):
+    """obj['database']['id'] for 'database.id'"""
+    for part in path.split("."):
+        if not isinstance(obj, dict):
+            return None
+        obj = obj.get(part)
+    return obj
+
+
+def _matches(obj: Dict, flt: Dict) -> bool:
+    value = _field(obj, flt["col"])
+    if isinstance(value, dict):
+        value = value.get("id")
+    opr, target = flt["opr"], flt.get("value")
+    if opr in ("eq", "rel_o_m"):
+        return value == target
+    if opr == "neq":
+        return value != target
+    if opr == "in":
+        return value in target
+    if opr == "ct":
+        return str(target).lower() in str(value or "").lower()
+    raise ValueError(f"Unsupported filter operator: {opr}")
+
+
+class MockSupersetStore:
+    def __init__(self, database_name: str = "MySql-bnb"):
+        """
+        Initialize an empty workspace with one database connection
+
+        Args:
+            database_name: Name of the pre-created database connection
+        """
+        self.lock = threading.Lock()
+        self.database_name = database_name
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.databases = [{"id": 1, "database_name": self.database_name}]
+            self.objects: Dict[str, Dict[int, Dict]] = {r: {} for r in RESOURCES}
+            self.next_id = {r: 1 for r in RESOURCES}
+            self.requests: Dict[str, int] = {}
+
+    def count(self, method: str, path: str):
+        key = f"{method} {path}"
+        with self.lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def list(self, resource: str, query: Dict) -> Tuple[int, List[Dict]]:
+        with self.lock:
+            rows = [o for o in self.objects[resource].values()
+                    if all(_matches(o, f) for f in query.get("filters", []))]
+        order = query.get("order_column", "id")
+        rows.sort(key=lambda o: (_field(o, order) is None, _field(o, order)),
+                  reverse=query.get("order_direction") == "desc")
+        page, page_size = query.get("page", 0), query.get("page_size", 20)
+        page_rows = rows[page * page_size:(page + 1) * page_size]
+        columns = query.get("columns")
+        if columns:
+            page_rows = [{c: _field(o, c) for c in columns} for o in page_rows]
+        return len(rows), page_rows
+
+    def create(self, resource: str, body: Dict) -> Tuple[int, Dict]:
+        with self.lock:
+            if resource == "dataset":
+                database = next((d for d in self.databases if d["id"] == body.get("database")), None)
+                if database is None:
+                    return 422, {"message": {"database": ["Database does not exist"]}}
+                if any(o["table_name"] == body.get("table_name") and o["database"]["id"] == database["id"]
+                       for o in self.objects["dataset"].values()):
+                    return 422, {"message": {"table_name": [f"Dataset {body.get('table_name')} already exists"]}}
+                body = {**body, "database": database}
+            obj_id = self.next_id[resource]
+            self.next_id[resource] += 1
+            self.objects[resource][obj_id] = {**body, "id": obj_id}
+            return 201, {"id": obj_id, "result": body}
+
+    def get(self, resource: str, obj_id: int) -> Optional[Dict]:
+        with self.lock:
+            return self.objects[resource].get(obj_id)
+
+    def update(self, resource: str, obj_id: int, body: Dict) -> Tuple[int, Dict]:
+        with self.lock:
+            obj = self.objects[resource].get(obj_id)
+            if obj is None:
+                return 404, {"message": "Not found"}
+            obj.update({k: v for k, v in body.items() if k != "id"})
+            return 200, {"id": obj_id, "result": body}
+
+    def dashboard_charts(self, dashboard_id: int) -> Optional[List[Dict]]:
+        """Charts placed on the dashboard (CHART nodes of position_json)"""
+        dashboard = self.get("dashboard", dashboard_id)
+        if dashboard is None:
+            return None
+        position = json.loads(dashboard.get("position_json") or "{}")
+        chart_ids = [node["meta"]["chartId"] for node in position.values()
+                     if isinstance(node, dict) and node.get("type") == "CHART"]
+        charts = []
+        for chart_id in chart_ids:
+            chart = self.get("chart", chart_id)
+            if chart:
+                charts.append({"id": chart_id, "slice_name": chart.get("slice_name")})
+        return charts
+
+
+class MockSupersetHandler(BaseHTTPRequestHandler):
+    store: MockSupersetStore = None
+    latency: float = 0.0
+    fail_rate: float = 0.0
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status: int, body: Dict):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _body(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _route(self, method: str):
+        url = urlparse(self.path)
+        path = url.path.rstrip("/")
+        self.store.count(method, path)
+
+        if path.startswith("/mock"):
+            if path == "/mock/stats":
+                return self._send(200, {"requests": self.store.requests,
+                                        "total": sum(self.store.requests.values())})
+            if path == "/mock/reset" and method == "POST":
+                self.store.reset()
+                return self._send(200, {"message": "reset"})
+            return self._send(404, {"message": "Not found"})
+
+        if self.latency:
+            time.sleep(self.latency)
+        if method != "POST" and random.random() < self.fail_rate:
+            return self._send(503, {"message": "Injected failure"})
+
+        if path == "/api/v1/security/csrf_token":
+            return self._send(200, {"result": "mock-csrf-token"})
+        if path == "/api/v1/security/login" and method == "POST":
+            return self._send(200, {"access_token": "mock-access-token", "refresh_token": "mock-refresh-token"})
+        if path == "/api/v1/database" and method == "GET":
+            return self._send(200, {"count": len(self.store.databases), "result": self.store.databases})
+
+        parts = path.split("/")[3:]  # /api/v1/<resource>[/<id>[/charts]]
+        if not parts or parts[0] not in RESOURCES:
+            return self._send(404, {"message": "Not found"})
+        resource = parts[0]
+
+        if len(parts) == 1:
+            if method == "GET":
+                q = parse_qs(url.query).get("q", ["()"])[0]
+                try:
+                    count, rows = self.store.list(resource, rison_loads(q))
+                except (ValueError, KeyError, IndexError) as ex:
+                    return self._send(400, {"message": f"Bad q: {ex}"})
+                return self._send(200, {"count": count, "result": rows})
+            if method == "POST":
+                return self._send(*self.store.create(resource, self._body()))
+
+        if len(parts) >= 2 and parts[1].isdigit():
+            obj_id = int(parts[1])
+            if len(parts) == 3 and parts[2] == "charts" and resource == "dashboard" and method == "GET":
+                charts = self.store.dashboard_charts(obj_id)
+                if charts is None:
+                    return self._send(404, {"message": "Not found"})
+                return self._send(200, {"result": charts})
+            if len(parts) == 2 and method == "GET":
+                obj = self.store.get(resource, obj_id)
+                if obj is None:
+                    return self._send(404, {"message": "Not found"})
+                return self._send(200, {"id": obj_id, "result": obj})
+            if len(parts) == 2 and method == "PUT":
+                return self._send(*self.store.update(resource, obj_id, self._body()))
+
+        return self._send(405, {"message": "Method not allowed"})
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_PUT(self):
+        self._route("PUT")
+
+
+def serve(port: int = 8088, latency_ms: int = 0, fail_rate: float = 0.0,
+          database_name: str = "MySql-bnb") -> ThreadingHTTPServer:
+    """Start the mock API in a background thread; returns the server (call .shutdown() to stop)"""
+    handler = type("Handler", (MockSupersetHandler,), {
+        "store": MockSupersetStore(database_name),
+        "latency": latency_ms / 1000.0,
+        "fail_rate": fail_rate,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="In-memory mock of the Superset REST API")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--latency", type=int, default=0, help="Added latency per request, in ms")
+    parser.add_argument("--fail-rate", type=float, default=0.0,
+                        help="Fraction of non-POST requests answered with 503 (exercises retries)")
+    parser.add_argument("--database-name", default="MySql-bnb")
+    args = parser.parse_args(argv)
+
+    server = serve(args.port, args.latency, args.fail_rate, args.database_name)
+    print(f"🧪 Mock Superset API on http://127.0.0.1:{args.port} "
+          f"(latency {args.latency}ms, fail rate {args.fail_rate:.0%}) - Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+-- =====================================================
+-- POWER BI REPORT MEASURES AS SQL VIEWS
+-- Generated by pbit_model.py from BuyandBill-pbiRpt.pbit.zip
+-- Re-generate instead of editing by hand
+-- =====================================================
+--
+-- Base views expose each report table with the report's column names
+-- (spaces/symbols -> underscores); measure views pre-aggregate what each
+-- visual computed client-side. Needs sp_refresh_bi_rollups.sql
+-- (bi_rollup_hcpcs_quarter) for the historical views.
+
+CREATE TABLE IF NOT EXISTS bi_drug_class (
+    HCPCS_Code VARCHAR(100) PRIMARY KEY,
+    General_Drug_Class VARCHAR(255),
+    Specialized_Drug_Class VARCHAR(255)
+);
+
+-- =====================================================
+-- Base views
+-- =====================================================
+
+-- Power BI table(s): Drug Class
+CREATE OR REPLACE VIEW vw_pbi_drug_class AS
+SELECT
+    dc.HCPCS_Code AS `HCPCS_Code`,
+    dc.General_Drug_Class AS `General_Drug_Class`,
+    dc.Specialized_Drug_Class AS `Specialized_Drug_Class`
+FROM bi_drug_class dc;
+
+-- Power BI table(s): Historical_ASP
+CREATE OR REPLACE VIEW vw_pbi_historical_asp AS
+SELECT
+    r.HCPCS_Code AS `HCPCS_Code`,
+    r.quarter_date AS `Date`,
+    r.asp AS `asp`,
+    r.asp_change_pct AS `Diff_Quarters_Pct`
+FROM bi_rollup_hcpcs_quarter r;
+
+-- Power BI table(s): Historical_AWP
+CREATE OR REPLACE VIEW vw_pbi_historical_awp AS
+SELECT
+    r.HCPCS_Code AS `HCPCS_Code`,
+    r.quarter_date AS `Date`,
+    r.median_awp AS `Median_AWP`
+FROM bi_rollup_hcpcs_quarter r;
+
+-- Power BI table(s): Historical_WAC
+CREATE OR REPLACE VIEW vw_pbi_historical_wac AS
+SELECT
+    r.HCPCS_Code AS `HCPCS_Code`,
+    r.quarter_date AS `Date`,
+    r.median_wac AS `Median_WAC`
+FROM bi_rollup_hcpcs_quarter r;
+
+-- Power BI table(s): Master, Master_NonASP
+CREATE OR REPLACE VIEW vw_pbi_master AS
+SELECT
+    p.HCPCS_Code AS `HCPCS_Code`,
+    p.Drug_Name AS `Brand_name`,
+    p.Manufacturer AS `Manufacturer`,
+    p.hcpcs_drug AS `Concat`,
+    p.ASP_current_quarter AS `ASP_per_Unit_Current_Quarter`,
+    p.ASP_prev_quarter AS `ASP_per_Unit_Previous_Quarter`,
+    p.ASP_Quarterly_Change_Pct AS `ASP_Quarterly_Change_Pct`,
+    p.ASP_by_WAC_ratio AS `ASP_WAC_Ratio`,
+    p.ASP_by_AWP_ratio AS `ASP_AWP_Ratio`,
+    p.Median_WAC AS `Median_WAC_per_HCPCS_Unit`,
+    p.Median_AWP AS `Median_AWP_per_HCPCS_Unit`,
+    p.Payment_Limit AS `Medicare_Payment_Limit`,
+    NULLIF(GREATEST(COALESCE(p.Current_WAC_Effect_Date, '1900-01-01'), COALESCE(p.Current_AWP_Effect_Date, '1900-01-01')), '1900-01-01') AS `WAC_AWP_Last_Change`,
+    dc.General_Drug_Class AS `Drug_Class`
+FROM (
+    SELECT p.*, ROW_NUMBER() OVER (PARTITION BY p.HCPCS_Code ORDER BY p.period_date DESC) AS pbi_rn
+    FROM bi_hcpcs_drug_pricing p
+) p
+LEFT JOIN bi_drug_class dc ON dc.HCPCS_Code = p.HCPCS_Code
+WHERE p.pbi_rn = 1;
+
+-- =====================================================
+-- Measure views
+-- =====================================================
+
+-- Used on: Data Table (card)
+CREATE OR REPLACE VIEW vw_pbi_avg_asp_quarterly_change AS
+SELECT
+    AVG(f.`ASP_Quarterly_Change_Pct`) AS `average_of_asp_quarterly_change`
+FROM vw_pbi_master f;
+
+-- Used on: Data Table (card)
+CREATE OR REPLACE VIEW vw_pbi_avg_asp_wac_ratio AS
+SELECT
+    AVG(f.`ASP_WAC_Ratio`) AS `average_of_asp_wac_ratio`
+FROM vw_pbi_master f;
+
+-- Used on: Data Table (card)
+CREATE OR REPLACE VIEW vw_pbi_avg_asp_awp_ratio AS
+SELECT
+    AVG(f.`ASP_AWP_Ratio`) AS `average_of_asp_awp_ratio`
+FROM vw_pbi_master f;
+
+-- Used on: ASP Quarterly % (clusteredColumnChart)
+CREATE OR REPLACE VIEW vw_pbi_avg_asp_quarterly_change_by_concat AS
+SELECT
+    f.`Concat` AS `Concat`,
+    AVG(f.`ASP_Quarterly_Change_Pct`) AS `average_of_asp_quarterly_change`
+FROM vw_pbi_master f
+GROUP BY f.`Concat`;
+
+-- Used on: ASP Ratio (clusteredColumnChart)
+CREATE OR REPLACE VIEW vw_pbi_sum_asp_wac_ratio_by_concat AS
+SELECT
+    f.`Concat` AS `Concat`,
+    SUM(f.`ASP_WAC_Ratio`) AS `sum_of_asp_wac_ratio`
+FROM vw_pbi_master f
+GROUP BY f.`Concat`;
+
+-- Used on: ASP History (lineChart)
+CREATE OR REPLACE VIEW vw_pbi_avg_asp_by_year_quarter_concat AS
+SELECT
+    YEAR(f.`Date`) AS `Date_Year`,
+    QUARTER(f.`Date`) AS `Date_Quarter`,
+    d1.`Concat` AS `Concat`,
+    AVG(f.`asp`) AS `average_of_asp`
+FROM vw_pbi_historical_asp f
+JOIN vw_pbi_master d1 ON d1.HCPCS_Code = f.HCPCS_Code
+GROUP BY YEAR(f.`Date`), QUARTER(f.`Date`), d1.`Concat`;
+
+-- Used on: ASP History (card); ASP History (Percent Change) (card)
+CREATE OR REPLACE VIEW vw_pbi_avg_diff_quarters AS
+SELECT
+    AVG(f.`Diff_Quarters_Pct`) AS `average_quarterly_change`
+FROM vw_pbi_historical_asp f;
+
+-- Used on: ASP History (Percent Change) (lineChart)
+CREATE OR REPLACE VIEW vw_pbi_sum_diff_quarters_by_year_quarter_concat AS
+SELECT
+    YEAR(f.`Date`) AS `Date_Year`,
+    QUARTER(f.`Date`) AS `Date_Quarter`,
+    d1.`Concat` AS `Concat`,
+    SUM(f.`Diff_Quarters_Pct`) AS `diff_quarters`
+FROM vw_pbi_historical_asp f
+JOIN vw_pbi_master d1 ON d1.HCPCS_Code = f.HCPCS_Code
+GROUP BY YEAR(f.`Date`), QUARTER(f.`Date`), d1.`Concat`;
+
+-- Used on: WAC History (lineChart)
+CREATE OR REPLACE VIEW vw_pbi_avg_median_wac_by_year_quarter_concat AS
+SELECT
+    YEAR(f.`Date`) AS `Date_Year`,
+    QUARTER(f.`Date`) AS `Date_Quarter`,
+    d1.`Concat` AS `Concat`,
+    AVG(f.`Median_WAC`) AS `average_of_median_wac`
+FROM vw_pbi_historical_wac f
+JOIN vw_pbi_master d1 ON d1.HCPCS_Code = f.HCPCS_Code
+GROUP BY YEAR(f.`Date`), QUARTER(f.`Date`), d1.`Concat`;
+
+-- Used on: AWP History (lineChart)
+CREATE OR REPLACE VIEW vw_pbi_avg_median_awp_by_year_quarter_concat AS
+SELECT
+    YEAR(f.`Date`) AS `Date_Year`,
+    QUARTER(f.`Date`) AS `Date_Quarter`,
+    d1.`Concat` AS `Concat`,
+    AVG(f.`Median_AWP`) AS `average_of_median_awp`
+FROM vw_pbi_historical_awp f
+JOIN vw_pbi_master d1 ON d1.HCPCS_Code = f.HCPCS_Code
+GROUP BY YEAR(f.`Date`), QUARTER(f.`Date`), d1.`Concat`;
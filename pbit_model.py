@@ -0,0 +1,541 @@
+"""
+Power BI Report Model Extractor
+Reads the legacy BuyandBill Power BI template and generates the equivalent
+server-side SQL views over bi_hcpcs_drug_pricing / bi_historical_pricing, so
+Superset (or anything else) gets the report's measures without the pbix
+
+The report is live-connected to a published dataset (Connections ->
+RemoteArtifacts), so DataModel.txt is empty and there is no DataModelSchema:
+the template carries no DAX. The model is recovered from what the report
+actually queries instead:
+  - Report/Layout: every visual's prototypeQuery (entities, columns,
+    aggregations, date-hierarchy levels) plus visual and page filters
+  - DiagramLayout: the tables of the model
+When a DataModelSchema is present (an import-mode .pbit), its tables,
+columns, relationships and DAX measures are listed as well.
+
+Outputs:
+1. A report: tables -> columns -> BI table column, measures and where they are
+   used, slicers/filters, unmapped fields
+2. --sql: CREATE OR REPLACE VIEW statements - one base view per report table
+   (typed, Power BI column names) and one view per distinct visual measure
+   query (GROUP BY the visual's axis / legend)
+
+Usage:
+  python pbit_model.py "Drug Filters BI Report/BuyandBill-pbiRpt.pbit.zip"
+  python pbit_model.py "Drug Filters BI Report/BuyandBill-pbiRpt" --sql pbi_report_views.sql
+  python pbit_model.py report.pbit --json model.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import zipfile
+from typing import Dict, List, Optional, Tuple
+
+# Power BI QueryAggregateFunction codes
+AGGREGATIONS = {0: "SUM", 1: "AVG", 2: "COUNT", 3: "MIN", 4: "MAX", 5: "COUNT", 6: "MEDIAN"}
+
+# Date hierarchy level -> SQL
+HIERARCHY_LEVELS = {"Year": "YEAR", "Quarter": "QUARTER", "Month": "MONTH", "Day": "DAY"}
+
+# Report table -> base view. Master_NonASP only drives filters on the same
+# rows as Master, so it shares Master's view.
+ENTITY_VIEWS = {
+    "Master": ("vw_pbi_master", "master"),
+    "Master_NonASP": ("vw_pbi_master", "master"),
+    "Historical_ASP": ("vw_pbi_historical_asp", "historical"),
+    "Historical_WAC": ("vw_pbi_historical_wac", "historical"),
+    "Historical_AWP": ("vw_pbi_historical_awp", "historical"),
+    "Drug Class": ("vw_pbi_drug_class", "drug_class"),
+}
+
+# Base view FROM clauses. master = latest month per HCPCS (what the old
+# bi_consolidated_drug_data held); historical = typed quarterly rollup.
+VIEW_SOURCES = {
+    "master": (
+        "FROM (\n"
+        "    SELECT p.*, ROW_NUMBER() OVER (PARTITION BY p.HCPCS_Code ORDER BY p.period_date DESC) AS pbi_rn\n"
+        "    FROM bi_hcpcs_drug_pricing p\n"
+        ") p\n"
+        "{joins}"
+        "WHERE p.pbi_rn = 1"
+    ),
+    "historical": "FROM bi_rollup_hcpcs_quarter r\n{joins}",
+    "drug_class": "FROM bi_drug_class dc\n{joins}",
+}
+DRUG_CLASS_JOIN = "LEFT JOIN bi_drug_class dc ON dc.HCPCS_Code = p.HCPCS_Code\n"
+
+# (view kind, Power BI column) -> (SQL column, expression, BI source column)
+COLUMN_MAP = {
+    ("master", "HCPCS Code"): ("HCPCS_Code", "p.HCPCS_Code", "bi_hcpcs_drug_pricing.HCPCS_Code"),
+    ("master", "Brand name"): ("Brand_name", "p.Drug_Name", "bi_hcpcs_drug_pricing.Drug_Name"),
+    ("master", "Manufacturer"): ("Manufacturer", "p.Manufacturer", "bi_hcpcs_drug_pricing.Manufacturer"),
+    ("master", "Concat"): ("Concat", "p.hcpcs_drug", "bi_hcpcs_drug_pricing.hcpcs_drug"),
+    ("master", "ASP per Unit Current Quarter"):
+        ("ASP_per_Unit_Current_Quarter", "p.ASP_current_quarter", "bi_hcpcs_drug_pricing.ASP_current_quarter"),
+    ("master", "ASP per Unit Previous Quarter"):
+        ("ASP_per_Unit_Previous_Quarter", "p.ASP_prev_quarter", "bi_hcpcs_drug_pricing.ASP_prev_quarter"),
+    ("master", "ASP Quarterly Change %"):
+        ("ASP_Quarterly_Change_Pct", "p.ASP_Quarterly_Change_Pct", "bi_hcpcs_drug_pricing.ASP_Quarterly_Change_Pct"),
+    ("master", "ASP/WAC Ratio"): ("ASP_WAC_Ratio", "p.ASP_by_WAC_ratio", "bi_hcpcs_drug_pricing.ASP_by_WAC_ratio"),
+    ("master", "ASP/AWP Ratio"): ("ASP_AWP_Ratio", "p.ASP_by_AWP_ratio", "bi_hcpcs_drug_pricing.ASP_by_AWP_ratio"),
+    ("master", "Median WAC per HCPCS Unit"):
+        ("Median_WAC_per_HCPCS_Unit", "p.Median_WAC", "bi_hcpcs_drug_pricing.Median_WAC"),
+    ("master", "Median AWP per HCPCS Unit"):
+        ("Median_AWP_per_HCPCS_Unit", "p.Median_AWP", "bi_hcpcs_drug_pricing.Median_AWP"),
+    ("master", "Medicare Payment Limit"):
+        ("Medicare_Payment_Limit", "p.Payment_Limit", "bi_hcpcs_drug_pricing.Payment_Limit"),
+    ("master", "WAC/AWP (last change)"): (
+        "WAC_AWP_Last_Change",
+        "NULLIF(GREATEST(COALESCE(p.Current_WAC_Effect_Date, '1900-01-01'), "
+        "COALESCE(p.Current_AWP_Effect_Date, '1900-01-01')), '1900-01-01')",
+        "bi_hcpcs_drug_pricing.Current_WAC_Effect_Date / Current_AWP_Effect_Date"),
+    ("master", "Drug Class"): ("Drug_Class", "dc.General_Drug_Class", "bi_drug_class.General_Drug_Class"),
+    ("historical", "HCPCS Code"): ("HCPCS_Code", "r.HCPCS_Code", "bi_historical_pricing.HCPCS_Code"),
+    ("historical", "Concat"): ("Concat", "r.hcpcs_drug", "bi_historical_pricing.hcpcs_drug"),
+    ("historical", "Date"): ("Date", "r.quarter_date", "bi_historical_pricing.quarter_key (as quarter start)"),
+    ("historical", "asp"): ("asp", "r.asp", "bi_historical_pricing.ASP"),
+    ("historical", "%Diff Quarters"):
+        ("Diff_Quarters_Pct", "r.asp_change_pct", "bi_historical_pricing.ASP vs previous quarter"),
+    ("historical", "Median WAC"): ("Median_WAC", "r.median_wac", "bi_historical_pricing.Median_WAC"),
+    ("historical", "Median AWP"): ("Median_AWP", "r.median_awp", "bi_historical_pricing.Median_AWP"),
+    ("drug_class", "HCPCS Code"): ("HCPCS_Code", "dc.HCPCS_Code", "bi_drug_class.HCPCS_Code"),
+    ("drug_class", "General Drug Class"):
+        ("General_Drug_Class", "dc.General_Drug_Class", "bi_drug_class.General_Drug_Class"),
+    ("drug_class", "Specialized Drug Class"):
+        ("Specialized_Drug_Class", "dc.Specialized_Drug_Class", "bi_drug_class.Specialized_Drug_Class"),
+    ("drug_class", "Drug Class"): ("Drug_Class", "dc.General_Drug_Class", "bi_drug_class.General_Drug_Class"),
+}
+
+# bi_drug_class comes from the Drug Class.xlsx import (old scripts/create_powerbi_consolidated_table.sql)
+DRUG_CLASS_DDL = """CREATE TABLE IF NOT EXISTS bi_drug_class (
+    HCPCS_Code VARCHAR(100) PRIMARY KEY,
+    General_Drug_Class VARCHAR(255),
+    Specialized_Drug_Class VARCHAR(255)
+);"""
+
+
+def slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+
+
+class PbitReader:
+    def __init__(self, path: str):
+        """
+        Read parts of a Power BI template
+
+        Args:
+            path: Extracted folder, .pbit/.pbix, or a .zip of the extracted folder
+        """
+        self.path = path
+        self.files: Dict[str, str] = {}  # part name -> path inside the folder/zip
+        self.zip: Optional[zipfile.ZipFile] = None
+
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in names:
+                    full = os.path.join(root, name)
+                    self._add(os.path.relpath(full, path).replace(os.sep, "/"), full)
+        else:
+            self.zip = zipfile.ZipFile(path)
+            for name in self.zip.namelist():
+                if not name.endswith("/"):
+                    self._add(name, name)
+
+    def _add(self, name: str, location: str):
+        if name.startswith("__MACOSX/") or os.path.basename(name).startswith("._"):
+            return
+        for part in ("DataModelSchema", "DataModel.txt", "DiagramLayout", "Connections", "Report/Layout"):
+            if name == part or name.endswith("/" + part):
+                self.files.setdefault(part, location)
+
+    def read(self, part: str) -> Optional[bytes]:
+        location = self.files.get(part)
+        if location is None:
+            return None
+        if self.zip:
+            return self.zip.read(location)
+        with open(location, "rb") as f:
+            return f.read()
+
+    def read_json(self, part: str) -> Optional[Dict]:
+        """Power BI parts are UTF-16 LE JSON (Connections is UTF-8)"""
+        data = self.read(part)
+        if not data:
+            return None
+        if data.startswith(b"\xff\xfe"):
+            text = data[2:].decode("utf-16-le")
+        elif len(data) > 1 and data[1] == 0:
+            text = data.decode("utf-16-le")
+        else:
+            text = data.decode("utf-8-sig")
+        return json.loads(text)
+
+
+class PbiReportModel:
+    def __init__(self, reader: PbitReader):
+        """
+        Initialize the model
+
+        Args:
+            reader: Template to extract from
+        """
+        self.reader = reader
+        self.tables: Dict[str, Dict[str, List[str]]] = {}  # table -> column -> pages
+        self.visuals: List[Dict] = []
+        self.filters: List[Dict] = []
+        self.dax_measures: List[Dict] = []
+        self.relationships: List[Dict] = []
+        self.connection: Optional[Dict] = None
+
+    def _use(self, entity: str, column: str, page: str):
+        pages = self.tables.setdefault(entity, {}).setdefault(column, [])
+        if page not in pages:
+            pages.append(page)
+
+    def parse(self) -> "PbiReportModel":
+        self.connection = self.reader.read_json("Connections")
+
+        diagram = self.reader.read_json("DiagramLayout") or {}
+        for d in diagram.get("diagrams", []):
+            for node in d.get("nodes", []):
+                self.tables.setdefault(node["nodeIndex"], {})
+
+        schema = self.reader.read_json("DataModelSchema")
+        if schema:
+            self._parse_schema(schema.get("model", {}))
+
+        layout = self.reader.read_json("Report/Layout")
+        if not layout:
+            raise ValueError(f"{self.reader.path} has no Report/Layout")
+        for section in layout.get("sections", []):
+            page = section.get("displayName", section.get("name"))
+            self._parse_filters(section.get("filters"), page, None)
+            for container in section.get("visualContainers", []):
+                self._parse_visual(container, page)
+        return self
+
+    def _parse_schema(self, model: Dict):
+        """Import-mode templates: tables, columns, DAX measures and relationships"""
+        for table in model.get("tables", []):
+            columns = self.tables.setdefault(table["name"], {})
+            for column in table.get("columns", []):
+                columns.setdefault(column["name"], [])
+            for measure in table.get("measures", []):
+                expression = measure.get("expression", "")
+                self.dax_measures.append({
+                    "table": table["name"],
+                    "name": measure["name"],
+                    "expression": "\n".join(expression) if isinstance(expression, list) else expression,
+                })
+        for rel in model.get("relationships", []):
+            self.relationships.append({
+                "from": f"{rel.get('fromTable')}.{rel.get('fromColumn')}",
+                "to": f"{rel.get('toTable')}.{rel.get('toColumn')}",
+            })
+
+    @staticmethod
+    def _field(expr: Dict, aliases: Dict[str, str]) -> Optional[Tuple[str, str]]:
+        """(entity, column) of a Column / Measure expression"""
+        for kind in ("Column", "Measure"):
+            if kind in expr:
+                ref = expr[kind]["Expression"]["SourceRef"]
+                return aliases.get(ref.get("Source"), ref.get("Entity")), expr[kind]["Property"]
+        return None
+
+    def _parse_filters(self, raw: Optional[str], page: str, visual_type: Optional[str]):
+        for flt in json.loads(raw or "[]"):
+            expr = flt.get("expression", {})
+            field = self._field(expr, {})
+            aggregation = None
+            if field is None and "Aggregation" in expr:
+                field = self._field(expr["Aggregation"]["Expression"], {})
+                aggregation = AGGREGATIONS.get(expr["Aggregation"].get("Function"))
+            if field is None:
+                continue
+            self._use(field[0], field[1], page)
+            self.filters.append({
+                "page": page, "visual_type": visual_type, "entity": field[0], "column": field[1],
+                "aggregation": aggregation, "type": flt.get("type"),
+                "display_name": flt.get("displayName"),
+            })
+
+    def _parse_visual(self, container: Dict, page: str):
+        config = json.loads(container.get("config", "{}"))
+        visual = config.get("singleVisual", {})
+        visual_type = visual.get("visualType")
+        self._parse_filters(container.get("filters"), page, visual_type)
+        query = visual.get("prototypeQuery")
+        if not query:
+            return
+
+        aliases = {f["Name"]: f["Entity"] for f in query.get("From", [])}
+        groups: List[Dict] = []
+        values: List[Dict] = []
+        for select in query.get("Select", []):
+            name = select.get("NativeReferenceName") or select.get("Name")
+            if "Aggregation" in select:
+                field = self._field(select["Aggregation"]["Expression"], aliases)
+                if field:
+                    values.append({"entity": field[0], "column": field[1], "label": name,
+                                   "aggregation": AGGREGATIONS.get(select["Aggregation"].get("Function"), "SUM")})
+            elif "HierarchyLevel" in select:
+                source = select["HierarchyLevel"]["Expression"]["Hierarchy"]["Expression"]["PropertyVariationSource"]
+                entity = aliases.get(source["Expression"]["SourceRef"]["Source"])
+                field = (entity, source["Property"])
+                groups.append({"entity": entity, "column": source["Property"], "label": name,
+                               "level": select["HierarchyLevel"]["Level"]})
+            else:
+                field = self._field(select, aliases)
+                if field:
+                    groups.append({"entity": field[0], "column": field[1], "label": name})
+            if field:
+                self._use(field[0], field[1], page)
+
+        self.visuals.append({"page": page, "visual_type": visual_type, "groups": groups, "values": values})
+
+    # -------------------------------------------------------------
+    # Measures and SQL
+    # -------------------------------------------------------------
+
+    def measure_queries(self) -> List[Dict]:
+        """Distinct aggregating visual queries (same measure + grouping on several pages -> one entry)"""
+        queries: Dict[str, Dict] = {}
+        for visual in self.visuals:
+            if not visual["values"]:
+                continue
+            signature = json.dumps([
+                [(g["entity"], g["column"], g.get("level")) for g in visual["groups"]],
+                [(v["entity"], v["column"], v["aggregation"]) for v in visual["values"]],
+            ])
+            query = queries.setdefault(signature, {**visual, "pages": []})
+            label = f"{visual['page']} ({visual['visual_type']})"
+            if label not in query["pages"]:
+                query["pages"].append(label)
+        return list(queries.values())
+
+    @staticmethod
+    def _mapping(entity: str, column: str) -> Optional[Tuple[str, str, str]]:
+        view = ENTITY_VIEWS.get(entity)
+        return COLUMN_MAP.get((view[1], column)) if view else None
+
+    def unmapped(self) -> List[str]:
+        return [f"{entity}.{column}" for entity, columns in self.tables.items()
+                for column in columns if not self._mapping(entity, column)]
+
+    def base_views(self) -> Dict[str, Dict]:
+        """{view: {"kind", "entities", "columns": {sql column: expression}}} for the columns the report uses"""
+        views: Dict[str, Dict] = {}
+        for entity, columns in sorted(self.tables.items()):
+            if entity not in ENTITY_VIEWS or not columns:
+                continue
+            view_name, kind = ENTITY_VIEWS[entity]
+            view = views.setdefault(view_name, {"kind": kind, "entities": [], "columns": {}})
+            view["entities"].append(entity)
+            # Every view carries the join key
+            key_column, key_expr, _ = COLUMN_MAP[(kind, "HCPCS Code")]
+            view["columns"].setdefault(key_column, key_expr)
+            for column in columns:
+                mapping = COLUMN_MAP.get((kind, column))
+                if mapping:
+                    view["columns"].setdefault(mapping[0], mapping[1])
+        # Keep COLUMN_MAP order so the generated SQL is stable between runs
+        order: Dict[str, int] = {}
+        for value in COLUMN_MAP.values():
+            order.setdefault(value[0], len(order))
+        for view in views.values():
+            view["columns"] = dict(sorted(view["columns"].items(), key=lambda c: order.get(c[0], len(order))))
+        return views
+
+    @staticmethod
+    def _measure_view_name(query: Dict) -> str:
+        parts = [f"{v['aggregation']}_{v['column']}" for v in query["values"]]
+        if query["groups"]:
+            parts.append("by_" + "_".join(g.get("level") or g["column"] for g in query["groups"]))
+        name = "vw_pbi_" + slug("_".join(parts))
+        if len(name) > 64:
+            name = name[:55] + "_" + hashlib.md5(name.encode()).hexdigest()[:8]
+        return name
+
+    def generate_sql(self) -> str:
+        lines = [
+            "-- =====================================================",
+            "-- POWER BI REPORT MEASURES AS SQL VIEWS",
+            f"-- Generated by pbit_model.py from {os.path.basename(os.path.normpath(self.reader.path))}",
+            "-- Re-generate instead of editing by hand",
+            "-- =====================================================",
+            "--",
+            "-- Base views expose each report table with the report's column names",
+            "-- (spaces/symbols -> underscores); measure views pre-aggregate what each",
+            "-- visual computed client-side. Needs sp_refresh_bi_rollups.sql",
+            "-- (bi_rollup_hcpcs_quarter) for the historical views.",
+            "",
+        ]
+        unmapped = self.unmapped()
+        if unmapped:
+            lines += ["-- Not mapped (no BI column yet): " + ", ".join(sorted(unmapped)), ""]
+
+        views = self.base_views()
+        if any(v["kind"] == "drug_class" or "Drug_Class" in v["columns"] for v in views.values()):
+            lines += [DRUG_CLASS_DDL, ""]
+
+        lines += ["-- =====================================================", "-- Base views",
+                  "-- =====================================================", ""]
+        for name, view in views.items():
+            joins = DRUG_CLASS_JOIN if view["kind"] == "master" and "Drug_Class" in view["columns"] else ""
+            select = ",\n".join(f"    {expr} AS `{column}`" for column, expr in view["columns"].items())
+            lines += [
+                f"-- Power BI table(s): {', '.join(view['entities'])}",
+                f"CREATE OR REPLACE VIEW {name} AS",
+                "SELECT",
+                select,
+                VIEW_SOURCES[view["kind"]].format(joins=joins).rstrip("\n") + ";",
+                "",
+            ]
+
+        lines += ["-- =====================================================", "-- Measure views",
+                  "-- =====================================================", ""]
+        for query in self.measure_queries():
+            lines += self._measure_view_sql(query, views)
+        return "\n".join(lines)
+
+    def _measure_view_sql(self, query: Dict, views: Dict[str, Dict]) -> List[str]:
+        fact_entity = query["values"][0]["entity"]
+        fact_view = ENTITY_VIEWS.get(fact_entity, (None,))[0]
+        header = [f"-- Used on: {'; '.join(query['pages'])}"]
+        if fact_view not in views:
+            return header + [f"-- Skipped: {fact_entity} has no base view", ""]
+
+        # Other report tables join on HCPCS_Code (the only shared key in the model)
+        aliases = {fact_view: "f"}
+        joins = []
+        select, group_by = [], []
+        for group in query["groups"]:
+            mapping = self._mapping(group["entity"], group["column"])
+            view = ENTITY_VIEWS.get(group["entity"], (None,))[0]
+            if not mapping or view not in views:
+                return header + [f"-- Skipped: {group['entity']}.{group['column']} is not mapped", ""]
+            if view not in aliases:
+                aliases[view] = f"d{len(aliases)}"
+                join = "LEFT JOIN" if views[view]["kind"] == "drug_class" else "JOIN"
+                joins.append(f"{join} {view} {aliases[view]} ON {aliases[view]}.HCPCS_Code = f.HCPCS_Code")
+            column = f"{aliases[view]}.`{mapping[0]}`"
+            if group.get("level"):
+                expr = f"{HIERARCHY_LEVELS.get(group['level'], 'YEAR')}({column})"
+                select.append(f"    {expr} AS `{mapping[0]}_{group['level']}`")
+            else:
+                expr = column
+                select.append(f"    {expr} AS `{mapping[0]}`")
+            group_by.append(expr)
+
+        for value in query["values"]:
+            mapping = self._mapping(value["entity"], value["column"])
+            if not mapping or ENTITY_VIEWS[value["entity"]][0] != fact_view:
+                return header + [f"-- Skipped: {value['entity']}.{value['column']} is not mapped", ""]
+            if value["aggregation"] == "MEDIAN":
+                return header + [f"-- Skipped: MEDIAN({value['column']}) has no MySQL aggregate", ""]
+            select.append(f"    {value['aggregation']}(f.`{mapping[0]}`) AS `{slug(value['label'])}`")
+
+        lines = header + [
+            f"CREATE OR REPLACE VIEW {self._measure_view_name(query)} AS",
+            "SELECT",
+            ",\n".join(select),
+            f"FROM {fact_view} f",
+        ] + joins
+        if group_by:
+            lines.append("GROUP BY " + ", ".join(group_by))
+        lines[-1] += ";"
+        return lines + [""]
+
+    def to_dict(self) -> Dict:
+        return {
+            "source": self.reader.path,
+            "connection": self.connection,
+            "tables": self.tables,
+            "visuals": self.visuals,
+            "filters": self.filters,
+            "dax_measures": self.dax_measures,
+            "relationships": self.relationships,
+            "measure_queries": self.measure_queries(),
+            "unmapped": self.unmapped(),
+        }
+
+    def print_report(self):
+        print("=" * 78)
+        print(f"📦 {self.reader.path}")
+        if self.connection and self.connection.get("RemoteArtifacts"):
+            print("   Live connection to a published dataset - no DAX in the template; "
+                  "model recovered from the report's queries")
+        print("=" * 78)
+
+        print(f"\n🗂️  Tables ({len(self.tables)})")
+        for entity, columns in sorted(self.tables.items()):
+            view = ENTITY_VIEWS.get(entity, ("(not mapped)",))[0]
+            print(f"   {entity}  →  {view}")
+            for column, pages in sorted(columns.items()):
+                mapping = self._mapping(entity, column)
+                target = f"{mapping[0]:<30} ← {mapping[2]}" if mapping else "⚠️  not mapped"
+                print(f"      {column:<32}{target}  [{len(pages)} page(s)]")
+
+        print(f"\n📐 Measures ({len(self.measure_queries())} distinct visual queries)")
+        for query in self.measure_queries():
+            values = ", ".join(f"{v['aggregation']}({v['entity']}.{v['column']})" for v in query["values"])
+            groups = ", ".join(f"{g['entity']}.{g['column']}" + (f".{g['level']}" if g.get("level") else "")
+                               for g in query["groups"])
+            print(f"   {values}" + (f" BY {groups}" if groups else ""))
+            print(f"      → {self._measure_view_name(query)}  ({'; '.join(query['pages'])})")
+
+        if self.dax_measures:
+            print(f"\n🧮 DAX measures ({len(self.dax_measures)})")
+            for measure in self.dax_measures:
+                print(f"   {measure['table']}[{measure['name']}] = {measure['expression']}")
+        if self.relationships:
+            print(f"\n🔗 Relationships ({len(self.relationships)})")
+            for rel in self.relationships:
+                print(f"   {rel['from']} → {rel['to']}")
+
+        slicers = sorted({f"{g['entity']}.{g['column']}" for v in self.visuals
+                          if v["visual_type"] == "slicer" for g in v["groups"]})
+        print(f"\n🎚️  Slicers (filter columns the base views must expose): {', '.join(slicers) or '-'}")
+        filtered = sorted({f"{f['entity']}.{f['column']}" for f in self.filters})
+        print(f"🔍 Visual/page filters on: {', '.join(filtered) or '-'}")
+
+        unmapped = self.unmapped()
+        print()
+        if unmapped:
+            print(f"⚠️  {len(unmapped)} column(s) without a BI mapping: {', '.join(sorted(unmapped))}")
+        else:
+            print("✅ Every column the report uses maps to a BI table column")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Extract the Power BI report model and generate SQL views")
+    parser.add_argument("path", help="Extracted .pbit folder, .pbit/.pbix, or a .zip of the folder")
+    parser.add_argument("--sql", help="Write CREATE OR REPLACE VIEW statements to this file")
+    parser.add_argument("--json", help="Write the extracted model as JSON to this file")
+    args = parser.parse_args(argv)
+
+    try:
+        model = PbiReportModel(PbitReader(args.path)).parse()
+    except (OSError, ValueError, zipfile.BadZipFile) as ex:
+        print(f"❌ Cannot read {args.path}: {ex}")
+        return 1
+
+    model.print_report()
+    if args.sql:
+        with open(args.sql, "w", encoding="utf-8") as f:
+            f.write(model.generate_sql())
+        print(f"💾 Views written to {args.sql}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(model.to_dict(), f, indent=2, ensure_ascii=False)
+        print(f"💾 Model written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,587 @@
+"""
+BI Tables Refresh Orchestrator
+Replaces the bare cron wrapper around CALL sp_refresh_bi_tables_v3()
+
+Full refresh:
+  1. CALL sp_stage_cms_drug_pricing()          - validate (data-quality gate) and
+                                                 parse the source once
+  2. CALL sp_process_quarter_historical(q)     - every quarter, fanned out over
+                                                 N connections (temp tables are
+                                                 per session, so workers never
+                                                 collide on staging)
+  3. CALL sp_process_quarter_pricing(latest)   - ordering-sensitive ASP_prev_quarter
+                                                 pass, after all history exists
+
+Shadow mode (--shadow, full refresh only):
+  Steps 2-3 write to *_shadow tables (PK only, indexes deferred) while
+  dashboards keep reading the live tables; sp_publish_bi_shadow_tables()
+  then builds the indexes once and swaps both tables with one RENAME TABLE.
+
+Incremental refresh:
+  CALL sp_refresh_bi_tables_incremental()      - only quarters whose source changed
+
+Deadlocks (1213) and lock wait timeouts (1205) are retried with exponential
+backoff instead of the fixed DO SLEEP(0.5) between quarters.
+
+Only one refresh runs at a time: every entry point takes the GET_LOCK
+advisory lock '<database>.bi_refresh' first (refresh_scheduler.py too, and
+the top-level procedures themselves - sp_refresh_lock.sql). The lock is held
+on its own connection; lock_owner tells the procedures it is this refresh's.
+
+Every CALL is timed into bi_refresh_step_log (sp_refresh_step_log.sql) under
+one run_id, next to the per-step rows the procedures write themselves.
+
+Each build ends with sp_record_refresh_digest() (sp_refresh_digest.sql); when
+its digests match the previous build, --warm-cache / --search-index are
+skipped because nothing visible changed (see refresh_diff.py).
+
+Prerequisites:
+- pip install -r requirements.txt  (PyMySQL)
+- ~/.my.cnf with [client] credentials (same file the mysql CLI uses)
+
+Usage:
+  python refresh_bi_tables.py                      # incremental
+  python refresh_bi_tables.py --mode full --workers 6
+  python refresh_bi_tables.py --mode full --workers 6 --shadow
+  python refresh_bi_tables.py --search-index      # + rebuild drug type-ahead (drug_search.py)
+  python refresh_bi_tables.py --max-rejected-pct 5  # stop if >5% of source rows are rejected
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+from typing import Dict, List, Optional, Set
+
+import pymysql
+
+DEFAULT_DATABASE = "buyandbill_cms"
+DEFAULT_DEFAULTS_FILE = "~/.my.cnf"
+DEFAULT_LOG_FILE = "/home/buyandbill/utils/bi_refresh.log"
+
+# MySQL errors worth retrying: deadlock, lock wait timeout
+RETRYABLE_ERRNOS = (1213, 1205)
+
+# GET_LOCK name (prefixed with the database) shared by every refresh entry point
+REFRESH_LOCK = "bi_refresh"
+
+logger = logging.getLogger("bi_refresh")
+
+
+def connect(database: str = DEFAULT_DATABASE,
+            defaults_file: str = DEFAULT_DEFAULTS_FILE) -> pymysql.connections.Connection:
+    """Open a connection using the [client] section of a MySQL option file"""
+    return pymysql.connect(
+        read_default_file=os.path.expanduser(defaults_file),
+        database=database,
+        charset="utf8mb4",
+        autocommit=False,
+    )
+
+
+def quarter_key(quarter_start: date) -> int:
+    """2024-10-01 -> 20244 (the YYYYQ quarter_key column)"""
+    return quarter_start.year * 10 + (quarter_start.month - 1) // 3 + 1
+
+
+def quarter_label(quarter_start: date) -> str:
+    """2024-10-01 -> 'Q4-2024' (same format as the bi_refresh_log messages)"""
+    return f"Q{(quarter_start.month - 1) // 3 + 1}-{quarter_start.year}"
+
+
+def acquire_refresh_lock(conn: pymysql.connections.Connection, database: str = DEFAULT_DATABASE,
+                         timeout: int = 0) -> bool:
+    """
+    Take the server-wide advisory lock that keeps refreshes from overlapping
+
+    Held until release_refresh_lock() or until conn closes (also when the
+    process dies), so a crashed run never leaves a stale lock behind.
+
+    Args:
+        conn: Connection that holds the lock for the whole refresh
+        database: Database being refreshed (part of the lock name)
+        timeout: Seconds to wait for a running refresh to finish
+
+    Returns:
+        True when the lock was taken
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (f"{database}.{REFRESH_LOCK}", timeout))
+        return cursor.fetchone()[0] == 1
+
+
+def release_refresh_lock(conn: pymysql.connections.Connection, database: str = DEFAULT_DATABASE):
+    if conn.open:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (f"{database}.{REFRESH_LOCK}",))
+
+
+class RefreshOrchestrator:
+    def __init__(self, database: str = DEFAULT_DATABASE,
+                 defaults_file: str = DEFAULT_DEFAULTS_FILE,
+                 workers: int = 4, max_retries: int = 5,
+                 base_backoff: float = 0.5, shadow: bool = False,
+                 max_rejected_pct: Optional[float] = None):
+        """
+        Initialize the refresh orchestrator
+
+        Args:
+            database: Database holding cms_drug_pricing and the BI tables
+            defaults_file: MySQL option file with [client] credentials
+            workers: Number of parallel database connections for quarter jobs
+            max_retries: Attempts per statement on deadlock / lock wait timeout
+            base_backoff: First retry delay in seconds (doubles each attempt)
+            shadow: Build full refreshes into shadow tables and swap them in at the end
+            max_rejected_pct: Stop the refresh when more than this share of source
+                rows is rejected by the data-quality gate (None = never)
+        """
+        self.database = database
+        self.defaults_file = defaults_file
+        self.workers = max(1, workers)
+        self.max_retries = max(1, max_retries)
+        self.base_backoff = base_backoff
+        self.shadow = shadow
+        self.max_rejected_pct = max_rejected_pct
+        self.refresh_type = "parallel"
+        self.run_id = str(uuid.uuid4())
+        self.data_changed = False
+        # CONNECTION_ID() holding the refresh lock for this run (see sp_refresh_lock.sql)
+        self.lock_owner: Optional[int] = None
+        self._local = threading.local()
+        self._connections: List[pymysql.connections.Connection] = []
+        self._connections_lock = threading.Lock()
+
+    # -------------------------------------------------------------
+    # Connections
+    # -------------------------------------------------------------
+
+    def _connect(self) -> pymysql.connections.Connection:
+        conn = connect(self.database, self.defaults_file)
+        with conn.cursor() as cursor:
+            # Step rows logged by the procedures carry this run's id
+            cursor.execute("SET @bi_refresh_run_id = %s, @bi_refresh_type = %s",
+                           (self.run_id, self.refresh_type))
+            if self.lock_owner:
+                # sp_acquire_refresh_lock: the lock is already held for this refresh
+                cursor.execute("SET @bi_refresh_lock_owner = %s", (self.lock_owner,))
+            if self.shadow:
+                # Session variables read by sp_process_quarter_pricing / _historical
+                cursor.execute("SET @bi_pricing_table = 'bi_hcpcs_drug_pricing_shadow', "
+                               "@bi_historical_table = 'bi_historical_pricing_shadow'")
+            if self.max_rejected_pct is not None:
+                # Read by sp_validate_cms_drug_pricing (the data-quality gate)
+                cursor.execute("SET @bi_dq_max_rejected_pct = %s", (self.max_rejected_pct,))
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+    def _worker_connection(self) -> pymysql.connections.Connection:
+        """One connection per worker thread, reused across its quarters"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or not conn.open:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                if conn.open:
+                    conn.close()
+            self._connections.clear()
+
+    # -------------------------------------------------------------
+    # Statement execution with deadlock retry
+    # -------------------------------------------------------------
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with jitter so retrying workers spread out"""
+        return self.base_backoff * (2 ** (attempt - 1)) * (0.5 + random.random())
+
+    def call(self, conn: pymysql.connections.Connection, sql: str,
+             args: tuple = (), label: str = "", out_var: Optional[str] = None,
+             step: Optional[str] = None, quarter_key: Optional[int] = None) -> Optional[int]:
+        """
+        Execute a CALL (or any statement) and commit, retrying on deadlocks
+
+        Args:
+            conn: Connection to run on
+            sql: Statement, e.g. "CALL sp_process_quarter_historical(%s, @rows)"
+            args: Statement parameters
+            label: Text used in log messages
+            out_var: Session variable holding an OUT parameter (e.g. "@rows")
+            step: Step name for bi_refresh_step_log (not logged when None)
+            quarter_key: Quarter (YYYYQ) the step belongs to
+
+        Returns:
+            Value of out_var after the call (or None)
+        """
+        for attempt in range(1, self.max_retries + 1):
+            step_start = time.time()
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(sql, args)
+                    while cursor.nextset():
+                        pass
+                    result = None
+                    if out_var:
+                        cursor.execute(f"SELECT {out_var}")
+                        row = cursor.fetchone()
+                        result = row[0] if row else None
+                conn.commit()
+                if step:
+                    self.log_step(conn, step, quarter_key, result, step_start)
+                return result
+            except pymysql.err.MySQLError as ex:
+                conn.rollback()
+                errno = ex.args[0] if ex.args else None
+                if step:
+                    self.log_step(conn, step, quarter_key, None, step_start, errno)
+                if errno not in RETRYABLE_ERRNOS or attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning("%s: error %s (attempt %d/%d), retrying in %.1fs",
+                               label or sql, errno, attempt, self.max_retries, delay)
+                time.sleep(delay)
+        return None
+
+    def log(self, conn: pymysql.connections.Connection, status: str, message: str,
+            started_at: Optional[str] = None, completed: bool = False):
+        """Write a row to bi_refresh_log (same table the procedures use)"""
+        logger.info("%s | %s", status, message)
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at) "
+                "VALUES (%s, %s, %s, COALESCE(%s, NOW()), IF(%s, NOW(), NULL))",
+                (self.refresh_type, status, message, started_at, completed),
+            )
+        conn.commit()
+
+    def log_step(self, conn: pymysql.connections.Connection, step: str,
+                 quarter_key: Optional[int], rows_out: Optional[int],
+                 step_start: float, errno: Optional[int] = 0):
+        """Write one timing row to bi_refresh_step_log (client-side wall clock)"""
+        elapsed_ms = int((time.time() - step_start) * 1000)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO bi_refresh_step_log (run_id, refresh_type, quarter_key, step, "
+                    "rows_in, rows_out, elapsed_ms, errno, started_at, completed_at) "
+                    "VALUES (%s, %s, %s, %s, NULL, %s, %s, %s, "
+                    "NOW(3) - INTERVAL %s MICROSECOND, NOW(3))",
+                    (self.run_id, self.refresh_type, quarter_key, step, rows_out,
+                     elapsed_ms, errno if isinstance(errno, int) else -1, elapsed_ms * 1000),
+                )
+            conn.commit()
+        except pymysql.err.MySQLError as ex:
+            # Telemetry must never fail a refresh
+            logger.warning("Could not write step log for %s: %s", step, ex)
+
+    # -------------------------------------------------------------
+    # Quarter jobs
+    # -------------------------------------------------------------
+
+    def fetch_quarters(self, conn: pymysql.connections.Connection) -> List[date]:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT DISTINCT quarter_start FROM bi_cms_drug_pricing_stg ORDER BY quarter_start"
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def process_historical(self, quarter_start: date, record_watermark: bool = True) -> int:
+        """Historical rows for one quarter - independent of every other quarter"""
+        self.step_started("historical", quarter_start)
+        conn = self._worker_connection()
+        label = f"historical {quarter_label(quarter_start)}"
+        rows = self.call(conn, "CALL sp_process_quarter_historical(%s, @rows_historical)",
+                         (quarter_start,), label=label, out_var="@rows_historical",
+                         step="quarter_historical", quarter_key=quarter_key(quarter_start))
+        if record_watermark:
+            self.call(conn, "CALL sp_record_source_watermark(%s)", (quarter_start,), label=label)
+        return rows or 0
+
+    def process_pricing(self, conn: pymysql.connections.Connection, quarter_start: date,
+                        record_watermark: bool = True) -> int:
+        """Pricing rows for the latest quarter (reads ASP_prev_quarter from history)"""
+        self.step_started("pricing", quarter_start)
+        rows = self.call(conn, "CALL sp_process_quarter_pricing(%s, @rows_pricing)",
+                         (quarter_start,), label=f"pricing {quarter_label(quarter_start)}",
+                         out_var="@rows_pricing",
+                         step="quarter_pricing", quarter_key=quarter_key(quarter_start))
+        if record_watermark:
+            self.call(conn, "CALL sp_record_source_watermark(%s)", (quarter_start,))
+        return rows or 0
+
+    # -------------------------------------------------------------
+    # Progress / checkpoint hooks (no-ops; see refresh_scheduler.py)
+    # -------------------------------------------------------------
+
+    def step_started(self, step: str, quarter_start: Optional[date] = None):
+        """A step of a full refresh started (called from worker threads too)"""
+
+    def planned(self, quarters: List[date], resumed: Set[date]):
+        """Quarters of this full refresh, and those already done by an earlier attempt"""
+
+    def is_checkpointed(self, step: str, quarter_start: Optional[date] = None) -> bool:
+        """Whether an earlier attempt of this run finished the step on the same staged source"""
+        return False
+
+    def checkpoint(self, conn: pymysql.connections.Connection, step: str,
+                   quarter_start: Optional[date] = None, rows: Optional[int] = None):
+        """A step of a full refresh finished"""
+
+    def clear_checkpoints(self, conn: pymysql.connections.Connection):
+        """Forget what earlier attempts of this run finished"""
+
+    # -------------------------------------------------------------
+    # Refresh modes
+    # -------------------------------------------------------------
+
+    def run_full(self) -> bool:
+        """Full rebuild: stage once, historical in parallel, then pricing"""
+        self.refresh_type = "shadow" if self.shadow else "parallel"
+        start = time.time()
+        conn = self._connect()
+        started_at = time.strftime("%Y-%m-%d %H:%M:%S")
+
+        self.step_started("staging")
+        self.call(conn, "CALL sp_stage_cms_drug_pricing()", label="staging")
+        quarters = self.fetch_quarters(conn)
+
+        # A resumed run skips the quarters it already finished on the same staged source
+        resumed = {q for q in quarters if self.is_checkpointed("historical", q)}
+        published = self.shadow and self.is_checkpointed("publish")
+        if published and len(resumed) < len(quarters):
+            # Source changed after the shadow tables were swapped in - start over
+            self.clear_checkpoints(conn)
+            resumed, published = set(), False
+        if self.shadow and not resumed and not published:
+            self.call(conn, "CALL sp_prepare_bi_shadow_tables()", label="prepare shadow tables")
+        if not quarters:
+            self.log(conn, "COMPLETED", "No quarters staged - nothing to refresh", started_at, True)
+            return True
+
+        self.log(conn, "STARTED",
+                 f"Processing {len(quarters)} quarters from {quarters[0]} to {quarters[-1]} "
+                 f"on {self.workers} connections"
+                 f"{f' ({len(resumed)} already done, resuming)' if resumed else ''}", started_at)
+        self.planned(quarters, resumed)
+
+        latest = quarters[-1]
+        pending = [q for q in quarters if q not in resumed]
+        total_historical = 0
+        failures: Dict[date, str] = {}
+        done = len(resumed)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {
+                # The latest quarter's watermark is recorded after its pricing pass;
+                # shadow builds record every watermark after publishing
+                pool.submit(self.process_historical, q, not self.shadow and q != latest): q
+                for q in pending
+            }
+            for future in as_completed(futures):
+                quarter_start = futures[future]
+                done += 1
+                try:
+                    rows = future.result()
+                    total_historical += rows
+                    self.checkpoint(conn, "historical", quarter_start, rows)
+                    self.log(conn, "COMPLETED_QUARTER",
+                             f"✓ Q{done} of {len(quarters)} ({quarter_label(quarter_start)}) - "
+                             f"Historical: {rows}", started_at, True)
+                except pymysql.err.MySQLError as ex:
+                    failures[quarter_start] = str(ex)
+                    self.log(conn, "ERROR",
+                             f"Quarter {quarter_label(quarter_start)} error [{ex.args[0]}]: {ex}",
+                             started_at, True)
+
+        # Ordering-sensitive pass: every earlier quarter is now in bi_historical_pricing
+        # (skipped on resume only when no history was rebuilt since it ran)
+        total_pricing = 0
+        if pending or not self.is_checkpointed("pricing", latest):
+            try:
+                total_pricing = self.process_pricing(conn, latest, record_watermark=not self.shadow)
+                self.checkpoint(conn, "pricing", latest, total_pricing)
+            except pymysql.err.MySQLError as ex:
+                failures[latest] = str(ex)
+                self.log(conn, "ERROR", f"Pricing {quarter_label(latest)} error [{ex.args[0]}]: {ex}",
+                         started_at, True)
+
+        duration = int(time.time() - start)
+        if failures:
+            self.log(conn, "FAILED",
+                     f"{len(failures)} of {len(quarters)} quarters failed: "
+                     f"{', '.join(quarter_label(q) for q in sorted(failures))}"
+                     f"{' - shadow tables NOT published, live tables unchanged' if self.shadow else ''}"
+                     f" [Duration: {duration}s]",
+                     started_at, True)
+            return False
+
+        if self.shadow:
+            # Deferred index build + atomic RENAME, then watermarks for every quarter
+            if not published:
+                self.step_started("publish")
+                self.call(conn, "CALL sp_publish_bi_shadow_tables()", label="publish shadow tables",
+                          step="publish_shadow")
+                self.checkpoint(conn, "publish")
+            self.call(conn, "CALL sp_record_source_watermark(NULL)", label="watermarks")
+
+        # Compact facts, then the dashboard rollups built from them
+        # (sp_refresh_bi_dimensions.sql, sp_refresh_bi_rollups.sql)
+        self.step_started("dimensions")
+        self.call(conn, "CALL sp_refresh_bi_dimensions(NULL)", label="dimensions")
+        self.call(conn, "CALL sp_refresh_bi_rollups(NULL)", label="rollups")
+        # Per-quarter/HCPCS digests of this build (sp_refresh_digest.sql)
+        self.call(conn, "CALL sp_record_refresh_digest(NULL)", label="digest")
+        duration = int(time.time() - start)
+
+        from refresh_diff import digests_changed
+        self.data_changed = digests_changed(conn)
+        self.log(conn, "COMPLETED",
+                 f"SUCCESS! All {len(quarters)} quarters processed. Total pricing rows: {total_pricing}, "
+                 f"Total historical rows: {total_historical} [Duration: {duration}s]",
+                 started_at, True)
+        return True
+
+    def run_incremental(self) -> bool:
+        """Only quarters whose source changed (see sp_refresh_bi_tables_incremental.sql)"""
+        self.refresh_type = "incremental"
+        conn = self._connect()
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT IFNULL(MAX(id), 0) FROM bi_refresh_log")
+            last_log_id = cursor.fetchone()[0]
+        self.call(conn, "CALL sp_refresh_bi_tables_incremental()", label="incremental")
+        # The procedure logs 'No source changes' when it skipped everything
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM bi_refresh_log "
+                "WHERE id > %s AND status = 'COMPLETED' AND message LIKE 'No source changes%%'",
+                (last_log_id,),
+            )
+            self.data_changed = cursor.fetchone()[0] == 0
+            # ... and 'FAILED' when the data-quality gate stopped it
+            cursor.execute(
+                "SELECT message FROM bi_refresh_log "
+                "WHERE id > %s AND refresh_type = 'incremental' AND status = 'FAILED'",
+                (last_log_id,),
+            )
+            failed = cursor.fetchone()
+        if failed:
+            logger.error("Incremental refresh stopped: %s", failed[0])
+            self.data_changed = False
+            return False
+        if self.data_changed:
+            # Source rows changed, but the rebuilt quarters may still be identical
+            from refresh_diff import digests_changed
+            self.data_changed = digests_changed(conn)
+        return True
+
+
+def setup_logging(log_file: Optional[str]):
+    handlers: List[logging.Handler] = [logging.StreamHandler()]
+    if log_file:
+        try:
+            handlers.append(logging.FileHandler(log_file))
+        except OSError as ex:
+            print(f"⚠️  Cannot write {log_file} ({ex}); logging to stderr only")
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(message)s", handlers=handlers)
+
+
+def after_refresh(orchestrator: RefreshOrchestrator, warm_cache: bool = False, search_index: bool = False):
+    """Cache warm-up / search index rebuild after a successful refresh that changed data"""
+    if warm_cache and orchestrator.data_changed:
+        from warm_superset_cache import warm_from_env
+        try:
+            warm_from_env()
+        except Exception as ex:
+            # Stale-but-valid cache expires on its own; never fail the refresh for it
+            logger.warning("Superset cache warm-up failed: %s", ex)
+    if search_index and orchestrator.data_changed:
+        from drug_search import build_index, write_suggestion_table
+        try:
+            conn = connect(orchestrator.database, orchestrator.defaults_file)
+            try:
+                rows = write_suggestion_table(conn, build_index(orchestrator.database,
+                                                                orchestrator.defaults_file))
+            finally:
+                conn.close()
+            logger.info("Drug search suggestions rebuilt: %s rows", rows)
+        except pymysql.err.MySQLError as ex:
+            # Previous suggestions stay in place; never fail the refresh for it
+            logger.warning("Drug search rebuild failed: %s", ex)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Refresh bi_hcpcs_drug_pricing and bi_historical_pricing")
+    parser.add_argument("--mode", choices=["incremental", "full"], default="incremental")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Parallel database connections for a full refresh")
+    parser.add_argument("--database", default=DEFAULT_DATABASE)
+    parser.add_argument("--defaults-file", default=DEFAULT_DEFAULTS_FILE)
+    parser.add_argument("--shadow", action="store_true",
+                        help="Full refresh only: build shadow tables and swap them in atomically")
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--max-rejected-pct", type=float,
+                        help="Stop before rebuilding anything when more than this %% of source rows is rejected")
+    parser.add_argument("--warm-cache", action="store_true",
+                        help="Invalidate + re-warm Superset caches when data changed (SUPERSET_* env vars)")
+    parser.add_argument("--search-index", action="store_true",
+                        help="Rebuild the drug type-ahead table bi_search_suggestion when data changed")
+    parser.add_argument("--lock-timeout", type=int, default=0,
+                        help="Seconds to wait for a running refresh to finish before giving up")
+    parser.add_argument("--log-file", default=DEFAULT_LOG_FILE)
+    args = parser.parse_args(argv)
+
+    setup_logging(args.log_file)
+
+    if args.shadow and args.mode != "full":
+        print("⚠️  --shadow only applies to --mode full; running a regular incremental refresh")
+        args.shadow = False
+
+    orchestrator = RefreshOrchestrator(
+        database=args.database,
+        defaults_file=args.defaults_file,
+        workers=args.workers,
+        max_retries=args.max_retries,
+        shadow=args.shadow,
+        max_rejected_pct=args.max_rejected_pct,
+    )
+
+    lock_conn = connect(args.database, args.defaults_file)
+    if not acquire_refresh_lock(lock_conn, args.database, args.lock_timeout):
+        lock_conn.close()
+        logger.error("ERROR: another BI table refresh is running (lock %s.%s) - not started",
+                     args.database, REFRESH_LOCK)
+        return 1
+    orchestrator.lock_owner = lock_conn.thread_id()
+
+    logger.info("Starting BI table refresh (%s)...", args.mode)
+    try:
+        if args.mode == "full":
+            ok = orchestrator.run_full()
+        else:
+            ok = orchestrator.run_incremental()
+    except pymysql.err.MySQLError as ex:
+        logger.error("ERROR: BI table refresh failed: %s", ex)
+        return 1
+    finally:
+        orchestrator.close()
+        lock_conn.close()
+
+    if ok:
+        logger.info("BI table refresh completed successfully")
+        after_refresh(orchestrator, warm_cache=args.warm_cache, search_index=args.search_index)
+        return 0
+    logger.error("ERROR: BI table refresh finished with failed quarters")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,20 @@
 #!/bin/bash
+# Usage: refresh_bi_tables.sh [incremental|full] [workers] [--shadow]   (default: incremental)
+# Full refreshes process quarters in parallel (see refresh_bi_tables.py)
+# Overlapping runs are refused (GET_LOCK); for retries with resume + a progress API use
+# refresh_scheduler.py instead of cron
 LOG_FILE="/home/buyandbill/utils/bi_refresh.log"
+MODE="${1:-incremental}"
+WORKERS="${2:-4}"
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
 
-echo "[$(date)] Starting BI table refresh..." >> $LOG_FILE
+python3 "$SCRIPT_DIR/refresh_bi_tables.py" \
+    --mode "$MODE" \
+    --workers "$WORKERS" \
+    --database buyandbill_cms \
+    --log-file "$LOG_FILE" "${@:3}" >/dev/null 2>&1
 
-mysql buyandbill_cms -e "CALL sp_refresh_bi_tables_v3();" 2>&1 >> $LOG_FILE
-
-if [ $? -eq 0 ]; then
-    echo "[$(date)] BI table refresh completed successfully" >> $LOG_FILE
-else
-    echo "[$(date)] ERROR: BI table refresh failed" >> $LOG_FILE
+if [ $? -ne 0 ]; then
+    echo "[$(date)] ERROR: refresh_bi_tables.py exited with an error" >> $LOG_FILE
+    exit 1
 fi
@@ -0,0 +1,285 @@
+"""
+BI Refresh Diff
+Compares two builds of bi_hcpcs_drug_pricing / bi_historical_pricing through
+the digests every refresh records (sp_refresh_digest.sql), without touching
+the BI tables themselves:
+  1. Per quarter: rows and digest of each build - equal digests mean the
+     quarter is identical and is not looked at again
+  2. Per HCPCS code, changed quarters only: added / removed / changed rows
+  3. ASP / median WAC / median AWP moves beyond --threshold percent
+
+Usage:
+  python refresh_diff.py                          # latest build vs the one before
+  python refresh_diff.py --list                   # recorded builds
+  python refresh_diff.py --old <run_id> --new <run_id> --threshold 10
+  python refresh_diff.py --fail-on-delta          # exit 1 on price moves (for cron alerts)
+"""
+
+import argparse
+import sys
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+import pymysql
+
+from refresh_bi_tables import DEFAULT_DATABASE, DEFAULT_DEFAULTS_FILE, connect
+
+DIGEST_TABLES = ("bi_hcpcs_drug_pricing", "bi_historical_pricing")
+PRICE_COLUMNS = (("asp", "ASP"), ("median_wac", "Median WAC"), ("median_awp", "Median AWP"))
+
+
+def _pct_change(old: Optional[Decimal], new: Optional[Decimal]) -> Optional[float]:
+    if old is None or new is None or old == 0:
+        return None
+    return float((new - old) / old * 100)
+
+
+class RefreshDiff:
+    def __init__(self, conn: pymysql.connections.Connection):
+        """
+        Initialize the diff
+
+        Args:
+            conn: Connection to the database holding bi_refresh_digest
+        """
+        self.conn = conn
+
+    def _query(self, sql: str, args: tuple = ()) -> List[Dict]:
+        with self.conn.cursor(pymysql.cursors.DictCursor) as cursor:
+            cursor.execute(sql, args)
+            return list(cursor.fetchall())
+
+    def recent_runs(self, limit: int) -> List[Dict]:
+        """Recorded builds, newest first"""
+        return self._query(
+            "SELECT run_id, refresh_type, recorded_at, pricing_rows, historical_rows "
+            "FROM bi_refresh_digest_run "
+            "ORDER BY recorded_at DESC "
+            "LIMIT %s",
+            (limit,),
+        )
+
+    def previous_run(self, run_id: str) -> Optional[str]:
+        """The build recorded just before run_id"""
+        rows = self._query(
+            "SELECT p.run_id FROM bi_refresh_digest_run p "
+            "INNER JOIN bi_refresh_digest_run r ON r.run_id = %s "
+            "WHERE p.recorded_at < r.recorded_at "
+            "   OR (p.recorded_at = r.recorded_at AND p.run_id < r.run_id) "
+            "ORDER BY p.recorded_at DESC, p.run_id DESC "
+            "LIMIT 1",
+            (run_id,),
+        )
+        return rows[0]["run_id"] if rows else None
+
+    def quarter_changes(self, old: str, new: str) -> List[Dict]:
+        """Quarters whose digest differs between the builds (one pass over the quarter digests)"""
+        return self._query(
+            "SELECT table_name, quarter_key, "
+            "       MAX(CASE WHEN run_id = %s THEN row_count END) AS old_rows, "
+            "       MAX(CASE WHEN run_id = %s THEN row_count END) AS new_rows, "
+            "       MAX(CASE WHEN run_id = %s THEN quarter_digest END) AS old_digest, "
+            "       MAX(CASE WHEN run_id = %s THEN quarter_digest END) AS new_digest "
+            "FROM bi_refresh_digest_quarter "
+            "WHERE run_id IN (%s, %s) "
+            "GROUP BY table_name, quarter_key "
+            "HAVING NOT (old_digest <=> new_digest) "
+            "ORDER BY table_name, quarter_key",
+            (old, new, old, new, old, new),
+        )
+
+    def row_changes(self, old: str, new: str, table_name: str, quarter_keys: List[int]) -> List[Dict]:
+        """Per-HCPCS differences inside the given quarters of one table"""
+        if not quarter_keys:
+            return []
+        placeholders = ", ".join(["%s"] * len(quarter_keys))
+        return self._query(
+            f"SELECT quarter_key, HCPCS_Code, "
+            f"       MAX(CASE WHEN run_id = %s THEN row_count END) AS old_rows, "
+            f"       MAX(CASE WHEN run_id = %s THEN row_count END) AS new_rows, "
+            f"       MAX(CASE WHEN run_id = %s THEN row_digest END) AS old_digest, "
+            f"       MAX(CASE WHEN run_id = %s THEN row_digest END) AS new_digest, "
+            f"       MAX(CASE WHEN run_id = %s THEN asp END) AS old_asp, "
+            f"       MAX(CASE WHEN run_id = %s THEN asp END) AS new_asp, "
+            f"       MAX(CASE WHEN run_id = %s THEN median_wac END) AS old_median_wac, "
+            f"       MAX(CASE WHEN run_id = %s THEN median_wac END) AS new_median_wac, "
+            f"       MAX(CASE WHEN run_id = %s THEN median_awp END) AS old_median_awp, "
+            f"       MAX(CASE WHEN run_id = %s THEN median_awp END) AS new_median_awp "
+            f"FROM bi_refresh_digest "
+            f"WHERE run_id IN (%s, %s) AND table_name = %s AND quarter_key IN ({placeholders}) "
+            f"GROUP BY quarter_key, HCPCS_Code "
+            f"HAVING NOT (old_digest <=> new_digest) "
+            f"ORDER BY quarter_key, HCPCS_Code",
+            (old, new) * 5 + (old, new, table_name) + tuple(quarter_keys),
+        )
+
+    def diff(self, old: str, new: str, threshold: float) -> Dict[str, Dict]:
+        """
+        Classify every difference between two builds
+
+        Args:
+            old: Earlier run_id
+            new: Later run_id
+            threshold: Flag price moves of at least this many percent
+
+        Returns:
+            {table_name: {"quarters": [...], "added": [...], "removed": [...],
+                          "changed": [...], "deltas": [(row, column, label, pct), ...]}}
+        """
+        quarters = self.quarter_changes(old, new)
+        result: Dict[str, Dict] = {}
+        for table_name in DIGEST_TABLES:
+            table_quarters = [q for q in quarters if q["table_name"] == table_name]
+            entry: Dict[str, List] = {"quarters": table_quarters, "added": [], "removed": [],
+                                      "changed": [], "deltas": []}
+            result[table_name] = entry
+            for row in self.row_changes(old, new, table_name, [q["quarter_key"] for q in table_quarters]):
+                if row["old_digest"] is None:
+                    entry["added"].append(row)
+                    continue
+                if row["new_digest"] is None:
+                    entry["removed"].append(row)
+                    continue
+                entry["changed"].append(row)
+                for column, label in PRICE_COLUMNS:
+                    pct = _pct_change(row[f"old_{column}"], row[f"new_{column}"])
+                    if pct is not None and abs(pct) >= threshold:
+                        entry["deltas"].append((row, column, label, pct))
+        return result
+
+    def print_runs(self, limit: int = 10) -> None:
+        runs = self.recent_runs(limit)
+        if not runs:
+            print("⚠️  bi_refresh_digest_run is empty - install sp_refresh_digest.sql and run a refresh")
+            return
+        print(f"   {'run_id':<38}{'type':<14}{'recorded_at':<21}{'pricing':>10}{'historical':>12}")
+        for run in runs:
+            print(f"   {run['run_id']:<38}{run['refresh_type'] or '-':<14}{str(run['recorded_at']):<21}"
+                  f"{run['pricing_rows']:>10}{run['historical_rows']:>12}")
+
+    def print_diff(self, old: Optional[str] = None, new: Optional[str] = None,
+                   threshold: float = 5.0, top: int = 25) -> int:
+        """
+        Print what changed between two builds
+
+        Args:
+            old: Earlier run_id (default: the build before new)
+            new: Later run_id (default: the latest build)
+            threshold: Flag price moves of at least this many percent
+            top: Rows to list per category
+
+        Returns:
+            Number of flagged price deltas
+        """
+        if new is None:
+            runs = self.recent_runs(1)
+            if not runs:
+                print("⚠️  bi_refresh_digest_run is empty - install sp_refresh_digest.sql and run a refresh")
+                return 0
+            new = runs[0]["run_id"]
+        if old is None:
+            old = self.previous_run(new)
+            if old is None:
+                print(f"⚠️  Only one recorded build ({new}) - nothing to compare yet")
+                return 0
+
+        result = self.diff(old, new, threshold)
+        print("=" * 78)
+        print(f"🔍 Refresh diff {old} → {new}")
+        print("=" * 78)
+
+        flagged = 0
+        for table_name, entry in result.items():
+            print(f"\n📋 {table_name}")
+            if not entry["quarters"]:
+                print("   ✅ Identical")
+                continue
+            for q in entry["quarters"]:
+                print(f"   {q['quarter_key']}: rows {q['old_rows'] if q['old_rows'] is not None else '-'}"
+                      f" → {q['new_rows'] if q['new_rows'] is not None else '-'}")
+            print(f"   HCPCS codes: +{len(entry['added'])} added, -{len(entry['removed'])} removed, "
+                  f"~{len(entry['changed'])} changed")
+            for label in ("added", "removed"):
+                codes = [f"{r['quarter_key']}/{r['HCPCS_Code']}" for r in entry[label][:top]]
+                if codes:
+                    more = f" (+{len(entry[label]) - top} more)" if len(entry[label]) > top else ""
+                    print(f"   {label}: {', '.join(codes)}{more}")
+            deltas = sorted(entry["deltas"], key=lambda d: -abs(d[3]))
+            flagged += len(deltas)
+            if deltas:
+                print(f"   ⚠️  {len(deltas)} price move(s) ≥ {threshold}%")
+                for row, column, label, pct in deltas[:top]:
+                    print(f"      {row['quarter_key']}  {row['HCPCS_Code']:<12}{label:<12}"
+                          f"{row[f'old_{column}']} → {row[f'new_{column}']}  ({pct:+.1f}%)")
+
+        print()
+        if flagged:
+            print(f"⚠️  {flagged} price move(s) of {threshold}% or more")
+        else:
+            print(f"✅ No price moves of {threshold}% or more")
+        return flagged
+
+
+def digests_changed(conn: pymysql.connections.Connection) -> bool:
+    """
+    Whether the latest recorded build differs from the one before it
+
+    Used by refresh_bi_tables.py to skip cache warm-up and the search index
+    rebuild when a refresh re-derived identical tables. Missing digest tables
+    or a first build count as changed.
+    """
+    diff = RefreshDiff(conn)
+    try:
+        runs = diff.recent_runs(2)
+    except pymysql.err.ProgrammingError:
+        return True
+    if len(runs) < 2:
+        return True
+    return bool(diff.quarter_changes(runs[1]["run_id"], runs[0]["run_id"]))
+
+
+def latest_quarter_digests(conn: pymysql.connections.Connection,
+                           table_name: str) -> Dict[str, Tuple[int, int]]:
+    """{str(quarter_key): (row_count, quarter_digest)} of the latest recorded build"""
+    rows = RefreshDiff(conn)._query(
+        "SELECT q.quarter_key, q.row_count, q.quarter_digest "
+        "FROM bi_refresh_digest_quarter q "
+        "INNER JOIN ( "
+        "    SELECT run_id FROM bi_refresh_digest_run ORDER BY recorded_at DESC LIMIT 1 "
+        ") latest ON latest.run_id = q.run_id "
+        "WHERE q.table_name = %s",
+        (table_name,),
+    )
+    return {str(r["quarter_key"]): (int(r["row_count"]), int(r["quarter_digest"])) for r in rows}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="What changed between two BI refresh builds")
+    parser.add_argument("--old", help="Earlier run_id (default: the build before --new)")
+    parser.add_argument("--new", help="Later run_id (default: latest build)")
+    parser.add_argument("--threshold", type=float, default=5.0,
+                        help="Flag ASP / median WAC / median AWP moves of at least this many percent")
+    parser.add_argument("--top", type=int, default=25, help="Rows to list per category")
+    parser.add_argument("--list", action="store_true", help="List recorded builds instead")
+    parser.add_argument("--database", default=DEFAULT_DATABASE)
+    parser.add_argument("--defaults-file", default=DEFAULT_DEFAULTS_FILE)
+    parser.add_argument("--fail-on-delta", action="store_true",
+                        help="Exit 1 when any price move reaches the threshold (for cron alerts)")
+    args = parser.parse_args(argv)
+
+    conn = connect(args.database, args.defaults_file)
+    try:
+        if args.list:
+            RefreshDiff(conn).print_runs()
+            return 0
+        flagged = RefreshDiff(conn).print_diff(
+            old=args.old, new=args.new, threshold=args.threshold, top=args.top
+        )
+    finally:
+        conn.close()
+
+    return 1 if args.fail_on_delta and flagged else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+"""
+BI Refresh Step Report
+Reads bi_refresh_step_log (sp_refresh_step_log.sql) and shows:
+  1. The slowest steps of a run (default: latest)
+  2. Per-step totals across recent runs, flagging regressions
+  3. Steps that reported an errno
+  4. --quality: source rows valid / fixable / rejected per data-quality
+     rule over recent validation runs (sp_validate_cms_drug_pricing.sql)
+
+Usage:
+  python refresh_report.py                     # latest run vs previous 9
+  python refresh_report.py --runs 20 --top 25
+  python refresh_report.py --run-id <uuid> --threshold 1.3
+  python refresh_report.py --quality
+"""
+
+import argparse
+import statistics
+import sys
+from typing import Dict, List, Optional
+
+import pymysql
+
+from refresh_bi_tables import DEFAULT_DATABASE, DEFAULT_DEFAULTS_FILE, connect
+
+
+class RefreshReport:
+    def __init__(self, conn: pymysql.connections.Connection):
+        """
+        Initialize the report
+
+        Args:
+            conn: Connection to the database holding bi_refresh_step_log
+        """
+        self.conn = conn
+
+    def _query(self, sql: str, args: tuple = ()) -> List[Dict]:
+        with self.conn.cursor(pymysql.cursors.DictCursor) as cursor:
+            cursor.execute(sql, args)
+            return list(cursor.fetchall())
+
+    def recent_runs(self, limit: int) -> List[Dict]:
+        """Most recent runs, newest first"""
+        return self._query(
+            "SELECT run_id, MAX(refresh_type) AS refresh_type, "
+            "MIN(started_at) AS started_at, MAX(completed_at) AS completed_at, "
+            "COUNT(*) AS steps, SUM(errno != 0) AS errors "
+            "FROM bi_refresh_step_log "
+            "GROUP BY run_id "
+            "ORDER BY MIN(started_at) DESC "
+            "LIMIT %s",
+            (limit,),
+        )
+
+    def slowest_steps(self, run_id: str, top: int) -> List[Dict]:
+        return self._query(
+            "SELECT step, quarter_key, rows_in, rows_out, elapsed_ms, errno "
+            "FROM bi_refresh_step_log "
+            "WHERE run_id = %s "
+            "ORDER BY elapsed_ms DESC "
+            "LIMIT %s",
+            (run_id, top),
+        )
+
+    def step_totals(self, run_ids: List[str]) -> Dict[str, Dict[str, int]]:
+        """{step: {run_id: total elapsed_ms}}"""
+        if not run_ids:
+            return {}
+        placeholders = ", ".join(["%s"] * len(run_ids))
+        rows = self._query(
+            f"SELECT step, run_id, SUM(elapsed_ms) AS total_ms "
+            f"FROM bi_refresh_step_log "
+            f"WHERE run_id IN ({placeholders}) "
+            f"GROUP BY step, run_id",
+            tuple(run_ids),
+        )
+        totals: Dict[str, Dict[str, int]] = {}
+        for row in rows:
+            totals.setdefault(row["step"], {})[row["run_id"]] = int(row["total_ms"])
+        return totals
+
+    def errors(self, run_id: str) -> List[Dict]:
+        return self._query(
+            "SELECT step, quarter_key, errno, started_at "
+            "FROM bi_refresh_step_log "
+            "WHERE run_id = %s AND errno != 0 "
+            "ORDER BY started_at",
+            (run_id,),
+        )
+
+    def quality_counts(self, runs: int) -> List[Dict]:
+        """bi_data_quality_log rows of the most recent validation runs"""
+        return self._query(
+            "SELECT l.run_id, l.checked_at, l.severity, l.rule, l.row_count, r.description "
+            "FROM bi_data_quality_log l "
+            "INNER JOIN ("
+            "    SELECT run_id, MAX(checked_at) AS checked_at FROM bi_data_quality_log "
+            "    GROUP BY run_id ORDER BY MAX(checked_at) DESC LIMIT %s"
+            ") recent ON recent.run_id = l.run_id "
+            "LEFT JOIN bi_data_quality_rule r ON r.rule = l.rule "
+            "ORDER BY l.checked_at",
+            (runs,),
+        )
+
+    def print_quality(self, runs: int = 10) -> int:
+        """
+        Print per-rule source row counts, oldest run first
+
+        Args:
+            runs: Number of recent validation runs to show
+
+        Returns:
+            Rejected rows in the latest run
+        """
+        rows = self.quality_counts(runs)
+        if not rows:
+            print("⚠️  bi_data_quality_log is empty - install sp_validate_cms_drug_pricing.sql and run a refresh")
+            return 0
+
+        run_ids: List[str] = []
+        counts: Dict[tuple, Dict[str, int]] = {}
+        descriptions: Dict[tuple, str] = {}
+        for row in rows:
+            if row["run_id"] not in run_ids:
+                run_ids.append(row["run_id"])
+            key = (row["severity"], row["rule"])
+            counts.setdefault(key, {})[row["run_id"]] = int(row["row_count"])
+            descriptions[key] = row["description"] or ""
+
+        latest = run_ids[-1]
+        print("=" * 78)
+        print(f"🧪 Source data quality over {len(run_ids)} validation runs (oldest → newest)")
+        print("=" * 78)
+        severity_order = {"valid": 0, "fixable": 1, "rejected": 2}
+        for key in sorted(counts, key=lambda k: (severity_order.get(k[0], 3), k[1] != "ALL", k[1])):
+            severity, rule = key
+            label = severity if rule == "ALL" else f"  {rule}"
+            trend = " ".join(str(counts[key].get(r, "-")) for r in run_ids)
+            print(f"   {label:<22}{trend}   {descriptions[key]}")
+
+        rejected = counts.get(("rejected", "ALL"), {}).get(latest, 0)
+        print()
+        if rejected:
+            print(f"⚠️  {rejected} source row(s) rejected - see bi_cms_drug_pricing_quarantine")
+        else:
+            print("✅ No rejected source rows")
+        return rejected
+
+    def print_report(self, runs: int = 10, top: int = 15, threshold: float = 1.5,
+                     run_id: Optional[str] = None) -> int:
+        """
+        Print the report
+
+        Args:
+            runs: Number of recent runs to compare
+            top: Number of slowest steps to list
+            threshold: Flag a step when it is this many times slower than its
+                median over the previous runs
+            run_id: Run to report on (default: the latest)
+
+        Returns:
+            Number of regressed steps
+        """
+        history = self.recent_runs(runs)
+        if not history:
+            print("⚠️  bi_refresh_step_log is empty - run a refresh first")
+            return 0
+
+        run_ids = [r["run_id"] for r in history]
+        if run_id is None:
+            run_id = run_ids[0]
+        elif run_id not in run_ids:
+            run_ids.insert(0, run_id)
+
+        current = next((r for r in history if r["run_id"] == run_id), None)
+        print("=" * 78)
+        print(f"📊 Refresh run {run_id}")
+        if current:
+            print(f"   {current['refresh_type']} | {current['started_at']} → {current['completed_at']} | "
+                  f"{current['steps']} steps, {current['errors']} errors")
+        print("=" * 78)
+
+        # 1. Slowest steps
+        print(f"\n🐢 Slowest {top} steps")
+        print(f"   {'step':<26}{'quarter':>8}{'rows_in':>12}{'rows_out':>12}{'ms':>10}{'errno':>7}")
+        for row in self.slowest_steps(run_id, top):
+            print(f"   {row['step']:<26}{row['quarter_key'] or '-':>8}"
+                  f"{row['rows_in'] if row['rows_in'] is not None else '-':>12}"
+                  f"{row['rows_out'] if row['rows_out'] is not None else '-':>12}"
+                  f"{row['elapsed_ms']:>10}{row['errno'] or '':>7}")
+
+        # 2. Per-step trend (oldest → newest, current run last)
+        previous = [r for r in run_ids if r != run_id]
+        ordered = list(reversed(previous)) + [run_id]
+        totals = self.step_totals(ordered)
+        regressions = 0
+
+        print(f"\n📈 Total ms per step over {len(ordered)} runs (oldest → newest)")
+        for step in sorted(totals, key=lambda s: -totals[s].get(run_id, 0)):
+            series = [totals[step].get(r) for r in ordered]
+            baseline = [v for v in series[:-1] if v is not None]
+            latest = series[-1]
+            flag = ""
+            if latest is not None and baseline:
+                median = statistics.median(baseline)
+                if median > 0 and latest > median * threshold:
+                    regressions += 1
+                    flag = f"  ⚠️  {latest / median:.1f}x median"
+            trend = " ".join("-" if v is None else str(v) for v in series)
+            print(f"   {step:<26}{trend}{flag}")
+
+        # 3. Errors
+        errors = self.errors(run_id)
+        if errors:
+            print(f"\n❌ {len(errors)} step(s) reported an errno")
+            for row in errors:
+                print(f"   {row['started_at']}  {row['step']:<26}{row['quarter_key'] or '-':>8}  errno {row['errno']}")
+
+        print()
+        if regressions:
+            print(f"⚠️  {regressions} step(s) slower than {threshold}x their median")
+        else:
+            print("✅ No step regressions")
+        return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Slowest refresh steps and their trend across runs")
+    parser.add_argument("--runs", type=int, default=10, help="Recent runs to compare")
+    parser.add_argument("--top", type=int, default=15, help="Slowest steps to list")
+    parser.add_argument("--threshold", type=float, default=1.5,
+                        help="Regression factor vs the median of previous runs")
+    parser.add_argument("--run-id", help="Run to report on (default: latest)")
+    parser.add_argument("--database", default=DEFAULT_DATABASE)
+    parser.add_argument("--defaults-file", default=DEFAULT_DEFAULTS_FILE)
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="Exit 1 when any step regressed (for cron alerts)")
+    parser.add_argument("--quality", action="store_true",
+                        help="Source rows valid / fixable / rejected per data-quality rule instead")
+    args = parser.parse_args(argv)
+
+    conn = connect(args.database, args.defaults_file)
+    if args.quality:
+        try:
+            RefreshReport(conn).print_quality(runs=args.runs)
+        finally:
+            conn.close()
+        return 0
+
+    try:
+        regressions = RefreshReport(conn).print_report(
+            runs=args.runs, top=args.top, threshold=args.threshold, run_id=args.run_id
+        )
+    finally:
+        conn.close()
+
+    return 1 if args.fail_on_regression and regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
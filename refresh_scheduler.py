@@ -0,0 +1,634 @@
+"""
+BI Refresh Scheduler
+Long-running service around the refresh orchestrator (refresh_bi_tables.py),
+replacing the bare cron wrapper refresh_bi_tables.sh
+
+What it does:
+1. Runs a refresh daily --at HH:MM, every --every minutes, or --once
+2. Takes the GET_LOCK advisory lock '<database>.bi_refresh' first, so two
+   runs never overlap (the scheduler's, refresh_bi_tables.py's or
+   load_cms_pricing.py's) and never deadlock each other
+3. Full refreshes checkpoint each finished quarter in bi_refresh_checkpoint,
+   together with the staged source fingerprint of that quarter (row count +
+   SUM(row_crc) of bi_cms_drug_pricing_stg). A failed run is retried
+   --retries times under the same run_id, and so is the next scheduled run:
+   quarters whose staged source is unchanged are skipped, so a run that
+   failed at quarter 30 of 41 only redoes quarters 30-41
+4. GET /progress on a local port: state, current step and quarters, quarters
+   done / total, throughput and ETA; GET /health for monitoring
+
+Incremental refreshes need no checkpoints: sp_refresh_bi_tables_incremental
+records a source watermark per finished quarter, so a retry already redoes
+only the quarters that did not finish. Their progress comes from the
+per-quarter bi_refresh_log rows the procedure writes, polled while it runs.
+
+Prerequisites:
+- pip install -r requirements.txt
+- ~/.my.cnf with [client] credentials
+- The procedures from the README setup steps
+
+Usage:
+  python refresh_scheduler.py --at 02:00                       # nightly incremental, GET :8092/progress
+  python refresh_scheduler.py --once --mode full --workers 6   # one run, resuming a failed full run
+  python refresh_scheduler.py --every 60 --retries 3 --retry-delay 300
+  curl -s http://127.0.0.1:8092/progress
+"""
+
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+import pymysql
+
+from refresh_bi_tables import (DEFAULT_DATABASE, DEFAULT_DEFAULTS_FILE, DEFAULT_LOG_FILE, REFRESH_LOCK,
+                               RefreshOrchestrator, acquire_refresh_lock, after_refresh, connect, logger,
+                               quarter_key, quarter_label, release_refresh_lock, setup_logging)
+
+RUN_DDL = """CREATE TABLE IF NOT EXISTS bi_refresh_run (
+    run_id VARCHAR(64) NOT NULL,
+    mode VARCHAR(20) NOT NULL,
+    shadow TINYINT NOT NULL DEFAULT 0,
+    status VARCHAR(20) NOT NULL,
+    attempts INT NOT NULL DEFAULT 0,
+    quarters_total INT,
+    quarters_resumed INT,
+    started_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL,
+    completed_at DATETIME,
+    message TEXT,
+    PRIMARY KEY (run_id),
+    INDEX idx_refresh_run_mode (mode, shadow, started_at)
+)"""
+
+# quarter_key 0 = a step of the whole run (publish)
+CHECKPOINT_DDL = """CREATE TABLE IF NOT EXISTS bi_refresh_checkpoint (
+    run_id VARCHAR(64) NOT NULL,
+    step VARCHAR(32) NOT NULL,
+    quarter_key INT NOT NULL,
+    source_rows INT NOT NULL,
+    source_checksum DECIMAL(30,0) NOT NULL,
+    rows_out INT,
+    completed_at DATETIME(3) NOT NULL,
+    PRIMARY KEY (run_id, step, quarter_key)
+)"""
+
+Fingerprint = Tuple[int, Decimal]
+
+# Per-quarter bi_refresh_log rows of sp_refresh_bi_tables_incremental
+INCREMENTAL_STARTED = re.compile(r"Source changed in (\d+) quarter")
+INCREMENTAL_QUARTER = re.compile(r"(\d+) of (\d+) \(Q([1-4])-(\d{4})\)")
+INCREMENTAL_ROWS = re.compile(r"Pricing: (\d+), Historical: (\d+)")
+
+
+class RefreshProgress:
+    def __init__(self):
+        """Thread-safe state of the current run, read by GET /progress"""
+        self._lock = threading.Lock()
+        self.state = "idle"
+        self.run_id: Optional[str] = None
+        self.mode: Optional[str] = None
+        self.attempt = 0
+        self.step: Optional[str] = None
+        self.current: Set[date] = set()
+        self.quarters_total = 0
+        self.quarters_resumed = 0
+        self.quarters_done = 0
+        self.rows_done = 0
+        self.started_at: Optional[float] = None
+        self.first_quarter_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_run: Optional[Dict] = None
+        self.next_run_at: Optional[datetime] = None
+
+    def set_state(self, state: str):
+        with self._lock:
+            self.state = state
+
+    def start(self, run_id: str, mode: str, attempt: int):
+        with self._lock:
+            self.state = "running"
+            self.run_id, self.mode, self.attempt = run_id, mode, attempt
+            self.step = None
+            self.current = set()
+            self.quarters_total = self.quarters_resumed = self.quarters_done = self.rows_done = 0
+            self.started_at = time.time()
+            self.first_quarter_at = None
+            self.last_error = None
+
+    def step_started(self, step: str, quarter_start: Optional[date] = None):
+        with self._lock:
+            self.step = step
+            if quarter_start is not None and step in ("historical", "incremental"):
+                if self.first_quarter_at is None:
+                    self.first_quarter_at = time.time()
+            if step == "historical" and quarter_start is not None:
+                self.current.add(quarter_start)
+            else:
+                self.current = {quarter_start} if quarter_start else set()
+
+    def planned(self, total: int, resumed: int):
+        with self._lock:
+            self.quarters_total = total
+            self.quarters_resumed = self.quarters_done = resumed
+
+    def quarter_done(self, quarter_start: Optional[date], rows: Optional[int]):
+        with self._lock:
+            self.current.discard(quarter_start)
+            self.quarters_done += 1
+            self.rows_done += rows or 0
+
+    def finished(self, status: str, message: Optional[str] = None):
+        with self._lock:
+            self.state = status
+            self.current = set()
+            self.last_error = message if status != "completed" else None
+            self.last_run = {
+                "run_id": self.run_id,
+                "status": status,
+                "attempt": self.attempt,
+                "duration_s": round(time.time() - self.started_at, 1) if self.started_at else None,
+                "finished_at": datetime.now().isoformat(timespec="seconds"),
+            }
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            now = time.time()
+            elapsed = now - self.started_at if self.started_at else 0.0
+            processed = self.quarters_done - self.quarters_resumed
+            quarter_elapsed = now - self.first_quarter_at if self.first_quarter_at else 0.0
+            quarters_per_min = processed / quarter_elapsed * 60 if processed and quarter_elapsed else None
+            remaining = max(self.quarters_total - self.quarters_done, 0)
+            eta_s = None
+            if self.state == "running" and quarters_per_min:
+                eta_s = round(remaining / quarters_per_min * 60, 1)
+            return {
+                "state": self.state,
+                "run_id": self.run_id,
+                "mode": self.mode,
+                "attempt": self.attempt,
+                "step": self.step,
+                "current_quarters": [quarter_label(q) for q in sorted(self.current)],
+                "quarters_total": self.quarters_total,
+                "quarters_done": self.quarters_done,
+                "quarters_resumed": self.quarters_resumed,
+                "rows_done": self.rows_done,
+                "elapsed_s": round(elapsed, 1) if self.state == "running" else None,
+                "quarters_per_min": round(quarters_per_min, 2) if quarters_per_min else None,
+                "rows_per_s": (round(self.rows_done / quarter_elapsed, 1)
+                               if self.rows_done and quarter_elapsed else None),
+                "eta_s": eta_s,
+                "last_error": self.last_error,
+                "last_run": self.last_run,
+                "next_run_at": self.next_run_at.isoformat(timespec="seconds") if self.next_run_at else None,
+            }
+
+
+class CheckpointedOrchestrator(RefreshOrchestrator):
+    def __init__(self, progress: RefreshProgress,
+                 checkpoints: Optional[Dict[Tuple[str, int], Fingerprint]] = None,
+                 poll_interval: float = 5.0, **kwargs):
+        """
+        Orchestrator that persists its full-refresh steps in bi_refresh_checkpoint
+        and reports the progress of both refresh modes
+
+        Args:
+            progress: Progress shared with the HTTP endpoint
+            checkpoints: {(step, quarter_key): staged source fingerprint} finished
+                by earlier attempts of this run
+            poll_interval: Seconds between bi_refresh_log polls during an incremental refresh
+            **kwargs: RefreshOrchestrator arguments
+        """
+        super().__init__(**kwargs)
+        self.progress = progress
+        self.poll_interval = poll_interval
+        self.checkpoints = dict(checkpoints or {})
+        self.quarters_total: Optional[int] = None
+        self.quarters_resumed: Optional[int] = None
+        self._fingerprints: Optional[Dict[int, Fingerprint]] = None
+
+    def _fingerprint(self, quarter_start: Optional[date]) -> Fingerprint:
+        """Staged source rows + CRC sum of one quarter (None = all quarters), read once per attempt"""
+        if self._fingerprints is None:
+            with self._connect().cursor() as cursor:
+                cursor.execute("SELECT quarter_start, COUNT(*), IFNULL(SUM(row_crc), 0) "
+                               "FROM bi_cms_drug_pricing_stg GROUP BY quarter_start")
+                self._fingerprints = {quarter_key(q): (int(rows), Decimal(crc))
+                                      for q, rows, crc in cursor.fetchall()}
+        if quarter_start is None:
+            return (sum(r for r, _ in self._fingerprints.values()),
+                    sum((c for _, c in self._fingerprints.values()), Decimal(0)))
+        return self._fingerprints.get(quarter_key(quarter_start), (0, Decimal(0)))
+
+    def step_started(self, step: str, quarter_start: Optional[date] = None):
+        self.progress.step_started(step, quarter_start)
+
+    def planned(self, quarters: List[date], resumed: Set[date]):
+        self.quarters_total, self.quarters_resumed = len(quarters), len(resumed)
+        self.progress.planned(len(quarters), len(resumed))
+
+    def is_checkpointed(self, step: str, quarter_start: Optional[date] = None) -> bool:
+        key = (step, quarter_key(quarter_start) if quarter_start else 0)
+        return key in self.checkpoints and self.checkpoints[key] == self._fingerprint(quarter_start)
+
+    def checkpoint(self, conn: pymysql.connections.Connection, step: str,
+                   quarter_start: Optional[date] = None, rows: Optional[int] = None):
+        key = (step, quarter_key(quarter_start) if quarter_start else 0)
+        fingerprint = self._fingerprint(quarter_start)
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "REPLACE INTO bi_refresh_checkpoint (run_id, step, quarter_key, source_rows, "
+                "source_checksum, rows_out, completed_at) VALUES (%s, %s, %s, %s, %s, %s, NOW(3))",
+                (self.run_id, key[0], key[1], fingerprint[0], fingerprint[1], rows),
+            )
+        conn.commit()
+        self.checkpoints[key] = fingerprint
+        if step == "historical":
+            self.progress.quarter_done(quarter_start, rows)
+
+    def clear_checkpoints(self, conn: pymysql.connections.Connection):
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM bi_refresh_checkpoint WHERE run_id = %s", (self.run_id,))
+        conn.commit()
+        self.checkpoints.clear()
+
+    # -------------------------------------------------------------
+    # Incremental progress (one CALL - read back from bi_refresh_log)
+    # -------------------------------------------------------------
+
+    def run_incremental(self) -> bool:
+        conn = connect(self.database, self.defaults_file)
+        conn.autocommit(True)  # every poll sees the rows committed since the last one
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT IFNULL(MAX(id), 0) FROM bi_refresh_log")
+            last_log_id = cursor.fetchone()[0]
+        stop = threading.Event()
+        watcher = threading.Thread(target=self._watch_incremental, args=(conn, last_log_id, stop), daemon=True)
+        self.progress.step_started("incremental")
+        watcher.start()
+        try:
+            return super().run_incremental()
+        finally:
+            stop.set()
+            watcher.join()
+            conn.close()
+
+    def _watch_incremental(self, conn: pymysql.connections.Connection, last_log_id: int,
+                           stop: threading.Event):
+        """Feed the procedure's STARTED / IN_PROGRESS / COMPLETED_QUARTER / ERROR rows into the progress"""
+        current: Optional[date] = None
+        while True:
+            stopping = stop.wait(self.poll_interval)  # one last poll after the CALL returned
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT id, status, message FROM bi_refresh_log "
+                        "WHERE id > %s AND refresh_type = 'incremental' "
+                        "AND status IN ('STARTED', 'IN_PROGRESS', 'COMPLETED_QUARTER', 'ERROR') ORDER BY id",
+                        (last_log_id,),
+                    )
+                    rows = cursor.fetchall()
+            except pymysql.err.MySQLError as ex:
+                # Progress must never fail a refresh
+                logger.warning("Could not read incremental progress: %s", ex)
+                rows = []
+
+            for log_id, status, message in rows:
+                last_log_id = log_id
+                started = INCREMENTAL_STARTED.search(message or "")
+                quarter = INCREMENTAL_QUARTER.search(message or "")
+                if status == "STARTED" and started:
+                    self.quarters_total, self.quarters_resumed = int(started.group(1)), 0
+                    self.progress.planned(self.quarters_total, 0)
+                elif status == "IN_PROGRESS" and quarter:
+                    if not self.quarters_total:
+                        self.quarters_total, self.quarters_resumed = int(quarter.group(2)), 0
+                        self.progress.planned(self.quarters_total, 0)
+                    current = date(int(quarter.group(4)), 3 * int(quarter.group(3)) - 2, 1)
+                    self.progress.step_started("incremental", current)
+                elif status == "COMPLETED_QUARTER" and quarter:
+                    counts = INCREMENTAL_ROWS.search(message)
+                    self.progress.quarter_done(date(int(quarter.group(4)), 3 * int(quarter.group(3)) - 2, 1),
+                                               sum(int(n) for n in counts.groups()) if counts else None)
+                elif status == "ERROR":
+                    # Failed quarter: finished for the ETA, its watermark is retried next run
+                    self.progress.quarter_done(current, None)
+            if stopping:
+                return
+
+
+class RefreshScheduler:
+    def __init__(self, database: str = DEFAULT_DATABASE, defaults_file: str = DEFAULT_DEFAULTS_FILE,
+                 mode: str = "incremental", workers: int = 4, shadow: bool = False,
+                 max_rejected_pct: Optional[float] = None, retries: int = 2, retry_delay: int = 300,
+                 lock_timeout: int = 0, resume: bool = True,
+                 warm_cache: bool = False, search_index: bool = False):
+        """
+        Initialize the scheduler
+
+        Args:
+            database: Database holding cms_drug_pricing and the BI tables
+            defaults_file: MySQL option file with [client] credentials
+            mode: 'incremental' or 'full'
+            workers: Parallel database connections for a full refresh
+            shadow: Build full refreshes into shadow tables and swap them in at the end
+            max_rejected_pct: Data-quality gate (see refresh_bi_tables.py --max-rejected-pct)
+            retries: Retries of a failed run, each resuming from its checkpoints
+            retry_delay: Seconds between retries
+            lock_timeout: Seconds to wait for a refresh started elsewhere
+            resume: Resume the last failed full run instead of starting over
+            warm_cache: Re-warm Superset caches after a run that changed data
+            search_index: Rebuild bi_search_suggestion after a run that changed data
+        """
+        self.database = database
+        self.defaults_file = defaults_file
+        self.mode = mode
+        self.workers = workers
+        self.shadow = shadow and mode == "full"
+        self.max_rejected_pct = max_rejected_pct
+        self.retries = max(0, retries)
+        self.retry_delay = retry_delay
+        self.lock_timeout = lock_timeout
+        self.resume = resume
+        self.warm_cache = warm_cache
+        self.search_index = search_index
+        self.progress = RefreshProgress()
+        self._stop = threading.Event()
+
+    # -------------------------------------------------------------
+    # Run bookkeeping (bi_refresh_run / bi_refresh_checkpoint)
+    # -------------------------------------------------------------
+
+    def _ensure_tables(self, conn: pymysql.connections.Connection):
+        with conn.cursor() as cursor:
+            cursor.execute(RUN_DDL)
+            cursor.execute(CHECKPOINT_DDL)
+        conn.commit()
+
+    def _resumable_run(self, conn: pymysql.connections.Connection) -> Optional[Dict]:
+        """The latest full run of the same kind, when it failed"""
+        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+            cursor.execute(
+                "SELECT run_id, status, attempts FROM bi_refresh_run "
+                "WHERE mode = 'full' AND shadow = %s ORDER BY started_at DESC LIMIT 1",
+                (int(self.shadow),),
+            )
+            run = cursor.fetchone()
+            if not run or run["status"] != "FAILED":
+                return None
+            if self.shadow:
+                # Half-built shadow tables must still be there to resume into
+                # (or already published - then only the final steps are left)
+                cursor.execute(
+                    "SELECT (SELECT COUNT(*) FROM information_schema.TABLES "
+                    "        WHERE TABLE_SCHEMA = DATABASE() "
+                    "          AND TABLE_NAME = 'bi_historical_pricing_shadow') "
+                    "     + (SELECT COUNT(*) FROM bi_refresh_checkpoint "
+                    "        WHERE run_id = %s AND step = 'publish') AS n",
+                    (run["run_id"],),
+                )
+                if not cursor.fetchone()["n"]:
+                    return None
+        return run
+
+    def _load_checkpoints(self, conn: pymysql.connections.Connection,
+                          run_id: str) -> Dict[Tuple[str, int], Fingerprint]:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT step, quarter_key, source_rows, source_checksum "
+                           "FROM bi_refresh_checkpoint WHERE run_id = %s", (run_id,))
+            return {(step, key): (int(rows), Decimal(crc)) for step, key, rows, crc in cursor.fetchall()}
+
+    def _record_run(self, conn: pymysql.connections.Connection, run_id: str, status: str,
+                    attempts: int, orchestrator: Optional[CheckpointedOrchestrator] = None,
+                    message: Optional[str] = None):
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO bi_refresh_run (run_id, mode, shadow, status, attempts, quarters_total, "
+                "quarters_resumed, started_at, updated_at, completed_at, message) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s, NOW(), NOW(), IF(%s, NOW(), NULL), %s) "
+                "ON DUPLICATE KEY UPDATE status = VALUES(status), attempts = VALUES(attempts), "
+                "quarters_total = IFNULL(VALUES(quarters_total), quarters_total), "
+                "quarters_resumed = IFNULL(VALUES(quarters_resumed), quarters_resumed), "
+                "updated_at = NOW(), completed_at = VALUES(completed_at), message = VALUES(message)",
+                (run_id, self.mode, int(self.shadow), status, attempts,
+                 orchestrator.quarters_total if orchestrator else None,
+                 orchestrator.quarters_resumed if orchestrator else None,
+                 status != "RUNNING", message),
+            )
+        conn.commit()
+
+    # -------------------------------------------------------------
+    # Runs
+    # -------------------------------------------------------------
+
+    def run_once(self) -> Optional[bool]:
+        """
+        One refresh under the advisory lock, retried from its checkpoints
+
+        Returns:
+            True / False for success / failure, None when another refresh held the lock
+        """
+        lock_conn = connect(self.database, self.defaults_file)
+        try:
+            self.progress.set_state("waiting_lock")
+            if not acquire_refresh_lock(lock_conn, self.database, self.lock_timeout):
+                logger.warning("Another BI table refresh is running (lock %s.%s) - skipped",
+                               self.database, REFRESH_LOCK)
+                self.progress.set_state("idle")
+                return None
+            self._ensure_tables(lock_conn)
+
+            run_id, attempts, checkpoints = str(uuid.uuid4()), 0, {}
+            previous = self._resumable_run(lock_conn) if self.mode == "full" and self.resume else None
+            if previous:
+                run_id, attempts = previous["run_id"], previous["attempts"]
+                checkpoints = self._load_checkpoints(lock_conn, run_id)
+                logger.info("Resuming failed run %s (%d checkpoints)", run_id, len(checkpoints))
+
+            for retry in range(self.retries + 1):
+                attempts += 1
+                self._record_run(lock_conn, run_id, "RUNNING", attempts)
+                self.progress.start(run_id, self.mode, attempts)
+                orchestrator = CheckpointedOrchestrator(
+                    self.progress, checkpoints,
+                    database=self.database, defaults_file=self.defaults_file, workers=self.workers,
+                    shadow=self.shadow, max_rejected_pct=self.max_rejected_pct,
+                )
+                orchestrator.run_id = run_id
+                orchestrator.lock_owner = lock_conn.thread_id()
+                error = None
+                logger.info("Starting BI table refresh (%s, run %s, attempt %d)...", self.mode, run_id, attempts)
+                try:
+                    ok = orchestrator.run_full() if self.mode == "full" else orchestrator.run_incremental()
+                    if not ok:
+                        error = "Refresh finished with failed quarters"
+                except pymysql.err.MySQLError as ex:
+                    ok, error = False, str(ex)
+                finally:
+                    orchestrator.close()
+                checkpoints = orchestrator.checkpoints
+
+                if ok:
+                    self._record_run(lock_conn, run_id, "COMPLETED", attempts, orchestrator)
+                    self.progress.finished("completed")
+                    logger.info("BI table refresh completed successfully")
+                    after_refresh(orchestrator, warm_cache=self.warm_cache, search_index=self.search_index)
+                    return True
+
+                self._record_run(lock_conn, run_id, "FAILED", attempts, orchestrator, error)
+                self.progress.finished("failed", error)
+                logger.error("ERROR: BI table refresh failed: %s", error)
+                if retry < self.retries:
+                    logger.info("Retrying in %ds (%d of %d), resuming from checkpoints",
+                                self.retry_delay, retry + 1, self.retries)
+                    self.progress.set_state("retrying")
+                    if self._stop.wait(self.retry_delay):
+                        break
+            return False
+        finally:
+            release_refresh_lock(lock_conn, self.database)
+            lock_conn.close()
+
+    def next_run(self, now: datetime, every: Optional[int], at: Optional[str]) -> datetime:
+        """Next start: every N minutes from now, or the next HH:MM"""
+        if every:
+            return now + timedelta(minutes=every)
+        hour, minute = (int(part) for part in at.split(":"))
+        candidate = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        return candidate if candidate > now else candidate + timedelta(days=1)
+
+    def loop(self, every: Optional[int] = None, at: Optional[str] = None):
+        """Run on schedule until stop() (a run that is in progress finishes first)"""
+        while not self._stop.is_set():
+            start = self.next_run(datetime.now(), every, at)
+            self.progress.next_run_at = start
+            logger.info("Next BI table refresh at %s", start.isoformat(timespec="seconds"))
+            if self._stop.wait(max((start - datetime.now()).total_seconds(), 0)):
+                break
+            self.progress.next_run_at = None
+            try:
+                self.run_once()
+            except pymysql.err.MySQLError as ex:
+                # Database unreachable: keep the service up for the next slot
+                logger.error("ERROR: could not start BI table refresh: %s", ex)
+                self.progress.finished("failed", str(ex))
+
+    def stop(self):
+        self._stop.set()
+
+    def serve(self, host: str = "127.0.0.1", port: int = 8092) -> ThreadingHTTPServer:
+        """Start the progress API in a background thread; returns the server (call .shutdown() to stop)"""
+        handler = type("Handler", (ProgressHandler,), {"scheduler": self})
+        server = ThreadingHTTPServer((host, port), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+class ProgressHandler(BaseHTTPRequestHandler):
+    scheduler: RefreshScheduler = None
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status: int, body: Dict):
+        payload = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        snapshot = self.scheduler.progress.snapshot()
+        if path == "/progress":
+            return self._send(200, snapshot)
+        if path == "/health":
+            # 503 after a failed run so a plain HTTP check can alert on it
+            healthy = snapshot["state"] != "failed"
+            return self._send(200 if healthy else 503, {"state": snapshot["state"],
+                                                        "last_run": snapshot["last_run"]})
+        return self._send(404, {"message": "Not found"})
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Scheduled BI table refreshes with locking, resume and progress API")
+    parser.add_argument("--mode", choices=["incremental", "full"], default="incremental")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Parallel database connections for a full refresh")
+    parser.add_argument("--shadow", action="store_true",
+                        help="Full refresh only: build shadow tables and swap them in atomically")
+    parser.add_argument("--max-rejected-pct", type=float,
+                        help="Stop before rebuilding anything when more than this %% of source rows is rejected")
+    schedule = parser.add_mutually_exclusive_group(required=True)
+    schedule.add_argument("--once", action="store_true", help="Run one refresh now and exit")
+    schedule.add_argument("--every", type=int, metavar="MINUTES", help="Run every N minutes")
+    schedule.add_argument("--at", metavar="HH:MM", help="Run daily at this local time")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="Retries of a failed run, each resuming from its checkpoints")
+    parser.add_argument("--retry-delay", type=int, default=300, help="Seconds between retries")
+    parser.add_argument("--lock-timeout", type=int, default=0,
+                        help="Seconds to wait for a refresh started elsewhere before skipping")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Start a failed full run over instead of resuming it")
+    parser.add_argument("--warm-cache", action="store_true",
+                        help="Invalidate + re-warm Superset caches when data changed (SUPERSET_* env vars)")
+    parser.add_argument("--search-index", action="store_true",
+                        help="Rebuild the drug type-ahead table bi_search_suggestion when data changed")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8092, help="Progress API port (0 = no API)")
+    parser.add_argument("--database", default=DEFAULT_DATABASE)
+    parser.add_argument("--defaults-file", default=DEFAULT_DEFAULTS_FILE)
+    parser.add_argument("--log-file", default=DEFAULT_LOG_FILE)
+    args = parser.parse_args(argv)
+
+    if args.at:
+        try:
+            datetime.strptime(args.at, "%H:%M")
+        except ValueError:
+            parser.error("--at must be HH:MM")
+    setup_logging(args.log_file)
+    if args.shadow and args.mode != "full":
+        print("⚠️  --shadow only applies to --mode full; running regular incremental refreshes")
+
+    scheduler = RefreshScheduler(
+        database=args.database,
+        defaults_file=args.defaults_file,
+        mode=args.mode,
+        workers=args.workers,
+        shadow=args.shadow,
+        max_rejected_pct=args.max_rejected_pct,
+        retries=args.retries,
+        retry_delay=args.retry_delay,
+        lock_timeout=args.lock_timeout,
+        resume=not args.no_resume,
+        warm_cache=args.warm_cache,
+        search_index=args.search_index,
+    )
+    server = scheduler.serve(args.host, args.port) if args.port else None
+    if server:
+        print(f"📡 Refresh progress on http://{args.host}:{args.port}/progress")
+
+    try:
+        if args.once:
+            ok = scheduler.run_once()
+            return 1 if ok is False else 0
+        scheduler.loop(every=args.every, at=args.at)
+    except KeyboardInterrupt:
+        scheduler.stop()
+    finally:
+        if server:
+            server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,38 +2,57 @@
 -- SINGLE QUARTER PROCESSOR
 -- This is the WORKING version that completed in 35 seconds
 -- Processes ONE quarter/month at a time
+-- Reads the quarter's range of bi_cms_drug_pricing_stg
+-- (built once per refresh by sp_stage_cms_drug_pricing)
+--
+-- Split into steps so they can also be run separately:
+--   sp_stage_single_quarter        - session staging table for one quarter
+--   sp_process_quarter_pricing     - bi_hcpcs_drug_pricing (needs earlier
+--                                    quarters in bi_historical_pricing)
+--   sp_process_quarter_historical  - bi_historical_pricing (independent of
+--                                    other quarters - safe to run in parallel)
+--   sp_process_single_quarter      - all of the above, in order
+--
+-- Target tables: the live BI tables by default. A shadow refresh
+-- (sp_refresh_bi_tables_shadow.sql) sets @bi_pricing_table and
+-- @bi_historical_table so the same steps build the shadow tables instead.
+--
+-- Every step writes a timing row to bi_refresh_step_log
+-- (sp_refresh_step_log.sql) - see refresh_report.py.
 -- =====================================================
 
 DELIMITER //
 
-DROP PROCEDURE IF EXISTS sp_process_single_quarter //
+DROP PROCEDURE IF EXISTS sp_stage_single_quarter //
 
-CREATE PROCEDURE sp_process_single_quarter(
-    IN p_target_date DATE,
-    OUT p_rows_pricing INT,
-    OUT p_rows_historical INT
+CREATE PROCEDURE sp_stage_single_quarter(
+    IN p_target_date DATE
 )
 BEGIN
-    DECLARE v_start_time DATETIME;
-    DECLARE v_error_message TEXT;
-
-    -- Error handler
-    DECLARE exit handler FOR SQLEXCEPTION
-    BEGIN
-        GET DIAGNOSTICS CONDITION 1 v_error_message = MESSAGE_TEXT;
-        INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
-        VALUES ('manual', 'FAILED', CONCAT('Error processing ', DATE_FORMAT(p_target_date, '%Y-%m-%d'), ': ', v_error_message), v_start_time, NOW());
-        RESIGNAL;
-    END;
-
-    SET v_start_time = NOW();
-    SET p_rows_pricing = 0;
-    SET p_rows_historical = 0;
+    DECLARE v_quarter_start DATE;
+    DECLARE v_step_start DATETIME(3);
 
     -- =====================================================
-    -- STEP 1: CREATE STAGING TABLE (ALL DATA)
+    -- CREATE SESSION STAGING TABLE (TARGET QUARTER ONLY)
+    -- The source is parsed once per refresh by sp_stage_cms_drug_pricing;
+    -- here we only copy this quarter's range out of bi_cms_drug_pricing_stg
     -- =====================================================
 
+    -- Standalone calls (outside a refresh) stage the source on demand
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.tables
+        WHERE table_schema = DATABASE()
+            AND table_name = 'bi_cms_drug_pricing_stg'
+    ) THEN
+        CALL sp_stage_cms_drug_pricing();
+    END IF;
+
+    SET v_step_start = NOW(3);
+    SET v_quarter_start = DATE_SUB(
+        DATE_SUB(p_target_date, INTERVAL DAY(p_target_date) - 1 DAY),
+        INTERVAL (MONTH(p_target_date) - 1) % 3 MONTH
+    );
+
     DROP TEMPORARY TABLE IF EXISTS bi_hcpcs_drug_pricing_stg;
 
     CREATE TEMPORARY TABLE bi_hcpcs_drug_pricing_stg (
@@ -57,6 +76,7 @@ BEGIN
         AWP_per_unit DECIMAL(18,4),
         ASP DECIMAL(18,4),
         period_date DATE,
+        quarter_key INT,
         Quarter VARCHAR(20),
         INDEX idx_stg_quarter (Quarter, HCPCS_Code),
         INDEX idx_stg_period_date (period_date),
@@ -64,65 +84,75 @@ BEGIN
         INDEX idx_stg_hcpcs (HCPCS_Code)
     );
 
-    INSERT INTO bi_hcpcs_drug_pricing_stg
+    INSERT INTO bi_hcpcs_drug_pricing_stg (
+        HCPCS_Code, Manufacturer, NDC2, Drug_Name, BILLUNITSPKG, HCPCS_Code_Dosage,
+        Payment_Limit, Current_WAC_Package_Price, Current_WAC_Effect_Date,
+        Current_AWP_Package_Price, Current_AWP_Effect_Date, J_Code_Desc, month_name,
+        year_name, month_year, ASP_Override, WAC_per_unit, AWP_per_unit, ASP,
+        period_date, quarter_key, Quarter
+    )
     SELECT
-        CAST(HCPCS_Code AS CHAR(100)) AS HCPCS_Code,
-        CAST(LABELER_NAME AS CHAR(255)) AS Manufacturer,
-        CAST(NDC2 AS CHAR(50)) AS NDC2,
-        CAST(Drug_Name AS CHAR(500)) AS Drug_Name,
-        CAST(BILLUNITSPKG AS DECIMAL(18,4)) AS BILLUNITSPKG,
-        CAST(HCPCS_Code_Dosage AS CHAR(100)) AS HCPCS_Code_Dosage,
-        CAST(Payment_Limit AS DECIMAL(18,4)) AS Payment_Limit,
-        CAST(Current_WAC_Package_Price AS DECIMAL(18,4)) AS Current_WAC_Package_Price,
-        STR_TO_DATE(Current_WAC_Effect_Date, '%c/%e/%y') AS Current_WAC_Effect_Date,
-        CAST(Current_AWP_Package_Price AS DECIMAL(18,4)) AS Current_AWP_Package_Price,
-        STR_TO_DATE(Current_AWP_Effect_Date, '%c/%e/%y') AS Current_AWP_Effect_Date,
-        CAST(J_Code_Desc AS CHAR(500)) AS J_Code_Desc,
-        CAST(month_name AS CHAR(20)) AS month_name,
-        CAST(year_name AS CHAR(10)) AS year_name,
-        CAST(month_year AS CHAR(20)) AS month_year,
-        CAST(ASP_Override AS DECIMAL(18,4)) AS ASP_Override,
-        CASE
-            WHEN CAST(BILLUNITSPKG AS DECIMAL(18,4)) IS NOT NULL
-                 AND CAST(BILLUNITSPKG AS DECIMAL(18,4)) != 0
-                 AND CAST(Current_WAC_Package_Price AS DECIMAL(18,4)) IS NOT NULL
-            THEN CAST(Current_WAC_Package_Price AS DECIMAL(18,4)) / CAST(BILLUNITSPKG AS DECIMAL(18,4))
-            ELSE NULL
-        END AS WAC_per_unit,
-        CASE
-            WHEN CAST(BILLUNITSPKG AS DECIMAL(18,4)) IS NOT NULL
-                 AND CAST(BILLUNITSPKG AS DECIMAL(18,4)) != 0
-                 AND CAST(Current_AWP_Package_Price AS DECIMAL(18,4)) IS NOT NULL
-            THEN CAST(Current_AWP_Package_Price AS DECIMAL(18,4)) / CAST(BILLUNITSPKG AS DECIMAL(18,4))
-            ELSE NULL
-        END AS AWP_per_unit,
-        CASE
-            WHEN CAST(ASP_Override AS DECIMAL(18,4)) IS NOT NULL
-                 AND CAST(ASP_Override AS DECIMAL(18,4)) != 0
-            THEN CAST(ASP_Override AS DECIMAL(18,4))
-            WHEN CAST(Payment_Limit AS DECIMAL(18,4)) IS NOT NULL
-                 AND CAST(Payment_Limit AS DECIMAL(18,4)) != 0
-            THEN CAST(Payment_Limit AS DECIMAL(18,4)) / 1.06
-            ELSE NULL
-        END AS ASP,
-        STR_TO_DATE(
-            CONCAT('01-', REPLACE(REPLACE(month_year, '.', '-'), 'Feburary', 'February')),
-            '%d-%M-%Y'
-        ) AS period_date,
-        CONCAT(
-            'Q',
-            QUARTER(STR_TO_DATE(CONCAT('01-', REPLACE(REPLACE(month_year, '.', '-'), 'Feburary', 'February')), '%d-%M-%Y')),
-            YEAR(STR_TO_DATE(CONCAT('01-', REPLACE(REPLACE(month_year, '.', '-'), 'Feburary', 'February')), '%d-%M-%Y'))
-        ) AS Quarter
-    FROM cms_drug_pricing
-    WHERE HCPCS_Code IS NOT NULL
-        AND month_year IS NOT NULL
-        AND month_year != 'month_year'
-        AND month_year LIKE '%.%'
-        AND LENGTH(month_year) >= 8;
+        HCPCS_Code, Manufacturer, NDC2, Drug_Name, BILLUNITSPKG, HCPCS_Code_Dosage,
+        Payment_Limit, Current_WAC_Package_Price, Current_WAC_Effect_Date,
+        Current_AWP_Package_Price, Current_AWP_Effect_Date, J_Code_Desc, month_name,
+        year_name, month_year, ASP_Override, WAC_per_unit, AWP_per_unit, ASP,
+        period_date, quarter_key, Quarter
+    FROM bi_cms_drug_pricing_stg
+    WHERE quarter_start = v_quarter_start;
+
+    SET @bi_staged_rows = ROW_COUNT();
+
+    -- Lets the step procedures skip re-staging the same quarter
+    SET @bi_staged_quarter_key = YEAR(p_target_date) * 10 + QUARTER(p_target_date);
+
+    CALL sp_log_refresh_step('stage_quarter', @bi_staged_quarter_key, NULL, @bi_staged_rows, v_step_start, 0);
+
+END //
+
+DROP PROCEDURE IF EXISTS sp_process_quarter_pricing //
+
+CREATE PROCEDURE sp_process_quarter_pricing(
+    IN p_target_date DATE,
+    OUT p_rows_pricing INT
+)
+BEGIN
+    DECLARE v_start_time DATETIME;
+    DECLARE v_quarter_key INT;
+    DECLARE v_pricing_table VARCHAR(64);
+    DECLARE v_historical_table VARCHAR(64);
+    DECLARE v_step VARCHAR(64) DEFAULT 'pricing_setup';
+    DECLARE v_step_start DATETIME(3);
+    DECLARE v_rows_in INT;
+    DECLARE v_rows_out INT;
+    DECLARE v_error_code INT;
+    DECLARE v_error_message TEXT;
+
+    -- Error handler
+    DECLARE exit handler FOR SQLEXCEPTION
+    BEGIN
+        GET DIAGNOSTICS CONDITION 1
+            v_error_code = MYSQL_ERRNO,
+            v_error_message = MESSAGE_TEXT;
+        CALL sp_log_refresh_step(v_step, v_quarter_key, v_rows_in, NULL, v_step_start, v_error_code);
+        INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+        VALUES ('manual', 'FAILED', CONCAT('Error processing pricing for ', DATE_FORMAT(p_target_date, '%Y-%m-%d'), ': ', v_error_message), v_start_time, NOW());
+        RESIGNAL;
+    END;
+
+    SET v_start_time = NOW();
+    SET v_step_start = NOW(3);
+    SET p_rows_pricing = 0;
+    SET v_quarter_key = YEAR(p_target_date) * 10 + QUARTER(p_target_date);
+    SET v_pricing_table = IFNULL(@bi_pricing_table, 'bi_hcpcs_drug_pricing');
+    SET v_historical_table = IFNULL(@bi_historical_table, 'bi_historical_pricing');
+
+    -- Reuse the session staging table when it already holds this quarter
+    IF NOT (@bi_staged_quarter_key <=> v_quarter_key) THEN
+        CALL sp_stage_single_quarter(p_target_date);
+    END IF;
 
     -- =====================================================
-    -- STEP 2: PROCESS bi_hcpcs_drug_pricing (TARGET DATE ONLY)
+    -- PROCESS bi_hcpcs_drug_pricing (TARGET DATE ONLY)
     -- =====================================================
 
     CREATE TABLE IF NOT EXISTS bi_hcpcs_drug_pricing (
@@ -147,104 +177,128 @@ BEGIN
         Median_AWP DECIMAL(18,4),
         ASP_by_WAC_ratio DECIMAL(10,4),
         ASP_by_AWP_ratio DECIMAL(10,4),
+        period_date DATE,
+        quarter_key INT,
         Updated_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         PRIMARY KEY (HCPCS_Code, month_year),
         INDEX idx_hcpcs (HCPCS_Code),
         INDEX idx_month_year (month_year),
-        INDEX idx_manufacturer (Manufacturer),
-        INDEX idx_hcpcs_drug (hcpcs_drug),
-        FULLTEXT INDEX idx_hcpcs_drug_ft (hcpcs_drug)
+        INDEX idx_quarter_key (quarter_key)
     );
 
-    DROP TEMPORARY TABLE IF EXISTS temp_distinct_hcpcs_month;
-    DROP TEMPORARY TABLE IF EXISTS temp_wac_ranked;
-    DROP TEMPORARY TABLE IF EXISTS temp_awp_ranked;
     DROP TEMPORARY TABLE IF EXISTS temp_median_calcs;
+    DROP TEMPORARY TABLE IF EXISTS temp_prev_quarter_asp;
     DROP TEMPORARY TABLE IF EXISTS temp_quarter_data;
     DROP TEMPORARY TABLE IF EXISTS temp_pricing_upsert;
 
-    -- Get distinct HCPCS-month_year combinations (TARGET DATE ONLY)
-    CREATE TEMPORARY TABLE temp_distinct_hcpcs_month AS
-    SELECT DISTINCT HCPCS_Code, month_year
-    FROM bi_hcpcs_drug_pricing_stg
-    WHERE HCPCS_Code IS NOT NULL
-        AND month_year IS NOT NULL
-        AND period_date = p_target_date;
-
-    -- Create ranked WAC data (TARGET DATE ONLY)
-    CREATE TEMPORARY TABLE temp_wac_ranked AS
-    SELECT
-        HCPCS_Code,
-        month_year,
-        WAC_per_unit,
-        ROW_NUMBER() OVER (PARTITION BY HCPCS_Code, month_year ORDER BY WAC_per_unit) AS row_num,
-        COUNT(*) OVER (PARTITION BY HCPCS_Code, month_year) AS total_count
-    FROM bi_hcpcs_drug_pricing_stg
-    WHERE WAC_per_unit IS NOT NULL
-        AND period_date = p_target_date;
-
-    -- Create ranked AWP data (TARGET DATE ONLY)
-    CREATE TEMPORARY TABLE temp_awp_ranked AS
-    SELECT
-        HCPCS_Code,
-        month_year,
-        AWP_per_unit,
-        ROW_NUMBER() OVER (PARTITION BY HCPCS_Code, month_year ORDER BY AWP_per_unit) AS row_num,
-        COUNT(*) OVER (PARTITION BY HCPCS_Code, month_year) AS total_count
-    FROM bi_hcpcs_drug_pricing_stg
-    WHERE AWP_per_unit IS NOT NULL
-        AND period_date = p_target_date;
+    SET v_step = 'pricing_medians';
+    SET v_step_start = NOW(3);
+    SET v_rows_in = @bi_staged_rows;
 
-    -- Calculate medians
+    -- Calculate medians in ONE pass (TARGET DATE ONLY)
+    -- WAC and AWP are ranked side by side in a single windowed scan;
+    -- NULLs sort last and are not counted, so row numbers 1..n cover
+    -- exactly the non-NULL values. The middle row(s) are then picked with
+    -- a conditional AVG: odd n -> one row, even n -> mean of the two.
     CREATE TEMPORARY TABLE temp_median_calcs AS
     SELECT
-        t1.HCPCS_Code,
-        t1.month_year,
-        AVG(wac_ranked.WAC_per_unit) AS Median_WAC,
-        AVG(awp_ranked.AWP_per_unit) AS Median_AWP
-    FROM temp_distinct_hcpcs_month t1
-    LEFT JOIN temp_wac_ranked wac_ranked
-        ON t1.HCPCS_Code = wac_ranked.HCPCS_Code
-        AND t1.month_year = wac_ranked.month_year
-        AND (
-            wac_ranked.row_num = FLOOR((wac_ranked.total_count + 1) / 2)
-            OR wac_ranked.row_num = FLOOR((wac_ranked.total_count + 2) / 2)
-        )
-    LEFT JOIN temp_awp_ranked awp_ranked
-        ON t1.HCPCS_Code = awp_ranked.HCPCS_Code
-        AND t1.month_year = awp_ranked.month_year
-        AND (
-            awp_ranked.row_num = FLOOR((awp_ranked.total_count + 1) / 2)
-            OR awp_ranked.row_num = FLOOR((awp_ranked.total_count + 2) / 2)
-        )
-    GROUP BY t1.HCPCS_Code, t1.month_year;
-
-    -- Create quarter data with LAG for previous quarter (TARGET DATE ONLY)
+        ranked.HCPCS_Code,
+        ranked.month_year,
+        AVG(CASE
+            WHEN ranked.wac_rn IN (FLOOR((ranked.wac_cnt + 1) / 2), FLOOR((ranked.wac_cnt + 2) / 2))
+            THEN ranked.WAC_per_unit
+        END) AS Median_WAC,
+        AVG(CASE
+            WHEN ranked.awp_rn IN (FLOOR((ranked.awp_cnt + 1) / 2), FLOOR((ranked.awp_cnt + 2) / 2))
+            THEN ranked.AWP_per_unit
+        END) AS Median_AWP
+    FROM (
+        SELECT
+            HCPCS_Code,
+            month_year,
+            WAC_per_unit,
+            AWP_per_unit,
+            ROW_NUMBER() OVER (PARTITION BY HCPCS_Code, month_year ORDER BY WAC_per_unit IS NULL, WAC_per_unit) AS wac_rn,
+            COUNT(WAC_per_unit) OVER (PARTITION BY HCPCS_Code, month_year) AS wac_cnt,
+            ROW_NUMBER() OVER (PARTITION BY HCPCS_Code, month_year ORDER BY AWP_per_unit IS NULL, AWP_per_unit) AS awp_rn,
+            COUNT(AWP_per_unit) OVER (PARTITION BY HCPCS_Code, month_year) AS awp_cnt
+        FROM bi_hcpcs_drug_pricing_stg
+        WHERE HCPCS_Code IS NOT NULL
+            AND month_year IS NOT NULL
+            AND period_date = p_target_date
+    ) ranked
+    GROUP BY ranked.HCPCS_Code, ranked.month_year;
+
+    SELECT COUNT(*) INTO v_rows_out FROM temp_median_calcs;
+    CALL sp_log_refresh_step(v_step, v_quarter_key, v_rows_in, v_rows_out, v_step_start, 0);
+
+    SET v_step = 'pricing_prev_asp';
+    SET v_step_start = NOW(3);
+
+    -- Previous-quarter ASP as a set: one row per HCPCS_Code with the ASP of
+    -- its latest non-NA quarter before the target quarter.
     -- NOTE: We look up ASP_prev_quarter from bi_historical_pricing since
-    -- bi_hcpcs_drug_pricing only keeps the latest quarter's data
-    -- IMPORTANT: Quarter strings (e.g., Q12026) don't sort chronologically,
-    -- so we convert to a sortable format: YYYYQ (e.g., 20261 for Q1 2026)
+    -- bi_hcpcs_drug_pricing only keeps the latest quarter's data.
+    -- quarter_key (YYYYQ) sorts chronologically and is indexed with
+    -- HCPCS_Code, so this is one ranged pass instead of a subquery per row.
+    CREATE TEMPORARY TABLE temp_prev_quarter_asp (
+        HCPCS_Code VARCHAR(100) NOT NULL,
+        ASP_prev_quarter DECIMAL(18,4),
+        PRIMARY KEY (HCPCS_Code)
+    );
+
+    -- (dynamic: reads the historical table being built - live or shadow)
+    SET @bi_sql = CONCAT('
+        INSERT INTO temp_prev_quarter_asp (HCPCS_Code, ASP_prev_quarter)
+        SELECT ranked.HCPCS_Code, ranked.ASP_prev_quarter
+        FROM (
+            SELECT
+                prev.HCPCS_Code,
+                CAST(prev.ASP AS DECIMAL(18,4)) AS ASP_prev_quarter,
+                ROW_NUMBER() OVER (PARTITION BY prev.HCPCS_Code ORDER BY prev.quarter_key DESC) AS rn
+            FROM `', v_historical_table, '` prev
+            INNER JOIN (
+                SELECT DISTINCT HCPCS_Code
+                FROM bi_hcpcs_drug_pricing_stg
+                WHERE ASP IS NOT NULL
+                    AND period_date = ', QUOTE(p_target_date), '
+            ) cur
+                ON cur.HCPCS_Code = prev.HCPCS_Code
+            WHERE prev.quarter_key < ', v_quarter_key, '
+                AND prev.ASP != ''NA''
+        ) ranked
+        WHERE ranked.rn = 1');
+    PREPARE bi_stmt FROM @bi_sql;
+    EXECUTE bi_stmt;
+    SET v_rows_out = ROW_COUNT();
+    DEALLOCATE PREPARE bi_stmt;
+
+    CALL sp_log_refresh_step(v_step, v_quarter_key, v_rows_in, v_rows_out, v_step_start, 0);
+
+    SET v_step = 'pricing_quarter_data';
+    SET v_step_start = NOW(3);
+
+    -- Create quarter data with previous-quarter ASP (TARGET DATE ONLY)
     CREATE TEMPORARY TABLE temp_quarter_data AS
     SELECT
         s.HCPCS_Code,
         s.month_year,
         s.Quarter,
         s.ASP,
-        (
-            SELECT CAST(prev.ASP AS DECIMAL(18,4))
-            FROM bi_historical_pricing prev
-            WHERE prev.HCPCS_Code = s.HCPCS_Code
-                AND CONCAT(SUBSTRING(prev.Quarter, 3), SUBSTRING(prev.Quarter, 2, 1)) <
-                    CONCAT(SUBSTRING(s.Quarter, 3), SUBSTRING(s.Quarter, 2, 1))
-                AND prev.ASP != 'NA'
-            ORDER BY CONCAT(SUBSTRING(prev.Quarter, 3), SUBSTRING(prev.Quarter, 2, 1)) DESC
-            LIMIT 1
-        ) AS ASP_prev_quarter,
+        pq.ASP_prev_quarter,
         s.period_date
     FROM bi_hcpcs_drug_pricing_stg s
+    LEFT JOIN temp_prev_quarter_asp pq
+        ON pq.HCPCS_Code = s.HCPCS_Code
     WHERE s.ASP IS NOT NULL
         AND s.period_date = p_target_date;
 
+    SELECT COUNT(*) INTO v_rows_out FROM temp_quarter_data;
+    CALL sp_log_refresh_step(v_step, v_quarter_key, v_rows_in, v_rows_out, v_step_start, 0);
+
+    SET v_step = 'pricing_build_upsert';
+    SET v_step_start = NOW(3);
+
     -- Create temporary table with calculated data
     CREATE TEMPORARY TABLE temp_pricing_upsert AS
     SELECT
@@ -284,7 +338,9 @@ BEGIN
                  AND bd.ASP IS NOT NULL
             THEN bd.ASP / mc.Median_AWP
             ELSE NULL
-        END AS ASP_by_AWP_ratio
+        END AS ASP_by_AWP_ratio,
+        bd.period_date,
+        bd.quarter_key
     FROM (
         SELECT DISTINCT
             s.HCPCS_Code,
@@ -302,7 +358,8 @@ BEGIN
             s.ASP_Override,
             s.ASP,
             s.Quarter,
-            s.period_date
+            s.period_date,
+            s.quarter_key
         FROM bi_hcpcs_drug_pricing_stg s
         WHERE s.period_date = p_target_date
     ) bd
@@ -313,68 +370,135 @@ BEGIN
         ON bd.HCPCS_Code = qd.HCPCS_Code
         AND bd.month_year = qd.month_year;
 
+    SELECT COUNT(*) INTO v_rows_out FROM temp_pricing_upsert;
+    CALL sp_log_refresh_step(v_step, v_quarter_key, v_rows_in, v_rows_out, v_step_start, 0);
+
     -- =====================================================
     -- CLEANUP: Delete old data to keep only latest quarter
     -- bi_hcpcs_drug_pricing should ONLY have the most recent quarter
     -- =====================================================
 
-    -- Find the maximum quarter date being processed
-    SET @max_quarter_date = (
-        SELECT MAX(STR_TO_DATE(CONCAT('01-', REPLACE(REPLACE(month_year, '.', '-'), 'Feburary', 'February')), '%d-%M-%Y'))
-        FROM bi_hcpcs_drug_pricing
-    );
+    SET v_step = 'pricing_delete';
+    SET v_step_start = NOW(3);
+    SET v_rows_in = v_rows_out;
 
-    -- Delete all data that's NOT from the most recent quarter
-    -- Keep only data from the same quarter as the max date
-    DELETE FROM bi_hcpcs_drug_pricing
-    WHERE CONCAT('Q',
-                 QUARTER(STR_TO_DATE(CONCAT('01-', REPLACE(REPLACE(month_year, '.', '-'), 'Feburary', 'February')), '%d-%M-%Y')),
-                 YEAR(STR_TO_DATE(CONCAT('01-', REPLACE(REPLACE(month_year, '.', '-'), 'Feburary', 'February')), '%d-%M-%Y'))
-          ) != CONCAT('Q', QUARTER(@max_quarter_date), YEAR(@max_quarter_date));
-
-    -- UPSERT into bi_hcpcs_drug_pricing
-    INSERT INTO bi_hcpcs_drug_pricing (
-        HCPCS_Code, Manufacturer, Drug_Name, hcpcs_drug, BILLUNITSPKG, HCPCS_Code_Dosage,
-        Payment_Limit, Current_WAC_Effect_Date, Current_AWP_Effect_Date,
-        J_Code_Desc, month_name, year_name, month_year, ASP_Override,
-        ASP_current_quarter, ASP_prev_quarter, ASP_Quarterly_Change_Pct,
-        Median_WAC, Median_AWP, ASP_by_WAC_ratio, ASP_by_AWP_ratio,
-        Updated_date
-    )
-    SELECT
-        HCPCS_Code, Manufacturer, Drug_Name, hcpcs_drug, BILLUNITSPKG, HCPCS_Code_Dosage,
-        Payment_Limit, Current_WAC_Effect_Date, Current_AWP_Effect_Date,
-        J_Code_Desc, month_name, year_name, month_year, ASP_Override,
-        ASP_current_quarter, ASP_prev_quarter, ASP_Quarterly_Change_Pct,
-        Median_WAC, Median_AWP, ASP_by_WAC_ratio, ASP_by_AWP_ratio,
-        CURRENT_TIMESTAMP
-    FROM temp_pricing_upsert
-    ON DUPLICATE KEY UPDATE
-        Manufacturer = VALUES(Manufacturer),
-        Drug_Name = VALUES(Drug_Name),
-        hcpcs_drug = VALUES(hcpcs_drug),
-        BILLUNITSPKG = VALUES(BILLUNITSPKG),
-        HCPCS_Code_Dosage = VALUES(HCPCS_Code_Dosage),
-        Payment_Limit = VALUES(Payment_Limit),
-        Current_WAC_Effect_Date = VALUES(Current_WAC_Effect_Date),
-        Current_AWP_Effect_Date = VALUES(Current_AWP_Effect_Date),
-        J_Code_Desc = VALUES(J_Code_Desc),
-        month_name = VALUES(month_name),
-        year_name = VALUES(year_name),
-        ASP_Override = VALUES(ASP_Override),
-        ASP_current_quarter = VALUES(ASP_current_quarter),
-        ASP_prev_quarter = VALUES(ASP_prev_quarter),
-        ASP_Quarterly_Change_Pct = VALUES(ASP_Quarterly_Change_Pct),
-        Median_WAC = VALUES(Median_WAC),
-        Median_AWP = VALUES(Median_AWP),
-        ASP_by_WAC_ratio = VALUES(ASP_by_WAC_ratio),
-        ASP_by_AWP_ratio = VALUES(ASP_by_AWP_ratio),
-        Updated_date = CURRENT_TIMESTAMP;
+    -- Latest quarter = newest of what is stored and what is being processed
+    -- (quarter_key is indexed, so both statements are index range operations)
+    SET @bi_sql = CONCAT('SELECT MAX(quarter_key) INTO @max_quarter_key FROM `', v_pricing_table, '`');
+    PREPARE bi_stmt FROM @bi_sql;
+    EXECUTE bi_stmt;
+    DEALLOCATE PREPARE bi_stmt;
+
+    SET @max_quarter_key = GREATEST(IFNULL(@max_quarter_key, 0), v_quarter_key);
 
+    -- Delete all data that's NOT from the most recent quarter
+    SET @bi_sql = CONCAT('DELETE FROM `', v_pricing_table, '` WHERE quarter_key < @max_quarter_key');
+    PREPARE bi_stmt FROM @bi_sql;
+    EXECUTE bi_stmt;
+    CALL sp_log_refresh_step(v_step, v_quarter_key, NULL, ROW_COUNT(), v_step_start, 0);
+    DEALLOCATE PREPARE bi_stmt;
+
+    SET v_step = 'pricing_upsert';
+    SET v_step_start = NOW(3);
+
+    -- UPSERT into bi_hcpcs_drug_pricing (or its shadow)
+    SET @bi_sql = CONCAT('
+        INSERT INTO `', v_pricing_table, '` (
+            HCPCS_Code, Manufacturer, Drug_Name, hcpcs_drug, BILLUNITSPKG, HCPCS_Code_Dosage,
+            Payment_Limit, Current_WAC_Effect_Date, Current_AWP_Effect_Date,
+            J_Code_Desc, month_name, year_name, month_year, ASP_Override,
+            ASP_current_quarter, ASP_prev_quarter, ASP_Quarterly_Change_Pct,
+            Median_WAC, Median_AWP, ASP_by_WAC_ratio, ASP_by_AWP_ratio,
+            period_date, quarter_key, Updated_date
+        )
+        SELECT
+            HCPCS_Code, Manufacturer, Drug_Name, hcpcs_drug, BILLUNITSPKG, HCPCS_Code_Dosage,
+            Payment_Limit, Current_WAC_Effect_Date, Current_AWP_Effect_Date,
+            J_Code_Desc, month_name, year_name, month_year, ASP_Override,
+            ASP_current_quarter, ASP_prev_quarter, ASP_Quarterly_Change_Pct,
+            Median_WAC, Median_AWP, ASP_by_WAC_ratio, ASP_by_AWP_ratio,
+            period_date, quarter_key, CURRENT_TIMESTAMP
+        FROM temp_pricing_upsert
+        ON DUPLICATE KEY UPDATE
+            Manufacturer = VALUES(Manufacturer),
+            Drug_Name = VALUES(Drug_Name),
+            hcpcs_drug = VALUES(hcpcs_drug),
+            BILLUNITSPKG = VALUES(BILLUNITSPKG),
+            HCPCS_Code_Dosage = VALUES(HCPCS_Code_Dosage),
+            Payment_Limit = VALUES(Payment_Limit),
+            Current_WAC_Effect_Date = VALUES(Current_WAC_Effect_Date),
+            Current_AWP_Effect_Date = VALUES(Current_AWP_Effect_Date),
+            J_Code_Desc = VALUES(J_Code_Desc),
+            month_name = VALUES(month_name),
+            year_name = VALUES(year_name),
+            ASP_Override = VALUES(ASP_Override),
+            ASP_current_quarter = VALUES(ASP_current_quarter),
+            ASP_prev_quarter = VALUES(ASP_prev_quarter),
+            ASP_Quarterly_Change_Pct = VALUES(ASP_Quarterly_Change_Pct),
+            Median_WAC = VALUES(Median_WAC),
+            Median_AWP = VALUES(Median_AWP),
+            ASP_by_WAC_ratio = VALUES(ASP_by_WAC_ratio),
+            ASP_by_AWP_ratio = VALUES(ASP_by_AWP_ratio),
+            period_date = VALUES(period_date),
+            quarter_key = VALUES(quarter_key),
+            Updated_date = CURRENT_TIMESTAMP');
+    PREPARE bi_stmt FROM @bi_sql;
+    EXECUTE bi_stmt;
     SELECT ROW_COUNT() INTO p_rows_pricing;
+    DEALLOCATE PREPARE bi_stmt;
+
+    CALL sp_log_refresh_step(v_step, v_quarter_key, v_rows_in, p_rows_pricing, v_step_start, 0);
+
+    -- Clean up temporary tables
+    DROP TEMPORARY TABLE IF EXISTS temp_median_calcs;
+    DROP TEMPORARY TABLE IF EXISTS temp_prev_quarter_asp;
+    DROP TEMPORARY TABLE IF EXISTS temp_quarter_data;
+    DROP TEMPORARY TABLE IF EXISTS temp_pricing_upsert;
+
+END //
+
+DROP PROCEDURE IF EXISTS sp_process_quarter_historical //
+
+CREATE PROCEDURE sp_process_quarter_historical(
+    IN p_target_date DATE,
+    OUT p_rows_historical INT
+)
+BEGIN
+    DECLARE v_start_time DATETIME;
+    DECLARE v_quarter_key INT;
+    DECLARE v_historical_table VARCHAR(64);
+    DECLARE v_step VARCHAR(64) DEFAULT 'historical_setup';
+    DECLARE v_step_start DATETIME(3);
+    DECLARE v_rows_in INT;
+    DECLARE v_rows_out INT;
+    DECLARE v_error_code INT;
+    DECLARE v_error_message TEXT;
+
+    -- Error handler
+    DECLARE exit handler FOR SQLEXCEPTION
+    BEGIN
+        GET DIAGNOSTICS CONDITION 1
+            v_error_code = MYSQL_ERRNO,
+            v_error_message = MESSAGE_TEXT;
+        CALL sp_log_refresh_step(v_step, v_quarter_key, v_rows_in, NULL, v_step_start, v_error_code);
+        INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+        VALUES ('manual', 'FAILED', CONCAT('Error processing historical for ', DATE_FORMAT(p_target_date, '%Y-%m-%d'), ': ', v_error_message), v_start_time, NOW());
+        RESIGNAL;
+    END;
+
+    SET v_start_time = NOW();
+    SET v_step_start = NOW(3);
+    SET p_rows_historical = 0;
+    SET v_quarter_key = YEAR(p_target_date) * 10 + QUARTER(p_target_date);
+    SET v_historical_table = IFNULL(@bi_historical_table, 'bi_historical_pricing');
+
+    -- Reuse the session staging table when it already holds this quarter
+    IF NOT (@bi_staged_quarter_key <=> v_quarter_key) THEN
+        CALL sp_stage_single_quarter(p_target_date);
+    END IF;
 
     -- =====================================================
-    -- STEP 3: PROCESS bi_historical_pricing (TARGET QUARTER ONLY)
+    -- PROCESS bi_historical_pricing (TARGET QUARTER ONLY)
     -- =====================================================
 
     CREATE TABLE IF NOT EXISTS bi_historical_pricing (
@@ -385,30 +509,23 @@ BEGIN
         ASP VARCHAR(20),
         Median_WAC VARCHAR(20),
         Median_AWP VARCHAR(20),
+        quarter_key INT,
         Updated_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         PRIMARY KEY (HCPCS_Code, Quarter),
         INDEX idx_hist_hcpcs (HCPCS_Code),
         INDEX idx_hist_quarter (Quarter),
-        INDEX idx_hist_manufacturer (Manufacturer),
-        INDEX idx_hist_hcpcs_drug (hcpcs_drug),
-        FULLTEXT INDEX idx_hist_hcpcs_drug_ft (hcpcs_drug)
+        INDEX idx_hist_quarter_key (quarter_key),
+        INDEX idx_hist_hcpcs_quarter_key (HCPCS_Code, quarter_key)
     );
 
-    DROP TEMPORARY TABLE IF EXISTS temp_hist_distinct_hcpcs_qtr;
     DROP TEMPORARY TABLE IF EXISTS temp_hist_first_period;
     DROP TEMPORARY TABLE IF EXISTS temp_hist_first_month;
-    DROP TEMPORARY TABLE IF EXISTS temp_hist_wac_ranked;
-    DROP TEMPORARY TABLE IF EXISTS temp_hist_awp_ranked;
     DROP TEMPORARY TABLE IF EXISTS temp_hist_median_calcs;
     DROP TEMPORARY TABLE IF EXISTS temp_historical_upsert;
 
-    -- Get distinct HCPCS-Quarter combinations (TARGET QUARTER ONLY)
-    CREATE TEMPORARY TABLE temp_hist_distinct_hcpcs_qtr AS
-    SELECT DISTINCT HCPCS_Code, Quarter
-    FROM bi_hcpcs_drug_pricing_stg
-    WHERE HCPCS_Code IS NOT NULL
-        AND Quarter IS NOT NULL
-        AND Quarter = CONCAT('Q', QUARTER(p_target_date), YEAR(p_target_date));
+    SET v_step = 'historical_first_period';
+    SET v_step_start = NOW(3);
+    SET v_rows_in = @bi_staged_rows;
 
     -- Get first period date for each HCPCS-Quarter (TARGET QUARTER ONLY)
     CREATE TEMPORARY TABLE temp_hist_first_period AS
@@ -417,10 +534,15 @@ BEGIN
         Quarter,
         MIN(period_date) AS first_period_date
     FROM bi_hcpcs_drug_pricing_stg
-    WHERE Quarter IS NOT NULL
-        AND Quarter = CONCAT('Q', QUARTER(p_target_date), YEAR(p_target_date))
+    WHERE quarter_key = v_quarter_key
     GROUP BY HCPCS_Code, Quarter;
 
+    SELECT COUNT(*) INTO v_rows_out FROM temp_hist_first_period;
+    CALL sp_log_refresh_step(v_step, v_quarter_key, v_rows_in, v_rows_out, v_step_start, 0);
+
+    SET v_step = 'historical_first_month';
+    SET v_step_start = NOW(3);
+
     -- Get first month data for each HCPCS-Quarter
     CREATE TEMPORARY TABLE temp_hist_first_month AS
     SELECT
@@ -438,59 +560,49 @@ BEGIN
         AND s.Quarter = fm.Quarter
         AND s.period_date = fm.first_period_date;
 
-    -- Create ranked WAC data (TARGET QUARTER - first month only)
-    CREATE TEMPORARY TABLE temp_hist_wac_ranked AS
-    SELECT
-        s.HCPCS_Code,
-        s.Quarter,
-        s.WAC_per_unit,
-        ROW_NUMBER() OVER (PARTITION BY s.HCPCS_Code, s.Quarter ORDER BY s.WAC_per_unit) AS row_num,
-        COUNT(*) OVER (PARTITION BY s.HCPCS_Code, s.Quarter) AS total_count
-    FROM bi_hcpcs_drug_pricing_stg s
-    INNER JOIN temp_hist_first_month fm
-        ON s.HCPCS_Code = fm.HCPCS_Code
-        AND s.Quarter = fm.Quarter
-        AND MONTH(s.period_date) = fm.first_month
-    WHERE s.WAC_per_unit IS NOT NULL;
+    SELECT COUNT(*) INTO v_rows_out FROM temp_hist_first_month;
+    CALL sp_log_refresh_step(v_step, v_quarter_key, v_rows_in, v_rows_out, v_step_start, 0);
 
-    -- Create ranked AWP data (TARGET QUARTER - first month only)
-    CREATE TEMPORARY TABLE temp_hist_awp_ranked AS
-    SELECT
-        s.HCPCS_Code,
-        s.Quarter,
-        s.AWP_per_unit,
-        ROW_NUMBER() OVER (PARTITION BY s.HCPCS_Code, s.Quarter ORDER BY s.AWP_per_unit) AS row_num,
-        COUNT(*) OVER (PARTITION BY s.HCPCS_Code, s.Quarter) AS total_count
-    FROM bi_hcpcs_drug_pricing_stg s
-    INNER JOIN temp_hist_first_month fm
-        ON s.HCPCS_Code = fm.HCPCS_Code
-        AND s.Quarter = fm.Quarter
-        AND MONTH(s.period_date) = fm.first_month
-    WHERE s.AWP_per_unit IS NOT NULL;
+    SET v_step = 'historical_medians';
+    SET v_step_start = NOW(3);
 
-    -- Calculate medians
+    -- Calculate medians in ONE pass (TARGET QUARTER - first month only)
+    -- Same single-pass median pattern as the pricing step
     CREATE TEMPORARY TABLE temp_hist_median_calcs AS
     SELECT
-        t1.HCPCS_Code,
-        t1.Quarter,
-        AVG(wac_ranked.WAC_per_unit) AS Median_WAC,
-        AVG(awp_ranked.AWP_per_unit) AS Median_AWP
-    FROM temp_hist_distinct_hcpcs_qtr t1
-    LEFT JOIN temp_hist_wac_ranked wac_ranked
-        ON t1.HCPCS_Code = wac_ranked.HCPCS_Code
-        AND t1.Quarter = wac_ranked.Quarter
-        AND (
-            wac_ranked.row_num = FLOOR((wac_ranked.total_count + 1) / 2)
-            OR wac_ranked.row_num = FLOOR((wac_ranked.total_count + 2) / 2)
-        )
-    LEFT JOIN temp_hist_awp_ranked awp_ranked
-        ON t1.HCPCS_Code = awp_ranked.HCPCS_Code
-        AND t1.Quarter = awp_ranked.Quarter
-        AND (
-            awp_ranked.row_num = FLOOR((awp_ranked.total_count + 1) / 2)
-            OR awp_ranked.row_num = FLOOR((awp_ranked.total_count + 2) / 2)
-        )
-    GROUP BY t1.HCPCS_Code, t1.Quarter;
+        ranked.HCPCS_Code,
+        ranked.Quarter,
+        AVG(CASE
+            WHEN ranked.wac_rn IN (FLOOR((ranked.wac_cnt + 1) / 2), FLOOR((ranked.wac_cnt + 2) / 2))
+            THEN ranked.WAC_per_unit
+        END) AS Median_WAC,
+        AVG(CASE
+            WHEN ranked.awp_rn IN (FLOOR((ranked.awp_cnt + 1) / 2), FLOOR((ranked.awp_cnt + 2) / 2))
+            THEN ranked.AWP_per_unit
+        END) AS Median_AWP
+    FROM (
+        SELECT
+            s.HCPCS_Code,
+            s.Quarter,
+            s.WAC_per_unit,
+            s.AWP_per_unit,
+            ROW_NUMBER() OVER (PARTITION BY s.HCPCS_Code, s.Quarter ORDER BY s.WAC_per_unit IS NULL, s.WAC_per_unit) AS wac_rn,
+            COUNT(s.WAC_per_unit) OVER (PARTITION BY s.HCPCS_Code, s.Quarter) AS wac_cnt,
+            ROW_NUMBER() OVER (PARTITION BY s.HCPCS_Code, s.Quarter ORDER BY s.AWP_per_unit IS NULL, s.AWP_per_unit) AS awp_rn,
+            COUNT(s.AWP_per_unit) OVER (PARTITION BY s.HCPCS_Code, s.Quarter) AS awp_cnt
+        FROM bi_hcpcs_drug_pricing_stg s
+        INNER JOIN temp_hist_first_period fp
+            ON s.HCPCS_Code = fp.HCPCS_Code
+            AND s.Quarter = fp.Quarter
+            AND s.period_date = fp.first_period_date
+    ) ranked
+    GROUP BY ranked.HCPCS_Code, ranked.Quarter;
+
+    SELECT COUNT(*) INTO v_rows_out FROM temp_hist_median_calcs;
+    CALL sp_log_refresh_step(v_step, v_quarter_key, v_rows_in, v_rows_out, v_step_start, 0);
+
+    SET v_step = 'historical_build_upsert';
+    SET v_step_start = NOW(3);
 
     -- Create final historical upsert table
     CREATE TEMPORARY TABLE temp_historical_upsert AS
@@ -501,46 +613,70 @@ BEGIN
         fm.hcpcs_drug,
         COALESCE(CAST(ROUND(AVG(fm.ASP), 2) AS CHAR(20)), 'NA') AS ASP,
         COALESCE(CAST(ROUND(mc.Median_WAC, 2) AS CHAR(20)), 'NA') AS Median_WAC,
-        COALESCE(CAST(ROUND(mc.Median_AWP, 2) AS CHAR(20)), 'NA') AS Median_AWP
+        COALESCE(CAST(ROUND(mc.Median_AWP, 2) AS CHAR(20)), 'NA') AS Median_AWP,
+        v_quarter_key AS quarter_key
     FROM temp_hist_first_month fm
     LEFT JOIN temp_hist_median_calcs mc
         ON fm.HCPCS_Code = mc.HCPCS_Code
         AND fm.Quarter = mc.Quarter
     GROUP BY fm.HCPCS_Code, fm.Quarter, fm.Manufacturer, fm.hcpcs_drug, mc.Median_WAC, mc.Median_AWP;
 
-    -- UPSERT into bi_historical_pricing
-    INSERT INTO bi_historical_pricing (
-        HCPCS_Code, Quarter, Manufacturer, hcpcs_drug, ASP, Median_WAC, Median_AWP, Updated_date
-    )
-    SELECT
-        HCPCS_Code, Quarter, Manufacturer, hcpcs_drug, ASP, Median_WAC, Median_AWP, CURRENT_TIMESTAMP
-    FROM temp_historical_upsert
-    ON DUPLICATE KEY UPDATE
-        Manufacturer = VALUES(Manufacturer),
-        hcpcs_drug = VALUES(hcpcs_drug),
-        ASP = VALUES(ASP),
-        Median_WAC = VALUES(Median_WAC),
-        Median_AWP = VALUES(Median_AWP),
-        Updated_date = CURRENT_TIMESTAMP;
+    SELECT COUNT(*) INTO v_rows_out FROM temp_historical_upsert;
+    CALL sp_log_refresh_step(v_step, v_quarter_key, v_rows_in, v_rows_out, v_step_start, 0);
+
+    SET v_step = 'historical_upsert';
+    SET v_step_start = NOW(3);
+    SET v_rows_in = v_rows_out;
 
+    -- UPSERT into bi_historical_pricing (or its shadow)
+    SET @bi_sql = CONCAT('
+        INSERT INTO `', v_historical_table, '` (
+            HCPCS_Code, Quarter, Manufacturer, hcpcs_drug, ASP, Median_WAC, Median_AWP, quarter_key, Updated_date
+        )
+        SELECT
+            HCPCS_Code, Quarter, Manufacturer, hcpcs_drug, ASP, Median_WAC, Median_AWP, quarter_key, CURRENT_TIMESTAMP
+        FROM temp_historical_upsert
+        ON DUPLICATE KEY UPDATE
+            Manufacturer = VALUES(Manufacturer),
+            hcpcs_drug = VALUES(hcpcs_drug),
+            ASP = VALUES(ASP),
+            Median_WAC = VALUES(Median_WAC),
+            Median_AWP = VALUES(Median_AWP),
+            quarter_key = VALUES(quarter_key),
+            Updated_date = CURRENT_TIMESTAMP');
+    PREPARE bi_stmt FROM @bi_sql;
+    EXECUTE bi_stmt;
     SELECT ROW_COUNT() INTO p_rows_historical;
+    DEALLOCATE PREPARE bi_stmt;
+
+    CALL sp_log_refresh_step(v_step, v_quarter_key, v_rows_in, p_rows_historical, v_step_start, 0);
 
     -- Clean up temporary tables
-    DROP TEMPORARY TABLE IF EXISTS bi_hcpcs_drug_pricing_stg;
-    DROP TEMPORARY TABLE IF EXISTS temp_distinct_hcpcs_month;
-    DROP TEMPORARY TABLE IF EXISTS temp_wac_ranked;
-    DROP TEMPORARY TABLE IF EXISTS temp_awp_ranked;
-    DROP TEMPORARY TABLE IF EXISTS temp_median_calcs;
-    DROP TEMPORARY TABLE IF EXISTS temp_quarter_data;
-    DROP TEMPORARY TABLE IF EXISTS temp_pricing_upsert;
-    DROP TEMPORARY TABLE IF EXISTS temp_hist_distinct_hcpcs_qtr;
     DROP TEMPORARY TABLE IF EXISTS temp_hist_first_period;
     DROP TEMPORARY TABLE IF EXISTS temp_hist_first_month;
-    DROP TEMPORARY TABLE IF EXISTS temp_hist_wac_ranked;
-    DROP TEMPORARY TABLE IF EXISTS temp_hist_awp_ranked;
     DROP TEMPORARY TABLE IF EXISTS temp_hist_median_calcs;
     DROP TEMPORARY TABLE IF EXISTS temp_historical_upsert;
 
 END //
 
+DROP PROCEDURE IF EXISTS sp_process_single_quarter //
+
+CREATE PROCEDURE sp_process_single_quarter(
+    IN p_target_date DATE,
+    OUT p_rows_pricing INT,
+    OUT p_rows_historical INT
+)
+BEGIN
+    -- Always re-stage: the staged source may have changed since the
+    -- last call in this session (e.g. incremental restaging)
+    CALL sp_stage_single_quarter(p_target_date);
+
+    CALL sp_process_quarter_pricing(p_target_date, p_rows_pricing);
+    CALL sp_process_quarter_historical(p_target_date, p_rows_historical);
+
+    DROP TEMPORARY TABLE IF EXISTS bi_hcpcs_drug_pricing_stg;
+    SET @bi_staged_quarter_key = NULL;
+
+END //
+
 DELIMITER ;
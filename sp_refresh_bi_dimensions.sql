@@ -0,0 +1,494 @@
+-- =====================================================
+-- COMPACT DIMENSIONS + FACTS for the BI tables
+-- Surrogate-key dimension tables for the repeated text and
+-- narrow fact tables keyed by them; views keep the old
+-- column names for Superset
+-- =====================================================
+--
+-- Why: bi_hcpcs_drug_pricing / bi_historical_pricing repeat
+-- VARCHAR(100) HCPCS codes, VARCHAR(255) Manufacturer, VARCHAR(500)
+-- Drug_Name / J_Code_Desc and the VARCHAR(620) hcpcs_drug on every row,
+-- and bi_historical_pricing keeps its prices as VARCHAR ('NA' = missing).
+-- The fact rows below hold 3-byte keys, DATE / SMALLINT periods and
+-- DECIMAL prices instead, so scans touch several times fewer pages.
+--
+--   bi_dim_hcpcs         hcpcs_key        <- HCPCS_Code
+--   bi_dim_manufacturer  manufacturer_key <- Manufacturer
+--   bi_dim_drug          drug_key         <- Drug_Name + HCPCS_Code_Dosage + J_Code_Desc
+--   bi_fact_pricing      one row per HCPCS per month   (bi_hcpcs_drug_pricing)
+--   bi_fact_historical   one row per HCPCS per quarter (bi_historical_pricing)
+--
+--   vw_bi_hcpcs_drug_pricing / vw_bi_historical_pricing
+--       same columns as the wide tables
+--   vw_bi_consolidated_drug_data / vw_bi_historical_asp / _wac / _awp
+--       the dashboard datasets (dashboard_spec.json, Create-preset-dashboard.py),
+--       with the column names of the Create-bi-tables tables they replace
+--
+-- Dimension keys are stable: rows are only ever added, so keys held by
+-- exports or caches stay valid across refreshes.
+--
+-- p_quarter_key NULL = full rebuild: the facts are rebuilt into *_new
+-- tables and swapped in with one RENAME TABLE (v4, shadow, --mode full).
+-- p_quarter_key YYYYQ = one quarter: only that quarter's rows are rebuilt
+-- and replaced in one transaction, and fact quarters no longer in the wide
+-- tables are pruned (the incremental refresh, once per processed quarter).
+--
+-- Differences from the wide tables (views):
+--   month_name / year_name / month_year are derived from period_date, so
+--   old misspellings ('Feburary.2015') read as 'February.2015'
+--   rows without a period_date / quarter_key are not carried over
+--
+-- Called before sp_refresh_bi_rollups (which reads bi_fact_historical) at
+-- the end of sp_refresh_bi_tables_v4, sp_refresh_bi_tables_shadow and
+-- refresh_bi_tables.py --mode full; per quarter by sp_refresh_bi_tables_incremental.
+-- Run on its own with:  CALL sp_refresh_bi_dimensions(NULL);
+--                       CALL sp_refresh_bi_dimensions(20253);  -- Q3-2025 only
+
+CREATE TABLE IF NOT EXISTS bi_dim_hcpcs (
+    hcpcs_key MEDIUMINT UNSIGNED NOT NULL AUTO_INCREMENT,
+    HCPCS_Code VARCHAR(100) NOT NULL,
+    PRIMARY KEY (hcpcs_key),
+    UNIQUE KEY uk_dim_hcpcs_code (HCPCS_Code)
+);
+
+CREATE TABLE IF NOT EXISTS bi_dim_manufacturer (
+    manufacturer_key MEDIUMINT UNSIGNED NOT NULL AUTO_INCREMENT,
+    Manufacturer VARCHAR(255) NOT NULL,
+    PRIMARY KEY (manufacturer_key),
+    UNIQUE KEY uk_dim_manufacturer (Manufacturer)
+);
+
+-- drug_hash = MD5 over the three text columns (too long for one unique index)
+CREATE TABLE IF NOT EXISTS bi_dim_drug (
+    drug_key MEDIUMINT UNSIGNED NOT NULL AUTO_INCREMENT,
+    drug_hash BINARY(16) NOT NULL,
+    Drug_Name VARCHAR(500),
+    HCPCS_Code_Dosage VARCHAR(100),
+    J_Code_Desc VARCHAR(500),
+    PRIMARY KEY (drug_key),
+    UNIQUE KEY uk_dim_drug_hash (drug_hash),
+    INDEX idx_dim_drug_name (Drug_Name(100))
+);
+
+CREATE TABLE IF NOT EXISTS bi_fact_pricing (
+    hcpcs_key MEDIUMINT UNSIGNED NOT NULL,
+    period_date DATE NOT NULL,
+    quarter_key SMALLINT UNSIGNED NOT NULL,
+    manufacturer_key MEDIUMINT UNSIGNED,
+    drug_key MEDIUMINT UNSIGNED,
+    BILLUNITSPKG DECIMAL(18,4),
+    Payment_Limit DECIMAL(18,4),
+    Current_WAC_Effect_Date DATE,
+    Current_AWP_Effect_Date DATE,
+    ASP_Override DECIMAL(18,4),
+    ASP_current_quarter DECIMAL(18,4),
+    ASP_prev_quarter DECIMAL(18,4),
+    ASP_Quarterly_Change_Pct DECIMAL(10,4),
+    Median_WAC DECIMAL(18,4),
+    Median_AWP DECIMAL(18,4),
+    ASP_by_WAC_ratio DECIMAL(10,4),
+    ASP_by_AWP_ratio DECIMAL(10,4),
+    Updated_date TIMESTAMP NULL,
+    PRIMARY KEY (hcpcs_key, period_date),
+    INDEX idx_fact_pricing_quarter (quarter_key),
+    INDEX idx_fact_pricing_manufacturer (manufacturer_key, quarter_key)
+);
+
+-- Prices as written by sp_process_single_quarter: ROUND(x, 2), NULL = 'NA'
+CREATE TABLE IF NOT EXISTS bi_fact_historical (
+    hcpcs_key MEDIUMINT UNSIGNED NOT NULL,
+    quarter_key SMALLINT UNSIGNED NOT NULL,
+    manufacturer_key MEDIUMINT UNSIGNED,
+    drug_key MEDIUMINT UNSIGNED,
+    asp DECIMAL(18,2),
+    median_wac DECIMAL(18,2),
+    median_awp DECIMAL(18,2),
+    Updated_date TIMESTAMP NULL,
+    PRIMARY KEY (hcpcs_key, quarter_key),
+    INDEX idx_fact_hist_quarter (quarter_key),
+    INDEX idx_fact_hist_manufacturer (manufacturer_key, quarter_key)
+);
+
+DELIMITER //
+
+DROP PROCEDURE IF EXISTS sp_refresh_bi_dimensions //
+
+CREATE PROCEDURE sp_refresh_bi_dimensions(IN p_quarter_key INT)
+BEGIN
+    DECLARE v_start_time DATETIME;
+    DECLARE v_step_start DATETIME(3);
+    DECLARE v_rows_in INT DEFAULT NULL;
+    DECLARE v_rows_pricing_in INT DEFAULT 0;
+    DECLARE v_rows_historical_in INT DEFAULT 0;
+    DECLARE v_rows_pricing INT DEFAULT 0;
+    DECLARE v_rows_historical INT DEFAULT 0;
+    DECLARE v_new_hcpcs INT DEFAULT 0;
+    DECLARE v_new_manufacturers INT DEFAULT 0;
+    DECLARE v_new_drugs INT DEFAULT 0;
+    DECLARE v_pruned INT DEFAULT 0;
+    DECLARE v_error_message TEXT;
+    DECLARE v_error_code INT;
+
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        GET DIAGNOSTICS CONDITION 1
+            v_error_code = MYSQL_ERRNO,
+            v_error_message = MESSAGE_TEXT;
+        ROLLBACK;
+        CALL sp_log_refresh_step('dimensions', p_quarter_key, v_rows_in, NULL, v_step_start, v_error_code);
+        INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+        VALUES ('dimensions', 'FAILED', CONCAT('Error building compact facts - previous facts kept: ', v_error_message), v_start_time, NOW());
+        DROP TABLE IF EXISTS bi_fact_pricing_new;
+        DROP TABLE IF EXISTS bi_fact_historical_new;
+        RESIGNAL;
+    END;
+
+    SET v_start_time = NOW();
+    SET v_step_start = NOW(3);
+
+    -- Facts never built (fresh install): a quarter call builds everything
+    IF p_quarter_key IS NOT NULL AND NOT EXISTS (SELECT 1 FROM bi_fact_historical) THEN
+        SET p_quarter_key = NULL;
+    END IF;
+
+    SELECT COUNT(*) INTO v_rows_pricing_in FROM bi_hcpcs_drug_pricing
+    WHERE p_quarter_key IS NULL OR quarter_key = p_quarter_key;
+    SELECT COUNT(*) INTO v_rows_historical_in FROM bi_historical_pricing
+    WHERE p_quarter_key IS NULL OR quarter_key = p_quarter_key;
+    SET v_rows_in = v_rows_pricing_in + v_rows_historical_in;
+
+    DROP TABLE IF EXISTS bi_fact_pricing_new;
+    DROP TABLE IF EXISTS bi_fact_historical_new;
+
+    -- =====================================================
+    -- STEP 1: Add new dimension members (existing keys never change;
+    -- anti-join instead of INSERT IGNORE so no AUTO_INCREMENT values are burnt).
+    -- One quarter: only that quarter's rows can bring new members
+    -- =====================================================
+
+    INSERT INTO bi_dim_hcpcs (HCPCS_Code)
+    SELECT src.HCPCS_Code
+    FROM (
+        SELECT DISTINCT HCPCS_Code FROM bi_hcpcs_drug_pricing
+        WHERE p_quarter_key IS NULL OR quarter_key = p_quarter_key
+        UNION
+        SELECT DISTINCT HCPCS_Code FROM bi_historical_pricing
+        WHERE p_quarter_key IS NULL OR quarter_key = p_quarter_key
+    ) src
+    LEFT JOIN bi_dim_hcpcs d ON d.HCPCS_Code = src.HCPCS_Code
+    WHERE d.hcpcs_key IS NULL;
+
+    SET v_new_hcpcs = ROW_COUNT();
+
+    INSERT INTO bi_dim_manufacturer (Manufacturer)
+    SELECT src.Manufacturer
+    FROM (
+        SELECT DISTINCT Manufacturer FROM bi_hcpcs_drug_pricing
+        WHERE Manufacturer IS NOT NULL AND (p_quarter_key IS NULL OR quarter_key = p_quarter_key)
+        UNION
+        SELECT DISTINCT Manufacturer FROM bi_historical_pricing
+        WHERE Manufacturer IS NOT NULL AND (p_quarter_key IS NULL OR quarter_key = p_quarter_key)
+    ) src
+    LEFT JOIN bi_dim_manufacturer d ON d.Manufacturer = src.Manufacturer
+    WHERE d.manufacturer_key IS NULL;
+
+    SET v_new_manufacturers = ROW_COUNT();
+
+    -- bi_historical_pricing only has hcpcs_drug = CONCAT(Drug_Name, ' (', HCPCS_Code, ')'):
+    -- its drug rows carry the name with the code suffix removed
+    DROP TEMPORARY TABLE IF EXISTS temp_dim_drug_src;
+
+    CREATE TEMPORARY TABLE temp_dim_drug_src AS
+    SELECT
+        UNHEX(MD5(CONCAT_WS(CHAR(31), IFNULL(Drug_Name, CHAR(0)), IFNULL(HCPCS_Code_Dosage, CHAR(0)),
+            IFNULL(J_Code_Desc, CHAR(0))))) AS drug_hash,
+        Drug_Name, HCPCS_Code_Dosage, J_Code_Desc
+    FROM (
+        SELECT DISTINCT Drug_Name, HCPCS_Code_Dosage, J_Code_Desc
+        FROM bi_hcpcs_drug_pricing
+        WHERE (Drug_Name IS NOT NULL OR HCPCS_Code_Dosage IS NOT NULL OR J_Code_Desc IS NOT NULL)
+            AND (p_quarter_key IS NULL OR quarter_key = p_quarter_key)
+        UNION
+        SELECT DISTINCT
+            LEFT(hcpcs_drug, CHAR_LENGTH(hcpcs_drug) - CHAR_LENGTH(HCPCS_Code) - 3), NULL, NULL
+        FROM bi_historical_pricing
+        WHERE hcpcs_drug LIKE CONCAT('% (', HCPCS_Code, ')')
+            AND (p_quarter_key IS NULL OR quarter_key = p_quarter_key)
+    ) src;
+
+    INSERT INTO bi_dim_drug (drug_hash, Drug_Name, HCPCS_Code_Dosage, J_Code_Desc)
+    SELECT s.drug_hash, MAX(s.Drug_Name), MAX(s.HCPCS_Code_Dosage), MAX(s.J_Code_Desc)
+    FROM temp_dim_drug_src s
+    LEFT JOIN bi_dim_drug d ON d.drug_hash = s.drug_hash
+    WHERE d.drug_key IS NULL
+    GROUP BY s.drug_hash;
+
+    SET v_new_drugs = ROW_COUNT();
+
+    DROP TEMPORARY TABLE IF EXISTS temp_dim_drug_src;
+
+    -- =====================================================
+    -- STEP 2: Monthly facts (bi_hcpcs_drug_pricing)
+    -- Two month_year spellings of one period collapse to one row
+    -- =====================================================
+
+    CREATE TABLE bi_fact_pricing_new LIKE bi_fact_pricing;
+
+    INSERT IGNORE INTO bi_fact_pricing_new (
+        hcpcs_key, period_date, quarter_key, manufacturer_key, drug_key,
+        BILLUNITSPKG, Payment_Limit, Current_WAC_Effect_Date, Current_AWP_Effect_Date,
+        ASP_Override, ASP_current_quarter, ASP_prev_quarter, ASP_Quarterly_Change_Pct,
+        Median_WAC, Median_AWP, ASP_by_WAC_ratio, ASP_by_AWP_ratio, Updated_date
+    )
+    SELECT
+        h.hcpcs_key, p.period_date, p.quarter_key, m.manufacturer_key, d.drug_key,
+        p.BILLUNITSPKG, p.Payment_Limit, p.Current_WAC_Effect_Date, p.Current_AWP_Effect_Date,
+        p.ASP_Override, p.ASP_current_quarter, p.ASP_prev_quarter, p.ASP_Quarterly_Change_Pct,
+        p.Median_WAC, p.Median_AWP, p.ASP_by_WAC_ratio, p.ASP_by_AWP_ratio, p.Updated_date
+    FROM bi_hcpcs_drug_pricing p
+    INNER JOIN bi_dim_hcpcs h ON h.HCPCS_Code = p.HCPCS_Code
+    LEFT JOIN bi_dim_manufacturer m ON m.Manufacturer = p.Manufacturer
+    LEFT JOIN bi_dim_drug d ON d.drug_hash = UNHEX(MD5(CONCAT_WS(CHAR(31), IFNULL(p.Drug_Name, CHAR(0)),
+        IFNULL(p.HCPCS_Code_Dosage, CHAR(0)), IFNULL(p.J_Code_Desc, CHAR(0)))))
+    WHERE p.period_date IS NOT NULL
+        AND p.quarter_key IS NOT NULL
+        AND (p_quarter_key IS NULL OR p.quarter_key = p_quarter_key);
+
+    SET v_rows_pricing = ROW_COUNT();
+
+    -- =====================================================
+    -- STEP 3: Quarterly facts (bi_historical_pricing), prices typed
+    -- =====================================================
+
+    CREATE TABLE bi_fact_historical_new LIKE bi_fact_historical;
+
+    INSERT INTO bi_fact_historical_new (
+        hcpcs_key, quarter_key, manufacturer_key, drug_key, asp, median_wac, median_awp, Updated_date
+    )
+    SELECT
+        h.hcpcs_key, hp.quarter_key, m.manufacturer_key, d.drug_key,
+        CAST(NULLIF(hp.ASP, 'NA') AS DECIMAL(18,2)),
+        CAST(NULLIF(hp.Median_WAC, 'NA') AS DECIMAL(18,2)),
+        CAST(NULLIF(hp.Median_AWP, 'NA') AS DECIMAL(18,2)),
+        hp.Updated_date
+    FROM bi_historical_pricing hp
+    INNER JOIN bi_dim_hcpcs h ON h.HCPCS_Code = hp.HCPCS_Code
+    LEFT JOIN bi_dim_manufacturer m ON m.Manufacturer = hp.Manufacturer
+    LEFT JOIN bi_dim_drug d ON hp.hcpcs_drug LIKE CONCAT('% (', hp.HCPCS_Code, ')')
+        AND d.drug_hash = UNHEX(MD5(CONCAT_WS(CHAR(31),
+            LEFT(hp.hcpcs_drug, CHAR_LENGTH(hp.hcpcs_drug) - CHAR_LENGTH(hp.HCPCS_Code) - 3), CHAR(0), CHAR(0))))
+    WHERE hp.quarter_key IS NOT NULL
+        AND (p_quarter_key IS NULL OR hp.quarter_key = p_quarter_key);
+
+    SET v_rows_historical = ROW_COUNT();
+
+    IF p_quarter_key IS NULL THEN
+
+        -- =====================================================
+        -- STEP 4: Swap - readers see all old or all new facts
+        -- =====================================================
+
+        DROP TABLE IF EXISTS bi_fact_pricing_old;
+        DROP TABLE IF EXISTS bi_fact_historical_old;
+
+        RENAME TABLE bi_fact_pricing TO bi_fact_pricing_old,
+                     bi_fact_pricing_new TO bi_fact_pricing,
+                     bi_fact_historical TO bi_fact_historical_old,
+                     bi_fact_historical_new TO bi_fact_historical;
+
+        DROP TABLE IF EXISTS bi_fact_pricing_old;
+        DROP TABLE IF EXISTS bi_fact_historical_old;
+
+    ELSE
+
+        -- =====================================================
+        -- STEP 4: Replace the quarter + prune quarters gone from the
+        -- wide tables (older months leave bi_hcpcs_drug_pricing when a
+        -- newer quarter lands; removed quarters leave both) - one transaction
+        -- =====================================================
+
+        START TRANSACTION;
+
+        DELETE FROM bi_fact_pricing WHERE quarter_key = p_quarter_key;
+        INSERT INTO bi_fact_pricing SELECT * FROM bi_fact_pricing_new;
+
+        DELETE FROM bi_fact_historical WHERE quarter_key = p_quarter_key;
+        INSERT INTO bi_fact_historical SELECT * FROM bi_fact_historical_new;
+
+        DELETE FROM bi_fact_pricing
+        WHERE quarter_key NOT IN (
+            SELECT quarter_key FROM bi_hcpcs_drug_pricing WHERE quarter_key IS NOT NULL
+        );
+
+        SET v_pruned = ROW_COUNT();
+
+        DELETE FROM bi_fact_historical
+        WHERE quarter_key NOT IN (
+            SELECT quarter_key FROM bi_historical_pricing WHERE quarter_key IS NOT NULL
+        );
+
+        SET v_pruned = v_pruned + ROW_COUNT();
+
+        COMMIT;
+
+        DROP TABLE IF EXISTS bi_fact_pricing_new;
+        DROP TABLE IF EXISTS bi_fact_historical_new;
+
+    END IF;
+
+    CALL sp_log_refresh_step('dimensions', p_quarter_key, v_rows_in, v_rows_pricing + v_rows_historical, v_step_start, 0);
+
+    INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+    VALUES ('dimensions', 'COMPLETED', CONCAT(
+        IF(p_quarter_key IS NULL, 'Compact facts rebuilt',
+            CONCAT('Compact facts updated for Q', p_quarter_key MOD 10, '-', p_quarter_key DIV 10)),
+        ' - pricing: ', v_rows_pricing, '/', v_rows_pricing_in,
+        ', historical: ', v_rows_historical, '/', v_rows_historical_in,
+        IF(v_pruned > 0, CONCAT(', pruned: ', v_pruned), ''),
+        '; new HCPCS: ', v_new_hcpcs, ', manufacturers: ', v_new_manufacturers, ', drugs: ', v_new_drugs,
+        ' [Duration: ', TIMESTAMPDIFF(SECOND, v_start_time, NOW()), 's]'), v_start_time, NOW());
+
+END //
+
+DELIMITER ;
+
+-- =====================================================
+-- Views with the wide tables' column names
+-- =====================================================
+
+CREATE OR REPLACE VIEW vw_bi_hcpcs_drug_pricing AS
+SELECT
+    h.HCPCS_Code,
+    m.Manufacturer,
+    d.Drug_Name,
+    CONCAT(d.Drug_Name, ' (', h.HCPCS_Code, ')') AS hcpcs_drug,
+    f.BILLUNITSPKG,
+    d.HCPCS_Code_Dosage,
+    f.Payment_Limit,
+    f.Current_WAC_Effect_Date,
+    f.Current_AWP_Effect_Date,
+    d.J_Code_Desc,
+    MONTHNAME(f.period_date) AS month_name,
+    CAST(YEAR(f.period_date) AS CHAR(10)) AS year_name,
+    CONCAT(MONTHNAME(f.period_date), '.', YEAR(f.period_date)) AS month_year,
+    f.ASP_Override,
+    f.ASP_current_quarter,
+    f.ASP_prev_quarter,
+    f.ASP_Quarterly_Change_Pct,
+    f.Median_WAC,
+    f.Median_AWP,
+    f.ASP_by_WAC_ratio,
+    f.ASP_by_AWP_ratio,
+    f.period_date,
+    f.quarter_key,
+    f.Updated_date
+FROM bi_fact_pricing f
+INNER JOIN bi_dim_hcpcs h ON h.hcpcs_key = f.hcpcs_key
+LEFT JOIN bi_dim_manufacturer m ON m.manufacturer_key = f.manufacturer_key
+LEFT JOIN bi_dim_drug d ON d.drug_key = f.drug_key;
+
+CREATE OR REPLACE VIEW vw_bi_historical_pricing AS
+SELECT
+    h.HCPCS_Code,
+    CONCAT('Q', f.quarter_key MOD 10, f.quarter_key DIV 10) AS Quarter,
+    m.Manufacturer,
+    CONCAT(d.Drug_Name, ' (', h.HCPCS_Code, ')') AS hcpcs_drug,
+    COALESCE(CAST(f.asp AS CHAR(20)), 'NA') AS ASP,
+    COALESCE(CAST(f.median_wac AS CHAR(20)), 'NA') AS Median_WAC,
+    COALESCE(CAST(f.median_awp AS CHAR(20)), 'NA') AS Median_AWP,
+    f.quarter_key,
+    f.Updated_date
+FROM bi_fact_historical f
+INNER JOIN bi_dim_hcpcs h ON h.hcpcs_key = f.hcpcs_key
+LEFT JOIN bi_dim_manufacturer m ON m.manufacturer_key = f.manufacturer_key
+LEFT JOIN bi_dim_drug d ON d.drug_key = f.drug_key;
+
+-- =====================================================
+-- Dashboard datasets - the charts read the compact facts
+-- through these, with the Create-bi-tables column names
+-- =====================================================
+
+-- Same definition as pbi_report_views.sql; filled by hand or an import
+CREATE TABLE IF NOT EXISTS bi_drug_class (
+    HCPCS_Code VARCHAR(100) PRIMARY KEY,
+    General_Drug_Class VARCHAR(255),
+    Specialized_Drug_Class VARCHAR(255)
+);
+
+-- Latest month per HCPCS code (bi_consolidated_drug_data kept period_rank = 1)
+CREATE OR REPLACE VIEW vw_bi_consolidated_drug_data AS
+SELECT
+    h.HCPCS_Code,
+    d.Drug_Name AS Brand_name,
+    CONCAT(h.HCPCS_Code, ' - ', d.Drug_Name) AS Concat,
+    m.Manufacturer,
+    f.ASP_current_quarter AS ASP_per_Unit_Current_Quarter,
+    f.ASP_prev_quarter AS ASP_per_Unit_Previous_Quarter,
+    f.ASP_Quarterly_Change_Pct,
+    f.ASP_by_WAC_ratio AS ASP_WAC_Ratio,
+    f.ASP_by_AWP_ratio AS ASP_AWP_Ratio,
+    f.Median_WAC AS Median_WAC_per_HCPCS_Unit,
+    f.Median_AWP AS Median_AWP_per_HCPCS_Unit,
+    f.Payment_Limit AS Medicare_Payment_Limit,
+    f.Current_WAC_Effect_Date AS WAC_Effect_Date,
+    f.Current_AWP_Effect_Date AS AWP_Effect_Date,
+    f.period_date,
+    dc.General_Drug_Class AS Drug_Class
+FROM (
+    SELECT f.*, ROW_NUMBER() OVER (PARTITION BY f.hcpcs_key ORDER BY f.period_date DESC) AS period_rank
+    FROM bi_fact_pricing f
+) f
+INNER JOIN bi_dim_hcpcs h ON h.hcpcs_key = f.hcpcs_key
+LEFT JOIN bi_dim_manufacturer m ON m.manufacturer_key = f.manufacturer_key
+LEFT JOIN bi_dim_drug d ON d.drug_key = f.drug_key
+LEFT JOIN bi_drug_class dc ON dc.HCPCS_Code = h.HCPCS_Code
+WHERE f.period_rank = 1;
+
+-- One row per HCPCS per quarter with a price; Date = first day of the quarter
+CREATE OR REPLACE VIEW vw_bi_historical_asp AS
+SELECT
+    h.HCPCS_Code,
+    f.asp,
+    CONCAT('Q', f.quarter_key MOD 10, f.quarter_key DIV 10) AS quarter,
+    MAKEDATE(f.quarter_key DIV 10, 1) + INTERVAL (f.quarter_key MOD 10 - 1) QUARTER AS Date
+FROM bi_fact_historical f
+INNER JOIN bi_dim_hcpcs h ON h.hcpcs_key = f.hcpcs_key
+WHERE f.asp IS NOT NULL;
+
+CREATE OR REPLACE VIEW vw_bi_historical_wac AS
+SELECT
+    h.HCPCS_Code,
+    f.median_wac AS Median_WAC,
+    CONCAT('Q', f.quarter_key MOD 10, f.quarter_key DIV 10) AS quarter,
+    MAKEDATE(f.quarter_key DIV 10, 1) + INTERVAL (f.quarter_key MOD 10 - 1) QUARTER AS Date
+FROM bi_fact_historical f
+INNER JOIN bi_dim_hcpcs h ON h.hcpcs_key = f.hcpcs_key
+WHERE f.median_wac IS NOT NULL;
+
+CREATE OR REPLACE VIEW vw_bi_historical_awp AS
+SELECT
+    h.HCPCS_Code,
+    f.median_awp AS Median_AWP,
+    CONCAT('Q', f.quarter_key MOD 10, f.quarter_key DIV 10) AS quarter,
+    MAKEDATE(f.quarter_key DIV 10, 1) + INTERVAL (f.quarter_key MOD 10 - 1) QUARTER AS Date
+FROM bi_fact_historical f
+INNER JOIN bi_dim_hcpcs h ON h.hcpcs_key = f.hcpcs_key
+WHERE f.median_awp IS NOT NULL;
+
+-- =====================================================
+-- Verify
+-- =====================================================
+-- Row size, wide vs compact:
+-- SELECT TABLE_NAME, TABLE_ROWS, AVG_ROW_LENGTH, ROUND((DATA_LENGTH + INDEX_LENGTH) / 1024 / 1024, 1) AS total_mb
+-- FROM information_schema.TABLES
+-- WHERE TABLE_SCHEMA = DATABASE()
+--   AND TABLE_NAME IN ('bi_hcpcs_drug_pricing', 'bi_fact_pricing', 'bi_historical_pricing', 'bi_fact_historical');
+--
+-- The views match the wide tables (both should return 0):
+-- SELECT COUNT(*) FROM bi_historical_pricing hp
+-- LEFT JOIN vw_bi_historical_pricing v ON v.HCPCS_Code = hp.HCPCS_Code AND v.quarter_key = hp.quarter_key
+-- WHERE NOT (v.ASP <=> hp.ASP AND v.Manufacturer <=> hp.Manufacturer AND v.hcpcs_drug <=> hp.hcpcs_drug);
+--
+-- SELECT COUNT(*) FROM bi_hcpcs_drug_pricing p
+-- LEFT JOIN vw_bi_hcpcs_drug_pricing v ON v.HCPCS_Code = p.HCPCS_Code AND v.period_date = p.period_date
+-- WHERE p.period_date IS NOT NULL AND NOT (v.Median_WAC <=> p.Median_WAC AND v.Drug_Name <=> p.Drug_Name);
@@ -0,0 +1,263 @@
+-- =====================================================
+-- DASHBOARD ROLLUPS - compact, typed tables for the charts
+-- Rebuilt after every refresh; each rollup is built into a
+-- *_new table and swapped in with one RENAME TABLE
+-- =====================================================
+--
+-- Why: the time-series charts aggregate bi_historical_pricing on
+-- every view (VARCHAR prices, no DATE column for granularity_sqla),
+-- and ROW_LIMIT silently truncates the long series. The rollups are
+-- a few thousand rows each, already aggregated and indexed for the
+-- chart filters, so chart queries stay flat as history grows.
+--
+--   bi_rollup_hcpcs_quarter        one row per HCPCS_Code per quarter
+--   bi_rollup_manufacturer_quarter one row per Manufacturer per quarter
+--   bi_rollup_top_movers           top N ASP risers / fallers, latest quarter
+--
+-- STEP 1 reads the compact bi_fact_historical, so sp_refresh_bi_dimensions
+-- (sp_refresh_bi_dimensions.sql) runs first.
+--
+-- Called at the end of sp_refresh_bi_tables_v3, sp_refresh_bi_tables_incremental,
+-- sp_refresh_bi_tables_shadow and refresh_bi_tables.py --mode full.
+-- Run on its own with:  CALL sp_refresh_bi_rollups(NULL);
+
+DELIMITER //
+
+DROP PROCEDURE IF EXISTS sp_refresh_bi_rollups //
+
+CREATE PROCEDURE sp_refresh_bi_rollups(IN p_top_n INT)
+BEGIN
+    DECLARE v_start_time DATETIME;
+    DECLARE v_step_start DATETIME(3);
+    DECLARE v_top_n INT;
+    DECLARE v_rows_in INT DEFAULT NULL;
+    DECLARE v_rows_hcpcs INT DEFAULT 0;
+    DECLARE v_rows_manufacturer INT DEFAULT 0;
+    DECLARE v_rows_movers INT DEFAULT 0;
+    DECLARE v_error_message TEXT;
+    DECLARE v_error_code INT;
+
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        GET DIAGNOSTICS CONDITION 1
+            v_error_code = MYSQL_ERRNO,
+            v_error_message = MESSAGE_TEXT;
+        CALL sp_log_refresh_step('rollups', NULL, v_rows_in, NULL, v_step_start, v_error_code);
+        INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+        VALUES ('rollup', 'FAILED', CONCAT('Error building rollups - previous rollups kept: ', v_error_message), v_start_time, NOW());
+        DROP TABLE IF EXISTS bi_rollup_hcpcs_quarter_new;
+        DROP TABLE IF EXISTS bi_rollup_manufacturer_quarter_new;
+        DROP TABLE IF EXISTS bi_rollup_top_movers_new;
+        RESIGNAL;
+    END;
+
+    SET v_start_time = NOW();
+    SET v_step_start = NOW(3);
+    SET v_top_n = IFNULL(p_top_n, 25);
+
+    SELECT COUNT(*) INTO v_rows_in FROM bi_fact_historical;
+
+    DROP TABLE IF EXISTS bi_rollup_hcpcs_quarter_new;
+    DROP TABLE IF EXISTS bi_rollup_manufacturer_quarter_new;
+    DROP TABLE IF EXISTS bi_rollup_top_movers_new;
+
+    -- =====================================================
+    -- STEP 1: Per HCPCS per quarter
+    -- =====================================================
+
+    CREATE TABLE bi_rollup_hcpcs_quarter_new (
+        HCPCS_Code VARCHAR(100) NOT NULL,
+        quarter_key INT NOT NULL,
+        Quarter VARCHAR(10) NOT NULL,
+        quarter_date DATE NOT NULL,
+        Manufacturer VARCHAR(255),
+        hcpcs_drug VARCHAR(620),
+        asp DECIMAL(18,4),
+        asp_prev_quarter DECIMAL(18,4),
+        asp_change_pct DECIMAL(10,4),
+        median_wac DECIMAL(18,4),
+        median_awp DECIMAL(18,4),
+        PRIMARY KEY (HCPCS_Code, quarter_key),
+        INDEX idx_rollup_hcpcs_quarter_key (quarter_key),
+        INDEX idx_rollup_hcpcs_quarter_date (quarter_date),
+        INDEX idx_rollup_hcpcs_manufacturer (Manufacturer, quarter_key)
+    );
+
+    INSERT INTO bi_rollup_hcpcs_quarter_new (
+        HCPCS_Code, quarter_key, Quarter, quarter_date, Manufacturer, hcpcs_drug,
+        asp, asp_prev_quarter, asp_change_pct, median_wac, median_awp
+    )
+    SELECT
+        typed.HCPCS_Code,
+        typed.quarter_key,
+        typed.Quarter,
+        MAKEDATE(typed.quarter_key DIV 10, 1) + INTERVAL (typed.quarter_key MOD 10 - 1) QUARTER,
+        typed.Manufacturer,
+        typed.hcpcs_drug,
+        typed.asp,
+        prev.asp,
+        CASE
+            WHEN prev.asp IS NULL OR prev.asp = 0 THEN NULL
+            ELSE ROUND((typed.asp - prev.asp) / prev.asp * 100, 4)
+        END,
+        typed.median_wac,
+        typed.median_awp
+    FROM (
+        -- Compact facts (sp_refresh_bi_dimensions.sql): prices already typed
+        SELECT
+            f.hcpcs_key,
+            h.HCPCS_Code,
+            f.quarter_key,
+            CONCAT('Q', f.quarter_key MOD 10, f.quarter_key DIV 10) AS Quarter,
+            m.Manufacturer,
+            CONCAT(d.Drug_Name, ' (', h.HCPCS_Code, ')') AS hcpcs_drug,
+            f.asp,
+            -- Previous ASP = latest earlier quarter with an ASP, skipping NA
+            -- quarters (same rule as sp_process_single_quarter)
+            MAX(CASE WHEN f.asp IS NOT NULL THEN f.quarter_key END) OVER (
+                PARTITION BY f.hcpcs_key ORDER BY f.quarter_key
+                ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+            ) AS prev_asp_quarter_key,
+            f.median_wac,
+            f.median_awp
+        FROM bi_fact_historical f
+        INNER JOIN bi_dim_hcpcs h ON h.hcpcs_key = f.hcpcs_key
+        LEFT JOIN bi_dim_manufacturer m ON m.manufacturer_key = f.manufacturer_key
+        LEFT JOIN bi_dim_drug d ON d.drug_key = f.drug_key
+    ) typed
+    LEFT JOIN bi_fact_historical prev
+        ON prev.hcpcs_key = typed.hcpcs_key
+       AND prev.quarter_key = typed.prev_asp_quarter_key;
+
+    SET v_rows_hcpcs = ROW_COUNT();
+
+    -- =====================================================
+    -- STEP 2: Per manufacturer per quarter (reads STEP 1)
+    -- =====================================================
+
+    CREATE TABLE bi_rollup_manufacturer_quarter_new (
+        Manufacturer VARCHAR(255) NOT NULL,
+        quarter_key INT NOT NULL,
+        Quarter VARCHAR(10) NOT NULL,
+        quarter_date DATE NOT NULL,
+        hcpcs_count INT NOT NULL,
+        avg_asp DECIMAL(18,4),
+        avg_asp_change_pct DECIMAL(10,4),
+        avg_median_wac DECIMAL(18,4),
+        avg_median_awp DECIMAL(18,4),
+        PRIMARY KEY (Manufacturer, quarter_key),
+        INDEX idx_rollup_mfr_quarter_key (quarter_key),
+        INDEX idx_rollup_mfr_quarter_date (quarter_date)
+    );
+
+    INSERT INTO bi_rollup_manufacturer_quarter_new (
+        Manufacturer, quarter_key, Quarter, quarter_date, hcpcs_count,
+        avg_asp, avg_asp_change_pct, avg_median_wac, avg_median_awp
+    )
+    SELECT
+        IFNULL(Manufacturer, 'Unknown'),
+        quarter_key,
+        MIN(Quarter),
+        MIN(quarter_date),
+        COUNT(*),
+        ROUND(AVG(asp), 4),
+        ROUND(AVG(asp_change_pct), 4),
+        ROUND(AVG(median_wac), 4),
+        ROUND(AVG(median_awp), 4)
+    FROM bi_rollup_hcpcs_quarter_new
+    GROUP BY IFNULL(Manufacturer, 'Unknown'), quarter_key;
+
+    SET v_rows_manufacturer = ROW_COUNT();
+
+    -- =====================================================
+    -- STEP 3: Top N movers by ASP_Quarterly_Change_Pct
+    -- (bi_hcpcs_drug_pricing only holds the latest quarter)
+    -- =====================================================
+
+    CREATE TABLE bi_rollup_top_movers_new (
+        direction VARCHAR(4) NOT NULL,
+        mover_rank INT NOT NULL,
+        HCPCS_Code VARCHAR(100) NOT NULL,
+        Manufacturer VARCHAR(255),
+        hcpcs_drug VARCHAR(620),
+        quarter_key INT,
+        month_year VARCHAR(20),
+        ASP_current_quarter DECIMAL(18,4),
+        ASP_prev_quarter DECIMAL(18,4),
+        ASP_Quarterly_Change_Pct DECIMAL(10,4),
+        PRIMARY KEY (direction, mover_rank),
+        INDEX idx_rollup_movers_hcpcs (HCPCS_Code)
+    );
+
+    INSERT INTO bi_rollup_top_movers_new (
+        direction, mover_rank, HCPCS_Code, Manufacturer, hcpcs_drug, quarter_key, month_year,
+        ASP_current_quarter, ASP_prev_quarter, ASP_Quarterly_Change_Pct
+    )
+    SELECT
+        ranked.direction, ranked.mover_rank, ranked.HCPCS_Code, ranked.Manufacturer, ranked.hcpcs_drug,
+        ranked.quarter_key, ranked.month_year,
+        ranked.ASP_current_quarter, ranked.ASP_prev_quarter, ranked.ASP_Quarterly_Change_Pct
+    FROM (
+        SELECT
+            latest.*,
+            IF(latest.ASP_Quarterly_Change_Pct > 0, 'UP', 'DOWN') AS direction,
+            ROW_NUMBER() OVER (
+                PARTITION BY latest.ASP_Quarterly_Change_Pct > 0
+                ORDER BY ABS(latest.ASP_Quarterly_Change_Pct) DESC, latest.HCPCS_Code
+            ) AS mover_rank
+        FROM (
+            -- Latest month per HCPCS
+            SELECT
+                p.HCPCS_Code, p.Manufacturer, p.hcpcs_drug, p.quarter_key, p.month_year,
+                p.ASP_current_quarter, p.ASP_prev_quarter, p.ASP_Quarterly_Change_Pct,
+                ROW_NUMBER() OVER (PARTITION BY p.HCPCS_Code ORDER BY p.period_date DESC) AS rn
+            FROM bi_hcpcs_drug_pricing p
+            WHERE p.ASP_Quarterly_Change_Pct IS NOT NULL
+                AND p.ASP_Quarterly_Change_Pct != 0
+        ) latest
+        WHERE latest.rn = 1
+    ) ranked
+    WHERE ranked.mover_rank <= v_top_n;
+
+    SET v_rows_movers = ROW_COUNT();
+
+    -- =====================================================
+    -- STEP 4: Swap - readers see all old or all new rollups
+    -- =====================================================
+
+    -- First run: give RENAME something to move aside
+    CREATE TABLE IF NOT EXISTS bi_rollup_hcpcs_quarter LIKE bi_rollup_hcpcs_quarter_new;
+    CREATE TABLE IF NOT EXISTS bi_rollup_manufacturer_quarter LIKE bi_rollup_manufacturer_quarter_new;
+    CREATE TABLE IF NOT EXISTS bi_rollup_top_movers LIKE bi_rollup_top_movers_new;
+
+    DROP TABLE IF EXISTS bi_rollup_hcpcs_quarter_old;
+    DROP TABLE IF EXISTS bi_rollup_manufacturer_quarter_old;
+    DROP TABLE IF EXISTS bi_rollup_top_movers_old;
+
+    RENAME TABLE bi_rollup_hcpcs_quarter TO bi_rollup_hcpcs_quarter_old,
+                 bi_rollup_hcpcs_quarter_new TO bi_rollup_hcpcs_quarter,
+                 bi_rollup_manufacturer_quarter TO bi_rollup_manufacturer_quarter_old,
+                 bi_rollup_manufacturer_quarter_new TO bi_rollup_manufacturer_quarter,
+                 bi_rollup_top_movers TO bi_rollup_top_movers_old,
+                 bi_rollup_top_movers_new TO bi_rollup_top_movers;
+
+    DROP TABLE IF EXISTS bi_rollup_hcpcs_quarter_old;
+    DROP TABLE IF EXISTS bi_rollup_manufacturer_quarter_old;
+    DROP TABLE IF EXISTS bi_rollup_top_movers_old;
+
+    CALL sp_log_refresh_step('rollups', NULL, v_rows_in, v_rows_hcpcs + v_rows_manufacturer + v_rows_movers, v_step_start, 0);
+
+    INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+    VALUES ('rollup', 'COMPLETED', CONCAT('Rollups rebuilt - HCPCS/quarter: ', v_rows_hcpcs,
+        ', manufacturer/quarter: ', v_rows_manufacturer, ', top movers: ', v_rows_movers,
+        ' [Duration: ', TIMESTAMPDIFF(SECOND, v_start_time, NOW()), 's]'), v_start_time, NOW());
+
+END //
+
+DELIMITER ;
+
+-- =====================================================
+-- Verify
+-- =====================================================
+-- SELECT quarter_date, COUNT(*) FROM bi_rollup_hcpcs_quarter GROUP BY quarter_date ORDER BY quarter_date;
+-- SELECT * FROM bi_rollup_top_movers ORDER BY direction, mover_rank;
@@ -0,0 +1,373 @@
+-- =====================================================
+-- INCREMENTAL REFRESH - SOURCE WATERMARK DRIVEN
+-- Reprocesses ONLY the quarters whose cms_drug_pricing rows
+-- changed since the last refresh (new month loaded, rows fixed)
+-- =====================================================
+--
+-- Watermark per quarter = row count + SUM(CRC32(raw columns)) of the
+-- source rows that parse into that quarter (vw_cms_drug_pricing_parsed).
+--
+-- Dependent quarters: ASP_prev_quarter is looked up from
+-- bi_historical_pricing, and bi_hcpcs_drug_pricing only keeps the
+-- latest quarter. So the only quarter that depends on an older one is
+-- the latest quarter - it is always reprocessed last when anything changed.
+-- Older changed quarters only rebuild their bi_historical_pricing rows.
+--
+-- A quarter that fails keeps its old watermark (retried next run) and the
+-- run ends FAILED without rebuilding the rollups / digest.
+
+CREATE TABLE IF NOT EXISTS bi_refresh_watermark (
+    quarter_start DATE NOT NULL,
+    Quarter VARCHAR(10) NOT NULL,
+    source_rows INT NOT NULL,
+    source_checksum DECIMAL(30,0) NOT NULL,
+    refreshed_at DATETIME NOT NULL,
+    PRIMARY KEY (quarter_start)
+);
+
+DELIMITER //
+
+-- =====================================================
+-- Record the watermark of one staged quarter after it
+-- was processed successfully (NULL = every staged quarter)
+-- =====================================================
+
+DROP PROCEDURE IF EXISTS sp_record_source_watermark //
+
+CREATE PROCEDURE sp_record_source_watermark(
+    IN p_quarter_start DATE
+)
+BEGIN
+    CREATE TABLE IF NOT EXISTS bi_refresh_watermark (
+        quarter_start DATE NOT NULL,
+        Quarter VARCHAR(10) NOT NULL,
+        source_rows INT NOT NULL,
+        source_checksum DECIMAL(30,0) NOT NULL,
+        refreshed_at DATETIME NOT NULL,
+        PRIMARY KEY (quarter_start)
+    );
+
+    REPLACE INTO bi_refresh_watermark (quarter_start, Quarter, source_rows, source_checksum, refreshed_at)
+    SELECT
+        quarter_start,
+        MAX(Quarter),
+        COUNT(*),
+        IFNULL(SUM(row_crc), 0),
+        NOW()
+    FROM bi_cms_drug_pricing_stg
+    WHERE p_quarter_start IS NULL
+        OR quarter_start = p_quarter_start
+    GROUP BY quarter_start;
+
+END //
+
+-- =====================================================
+-- Incremental refresh (nightly job) - called through the
+-- sp_refresh_bi_tables_incremental entry point below
+-- =====================================================
+
+DROP PROCEDURE IF EXISTS sp_refresh_bi_tables_incremental_unlocked //
+
+CREATE PROCEDURE sp_refresh_bi_tables_incremental_unlocked()
+proc: BEGIN
+    DECLARE v_start_time DATETIME;
+    DECLARE v_current_date DATE;
+    DECLARE v_source_changed TINYINT;
+    DECLARE v_latest_quarter DATE;
+    DECLARE v_quarter_count INT DEFAULT 0;
+    DECLARE v_total_quarters INT DEFAULT 0;
+    DECLARE v_removed_quarters INT DEFAULT 0;
+    DECLARE v_total_pricing_rows INT DEFAULT 0;
+    DECLARE v_total_historical_rows INT DEFAULT 0;
+    DECLARE v_error_message TEXT;
+    DECLARE v_error_code INT DEFAULT 0;
+    DECLARE v_failed_steps INT DEFAULT 0;
+    DECLARE done INT DEFAULT 0;
+
+    -- Quarters to reprocess, oldest first
+    DECLARE quarter_cursor CURSOR FOR
+        SELECT quarter_start, source_changed
+        FROM temp_refresh_quarters
+        ORDER BY quarter_start ASC;
+
+    DECLARE CONTINUE HANDLER FOR NOT FOUND SET done = 1;
+
+    -- Error handler: log, skip the watermark for this quarter, continue
+    DECLARE CONTINUE HANDLER FOR SQLEXCEPTION
+    BEGIN
+        GET DIAGNOSTICS CONDITION 1
+            v_error_code = MYSQL_ERRNO,
+            v_error_message = MESSAGE_TEXT;
+
+        SET v_failed_steps = v_failed_steps + 1;
+
+        INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+        VALUES ('incremental', 'ERROR', CONCAT('Quarter ', v_quarter_count, ' error [', v_error_code, ']: ', v_error_message), v_start_time, NOW());
+    END;
+
+    SET v_start_time = NOW();
+
+    -- Groups this run's rows in bi_refresh_step_log
+    SET @bi_refresh_run_id = UUID();
+    SET @bi_refresh_type = 'incremental';
+
+    -- First run (nothing staged or no watermarks yet): do a full refresh
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.tables
+        WHERE table_schema = DATABASE()
+            AND table_name = 'bi_cms_drug_pricing_stg'
+    ) OR NOT EXISTS (SELECT 1 FROM bi_refresh_watermark) THEN
+        INSERT INTO bi_refresh_log (refresh_type, status, message, started_at)
+        VALUES ('incremental', 'STARTED', 'No watermarks recorded yet - running full refresh', v_start_time);
+        CALL sp_refresh_bi_tables_v3();
+        LEAVE proc;
+    END IF;
+
+    -- =====================================================
+    -- STEP 1: CURRENT SOURCE WATERMARK (one pass over the source)
+    -- =====================================================
+
+    DROP TEMPORARY TABLE IF EXISTS temp_source_watermark;
+    DROP TEMPORARY TABLE IF EXISTS temp_refresh_quarters;
+
+    CREATE TEMPORARY TABLE temp_source_watermark (
+        quarter_start DATE NOT NULL,
+        source_rows INT NOT NULL,
+        source_checksum DECIMAL(30,0) NOT NULL,
+        PRIMARY KEY (quarter_start)
+    );
+
+    INSERT INTO temp_source_watermark (quarter_start, source_rows, source_checksum)
+    SELECT MIN(quarter_start), COUNT(*), IFNULL(SUM(row_crc), 0)
+    FROM vw_cms_drug_pricing_parsed
+    GROUP BY quarter_key;
+
+    -- =====================================================
+    -- STEP 2: QUARTERS WHOSE SOURCE CHANGED
+    -- =====================================================
+
+    CREATE TEMPORARY TABLE temp_refresh_quarters (
+        quarter_start DATE NOT NULL,
+        source_changed TINYINT NOT NULL,
+        PRIMARY KEY (quarter_start)
+    );
+
+    INSERT INTO temp_refresh_quarters (quarter_start, source_changed)
+    SELECT sw.quarter_start, 1
+    FROM temp_source_watermark sw
+    LEFT JOIN bi_refresh_watermark w
+        ON w.quarter_start = sw.quarter_start
+    WHERE w.quarter_start IS NULL
+        OR w.source_rows != sw.source_rows
+        OR w.source_checksum != sw.source_checksum;
+
+    -- Source changed (or lost quarters): classify it, quarantine rejects,
+    -- count fixes (sp_validate_cms_drug_pricing.sql) before touching anything;
+    -- a tripped data-quality gate stops the refresh here
+    IF EXISTS (SELECT 1 FROM temp_refresh_quarters)
+        OR EXISTS (
+            SELECT 1
+            FROM bi_refresh_watermark w
+            LEFT JOIN temp_source_watermark sw
+                ON sw.quarter_start = w.quarter_start
+            WHERE sw.quarter_start IS NULL
+        ) THEN
+        SET v_error_code = 0;
+        CALL sp_validate_cms_drug_pricing();
+
+        IF v_error_code != 0 THEN
+            INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+            VALUES ('incremental', 'FAILED', CONCAT('Source validation failed [', v_error_code, '] - BI tables unchanged'),
+                v_start_time, NOW());
+            LEAVE proc;
+        END IF;
+    END IF;
+
+    -- Quarters that disappeared from the source entirely
+    DELETE h
+    FROM bi_historical_pricing h
+    INNER JOIN bi_refresh_watermark w
+        ON h.Quarter = w.Quarter
+    LEFT JOIN temp_source_watermark sw
+        ON sw.quarter_start = w.quarter_start
+    WHERE sw.quarter_start IS NULL;
+
+    DELETE s
+    FROM bi_cms_drug_pricing_stg s
+    LEFT JOIN temp_source_watermark sw
+        ON sw.quarter_start = s.quarter_start
+    WHERE sw.quarter_start IS NULL;
+
+    DELETE w
+    FROM bi_refresh_watermark w
+    LEFT JOIN temp_source_watermark sw
+        ON sw.quarter_start = w.quarter_start
+    WHERE sw.quarter_start IS NULL;
+
+    SET v_removed_quarters = ROW_COUNT();
+
+    SELECT COUNT(*) INTO v_total_quarters FROM temp_refresh_quarters;
+
+    IF v_total_quarters = 0 AND v_removed_quarters = 0 THEN
+        INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+        VALUES ('incremental', 'COMPLETED', CONCAT('No source changes - nothing to refresh [Duration: ',
+            TIMESTAMPDIFF(SECOND, v_start_time, NOW()), 's]'), v_start_time, NOW());
+        LEAVE proc;
+    END IF;
+
+    -- The latest quarter reads ASP_prev_quarter from older quarters,
+    -- so it is reprocessed whenever anything changed
+    SELECT MAX(quarter_start) INTO v_latest_quarter FROM temp_source_watermark;
+
+    INSERT IGNORE INTO temp_refresh_quarters (quarter_start, source_changed)
+    VALUES (v_latest_quarter, 0);
+
+    -- sp_process_quarter_pricing only deletes quarters older than the newest
+    -- stored one: when the latest quarter itself was removed, its pricing rows
+    -- would outlive it, so keep only the latest remaining source quarter
+    IF v_removed_quarters > 0 THEN
+        DELETE FROM bi_hcpcs_drug_pricing
+        WHERE quarter_key != YEAR(v_latest_quarter) * 10 + QUARTER(v_latest_quarter);
+    END IF;
+
+    SELECT COUNT(*) INTO v_total_quarters FROM temp_refresh_quarters;
+
+    INSERT INTO bi_refresh_log (refresh_type, status, message, started_at)
+    VALUES ('incremental', 'STARTED', CONCAT('Source changed in ', v_total_quarters, ' quarter(s)',
+        IF(v_removed_quarters > 0, CONCAT(', ', v_removed_quarters, ' quarter(s) removed'), ''),
+        ' - reprocessing only those'), v_start_time);
+
+    COMMIT;
+
+    -- =====================================================
+    -- STEP 3: RESTAGE + REPROCESS CHANGED QUARTERS
+    -- =====================================================
+
+    OPEN quarter_cursor;
+
+    read_loop: LOOP
+        FETCH quarter_cursor INTO v_current_date, v_source_changed;
+
+        IF done THEN
+            LEAVE read_loop;
+        END IF;
+
+        SET v_quarter_count = v_quarter_count + 1;
+        SET v_error_code = 0;
+
+        INSERT INTO bi_refresh_log (refresh_type, status, message, started_at)
+        VALUES ('incremental', 'IN_PROGRESS', CONCAT('Processing quarter ', v_quarter_count, ' of ', v_total_quarters, ' ',
+            '(Q', QUARTER(v_current_date), '-', YEAR(v_current_date), ') - ',
+            IF(v_source_changed = 1, 'source changed', 'depends on changed quarters')), NOW());
+
+        -- Visible right away to progress pollers (refresh_scheduler.py /progress)
+        COMMIT;
+
+        IF v_source_changed = 1 THEN
+            CALL sp_restage_cms_drug_pricing_quarter(v_current_date);
+        END IF;
+
+        -- Only the latest quarter has rows in bi_hcpcs_drug_pricing: older
+        -- quarters rebuild their history only, so the live pricing table never
+        -- holds a mix of quarters
+        IF v_error_code = 0 AND v_current_date = v_latest_quarter THEN
+            CALL sp_process_single_quarter(v_current_date, @rows_pricing, @rows_historical);
+        ELSEIF v_error_code = 0 THEN
+            SET @rows_pricing = 0;
+            CALL sp_stage_single_quarter(v_current_date);
+            CALL sp_process_quarter_historical(v_current_date, @rows_historical);
+            DROP TEMPORARY TABLE IF EXISTS bi_hcpcs_drug_pricing_stg;
+            SET @bi_staged_quarter_key = NULL;
+        END IF;
+
+        -- Compact facts for this quarter only (sp_refresh_bi_dimensions.sql);
+        -- the watermark is recorded only once they are in step
+        IF v_error_code = 0 THEN
+            CALL sp_refresh_bi_dimensions(YEAR(v_current_date) * 10 + QUARTER(v_current_date));
+        END IF;
+
+        IF v_error_code = 0 THEN
+            CALL sp_record_source_watermark(v_current_date);
+
+            SET v_total_pricing_rows = v_total_pricing_rows + IFNULL(@rows_pricing, 0);
+            SET v_total_historical_rows = v_total_historical_rows + IFNULL(@rows_historical, 0);
+
+            INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+            VALUES ('incremental', 'COMPLETED_QUARTER', CONCAT('✓ Q', v_quarter_count, ' of ', v_total_quarters, ' ',
+                '(Q', QUARTER(v_current_date), '-', YEAR(v_current_date), ') - ',
+                'Pricing: ', IFNULL(@rows_pricing, 0), ', Historical: ', IFNULL(@rows_historical, 0)),
+                v_start_time, NOW());
+        END IF;
+
+        COMMIT;
+
+    END LOOP;
+
+    CLOSE quarter_cursor;
+
+    -- A failed quarter keeps its old watermark and is retried next run;
+    -- this run is reported as FAILED and nothing is built on the partial result
+    IF v_failed_steps > 0 THEN
+        INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+        VALUES ('incremental', 'FAILED', CONCAT(v_failed_steps, ' step(s) failed in ', v_quarter_count,
+            ' quarter(s) - rollups and digest not rebuilt, failed quarters retried next run [Duration: ',
+            TIMESTAMPDIFF(SECOND, v_start_time, NOW()), 's]'), v_start_time, NOW());
+        LEAVE proc;
+    END IF;
+
+    -- Dashboard rollups from the compact facts kept in step above
+    -- (sp_refresh_bi_rollups.sql)
+    CALL sp_refresh_bi_rollups(NULL);
+
+    -- Per-quarter/HCPCS digests of this build (sp_refresh_digest.sql)
+    CALL sp_record_refresh_digest(NULL);
+
+    IF v_failed_steps > 0 THEN
+        INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+        VALUES ('incremental', 'FAILED', CONCAT('Rollups / digest failed after ', v_quarter_count,
+            ' quarter(s) were processed [Duration: ', TIMESTAMPDIFF(SECOND, v_start_time, NOW()), 's]'),
+            v_start_time, NOW());
+        LEAVE proc;
+    END IF;
+
+    INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+    VALUES ('incremental', 'COMPLETED', CONCAT('SUCCESS! ', v_quarter_count, ' changed quarter(s) processed. ',
+        'Total pricing rows: ', v_total_pricing_rows, ', Total historical rows: ', v_total_historical_rows,
+        ' [Duration: ', TIMESTAMPDIFF(SECOND, v_start_time, NOW()), 's]'), v_start_time, NOW());
+
+    -- Return summary
+    SELECT
+        'SUCCESS' AS status,
+        v_quarter_count AS quarters_processed,
+        v_total_pricing_rows AS total_pricing_rows,
+        v_total_historical_rows AS total_historical_rows,
+        CONCAT(TIMESTAMPDIFF(SECOND, v_start_time, NOW()), ' seconds') AS duration;
+
+END //
+
+-- =====================================================
+-- Entry point: sp_refresh_bi_tables_incremental_unlocked under the refresh
+-- lock (sp_refresh_lock.sql) - fails instead of overlapping a
+-- refresh that is already running
+-- =====================================================
+
+DROP PROCEDURE IF EXISTS sp_refresh_bi_tables_incremental //
+
+CREATE PROCEDURE sp_refresh_bi_tables_incremental()
+BEGIN
+    DECLARE v_lock_taken TINYINT DEFAULT 0;
+
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        CALL sp_release_refresh_lock(v_lock_taken);
+        RESIGNAL;
+    END;
+
+    -- SIGNALs when another refresh holds the lock
+    CALL sp_acquire_refresh_lock('incremental', v_lock_taken);
+    CALL sp_refresh_bi_tables_incremental_unlocked();
+    CALL sp_release_refresh_lock(v_lock_taken);
+
+END //
+
+DELIMITER ;
@@ -0,0 +1,279 @@
+-- =====================================================
+-- SHADOW-TABLE REFRESH - BUILD OFFLINE, SWAP ATOMICALLY
+-- Builds bi_hcpcs_drug_pricing / bi_historical_pricing into
+-- *_shadow copies while dashboards keep reading the live tables,
+-- then publishes both with one RENAME TABLE
+-- =====================================================
+--
+-- Why: the regular refresh upserts into the live tables, so every
+-- row pays for secondary index maintenance and Superset
+-- queries compete for the same locks (the 1213 deadlocks).
+--
+-- Shadow tables are loaded with the PRIMARY KEY only (the upserts need
+-- it); secondary indexes are built once in sp_publish_bi_shadow_tables,
+-- right before the swap. There are no FULLTEXT indexes any more - drug
+-- type-ahead is served by drug_search.py (migrate_drop_fulltext.sql) - and
+-- no Manufacturer / hcpcs_drug indexes: the dashboards filter the compact
+-- facts (migrate_drop_wide_indexes.sql).
+--
+-- The quarter steps in sp_process_single_quarter.sql write to
+-- @bi_pricing_table / @bi_historical_table when they are set.
+
+DELIMITER //
+
+-- =====================================================
+-- Create empty shadow tables (same columns as live, PK only)
+-- =====================================================
+
+DROP PROCEDURE IF EXISTS sp_prepare_bi_shadow_tables //
+
+CREATE PROCEDURE sp_prepare_bi_shadow_tables()
+BEGIN
+    IF (SELECT COUNT(*) FROM information_schema.tables
+        WHERE table_schema = DATABASE()
+            AND table_name IN ('bi_hcpcs_drug_pricing', 'bi_historical_pricing')) < 2 THEN
+        SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Shadow refresh needs existing BI tables - run sp_refresh_bi_tables_v3() once first';
+    END IF;
+
+    DROP TABLE IF EXISTS bi_hcpcs_drug_pricing_shadow;
+    DROP TABLE IF EXISTS bi_historical_pricing_shadow;
+
+    CREATE TABLE bi_hcpcs_drug_pricing_shadow LIKE bi_hcpcs_drug_pricing;
+    CREATE TABLE bi_historical_pricing_shadow LIKE bi_historical_pricing;
+
+    -- Defer index maintenance: bulk load against the PRIMARY KEY only
+    ALTER TABLE bi_hcpcs_drug_pricing_shadow
+        DROP INDEX IF EXISTS idx_hcpcs,
+        DROP INDEX IF EXISTS idx_month_year,
+        DROP INDEX IF EXISTS idx_quarter_key,
+        DROP INDEX IF EXISTS idx_manufacturer,
+        DROP INDEX IF EXISTS idx_hcpcs_drug,
+        DROP INDEX IF EXISTS idx_hcpcs_drug_ft;
+
+    ALTER TABLE bi_historical_pricing_shadow
+        DROP INDEX IF EXISTS idx_hist_hcpcs,
+        DROP INDEX IF EXISTS idx_hist_quarter,
+        DROP INDEX IF EXISTS idx_hist_quarter_key,
+        DROP INDEX IF EXISTS idx_hist_hcpcs_quarter_key,
+        DROP INDEX IF EXISTS idx_hist_manufacturer,
+        DROP INDEX IF EXISTS idx_hist_hcpcs_drug,
+        DROP INDEX IF EXISTS idx_hist_hcpcs_drug_ft;
+
+END //
+
+-- =====================================================
+-- Build deferred indexes once, then swap shadow -> live
+-- =====================================================
+
+DROP PROCEDURE IF EXISTS sp_publish_bi_shadow_tables //
+
+CREATE PROCEDURE sp_publish_bi_shadow_tables()
+BEGIN
+    -- One sorted index build per table instead of per-row maintenance
+    ALTER TABLE bi_hcpcs_drug_pricing_shadow
+        ADD INDEX IF NOT EXISTS idx_hcpcs (HCPCS_Code),
+        ADD INDEX IF NOT EXISTS idx_month_year (month_year),
+        ADD INDEX IF NOT EXISTS idx_quarter_key (quarter_key);
+
+    ALTER TABLE bi_historical_pricing_shadow
+        ADD INDEX IF NOT EXISTS idx_hist_hcpcs (HCPCS_Code),
+        ADD INDEX IF NOT EXISTS idx_hist_quarter (Quarter),
+        ADD INDEX IF NOT EXISTS idx_hist_quarter_key (quarter_key),
+        ADD INDEX IF NOT EXISTS idx_hist_hcpcs_quarter_key (HCPCS_Code, quarter_key);
+
+    -- Atomic: readers see either both old tables or both new tables
+    DROP TABLE IF EXISTS bi_hcpcs_drug_pricing_old;
+    DROP TABLE IF EXISTS bi_historical_pricing_old;
+
+    RENAME TABLE bi_hcpcs_drug_pricing TO bi_hcpcs_drug_pricing_old,
+                 bi_hcpcs_drug_pricing_shadow TO bi_hcpcs_drug_pricing,
+                 bi_historical_pricing TO bi_historical_pricing_old,
+                 bi_historical_pricing_shadow TO bi_historical_pricing;
+
+    DROP TABLE IF EXISTS bi_hcpcs_drug_pricing_old;
+    DROP TABLE IF EXISTS bi_historical_pricing_old;
+
+END //
+
+-- =====================================================
+-- Full refresh into shadow tables (replaces sp_refresh_bi_tables_v3
+-- when dashboards must stay responsive during the rebuild)
+-- =====================================================
+
+DROP PROCEDURE IF EXISTS sp_refresh_bi_tables_shadow_unlocked //
+
+CREATE PROCEDURE sp_refresh_bi_tables_shadow_unlocked()
+proc: BEGIN
+    DECLARE v_start_time DATETIME;
+    DECLARE v_current_date DATE;
+    DECLARE v_min_date DATE;
+    DECLARE v_max_date DATE;
+    DECLARE v_quarter_count INT DEFAULT 0;
+    DECLARE v_total_quarters INT DEFAULT 0;
+    DECLARE v_failed_steps INT DEFAULT 0;
+    DECLARE v_total_pricing_rows INT DEFAULT 0;
+    DECLARE v_total_historical_rows INT DEFAULT 0;
+    DECLARE v_error_message TEXT;
+    DECLARE v_error_code INT;
+    DECLARE v_step_start DATETIME(3);
+    DECLARE done INT DEFAULT 0;
+
+    DECLARE date_cursor CURSOR FOR
+        SELECT DISTINCT quarter_start
+        FROM bi_cms_drug_pricing_stg
+        ORDER BY quarter_start ASC;
+
+    DECLARE CONTINUE HANDLER FOR NOT FOUND SET done = 1;
+
+    -- Error handler: log and count; live tables are only replaced
+    -- when every step succeeded
+    DECLARE CONTINUE HANDLER FOR SQLEXCEPTION
+    BEGIN
+        GET DIAGNOSTICS CONDITION 1
+            v_error_code = MYSQL_ERRNO,
+            v_error_message = MESSAGE_TEXT;
+
+        SET v_failed_steps = v_failed_steps + 1;
+
+        INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+        VALUES ('shadow', 'ERROR', CONCAT('Quarter ', v_quarter_count, ' error [', v_error_code, ']: ', v_error_message), v_start_time, NOW());
+    END;
+
+    SET v_start_time = NOW();
+
+    -- Groups this run's rows in bi_refresh_step_log
+    SET @bi_refresh_run_id = UUID();
+    SET @bi_refresh_type = 'shadow';
+
+    CALL sp_stage_cms_drug_pricing();
+    CALL sp_prepare_bi_shadow_tables();
+
+    IF v_failed_steps > 0 THEN
+        INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+        VALUES ('shadow', 'FAILED', 'Could not stage source / prepare shadow tables - live tables unchanged', v_start_time, NOW());
+        LEAVE proc;
+    END IF;
+
+    SELECT
+        MIN(period_date),
+        MAX(period_date),
+        COUNT(DISTINCT quarter_start)
+    INTO v_min_date, v_max_date, v_total_quarters
+    FROM bi_cms_drug_pricing_stg;
+
+    INSERT INTO bi_refresh_log (refresh_type, status, message, started_at)
+    VALUES ('shadow', 'STARTED', CONCAT('Building shadow tables for QUARTERLY data from ',
+        DATE_FORMAT(v_min_date, '%Y-%m-%d'), ' to ', DATE_FORMAT(v_max_date, '%Y-%m-%d'),
+        ' (Total: ', v_total_quarters, ' quarters)'), v_start_time);
+
+    -- Route the quarter steps to the shadow tables (this session only)
+    SET @bi_pricing_table = 'bi_hcpcs_drug_pricing_shadow';
+    SET @bi_historical_table = 'bi_historical_pricing_shadow';
+
+    OPEN date_cursor;
+
+    read_loop: LOOP
+        FETCH date_cursor INTO v_current_date;
+
+        IF done THEN
+            LEAVE read_loop;
+        END IF;
+
+        SET v_quarter_count = v_quarter_count + 1;
+
+        INSERT INTO bi_refresh_log (refresh_type, status, message, started_at)
+        VALUES ('shadow', 'IN_PROGRESS', CONCAT('Processing quarter ', v_quarter_count, ' of ', v_total_quarters, ' ',
+            '(Q', QUARTER(v_current_date), '-', YEAR(v_current_date), ') - ',
+            DATE_FORMAT(v_current_date, '%Y-%m-%d')), NOW());
+
+        -- No readers on the shadow tables: no lock contention, no delay needed
+        CALL sp_process_single_quarter(v_current_date, @rows_pricing, @rows_historical);
+
+        SET v_total_pricing_rows = v_total_pricing_rows + IFNULL(@rows_pricing, 0);
+        SET v_total_historical_rows = v_total_historical_rows + IFNULL(@rows_historical, 0);
+
+        COMMIT;
+
+        INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+        VALUES ('shadow', 'COMPLETED_QUARTER', CONCAT('✓ Q', v_quarter_count, ' of ', v_total_quarters, ' ',
+            '(Q', QUARTER(v_current_date), '-', YEAR(v_current_date), ') - ',
+            'Pricing: ', IFNULL(@rows_pricing, 0), ', Historical: ', IFNULL(@rows_historical, 0)),
+            v_start_time, NOW());
+
+    END LOOP;
+
+    CLOSE date_cursor;
+
+    SET @bi_pricing_table = NULL;
+    SET @bi_historical_table = NULL;
+
+    IF v_failed_steps > 0 THEN
+        INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+        VALUES ('shadow', 'FAILED', CONCAT(v_failed_steps, ' quarter(s) failed - shadow tables NOT published, ',
+            'live tables unchanged [Duration: ', TIMESTAMPDIFF(SECOND, v_start_time, NOW()), 's]'), v_start_time, NOW());
+        LEAVE proc;
+    END IF;
+
+    SET v_step_start = NOW(3);
+    CALL sp_publish_bi_shadow_tables();
+    CALL sp_log_refresh_step('publish_shadow', NULL, NULL, NULL, v_step_start, IF(v_failed_steps > 0, v_error_code, 0));
+
+    IF v_failed_steps > 0 THEN
+        INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+        VALUES ('shadow', 'FAILED', 'Publishing shadow tables failed - live tables unchanged', v_start_time, NOW());
+        LEAVE proc;
+    END IF;
+
+    -- Watermarks only once the data is live
+    CALL sp_record_source_watermark(NULL);
+
+    -- Compact facts, then the dashboard rollups built from them
+    -- (sp_refresh_bi_dimensions.sql, sp_refresh_bi_rollups.sql)
+    CALL sp_refresh_bi_dimensions(NULL);
+    CALL sp_refresh_bi_rollups(NULL);
+
+    -- Per-quarter/HCPCS digests of this build (sp_refresh_digest.sql)
+    CALL sp_record_refresh_digest(NULL);
+
+    INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+    VALUES ('shadow', 'COMPLETED', CONCAT('SUCCESS! All ', v_quarter_count, ' quarters built and published. ',
+        'Total pricing rows: ', v_total_pricing_rows, ', Total historical rows: ', v_total_historical_rows,
+        ' [Duration: ', TIMESTAMPDIFF(SECOND, v_start_time, NOW()), 's]'), v_start_time, NOW());
+
+    -- Return summary
+    SELECT
+        'SUCCESS' AS status,
+        v_quarter_count AS quarters_processed,
+        v_total_pricing_rows AS total_pricing_rows,
+        v_total_historical_rows AS total_historical_rows,
+        CONCAT(TIMESTAMPDIFF(SECOND, v_start_time, NOW()), ' seconds') AS duration;
+
+END //
+
+-- =====================================================
+-- Entry point: sp_refresh_bi_tables_shadow_unlocked under the refresh
+-- lock (sp_refresh_lock.sql) - fails instead of overlapping a
+-- refresh that is already running
+-- =====================================================
+
+DROP PROCEDURE IF EXISTS sp_refresh_bi_tables_shadow //
+
+CREATE PROCEDURE sp_refresh_bi_tables_shadow()
+BEGIN
+    DECLARE v_lock_taken TINYINT DEFAULT 0;
+
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        CALL sp_release_refresh_lock(v_lock_taken);
+        RESIGNAL;
+    END;
+
+    -- SIGNALs when another refresh holds the lock
+    CALL sp_acquire_refresh_lock('shadow', v_lock_taken);
+    CALL sp_refresh_bi_tables_shadow_unlocked();
+    CALL sp_release_refresh_lock(v_lock_taken);
+
+END //
+
+DELIMITER ;
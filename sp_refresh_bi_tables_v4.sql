@@ -5,10 +5,10 @@
 
 DELIMITER //
 
-DROP PROCEDURE IF EXISTS sp_refresh_bi_tables_v3 //
+DROP PROCEDURE IF EXISTS sp_refresh_bi_tables_v3_unlocked //
 
-CREATE PROCEDURE sp_refresh_bi_tables_v3()
-BEGIN
+CREATE PROCEDURE sp_refresh_bi_tables_v3_unlocked()
+proc: BEGIN
     DECLARE v_start_time DATETIME;
     DECLARE v_current_date DATE;
     DECLARE v_min_date DATE;
@@ -21,21 +21,11 @@ BEGIN
     DECLARE v_error_code INT;
     DECLARE done INT DEFAULT 0;
 
-    -- Cursor for unique QUARTERS only
+    -- Cursor for unique QUARTERS only (read from the staged source)
     DECLARE date_cursor CURSOR FOR
-        SELECT DISTINCT DATE(CONCAT(
-            YEAR(STR_TO_DATE(CONCAT('01-', REPLACE(REPLACE(month_year, '.', '-'), 'Feburary', 'February')), '%d-%M-%Y')),
-            '-',
-            LPAD((QUARTER(STR_TO_DATE(CONCAT('01-', REPLACE(REPLACE(month_year, '.', '-'), 'Feburary', 'February')), '%d-%M-%Y')) - 1) * 3 + 1, 2, '0'),
-            '-01'
-        )) AS quarter_start_date
-        FROM cms_drug_pricing
-        WHERE HCPCS_Code IS NOT NULL
-            AND month_year IS NOT NULL
-            AND month_year != 'month_year'
-            AND month_year LIKE '%.%'
-            AND LENGTH(month_year) >= 8
-        ORDER BY quarter_start_date ASC;
+        SELECT DISTINCT quarter_start
+        FROM bi_cms_drug_pricing_stg
+        ORDER BY quarter_start ASC;
 
     DECLARE CONTINUE HANDLER FOR NOT FOUND SET done = 1;
 
@@ -55,31 +45,29 @@ BEGIN
 
     SET v_start_time = NOW();
 
+    -- Groups this run's rows in bi_refresh_step_log
+    SET @bi_refresh_run_id = UUID();
+    SET @bi_refresh_type = 'manual';
+
+    -- Validate, parse and stage cms_drug_pricing ONCE for the whole refresh
+    SET v_error_code = 0;
+    CALL sp_stage_cms_drug_pricing();
+
+    -- Failed staging or a tripped data-quality gate: leave the BI tables as they are
+    IF v_error_code != 0 THEN
+        INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+        VALUES ('manual', 'FAILED', CONCAT('Could not validate / stage source [', v_error_code, '] - BI tables unchanged'),
+            v_start_time, NOW());
+        LEAVE proc;
+    END IF;
+
     -- Get min/max dates and total quarter count
     SELECT
-        MIN(STR_TO_DATE(CONCAT('01-', REPLACE(REPLACE(month_year, '.', '-'), 'Feburary', 'February')), '%d-%M-%Y')),
-        MAX(STR_TO_DATE(CONCAT('01-', REPLACE(REPLACE(month_year, '.', '-'), 'Feburary', 'February')), '%d-%M-%Y'))
-    INTO v_min_date, v_max_date
-    FROM cms_drug_pricing
-    WHERE HCPCS_Code IS NOT NULL
-        AND month_year IS NOT NULL
-        AND month_year != 'month_year'
-        AND month_year LIKE '%.%'
-        AND LENGTH(month_year) >= 8;
-
-    -- Count total distinct quarters
-    SELECT COUNT(DISTINCT CONCAT(
-        'Q',
-        QUARTER(STR_TO_DATE(CONCAT('01-', REPLACE(REPLACE(month_year, '.', '-'), 'Feburary', 'February')), '%d-%M-%Y')),
-        YEAR(STR_TO_DATE(CONCAT('01-', REPLACE(REPLACE(month_year, '.', '-'), 'Feburary', 'February')), '%d-%M-%Y'))
-    ))
-    INTO v_total_quarters
-    FROM cms_drug_pricing
-    WHERE HCPCS_Code IS NOT NULL
-        AND month_year IS NOT NULL
-        AND month_year != 'month_year'
-        AND month_year LIKE '%.%'
-        AND LENGTH(month_year) >= 8;
+        MIN(period_date),
+        MAX(period_date),
+        COUNT(DISTINCT quarter_start)
+    INTO v_min_date, v_max_date, v_total_quarters
+    FROM bi_cms_drug_pricing_stg;
 
     -- Log start
     INSERT INTO bi_refresh_log (refresh_type, status, message, started_at)
@@ -105,8 +93,14 @@ BEGIN
             DATE_FORMAT(v_current_date, '%Y-%m-%d')), NOW());
 
         -- Process the quarter
+        SET v_error_code = 0;
         CALL sp_process_single_quarter(v_current_date, @rows_pricing, @rows_historical);
 
+        -- Record the source watermark so incremental runs can skip this quarter
+        IF v_error_code = 0 THEN
+            CALL sp_record_source_watermark(v_current_date);
+        END IF;
+
         -- Update totals
         SET v_total_pricing_rows = v_total_pricing_rows + IFNULL(@rows_pricing, 0);
         SET v_total_historical_rows = v_total_historical_rows + IFNULL(@rows_historical, 0);
@@ -128,6 +122,14 @@ BEGIN
 
     CLOSE date_cursor;
 
+    -- Compact facts, then the dashboard rollups built from them
+    -- (sp_refresh_bi_dimensions.sql, sp_refresh_bi_rollups.sql)
+    CALL sp_refresh_bi_dimensions(NULL);
+    CALL sp_refresh_bi_rollups(NULL);
+
+    -- Per-quarter/HCPCS digests of this build (sp_refresh_digest.sql)
+    CALL sp_record_refresh_digest(NULL);
+
     -- Log final completion
     INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
     VALUES ('manual', 'COMPLETED', CONCAT('SUCCESS! All ', v_quarter_count, ' quarters processed. ',
@@ -144,4 +146,29 @@ BEGIN
 
 END //
 
+-- =====================================================
+-- Entry point: sp_refresh_bi_tables_v3_unlocked under the refresh
+-- lock (sp_refresh_lock.sql) - fails instead of overlapping a
+-- refresh that is already running
+-- =====================================================
+
+DROP PROCEDURE IF EXISTS sp_refresh_bi_tables_v3 //
+
+CREATE PROCEDURE sp_refresh_bi_tables_v3()
+BEGIN
+    DECLARE v_lock_taken TINYINT DEFAULT 0;
+
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        CALL sp_release_refresh_lock(v_lock_taken);
+        RESIGNAL;
+    END;
+
+    -- SIGNALs when another refresh holds the lock
+    CALL sp_acquire_refresh_lock('manual', v_lock_taken);
+    CALL sp_refresh_bi_tables_v3_unlocked();
+    CALL sp_release_refresh_lock(v_lock_taken);
+
+END //
+
 DELIMITER ;
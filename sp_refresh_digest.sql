@@ -0,0 +1,203 @@
+-- =====================================================
+-- REFRESH DIGESTS - WHAT CHANGED BETWEEN TWO BUILDS
+-- One hash per HCPCS code per quarter of each BI table,
+-- recorded at the end of every refresh, so two builds are
+-- compared over the digests instead of the full tables
+-- =====================================================
+--
+--   bi_refresh_digest_run      one row per recorded build (run_id = @bi_refresh_run_id)
+--   bi_refresh_digest          per table / quarter_key / HCPCS_Code: row count,
+--                              64-bit digest of the rows (XOR of per-row MD5
+--                              prefixes, Updated_date excluded) and the average
+--                              ASP / median WAC / median AWP for price deltas
+--   bi_refresh_digest_quarter  per table / quarter_key: XOR of the HCPCS digests
+--
+-- Equal quarter digests = identical quarter (up to a 64-bit collision), so a
+-- comparison only drills into the quarters whose digest moved:
+--   python refresh_diff.py                    # latest build vs the one before
+--   python export_bi_parquet.py --use-digests # skip quarters whose digest is unchanged
+--
+-- Called at the end of sp_refresh_bi_tables_v4, sp_refresh_bi_tables_incremental
+-- (when it processed anything), sp_refresh_bi_tables_shadow and
+-- refresh_bi_tables.py --mode full. Keeps the last p_keep_runs builds (NULL = 30,
+-- never fewer than 2 so there is always a previous build to diff against).
+-- Run on its own with:  CALL sp_record_refresh_digest(NULL);
+
+CREATE TABLE IF NOT EXISTS bi_refresh_digest_run (
+    run_id VARCHAR(64) NOT NULL,
+    refresh_type VARCHAR(20),
+    recorded_at DATETIME(3) NOT NULL,
+    pricing_rows INT NOT NULL,
+    historical_rows INT NOT NULL,
+    PRIMARY KEY (run_id),
+    INDEX idx_digest_run_recorded (recorded_at)
+);
+
+CREATE TABLE IF NOT EXISTS bi_refresh_digest (
+    run_id VARCHAR(64) NOT NULL,
+    table_name VARCHAR(32) NOT NULL,
+    quarter_key INT NOT NULL,
+    HCPCS_Code VARCHAR(100) NOT NULL,
+    row_count INT NOT NULL,
+    row_digest BIGINT UNSIGNED NOT NULL,
+    asp DECIMAL(18,4),
+    median_wac DECIMAL(18,4),
+    median_awp DECIMAL(18,4),
+    PRIMARY KEY (run_id, table_name, quarter_key, HCPCS_Code)
+);
+
+CREATE TABLE IF NOT EXISTS bi_refresh_digest_quarter (
+    run_id VARCHAR(64) NOT NULL,
+    table_name VARCHAR(32) NOT NULL,
+    quarter_key INT NOT NULL,
+    row_count INT NOT NULL,
+    hcpcs_count INT NOT NULL,
+    quarter_digest BIGINT UNSIGNED NOT NULL,
+    PRIMARY KEY (run_id, table_name, quarter_key)
+);
+
+DELIMITER //
+
+DROP PROCEDURE IF EXISTS sp_record_refresh_digest //
+
+CREATE PROCEDURE sp_record_refresh_digest(
+    IN p_keep_runs INT
+)
+BEGIN
+    DECLARE v_start_time DATETIME;
+    DECLARE v_step_start DATETIME(3);
+    DECLARE v_run_id VARCHAR(64);
+    DECLARE v_pricing_rows INT DEFAULT 0;
+    DECLARE v_historical_rows INT DEFAULT 0;
+    DECLARE v_keep_runs INT;
+    DECLARE v_cutoff DATETIME(3) DEFAULT NULL;
+    DECLARE v_error_code INT;
+    DECLARE v_error_message TEXT;
+
+    -- Error handler
+    DECLARE exit handler FOR SQLEXCEPTION
+    BEGIN
+        GET DIAGNOSTICS CONDITION 1
+            v_error_code = MYSQL_ERRNO,
+            v_error_message = MESSAGE_TEXT;
+        CALL sp_log_refresh_step('digest', NULL, NULL, NULL, v_step_start, v_error_code);
+        INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+        VALUES ('digest', 'FAILED', CONCAT('Error recording refresh digest: ', v_error_message), v_start_time, NOW());
+        RESIGNAL;
+    END;
+
+    SET v_start_time = NOW();
+    SET v_step_start = NOW(3);
+    SET v_run_id = IFNULL(@bi_refresh_run_id, UUID());
+
+    -- Re-recording the same run replaces it
+    DELETE FROM bi_refresh_digest WHERE run_id = v_run_id;
+    DELETE FROM bi_refresh_digest_quarter WHERE run_id = v_run_id;
+
+    -- =====================================================
+    -- STEP 1: PER-HCPCS DIGESTS (one grouped pass per table)
+    -- CHAR(0) stands in for NULL so NULL and '' hash differently
+    -- =====================================================
+
+    INSERT INTO bi_refresh_digest (
+        run_id, table_name, quarter_key, HCPCS_Code, row_count, row_digest, asp, median_wac, median_awp
+    )
+    SELECT
+        v_run_id,
+        'bi_historical_pricing',
+        quarter_key,
+        HCPCS_Code,
+        COUNT(*),
+        BIT_XOR(CAST(CONV(LEFT(MD5(CONCAT_WS(CHAR(31),
+            Quarter, IFNULL(Manufacturer, CHAR(0)), IFNULL(hcpcs_drug, CHAR(0)),
+            IFNULL(ASP, CHAR(0)), IFNULL(Median_WAC, CHAR(0)), IFNULL(Median_AWP, CHAR(0))
+        )), 16), 16, 10) AS UNSIGNED)),
+        AVG(CAST(NULLIF(ASP, 'NA') AS DECIMAL(18,4))),
+        AVG(CAST(NULLIF(Median_WAC, 'NA') AS DECIMAL(18,4))),
+        AVG(CAST(NULLIF(Median_AWP, 'NA') AS DECIMAL(18,4)))
+    FROM bi_historical_pricing
+    WHERE quarter_key IS NOT NULL
+    GROUP BY quarter_key, HCPCS_Code;
+
+    SET v_historical_rows = ROW_COUNT();
+
+    INSERT INTO bi_refresh_digest (
+        run_id, table_name, quarter_key, HCPCS_Code, row_count, row_digest, asp, median_wac, median_awp
+    )
+    SELECT
+        v_run_id,
+        'bi_hcpcs_drug_pricing',
+        quarter_key,
+        HCPCS_Code,
+        COUNT(*),
+        BIT_XOR(CAST(CONV(LEFT(MD5(CONCAT_WS(CHAR(31),
+            month_year, IFNULL(Manufacturer, CHAR(0)), IFNULL(Drug_Name, CHAR(0)), IFNULL(hcpcs_drug, CHAR(0)),
+            IFNULL(BILLUNITSPKG, CHAR(0)), IFNULL(HCPCS_Code_Dosage, CHAR(0)), IFNULL(Payment_Limit, CHAR(0)),
+            IFNULL(Current_WAC_Effect_Date, CHAR(0)), IFNULL(Current_AWP_Effect_Date, CHAR(0)),
+            IFNULL(J_Code_Desc, CHAR(0)), IFNULL(ASP_Override, CHAR(0)), IFNULL(ASP_current_quarter, CHAR(0)),
+            IFNULL(ASP_prev_quarter, CHAR(0)), IFNULL(ASP_Quarterly_Change_Pct, CHAR(0)),
+            IFNULL(Median_WAC, CHAR(0)), IFNULL(Median_AWP, CHAR(0)),
+            IFNULL(ASP_by_WAC_ratio, CHAR(0)), IFNULL(ASP_by_AWP_ratio, CHAR(0)), IFNULL(period_date, CHAR(0))
+        )), 16), 16, 10) AS UNSIGNED)),
+        AVG(ASP_current_quarter),
+        AVG(Median_WAC),
+        AVG(Median_AWP)
+    FROM bi_hcpcs_drug_pricing
+    WHERE quarter_key IS NOT NULL
+    GROUP BY quarter_key, HCPCS_Code;
+
+    SET v_pricing_rows = ROW_COUNT();
+
+    -- =====================================================
+    -- STEP 2: PER-QUARTER DIGESTS + RUN ROW
+    -- =====================================================
+
+    INSERT INTO bi_refresh_digest_quarter (
+        run_id, table_name, quarter_key, row_count, hcpcs_count, quarter_digest
+    )
+    SELECT run_id, table_name, quarter_key, SUM(row_count), COUNT(*), BIT_XOR(row_digest)
+    FROM bi_refresh_digest
+    WHERE run_id = v_run_id
+    GROUP BY run_id, table_name, quarter_key;
+
+    REPLACE INTO bi_refresh_digest_run (run_id, refresh_type, recorded_at, pricing_rows, historical_rows)
+    SELECT
+        v_run_id,
+        @bi_refresh_type,
+        v_step_start,
+        IFNULL(SUM(CASE WHEN table_name = 'bi_hcpcs_drug_pricing' THEN row_count END), 0),
+        IFNULL(SUM(CASE WHEN table_name = 'bi_historical_pricing' THEN row_count END), 0)
+    FROM bi_refresh_digest_quarter
+    WHERE run_id = v_run_id;
+
+    -- =====================================================
+    -- STEP 3: RETENTION - drop builds older than the last p_keep_runs
+    -- =====================================================
+
+    SET v_keep_runs = GREATEST(IFNULL(p_keep_runs, 30), 2);
+
+    SELECT recorded_at INTO v_cutoff
+    FROM bi_refresh_digest_run
+    ORDER BY recorded_at DESC
+    LIMIT v_keep_runs, 1;
+
+    IF v_cutoff IS NOT NULL THEN
+        DELETE d
+        FROM bi_refresh_digest d
+        INNER JOIN bi_refresh_digest_run r ON r.run_id = d.run_id
+        WHERE r.recorded_at <= v_cutoff AND r.run_id != v_run_id;
+
+        DELETE q
+        FROM bi_refresh_digest_quarter q
+        INNER JOIN bi_refresh_digest_run r ON r.run_id = q.run_id
+        WHERE r.recorded_at <= v_cutoff AND r.run_id != v_run_id;
+
+        DELETE FROM bi_refresh_digest_run
+        WHERE recorded_at <= v_cutoff AND run_id != v_run_id;
+    END IF;
+
+    CALL sp_log_refresh_step('digest', NULL, NULL, v_historical_rows + v_pricing_rows, v_step_start, 0);
+
+END //
+
+DELIMITER ;
@@ -0,0 +1,67 @@
+-- =====================================================
+-- REFRESH LOCK - ONE REFRESH AT A TIME
+-- The GET_LOCK advisory lock '<database>.bi_refresh', taken by
+-- the top-level refresh procedures themselves, so a refresh
+-- started from cron, phpMyAdmin or Python never overlaps another
+-- =====================================================
+--
+-- Same lock name as refresh_bi_tables.py (REFRESH_LOCK). The lock belongs
+-- to the session: it is released by sp_release_refresh_lock or when the
+-- connection closes, also after a crash, so it never goes stale.
+--
+-- Already held by this refresh (nothing taken, nothing released):
+--   - by this session, e.g. sp_refresh_bi_tables_incremental falling back to
+--     sp_refresh_bi_tables_v3 on its first run
+--   - by the connection whose CONNECTION_ID() is in @bi_refresh_lock_owner:
+--     the Python entry points hold the lock on a separate connection and set
+--     it on the connections they run the procedures on
+--
+-- Wrapped procedures (the work itself is in <name>_unlocked):
+--   sp_refresh_bi_tables_v3, sp_refresh_bi_tables_incremental, sp_refresh_bi_tables_shadow
+--
+-- Wait for a running refresh instead of failing:  SET @bi_refresh_lock_timeout = 600;
+-- Who holds it:  SELECT IS_USED_LOCK(CONCAT(DATABASE(), '.bi_refresh'));  -- connection id, NULL = free
+
+DELIMITER //
+
+DROP PROCEDURE IF EXISTS sp_acquire_refresh_lock //
+
+CREATE PROCEDURE sp_acquire_refresh_lock(
+    IN p_refresh_type VARCHAR(20),
+    OUT p_taken TINYINT
+)
+BEGIN
+    DECLARE v_lock_name VARCHAR(128);
+    DECLARE v_holder BIGINT;
+    DECLARE v_message VARCHAR(255);
+
+    SET p_taken = 0;
+    SET v_lock_name = CONCAT(DATABASE(), '.bi_refresh');
+    SET v_holder = IS_USED_LOCK(v_lock_name);
+
+    IF v_holder IS NOT NULL AND (v_holder = CONNECTION_ID() OR v_holder = @bi_refresh_lock_owner) THEN
+        SET p_taken = 0;  -- held for this refresh already
+    ELSEIF GET_LOCK(v_lock_name, IFNULL(@bi_refresh_lock_timeout, 0)) = 1 THEN
+        SET p_taken = 1;
+    ELSE
+        SET v_message = CONCAT('Another BI table refresh is running (lock ', v_lock_name,
+            ', connection ', IFNULL(IS_USED_LOCK(v_lock_name), '?'), ') - not started');
+        INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+        VALUES (p_refresh_type, 'FAILED', v_message, NOW(), NOW());
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = v_message;
+    END IF;
+
+END //
+
+DROP PROCEDURE IF EXISTS sp_release_refresh_lock //
+
+CREATE PROCEDURE sp_release_refresh_lock(
+    IN p_taken TINYINT
+)
+BEGIN
+    IF p_taken = 1 THEN
+        DO RELEASE_LOCK(CONCAT(DATABASE(), '.bi_refresh'));
+    END IF;
+END //
+
+DELIMITER ;
@@ -0,0 +1,64 @@
+-- =====================================================
+-- REFRESH TELEMETRY - PER-STEP TIMINGS AND ROW COUNTS
+-- Companion to bi_refresh_log: one structured row per step
+-- (staging, medians, prev-quarter lookup, delete, upsert, ...)
+-- =====================================================
+--
+-- run_id groups the steps of one refresh. The refresh procedures set
+-- @bi_refresh_run_id at the start; refresh_bi_tables.py sets it on every
+-- worker connection. Standalone calls log with run_id 'manual'.
+--
+-- Report: python refresh_report.py
+
+CREATE TABLE IF NOT EXISTS bi_refresh_step_log (
+    id BIGINT NOT NULL AUTO_INCREMENT,
+    run_id VARCHAR(64) NOT NULL,
+    refresh_type VARCHAR(20),
+    quarter_key INT,
+    step VARCHAR(64) NOT NULL,
+    rows_in INT,
+    rows_out INT,
+    elapsed_ms INT NOT NULL,
+    errno INT NOT NULL DEFAULT 0,
+    started_at DATETIME(3) NOT NULL,
+    completed_at DATETIME(3) NOT NULL,
+    PRIMARY KEY (id),
+    INDEX idx_step_log_run (run_id),
+    INDEX idx_step_log_step (step, started_at)
+);
+
+DELIMITER //
+
+DROP PROCEDURE IF EXISTS sp_log_refresh_step //
+
+CREATE PROCEDURE sp_log_refresh_step(
+    IN p_step VARCHAR(64),
+    IN p_quarter_key INT,
+    IN p_rows_in INT,
+    IN p_rows_out INT,
+    IN p_started_at DATETIME(3),
+    IN p_errno INT
+)
+BEGIN
+    -- bi_refresh_step_log is created above, once: no DDL here, which would
+    -- implicitly commit the caller's open transaction on every step
+    INSERT INTO bi_refresh_step_log (
+        run_id, refresh_type, quarter_key, step, rows_in, rows_out,
+        elapsed_ms, errno, started_at, completed_at
+    )
+    VALUES (
+        IFNULL(@bi_refresh_run_id, 'manual'),
+        IFNULL(@bi_refresh_type, 'manual'),
+        p_quarter_key,
+        p_step,
+        p_rows_in,
+        p_rows_out,
+        TIMESTAMPDIFF(MICROSECOND, p_started_at, NOW(3)) DIV 1000,
+        IFNULL(p_errno, 0),
+        p_started_at,
+        NOW(3)
+    );
+
+END //
+
+DELIMITER ;
@@ -0,0 +1,221 @@
+-- =====================================================
+-- SOURCE STAGING - ONCE PER REFRESH
+-- Parses and types cms_drug_pricing ONE time and stores it
+-- clustered by quarter, so each quarter step reads only its
+-- own contiguous range instead of re-scanning the source
+-- =====================================================
+
+-- Parsed/typed view of the source. Shared by full staging, per-quarter
+-- restaging and the incremental watermark so they never drift apart.
+-- period_date/quarter_key are persisted on cms_drug_pricing
+-- (see migrate_period_columns.sql); unparseable rows have NULL period_date.
+-- row_crc is a per-row checksum of the raw source columns.
+-- The WHERE clause is the rejected set of the data-quality gate
+-- (vw_cms_drug_pricing_dq, sp_validate_cms_drug_pricing.sql) - keep in sync.
+CREATE OR REPLACE VIEW vw_cms_drug_pricing_parsed AS
+SELECT
+    DATE_SUB(src.period_date, INTERVAL (MONTH(src.period_date) - 1) % 3 MONTH) AS quarter_start,
+    src.*
+FROM (
+    SELECT
+        CAST(HCPCS_Code AS CHAR(100)) AS HCPCS_Code,
+        CAST(LABELER_NAME AS CHAR(255)) AS Manufacturer,
+        CAST(NDC2 AS CHAR(50)) AS NDC2,
+        CAST(Drug_Name AS CHAR(500)) AS Drug_Name,
+        CAST(BILLUNITSPKG AS DECIMAL(18,4)) AS BILLUNITSPKG,
+        CAST(HCPCS_Code_Dosage AS CHAR(100)) AS HCPCS_Code_Dosage,
+        CAST(Payment_Limit AS DECIMAL(18,4)) AS Payment_Limit,
+        CAST(Current_WAC_Package_Price AS DECIMAL(18,4)) AS Current_WAC_Package_Price,
+        STR_TO_DATE(Current_WAC_Effect_Date, '%c/%e/%y') AS Current_WAC_Effect_Date,
+        CAST(Current_AWP_Package_Price AS DECIMAL(18,4)) AS Current_AWP_Package_Price,
+        STR_TO_DATE(Current_AWP_Effect_Date, '%c/%e/%y') AS Current_AWP_Effect_Date,
+        CAST(J_Code_Desc AS CHAR(500)) AS J_Code_Desc,
+        CAST(month_name AS CHAR(20)) AS month_name,
+        CAST(year_name AS CHAR(10)) AS year_name,
+        CAST(month_year AS CHAR(20)) AS month_year,
+        CAST(ASP_Override AS DECIMAL(18,4)) AS ASP_Override,
+        CASE
+            WHEN CAST(BILLUNITSPKG AS DECIMAL(18,4)) IS NOT NULL
+                 AND CAST(BILLUNITSPKG AS DECIMAL(18,4)) != 0
+                 AND CAST(Current_WAC_Package_Price AS DECIMAL(18,4)) IS NOT NULL
+            THEN CAST(Current_WAC_Package_Price AS DECIMAL(18,4)) / CAST(BILLUNITSPKG AS DECIMAL(18,4))
+            ELSE NULL
+        END AS WAC_per_unit,
+        CASE
+            WHEN CAST(BILLUNITSPKG AS DECIMAL(18,4)) IS NOT NULL
+                 AND CAST(BILLUNITSPKG AS DECIMAL(18,4)) != 0
+                 AND CAST(Current_AWP_Package_Price AS DECIMAL(18,4)) IS NOT NULL
+            THEN CAST(Current_AWP_Package_Price AS DECIMAL(18,4)) / CAST(BILLUNITSPKG AS DECIMAL(18,4))
+            ELSE NULL
+        END AS AWP_per_unit,
+        CASE
+            WHEN CAST(ASP_Override AS DECIMAL(18,4)) IS NOT NULL
+                 AND CAST(ASP_Override AS DECIMAL(18,4)) != 0
+            THEN CAST(ASP_Override AS DECIMAL(18,4))
+            WHEN CAST(Payment_Limit AS DECIMAL(18,4)) IS NOT NULL
+                 AND CAST(Payment_Limit AS DECIMAL(18,4)) != 0
+            THEN CAST(Payment_Limit AS DECIMAL(18,4)) / 1.06
+            ELSE NULL
+        END AS ASP,
+        period_date,
+        quarter_key,
+        CONCAT('Q', quarter_key % 10, quarter_key DIV 10) AS Quarter,
+        CRC32(CONCAT_WS('|',
+            HCPCS_Code, LABELER_NAME, NDC2, Drug_Name, BILLUNITSPKG, HCPCS_Code_Dosage,
+            Payment_Limit, Current_WAC_Package_Price, Current_WAC_Effect_Date,
+            Current_AWP_Package_Price, Current_AWP_Effect_Date, J_Code_Desc,
+            month_name, year_name, month_year, ASP_Override
+        )) AS row_crc
+    FROM cms_drug_pricing
+    WHERE HCPCS_Code IS NOT NULL
+        AND TRIM(HCPCS_Code) != ''
+        AND HCPCS_Code != 'HCPCS_Code'
+        AND period_date IS NOT NULL
+) src;
+
+DELIMITER //
+
+DROP PROCEDURE IF EXISTS sp_stage_cms_drug_pricing //
+
+CREATE PROCEDURE sp_stage_cms_drug_pricing()
+BEGIN
+    DECLARE v_start_time DATETIME;
+    DECLARE v_step_start DATETIME(3);
+    DECLARE v_rows_staged INT;
+    DECLARE v_error_code INT;
+    DECLARE v_error_message TEXT;
+
+    -- Error handler
+    DECLARE exit handler FOR SQLEXCEPTION
+    BEGIN
+        GET DIAGNOSTICS CONDITION 1
+            v_error_code = MYSQL_ERRNO,
+            v_error_message = MESSAGE_TEXT;
+        CALL sp_log_refresh_step('stage_source', NULL, NULL, NULL, v_step_start, v_error_code);
+        INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+        VALUES ('manual', 'FAILED', CONCAT('Error staging cms_drug_pricing: ', v_error_message), v_start_time, NOW());
+        RESIGNAL;
+    END;
+
+    SET v_start_time = NOW();
+
+    -- Classify the source, quarantine rejects, count fixes
+    -- (sp_validate_cms_drug_pricing.sql); fails when the gate trips
+    CALL sp_validate_cms_drug_pricing();
+
+    SET v_step_start = NOW(3);
+
+    -- =====================================================
+    -- STEP 1: BUILD NEW STAGING TABLE
+    -- Primary key leads with quarter_start, so InnoDB stores every
+    -- quarter as one contiguous range (a partition per quarter)
+    -- =====================================================
+
+    DROP TABLE IF EXISTS bi_cms_drug_pricing_stg_new;
+
+    CREATE TABLE bi_cms_drug_pricing_stg_new (
+        stg_id BIGINT NOT NULL AUTO_INCREMENT,
+        quarter_start DATE NOT NULL,
+        HCPCS_Code VARCHAR(100),
+        Manufacturer VARCHAR(255),
+        NDC2 VARCHAR(50),
+        Drug_Name VARCHAR(500),
+        BILLUNITSPKG DECIMAL(18,4),
+        HCPCS_Code_Dosage VARCHAR(100),
+        Payment_Limit DECIMAL(18,4),
+        Current_WAC_Package_Price DECIMAL(18,4),
+        Current_WAC_Effect_Date DATE,
+        Current_AWP_Package_Price DECIMAL(18,4),
+        Current_AWP_Effect_Date DATE,
+        J_Code_Desc VARCHAR(500),
+        month_name VARCHAR(20),
+        year_name VARCHAR(10),
+        month_year VARCHAR(20),
+        ASP_Override DECIMAL(18,4),
+        WAC_per_unit DECIMAL(18,4),
+        AWP_per_unit DECIMAL(18,4),
+        ASP DECIMAL(18,4),
+        period_date DATE,
+        quarter_key INT NOT NULL,
+        Quarter VARCHAR(20),
+        row_crc INT UNSIGNED,
+        PRIMARY KEY (quarter_start, stg_id),
+        KEY idx_stg_id (stg_id),
+        KEY idx_stg_quarter_key (quarter_key)
+    );
+
+    INSERT INTO bi_cms_drug_pricing_stg_new (
+        quarter_start, HCPCS_Code, Manufacturer, NDC2, Drug_Name, BILLUNITSPKG,
+        HCPCS_Code_Dosage, Payment_Limit, Current_WAC_Package_Price, Current_WAC_Effect_Date,
+        Current_AWP_Package_Price, Current_AWP_Effect_Date, J_Code_Desc, month_name,
+        year_name, month_year, ASP_Override, WAC_per_unit, AWP_per_unit, ASP,
+        period_date, quarter_key, Quarter, row_crc
+    )
+    SELECT
+        quarter_start, HCPCS_Code, Manufacturer, NDC2, Drug_Name, BILLUNITSPKG,
+        HCPCS_Code_Dosage, Payment_Limit, Current_WAC_Package_Price, Current_WAC_Effect_Date,
+        Current_AWP_Package_Price, Current_AWP_Effect_Date, J_Code_Desc, month_name,
+        year_name, month_year, ASP_Override, WAC_per_unit, AWP_per_unit, ASP,
+        period_date, quarter_key, Quarter, row_crc
+    FROM vw_cms_drug_pricing_parsed
+    ORDER BY quarter_start;
+
+    SET v_rows_staged = ROW_COUNT();
+
+    -- =====================================================
+    -- STEP 2: SWAP IN THE NEW STAGING TABLE
+    -- =====================================================
+
+    CREATE TABLE IF NOT EXISTS bi_cms_drug_pricing_stg LIKE bi_cms_drug_pricing_stg_new;
+    DROP TABLE IF EXISTS bi_cms_drug_pricing_stg_old;
+    RENAME TABLE bi_cms_drug_pricing_stg TO bi_cms_drug_pricing_stg_old,
+                 bi_cms_drug_pricing_stg_new TO bi_cms_drug_pricing_stg;
+    DROP TABLE IF EXISTS bi_cms_drug_pricing_stg_old;
+
+    CALL sp_log_refresh_step('stage_source', NULL, NULL, v_rows_staged, v_step_start, 0);
+
+END //
+
+-- =====================================================
+-- RESTAGE ONE QUARTER (incremental refresh)
+-- Replaces a single quarter's range of bi_cms_drug_pricing_stg
+-- =====================================================
+
+DROP PROCEDURE IF EXISTS sp_restage_cms_drug_pricing_quarter //
+
+CREATE PROCEDURE sp_restage_cms_drug_pricing_quarter(
+    IN p_quarter_start DATE
+)
+BEGIN
+    DECLARE v_step_start DATETIME(3);
+    DECLARE v_rows_deleted INT;
+
+    SET v_step_start = NOW(3);
+
+    DELETE FROM bi_cms_drug_pricing_stg
+    WHERE quarter_start = p_quarter_start;
+
+    SET v_rows_deleted = ROW_COUNT();
+
+    INSERT INTO bi_cms_drug_pricing_stg (
+        quarter_start, HCPCS_Code, Manufacturer, NDC2, Drug_Name, BILLUNITSPKG,
+        HCPCS_Code_Dosage, Payment_Limit, Current_WAC_Package_Price, Current_WAC_Effect_Date,
+        Current_AWP_Package_Price, Current_AWP_Effect_Date, J_Code_Desc, month_name,
+        year_name, month_year, ASP_Override, WAC_per_unit, AWP_per_unit, ASP,
+        period_date, quarter_key, Quarter, row_crc
+    )
+    SELECT
+        quarter_start, HCPCS_Code, Manufacturer, NDC2, Drug_Name, BILLUNITSPKG,
+        HCPCS_Code_Dosage, Payment_Limit, Current_WAC_Package_Price, Current_WAC_Effect_Date,
+        Current_AWP_Package_Price, Current_AWP_Effect_Date, J_Code_Desc, month_name,
+        year_name, month_year, ASP_Override, WAC_per_unit, AWP_per_unit, ASP,
+        period_date, quarter_key, Quarter, row_crc
+    FROM vw_cms_drug_pricing_parsed
+    WHERE quarter_key = YEAR(p_quarter_start) * 10 + QUARTER(p_quarter_start);
+
+    CALL sp_log_refresh_step('restage_quarter', YEAR(p_quarter_start) * 10 + QUARTER(p_quarter_start),
+        v_rows_deleted, ROW_COUNT(), v_step_start, 0);
+
+END //
+
+DELIMITER ;
@@ -0,0 +1,251 @@
+-- =====================================================
+-- SOURCE DATA-QUALITY GATE - ONCE PER REFRESH
+-- Classifies every cms_drug_pricing row as valid, fixable or
+-- rejected, quarantines the rejects with their reasons and
+-- logs per-rule counts, before the source is staged
+-- =====================================================
+--
+--   rejected  not staged at all; copied to bi_cms_drug_pricing_quarantine
+--   fixable   staged, with the repair the parsing has always applied
+--   valid     staged as is
+--
+-- Rules (bi_data_quality_rule):
+--   rejected  missing_hcpcs      HCPCS_Code NULL or blank
+--             header_row         re-imported CSV header ('HCPCS_Code' / 'month_year')
+--             bad_month_year     month_year does not parse (fn_parse_month_year)
+--   fixable   month_typo         'Feburary' - parsed as February
+--             no_bill_units      BILLUNITSPKG missing / 0 - no per-unit WAC / AWP
+--             non_numeric_price  price column with text - read as its leading number (else 0)
+--             bad_effect_date    WAC / AWP effect date not m/d/yy - stored as NULL
+--             no_asp             neither ASP_Override nor Payment_Limit - ASP is NULL
+--
+-- The rejected rules are exactly what vw_cms_drug_pricing_parsed leaves out
+-- (sp_stage_cms_drug_pricing.sql), so staging and the quarter steps only
+-- ever see clean, typed rows. Keep the two in sync.
+--
+-- Gate: SET @bi_dq_max_rejected_pct = 5 (or refresh_bi_tables.py
+-- --max-rejected-pct 5) makes the procedure fail - and so stop the refresh
+-- before anything is rebuilt - when more than that share of rows is rejected.
+--
+-- Called at the start of sp_stage_cms_drug_pricing (full refreshes) and by
+-- sp_refresh_bi_tables_incremental when the source changed.
+-- Run on its own with:  CALL sp_validate_cms_drug_pricing();
+--
+-- Report: python refresh_report.py --quality
+
+CREATE TABLE IF NOT EXISTS bi_data_quality_rule (
+    rule VARCHAR(32) NOT NULL,
+    severity VARCHAR(10) NOT NULL,
+    description VARCHAR(255) NOT NULL,
+    PRIMARY KEY (rule)
+);
+
+INSERT INTO bi_data_quality_rule (rule, severity, description) VALUES
+    ('missing_hcpcs', 'rejected', 'HCPCS_Code NULL or blank'),
+    ('header_row', 'rejected', 'Re-imported CSV header row'),
+    ('bad_month_year', 'rejected', 'month_year does not parse to a month'),
+    ('month_typo', 'fixable', '''Feburary'' in month_year, parsed as February'),
+    ('no_bill_units', 'fixable', 'BILLUNITSPKG missing or 0: no per-unit WAC / AWP'),
+    ('non_numeric_price', 'fixable', 'Price column holds text: read as its leading number, else 0'),
+    ('bad_effect_date', 'fixable', 'WAC / AWP effect date is not m/d/yy: stored as NULL'),
+    ('no_asp', 'fixable', 'Neither ASP_Override nor Payment_Limit: ASP is NULL')
+ON DUPLICATE KEY UPDATE
+    severity = VALUES(severity),
+    description = VALUES(description);
+
+-- Per-rule row counts of every validation run (rule 'ALL' = status totals)
+CREATE TABLE IF NOT EXISTS bi_data_quality_log (
+    run_id VARCHAR(64) NOT NULL,
+    checked_at DATETIME NOT NULL,
+    severity VARCHAR(10) NOT NULL,
+    rule VARCHAR(32) NOT NULL,
+    row_count INT NOT NULL,
+    PRIMARY KEY (run_id, severity, rule),
+    INDEX idx_dq_log_checked (checked_at)
+);
+
+-- Rejected rows of the current source (rebuilt by every validation run)
+CREATE TABLE IF NOT EXISTS bi_cms_drug_pricing_quarantine (
+    source_id INT NOT NULL,
+    reasons VARCHAR(100) NOT NULL,
+    HCPCS_Code VARCHAR(100),
+    LABELER_NAME VARCHAR(255),
+    NDC2 VARCHAR(50),
+    month_year VARCHAR(50),
+    run_id VARCHAR(64) NOT NULL,
+    quarantined_at DATETIME NOT NULL,
+    PRIMARY KEY (source_id),
+    INDEX idx_quarantine_reasons (reasons)
+);
+
+DELIMITER //
+
+DROP FUNCTION IF EXISTS fn_is_number //
+
+CREATE FUNCTION fn_is_number(p_value VARCHAR(100))
+RETURNS TINYINT
+DETERMINISTIC
+BEGIN
+    -- Missing / blank counts as a number here: it is a missing value, not text
+    RETURN p_value IS NULL
+        OR TRIM(p_value) = ''
+        OR p_value REGEXP '^[[:space:]]*[-+]?([0-9]+([.][0-9]*)?|[.][0-9]+)([eE][-+]?[0-9]+)?[[:space:]]*$';
+END //
+
+DELIMITER ;
+
+-- One row per source row: comma-separated rejected reasons / applied fixes
+-- ('' = none)
+CREATE OR REPLACE VIEW vw_cms_drug_pricing_dq AS
+SELECT
+    id AS source_id,
+    HCPCS_Code,
+    LABELER_NAME,
+    NDC2,
+    month_year,
+    CONCAT_WS(',',
+        IF(HCPCS_Code IS NULL OR TRIM(HCPCS_Code) = '', 'missing_hcpcs', NULL),
+        IF(HCPCS_Code = 'HCPCS_Code' OR month_year = 'month_year', 'header_row', NULL),
+        IF(period_date IS NULL AND NOT (month_year <=> 'month_year'), 'bad_month_year', NULL)
+    ) AS rejected_reasons,
+    CONCAT_WS(',',
+        IF(month_year LIKE '%Feburary%', 'month_typo', NULL),
+        IF(IFNULL(CAST(BILLUNITSPKG AS DECIMAL(18,4)), 0) = 0, 'no_bill_units', NULL),
+        IF(fn_is_number(BILLUNITSPKG) AND fn_is_number(Payment_Limit)
+                AND fn_is_number(Current_WAC_Package_Price) AND fn_is_number(Current_AWP_Package_Price)
+                AND fn_is_number(ASP_Override),
+            NULL, 'non_numeric_price'),
+        IF((TRIM(Current_WAC_Effect_Date) != '' AND STR_TO_DATE(Current_WAC_Effect_Date, '%c/%e/%y') IS NULL)
+                OR (TRIM(Current_AWP_Effect_Date) != '' AND STR_TO_DATE(Current_AWP_Effect_Date, '%c/%e/%y') IS NULL),
+            'bad_effect_date', NULL),
+        IF(IFNULL(CAST(ASP_Override AS DECIMAL(18,4)), 0) = 0
+                AND IFNULL(CAST(Payment_Limit AS DECIMAL(18,4)), 0) = 0,
+            'no_asp', NULL)
+    ) AS fixes
+FROM cms_drug_pricing;
+
+DELIMITER //
+
+DROP PROCEDURE IF EXISTS sp_validate_cms_drug_pricing //
+
+CREATE PROCEDURE sp_validate_cms_drug_pricing()
+BEGIN
+    DECLARE v_start_time DATETIME;
+    DECLARE v_step_start DATETIME(3);
+    DECLARE v_run_id VARCHAR(64);
+    DECLARE v_total_rows INT DEFAULT 0;
+    DECLARE v_valid_rows INT DEFAULT 0;
+    DECLARE v_fixable_rows INT DEFAULT 0;
+    DECLARE v_rejected_rows INT DEFAULT 0;
+    DECLARE v_gate_message VARCHAR(255);
+    DECLARE v_error_code INT;
+    DECLARE v_error_message TEXT;
+
+    -- Error handler (also reached when the gate trips)
+    DECLARE exit handler FOR SQLEXCEPTION
+    BEGIN
+        GET DIAGNOSTICS CONDITION 1
+            v_error_code = MYSQL_ERRNO,
+            v_error_message = MESSAGE_TEXT;
+        CALL sp_log_refresh_step('validate_source', NULL, v_total_rows, v_rejected_rows, v_step_start, v_error_code);
+        INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+        VALUES ('validate', 'FAILED', CONCAT('Source validation: ', v_error_message), v_start_time, NOW());
+        DROP TABLE IF EXISTS bi_cms_drug_pricing_quarantine_new;
+        DROP TEMPORARY TABLE IF EXISTS temp_dq_combinations;
+        RESIGNAL;
+    END;
+
+    SET v_start_time = NOW();
+    SET v_step_start = NOW(3);
+    SET v_run_id = IFNULL(@bi_refresh_run_id, 'manual');
+
+    -- =====================================================
+    -- STEP 1: QUARANTINE REJECTED ROWS
+    -- =====================================================
+
+    DROP TABLE IF EXISTS bi_cms_drug_pricing_quarantine_new;
+    CREATE TABLE bi_cms_drug_pricing_quarantine_new LIKE bi_cms_drug_pricing_quarantine;
+
+    INSERT INTO bi_cms_drug_pricing_quarantine_new (
+        source_id, reasons, HCPCS_Code, LABELER_NAME, NDC2, month_year, run_id, quarantined_at
+    )
+    SELECT source_id, rejected_reasons, HCPCS_Code, LABELER_NAME, NDC2, month_year, v_run_id, v_start_time
+    FROM vw_cms_drug_pricing_dq
+    WHERE rejected_reasons != '';
+
+    -- =====================================================
+    -- STEP 2: COUNT EVERY RULE (one pass, grouped by reason set)
+    -- =====================================================
+
+    DROP TEMPORARY TABLE IF EXISTS temp_dq_combinations;
+
+    CREATE TEMPORARY TABLE temp_dq_combinations AS
+    SELECT rejected_reasons, fixes, COUNT(*) AS row_count
+    FROM vw_cms_drug_pricing_dq
+    GROUP BY rejected_reasons, fixes;
+
+    SELECT
+        IFNULL(SUM(row_count), 0),
+        IFNULL(SUM(CASE WHEN rejected_reasons = '' AND fixes = '' THEN row_count END), 0),
+        IFNULL(SUM(CASE WHEN rejected_reasons = '' AND fixes != '' THEN row_count END), 0),
+        IFNULL(SUM(CASE WHEN rejected_reasons != '' THEN row_count END), 0)
+    INTO v_total_rows, v_valid_rows, v_fixable_rows, v_rejected_rows
+    FROM temp_dq_combinations;
+
+    INSERT INTO bi_data_quality_log (run_id, checked_at, severity, rule, row_count)
+    VALUES
+        (v_run_id, v_start_time, 'valid', 'ALL', v_valid_rows),
+        (v_run_id, v_start_time, 'fixable', 'ALL', v_fixable_rows),
+        (v_run_id, v_start_time, 'rejected', 'ALL', v_rejected_rows)
+    ON DUPLICATE KEY UPDATE checked_at = VALUES(checked_at), row_count = VALUES(row_count);
+
+    -- A row counts once per rule it breaks (a rejected row's fixes are not counted)
+    INSERT INTO bi_data_quality_log (run_id, checked_at, severity, rule, row_count)
+    SELECT v_run_id, v_start_time, r.severity, r.rule, IFNULL(SUM(c.row_count), 0)
+    FROM bi_data_quality_rule r
+    LEFT JOIN temp_dq_combinations c
+        ON (r.severity = 'rejected' AND FIND_IN_SET(r.rule, c.rejected_reasons) > 0)
+        OR (r.severity = 'fixable' AND c.rejected_reasons = '' AND FIND_IN_SET(r.rule, c.fixes) > 0)
+    GROUP BY r.severity, r.rule
+    ON DUPLICATE KEY UPDATE checked_at = VALUES(checked_at), row_count = VALUES(row_count);
+
+    DROP TEMPORARY TABLE IF EXISTS temp_dq_combinations;
+
+    -- =====================================================
+    -- STEP 3: GATE, THEN SWAP IN THE NEW QUARANTINE
+    -- =====================================================
+
+    IF @bi_dq_max_rejected_pct IS NOT NULL
+        AND v_rejected_rows * 100 > @bi_dq_max_rejected_pct * v_total_rows THEN
+        SET v_gate_message = CONCAT('data-quality gate: ', v_rejected_rows, ' of ', v_total_rows,
+            ' rows rejected (limit ', @bi_dq_max_rejected_pct, '%) - see bi_cms_drug_pricing_quarantine_blocked');
+        -- Keep the new rejects for inspection instead of dropping them in the handler
+        DROP TABLE IF EXISTS bi_cms_drug_pricing_quarantine_blocked;
+        RENAME TABLE bi_cms_drug_pricing_quarantine_new TO bi_cms_drug_pricing_quarantine_blocked;
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = v_gate_message;
+    END IF;
+
+    DROP TABLE IF EXISTS bi_cms_drug_pricing_quarantine_old;
+    RENAME TABLE bi_cms_drug_pricing_quarantine TO bi_cms_drug_pricing_quarantine_old,
+                 bi_cms_drug_pricing_quarantine_new TO bi_cms_drug_pricing_quarantine;
+    DROP TABLE IF EXISTS bi_cms_drug_pricing_quarantine_old;
+
+    CALL sp_log_refresh_step('validate_source', NULL, v_total_rows, v_rejected_rows, v_step_start, 0);
+
+    INSERT INTO bi_refresh_log (refresh_type, status, message, started_at, completed_at)
+    VALUES ('validate', 'COMPLETED', CONCAT('Source rows: ', v_total_rows, ' - valid ', v_valid_rows,
+        ', fixable ', v_fixable_rows, ', rejected ', v_rejected_rows, ' (bi_cms_drug_pricing_quarantine)'),
+        v_start_time, NOW());
+
+END //
+
+DELIMITER ;
+
+-- =====================================================
+-- Latest run, per rule:
+-- SELECT l.severity, l.rule, l.row_count, r.description
+-- FROM bi_data_quality_log l
+-- LEFT JOIN bi_data_quality_rule r ON r.rule = l.rule
+-- WHERE l.run_id = (SELECT run_id FROM bi_data_quality_log ORDER BY checked_at DESC LIMIT 1)
+-- ORDER BY FIELD(l.severity, 'valid', 'fixable', 'rejected'), l.rule;
+-- =====================================================
@@ -0,0 +1,54 @@
+"""
+Superset / Preset REST API helpers
+Shared by Create-preset-dashboard.py and warm_superset_cache.py
+
+What it does:
+- rison_string / rison_list: quote values for a list endpoint's `q` parameter
+- list_all: every row of a list endpoint (GET /api/v1/<resource>/) matching
+  the filters, following pages
+
+Prerequisites:
+- pip install requests
+"""
+
+from typing import Dict, List
+
+import requests
+
+
+def rison_string(value: str) -> str:
+    """Quote a string for a rison `q` parameter"""
+    return "'" + value.replace("!", "!!").replace("'", "!'") + "'"
+
+
+def rison_list(values: List) -> str:
+    return "!(" + ",".join(rison_string(v) if isinstance(v, str) else str(v) for v in values) + ")"
+
+
+def list_all(session: requests.Session, base_url: str, resource: str, filters: str,
+             columns: List[str], page_size: int = 100, timeout: int = None) -> List[Dict]:
+    """
+    Every row of a list endpoint matching the filters, following pages
+
+    Args:
+        session: Authenticated requests session
+        base_url: Superset / Preset workspace URL
+        resource: 'dataset', 'chart' or 'dashboard'
+        filters: Rison filter tuples, e.g. "(col:slice_name,opr:in,value:!('a','b'))"
+        columns: Columns to return (keeps list responses small)
+        page_size: Rows per request
+        timeout: Seconds per request (None = wait)
+    """
+    rows = []
+    page = 0
+    while True:
+        query = (f"(filters:!({filters}),columns:{rison_list(columns)},"
+                 f"order_column:id,order_direction:asc,page:{page},page_size:{page_size})")
+        response = session.get(f"{base_url}/api/v1/{resource}/", params={"q": query}, timeout=timeout)
+        if response.status_code != 200:
+            raise Exception(f"Failed to list {resource}s: {response.text}")
+        body = response.json()
+        rows.extend(body.get('result', []))
+        if not body.get('result') or len(rows) >= body.get('count', 0):
+            return rows
+        page += 1
@@ -1,6 +1,11 @@
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
+
 import jwt
-from flask import request
+from flask import jsonify, request
 from flask_appbuilder.security.manager import AUTH_DB
 from superset.security import SupersetSecurityManager
 
@@ -21,11 +26,108 @@ AUTH_TYPE = AUTH_DB
 PUBLIC_ROLE_LIKE_GAMMA = False
 JWT_SECRET = os.getenv("SUPERSET_JWT_SECRET", "replace_with_strong_secret")
 
+JWT_CACHE_SIZE = int(os.getenv("SUPERSET_JWT_CACHE_SIZE", "1024"))
+JWT_CACHE_TTL = int(os.getenv("SUPERSET_JWT_CACHE_TTL", "300"))
+
+
+class JwtUserCache:
+    """
+    Bounded LRU of validated portal tokens -> resolved user
+
+    A dashboard fires dozens of API calls per view with the same token; only
+    the first pays for jwt.decode + find_user on the metadata DB. Entries
+    expire at the token's own `exp` (never later) or after JWT_CACHE_TTL.
+    One cache per worker process.
+    """
+
+    def __init__(self, maxsize: int = JWT_CACHE_SIZE, ttl: int = JWT_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        # Keep digests, not bearer tokens, in memory
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, user = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            # Counted as a hit by record_hit() once the user is re-attached
+            return user
+
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def put(self, token: str, user, token_exp=None):
+        expires_at = time.time() + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, float(token_exp))
+        if expires_at <= time.time():
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, token: str):
+        """Drop an entry that could not be used - the lookup counts as a miss"""
+        with self._lock:
+            self._entries.pop(self._key(token), None)
+            self.misses += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else None,
+            }
+
+
+jwt_user_cache = JwtUserCache()
+
+
 class HybridSecurityManager(SupersetSecurityManager):
     def get_user_from_request(self, request):
         token = request.headers.get("Authorization", "").replace("Bearer ", "")
         if not token:
             return None
+
+        cached_user = jwt_user_cache.get(token)
+        if cached_user is not None:
+            try:
+                # Re-attach to this request's session without a SELECT
+                user = self.get_session.merge(cached_user, load=False)
+                jwt_user_cache.record_hit()
+                return user
+            except Exception as ex:
+                print(f"Cached JWT user could not be re-attached ({ex}); resolving again.")
+                jwt_user_cache.discard(token)
+
         try:
             payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
             username = payload.get("username")
@@ -40,6 +142,9 @@ class HybridSecurityManager(SupersetSecurityManager):
                     email=payload.get("email", f"{username}@example.com"),
                     role=self.find_role("AnalystLite"),
                 )
+            if user:
+                user.roles  # load before caching - lazy loads fail once detached
+                jwt_user_cache.put(token, user, payload.get("exp"))
             return user
         except Exception as ex:
             print(f"JWT auth failed ({ex}); falling back to local login.")
@@ -47,8 +152,54 @@ class HybridSecurityManager(SupersetSecurityManager):
 
 CUSTOM_SECURITY_MANAGER = HybridSecurityManager
 
+
+def FLASK_APP_MUTATOR(app):
+    @app.route("/api/v1/jwt_cache/stats")
+    def jwt_cache_stats():
+        # Auth-cache internals: Superset admins only
+        from flask_login import current_user
+        from superset import security_manager
+
+        if not current_user.is_authenticated:
+            return jsonify({"message": "Not authorized"}), 401
+        if not security_manager.is_admin():
+            return jsonify({"message": "Forbidden"}), 403
+        return jsonify(jwt_user_cache.stats())
+
 # -------------------------------------------------------------
-# Misc
+# Caching
+# The BI tables change once a night, so chart results are cached for a
+# day and the refresh job invalidates + re-warms them (warm_superset_cache.py).
+# Redis when REDIS_URL is set, otherwise a local filesystem cache.
 # -------------------------------------------------------------
-CACHE_DEFAULT_TIMEOUT = 60
-DATA_CACHE_CONFIG = None
+REDIS_URL = os.getenv("REDIS_URL")
+CACHE_TTL = int(os.getenv("SUPERSET_CACHE_TTL", str(26 * 60 * 60)))  # > 1 day: survives until the next refresh
+CACHE_DIR = os.getenv("SUPERSET_CACHE_DIR", "/app/superset_home/cache")
+
+
+def _cache_config(key_prefix: str, timeout: int = CACHE_TTL) -> dict:
+    if REDIS_URL:
+        return {
+            "CACHE_TYPE": "RedisCache",
+            "CACHE_DEFAULT_TIMEOUT": timeout,
+            "CACHE_KEY_PREFIX": key_prefix,
+            "CACHE_REDIS_URL": REDIS_URL,
+        }
+    return {
+        "CACHE_TYPE": "FileSystemCache",
+        "CACHE_DEFAULT_TIMEOUT": timeout,
+        "CACHE_KEY_PREFIX": key_prefix,
+        "CACHE_DIR": os.path.join(CACHE_DIR, key_prefix.rstrip("_")),
+        "CACHE_THRESHOLD": 5000,
+    }
+
+
+CACHE_DEFAULT_TIMEOUT = CACHE_TTL
+CACHE_CONFIG = _cache_config("superset_metadata_", timeout=300)
+DATA_CACHE_CONFIG = _cache_config("superset_data_")
+FILTER_STATE_CACHE_CONFIG = _cache_config("superset_filter_state_")
+EXPLORE_FORM_DATA_CACHE_CONFIG = _cache_config("superset_explore_form_")
+
+# Record cache keys per datasource so /api/v1/cachekey/invalidate can
+# drop exactly the BI tables' results after a refresh
+STORE_CACHE_KEYS_IN_METADATA_DB = True
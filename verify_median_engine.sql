@@ -0,0 +1,160 @@
+-- =====================================================
+-- VERIFY: single-pass median engine == ranked tables + self-join
+-- Runs both median patterns used by sp_process_single_quarter on a
+-- small fixture and lists any group where they disagree.
+-- Expected result: 0 mismatches.
+-- =====================================================
+
+DROP TEMPORARY TABLE IF EXISTS fixture_median_stg;
+
+CREATE TEMPORARY TABLE fixture_median_stg (
+    HCPCS_Code VARCHAR(100),
+    month_year VARCHAR(20),
+    WAC_per_unit DECIMAL(18,4),
+    AWP_per_unit DECIMAL(18,4)
+);
+
+INSERT INTO fixture_median_stg (HCPCS_Code, month_year, WAC_per_unit, AWP_per_unit) VALUES
+    -- odd count
+    ('J0001', 'January.2024', 1.0000, 10.0000),
+    ('J0001', 'January.2024', 3.0000, 30.0000),
+    ('J0001', 'January.2024', 2.0000, 20.0000),
+    -- even count (mean of the two middle values)
+    ('J0002', 'January.2024', 1.1111, 4.0000),
+    ('J0002', 'January.2024', 2.2222, 1.0000),
+    ('J0002', 'January.2024', 3.3333, 3.0000),
+    ('J0002', 'January.2024', 4.4444, 2.0000),
+    -- NULLs mixed in, different non-NULL counts for WAC and AWP
+    ('J0003', 'January.2024', NULL,   5.0000),
+    ('J0003', 'January.2024', 7.0000, NULL),
+    ('J0003', 'January.2024', 9.0000, 6.0000),
+    ('J0003', 'January.2024', NULL,   8.0000),
+    -- single row
+    ('J0004', 'January.2024', 0.1234, 0.5678),
+    -- all WAC NULL
+    ('J0005', 'January.2024', NULL, 1.0000),
+    ('J0005', 'January.2024', NULL, 2.0000),
+    -- duplicates (many NDCs with the same price)
+    ('J0006', 'January.2024', 5.0000, 5.0000),
+    ('J0006', 'January.2024', 5.0000, 5.0000),
+    ('J0006', 'January.2024', 5.0000, 7.0000),
+    ('J0006', 'January.2024', 6.0000, 7.0000),
+    -- same code, second month
+    ('J0001', 'February.2024', 8.0000, 80.0000),
+    ('J0001', 'February.2024', 9.0000, 90.0000);
+
+-- -----------------------------------------------------
+-- OLD: ranked tables + OR'd self-join (pre single-pass)
+-- -----------------------------------------------------
+
+DROP TEMPORARY TABLE IF EXISTS fixture_distinct;
+DROP TEMPORARY TABLE IF EXISTS fixture_wac_ranked;
+DROP TEMPORARY TABLE IF EXISTS fixture_awp_ranked;
+DROP TEMPORARY TABLE IF EXISTS fixture_median_old;
+DROP TEMPORARY TABLE IF EXISTS fixture_median_new;
+
+CREATE TEMPORARY TABLE fixture_distinct AS
+SELECT DISTINCT HCPCS_Code, month_year FROM fixture_median_stg;
+
+CREATE TEMPORARY TABLE fixture_wac_ranked AS
+SELECT
+    HCPCS_Code,
+    month_year,
+    WAC_per_unit,
+    ROW_NUMBER() OVER (PARTITION BY HCPCS_Code, month_year ORDER BY WAC_per_unit) AS row_num,
+    COUNT(*) OVER (PARTITION BY HCPCS_Code, month_year) AS total_count
+FROM fixture_median_stg
+WHERE WAC_per_unit IS NOT NULL;
+
+CREATE TEMPORARY TABLE fixture_awp_ranked AS
+SELECT
+    HCPCS_Code,
+    month_year,
+    AWP_per_unit,
+    ROW_NUMBER() OVER (PARTITION BY HCPCS_Code, month_year ORDER BY AWP_per_unit) AS row_num,
+    COUNT(*) OVER (PARTITION BY HCPCS_Code, month_year) AS total_count
+FROM fixture_median_stg
+WHERE AWP_per_unit IS NOT NULL;
+
+CREATE TEMPORARY TABLE fixture_median_old AS
+SELECT
+    t1.HCPCS_Code,
+    t1.month_year,
+    AVG(wac_ranked.WAC_per_unit) AS Median_WAC,
+    AVG(awp_ranked.AWP_per_unit) AS Median_AWP
+FROM fixture_distinct t1
+LEFT JOIN fixture_wac_ranked wac_ranked
+    ON t1.HCPCS_Code = wac_ranked.HCPCS_Code
+    AND t1.month_year = wac_ranked.month_year
+    AND (
+        wac_ranked.row_num = FLOOR((wac_ranked.total_count + 1) / 2)
+        OR wac_ranked.row_num = FLOOR((wac_ranked.total_count + 2) / 2)
+    )
+LEFT JOIN fixture_awp_ranked awp_ranked
+    ON t1.HCPCS_Code = awp_ranked.HCPCS_Code
+    AND t1.month_year = awp_ranked.month_year
+    AND (
+        awp_ranked.row_num = FLOOR((awp_ranked.total_count + 1) / 2)
+        OR awp_ranked.row_num = FLOOR((awp_ranked.total_count + 2) / 2)
+    )
+GROUP BY t1.HCPCS_Code, t1.month_year;
+
+-- -----------------------------------------------------
+-- NEW: single windowed pass + conditional AVG
+-- -----------------------------------------------------
+
+CREATE TEMPORARY TABLE fixture_median_new AS
+SELECT
+    ranked.HCPCS_Code,
+    ranked.month_year,
+    AVG(CASE
+        WHEN ranked.wac_rn IN (FLOOR((ranked.wac_cnt + 1) / 2), FLOOR((ranked.wac_cnt + 2) / 2))
+        THEN ranked.WAC_per_unit
+    END) AS Median_WAC,
+    AVG(CASE
+        WHEN ranked.awp_rn IN (FLOOR((ranked.awp_cnt + 1) / 2), FLOOR((ranked.awp_cnt + 2) / 2))
+        THEN ranked.AWP_per_unit
+    END) AS Median_AWP
+FROM (
+    SELECT
+        HCPCS_Code,
+        month_year,
+        WAC_per_unit,
+        AWP_per_unit,
+        ROW_NUMBER() OVER (PARTITION BY HCPCS_Code, month_year ORDER BY WAC_per_unit IS NULL, WAC_per_unit) AS wac_rn,
+        COUNT(WAC_per_unit) OVER (PARTITION BY HCPCS_Code, month_year) AS wac_cnt,
+        ROW_NUMBER() OVER (PARTITION BY HCPCS_Code, month_year ORDER BY AWP_per_unit IS NULL, AWP_per_unit) AS awp_rn,
+        COUNT(AWP_per_unit) OVER (PARTITION BY HCPCS_Code, month_year) AS awp_cnt
+    FROM fixture_median_stg
+) ranked
+GROUP BY ranked.HCPCS_Code, ranked.month_year;
+
+-- -----------------------------------------------------
+-- Compare (stored as DECIMAL(18,4) in bi_hcpcs_drug_pricing)
+-- -----------------------------------------------------
+
+SELECT
+    o.HCPCS_Code,
+    o.month_year,
+    CAST(o.Median_WAC AS DECIMAL(18,4)) AS old_median_wac,
+    CAST(n.Median_WAC AS DECIMAL(18,4)) AS new_median_wac,
+    CAST(o.Median_AWP AS DECIMAL(18,4)) AS old_median_awp,
+    CAST(n.Median_AWP AS DECIMAL(18,4)) AS new_median_awp
+FROM fixture_median_old o
+LEFT JOIN fixture_median_new n
+    ON n.HCPCS_Code = o.HCPCS_Code
+    AND n.month_year = o.month_year
+WHERE NOT (CAST(o.Median_WAC AS DECIMAL(18,4)) <=> CAST(n.Median_WAC AS DECIMAL(18,4)))
+    OR NOT (CAST(o.Median_AWP AS DECIMAL(18,4)) <=> CAST(n.Median_AWP AS DECIMAL(18,4)));
+
+SELECT
+    (SELECT COUNT(*) FROM fixture_median_old) AS groups_old,
+    (SELECT COUNT(*) FROM fixture_median_new) AS groups_new,
+    'Expect 0 rows in the mismatch result above' AS note;
+
+DROP TEMPORARY TABLE IF EXISTS fixture_median_stg;
+DROP TEMPORARY TABLE IF EXISTS fixture_distinct;
+DROP TEMPORARY TABLE IF EXISTS fixture_wac_ranked;
+DROP TEMPORARY TABLE IF EXISTS fixture_awp_ranked;
+DROP TEMPORARY TABLE IF EXISTS fixture_median_old;
+DROP TEMPORARY TABLE IF EXISTS fixture_median_new;
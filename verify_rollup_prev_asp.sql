@@ -0,0 +1,148 @@
+-- =====================================================
+-- VERIFY: rollup previous-quarter ASP == sp_process_single_quarter's
+-- Runs the bi_rollup_hcpcs_quarter pattern (windowed MAX of the
+-- earlier quarters with an ASP + join) and the per-quarter pattern
+-- (latest earlier quarter whose ASP is not NA) on a small fixture
+-- with NA gap quarters and lists any row where they disagree.
+-- Expected result: 0 mismatches.
+-- =====================================================
+
+DROP TEMPORARY TABLE IF EXISTS fixture_fact_historical;
+DROP TEMPORARY TABLE IF EXISTS fixture_fact_prev;
+DROP TEMPORARY TABLE IF EXISTS fixture_fact_cur;
+
+-- asp NULL = 'NA' in bi_historical_pricing (CAST(NULLIF(ASP, 'NA') ...))
+CREATE TEMPORARY TABLE fixture_fact_historical (
+    hcpcs_key INT NOT NULL,
+    quarter_key INT NOT NULL,
+    asp DECIMAL(18,2),
+    PRIMARY KEY (hcpcs_key, quarter_key)
+);
+
+INSERT INTO fixture_fact_historical (hcpcs_key, quarter_key, asp) VALUES
+    -- no gaps
+    (1, 20241, 10.00),
+    (1, 20242, 11.00),
+    (1, 20243, 12.10),
+    -- one NA quarter: 20243 compares with 20241
+    (2, 20241, 20.00),
+    (2, 20242, NULL),
+    (2, 20243, 25.00),
+    (2, 20244, 24.00),
+    -- two NA quarters in a row, across a year boundary
+    (3, 20243, 5.00),
+    (3, 20244, NULL),
+    (3, 20251, NULL),
+    (3, 20252, 6.00),
+    -- leading NA: no previous ASP until one exists
+    (4, 20241, NULL),
+    (4, 20242, 8.00),
+    (4, 20243, 0.00),
+    (4, 20244, 9.00),
+    -- single quarter
+    (5, 20244, 3.00),
+    -- all NA
+    (6, 20241, NULL),
+    (6, 20242, NULL);
+
+-- Temporary tables cannot be opened twice in one query
+CREATE TEMPORARY TABLE fixture_fact_prev AS SELECT * FROM fixture_fact_historical;
+CREATE TEMPORARY TABLE fixture_fact_cur AS SELECT * FROM fixture_fact_historical;
+
+-- -----------------------------------------------------
+-- ROLLUP: sp_refresh_bi_rollups STEP 1
+-- -----------------------------------------------------
+
+DROP TEMPORARY TABLE IF EXISTS fixture_prev_rollup;
+DROP TEMPORARY TABLE IF EXISTS fixture_prev_single;
+
+CREATE TEMPORARY TABLE fixture_prev_rollup AS
+SELECT
+    typed.hcpcs_key,
+    typed.quarter_key,
+    typed.asp,
+    prev.asp AS asp_prev_quarter,
+    CASE
+        WHEN prev.asp IS NULL OR prev.asp = 0 THEN NULL
+        ELSE ROUND((typed.asp - prev.asp) / prev.asp * 100, 4)
+    END AS asp_change_pct
+FROM (
+    SELECT
+        f.hcpcs_key,
+        f.quarter_key,
+        f.asp,
+        MAX(CASE WHEN f.asp IS NOT NULL THEN f.quarter_key END) OVER (
+            PARTITION BY f.hcpcs_key ORDER BY f.quarter_key
+            ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+        ) AS prev_asp_quarter_key
+    FROM fixture_fact_historical f
+) typed
+LEFT JOIN fixture_fact_prev prev
+    ON prev.hcpcs_key = typed.hcpcs_key
+   AND prev.quarter_key = typed.prev_asp_quarter_key;
+
+-- -----------------------------------------------------
+-- SINGLE QUARTER: sp_process_single_quarter (latest
+-- prior quarter with ASP != 'NA', ROW_NUMBER rn = 1)
+-- -----------------------------------------------------
+
+CREATE TEMPORARY TABLE fixture_prev_single AS
+SELECT
+    cur.hcpcs_key,
+    cur.quarter_key,
+    cur.asp,
+    ranked.asp AS asp_prev_quarter,
+    CASE
+        WHEN ranked.asp IS NULL OR ranked.asp = 0 THEN NULL
+        ELSE ROUND((cur.asp - ranked.asp) / ranked.asp * 100, 4)
+    END AS asp_change_pct
+FROM fixture_fact_historical cur
+LEFT JOIN (
+    SELECT
+        later.hcpcs_key,
+        later.quarter_key AS for_quarter_key,
+        prev.asp,
+        ROW_NUMBER() OVER (
+            PARTITION BY later.hcpcs_key, later.quarter_key
+            ORDER BY prev.quarter_key DESC
+        ) AS rn
+    FROM fixture_fact_cur later
+    INNER JOIN fixture_fact_prev prev
+        ON prev.hcpcs_key = later.hcpcs_key
+       AND prev.quarter_key < later.quarter_key
+       AND prev.asp IS NOT NULL
+) ranked
+    ON ranked.hcpcs_key = cur.hcpcs_key
+   AND ranked.for_quarter_key = cur.quarter_key
+   AND ranked.rn = 1;
+
+-- -----------------------------------------------------
+-- Compare
+-- -----------------------------------------------------
+
+SELECT
+    s.hcpcs_key,
+    s.quarter_key,
+    s.asp,
+    s.asp_prev_quarter AS single_prev_asp,
+    r.asp_prev_quarter AS rollup_prev_asp,
+    s.asp_change_pct AS single_change_pct,
+    r.asp_change_pct AS rollup_change_pct
+FROM fixture_prev_single s
+LEFT JOIN fixture_prev_rollup r
+    ON r.hcpcs_key = s.hcpcs_key
+    AND r.quarter_key = s.quarter_key
+WHERE NOT (s.asp_prev_quarter <=> r.asp_prev_quarter)
+    OR NOT (s.asp_change_pct <=> r.asp_change_pct);
+
+SELECT
+    (SELECT COUNT(*) FROM fixture_prev_single) AS rows_single,
+    (SELECT COUNT(*) FROM fixture_prev_rollup) AS rows_rollup,
+    (SELECT COUNT(*) FROM fixture_prev_rollup WHERE hcpcs_key = 2 AND quarter_key = 20243 AND asp_prev_quarter = 20.00) AS gap_quarter_ok,
+    'Expect 0 rows in the mismatch result above and gap_quarter_ok = 1' AS note;
+
+DROP TEMPORARY TABLE IF EXISTS fixture_fact_historical;
+DROP TEMPORARY TABLE IF EXISTS fixture_fact_prev;
+DROP TEMPORARY TABLE IF EXISTS fixture_fact_cur;
+DROP TEMPORARY TABLE IF EXISTS fixture_prev_rollup;
+DROP TEMPORARY TABLE IF EXISTS fixture_prev_single;
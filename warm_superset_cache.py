@@ -0,0 +1,219 @@
+"""
+Superset Cache Invalidation + Warm-up
+Run after the nightly BI refresh so the first dashboard view of the day is a
+cache hit instead of a MySQL query
+
+1. Finds the Superset datasets for the BI tables - the ones the given
+   dashboard's charts read (--dashboard-id), else DEFAULT_TABLES
+2. Drops their cached results (POST /api/v1/cachekey/invalidate - needs
+   STORE_CACHE_KEYS_IN_METADATA_DB = True in superset_config.py)
+3. Re-runs every chart on those datasets (PUT /api/v1/dataset/warm_up_cache),
+   which stores fresh results in DATA_CACHE_CONFIG for CACHE_TTL
+
+Prerequisites:
+- pip install requests
+- SUPERSET_URL, SUPERSET_ADMIN_USERNAME, SUPERSET_ADMIN_PASSWORD
+  (or SUPERSET_API_TOKEN) in the environment
+
+Usage:
+  python warm_superset_cache.py
+  python warm_superset_cache.py --dashboard-id 12
+  python warm_superset_cache.py --dashboard-id 12 --tables vw_bi_consolidated_drug_data
+"""
+
+import argparse
+import os
+import sys
+from typing import Dict, List, Optional
+
+import requests
+
+from superset_api import list_all, rison_list
+
+# Datasets of the Create-preset-dashboard.py / dashboard_spec.json dashboard
+# (the rollups back its charts with --use-rollups)
+DEFAULT_TABLES = [
+    "vw_bi_consolidated_drug_data",
+    "vw_bi_historical_asp",
+    "vw_bi_historical_wac",
+    "vw_bi_historical_awp",
+    "bi_drug_class",
+    "bi_rollup_hcpcs_quarter",
+    "bi_rollup_manufacturer_quarter",
+    "bi_rollup_top_movers",
+]
+
+
+class SupersetCacheWarmer:
+    def __init__(self, base_url: str, api_token: str = None,
+                 username: str = None, password: str = None, timeout: int = 300):
+        """
+        Initialize the cache warmer
+
+        Args:
+            base_url: Superset URL (e.g., 'https://superset.onrender.com')
+            api_token: Bearer token (preferred) OR
+            username: Superset username (if not using token)
+            password: Superset password (if not using token)
+            timeout: Seconds to wait for a warm-up request (each one runs the charts)
+        """
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+        self.timeout = timeout
+
+        if api_token:
+            self.session.headers.update({
+                "Authorization": f"Bearer {api_token}",
+                "Content-Type": "application/json"
+            })
+        elif username and password:
+            self._authenticate(username, password)
+        else:
+            raise Exception("Must provide either api_token OR username+password")
+
+    def _authenticate(self, username: str, password: str):
+        """Log in, then attach the access token and CSRF token to the session"""
+        response = self.session.post(
+            f"{self.base_url}/api/v1/security/login",
+            json={"username": username, "password": password, "provider": "db", "refresh": True},
+            timeout=30
+        )
+        if response.status_code != 200:
+            raise Exception(f"Authentication failed: {response.text}")
+
+        self.session.headers.update({
+            "Authorization": f"Bearer {response.json()['access_token']}",
+            "Content-Type": "application/json"
+        })
+
+        csrf_response = self.session.get(f"{self.base_url}/api/v1/security/csrf_token/", timeout=30)
+        if csrf_response.status_code == 200:
+            self.session.headers["X-CSRFToken"] = csrf_response.json()['result']
+        print("✅ Authentication successful")
+
+    def dashboard_tables(self, dashboard_id: int) -> List[str]:
+        """Tables behind the charts of a dashboard (GET /api/v1/dashboard/<id>/datasets)"""
+        response = self.session.get(f"{self.base_url}/api/v1/dashboard/{dashboard_id}/datasets", timeout=30)
+        if response.status_code != 200:
+            print(f"❌ Failed to list datasets of dashboard {dashboard_id}: {response.text}")
+            return []
+        tables = sorted({ds['table_name'] for ds in response.json().get('result', []) if ds.get('table_name')})
+        print(f"📊 Dashboard {dashboard_id} reads {len(tables)} dataset(s): {', '.join(tables)}")
+        return tables
+
+    def find_datasets(self, table_names: List[str]) -> List[Dict]:
+        """Datasets (id, table_name, database name) backed by the given tables"""
+        try:
+            rows = list_all(self.session, self.base_url, "dataset",
+                            f"(col:table_name,opr:in,value:{rison_list(table_names)})",
+                            ["id", "table_name", "database.database_name"], timeout=30)
+        except Exception as ex:
+            print(f"❌ {ex}")
+            return []
+
+        datasets = []
+        for ds in rows:
+            database = ds.get('database') or {}
+            datasets.append({
+                "id": ds['id'],
+                "table_name": ds['table_name'],
+                "db_name": database.get('database_name'),
+            })
+        missing = set(table_names) - {ds['table_name'] for ds in datasets}
+        if missing:
+            print(f"⚠️  No dataset for: {', '.join(sorted(missing))}")
+        return datasets
+
+    def invalidate(self, datasets: List[Dict]) -> bool:
+        """Drop cached query results for the datasets"""
+        if not datasets:
+            return True
+        response = self.session.post(
+            f"{self.base_url}/api/v1/cachekey/invalidate",
+            json={"datasource_uids": [f"{ds['id']}__table" for ds in datasets]},
+            timeout=60
+        )
+        if response.status_code in [200, 201]:
+            print(f"🧹 Invalidated cache for {len(datasets)} dataset(s)")
+            return True
+        print(f"❌ Cache invalidation failed: {response.text}")
+        return False
+
+    def warm_up(self, dataset: Dict, dashboard_id: Optional[int] = None) -> bool:
+        """Run every chart on a dataset so its results land in the cache; False if any chart failed"""
+        payload = {"db_name": dataset['db_name'], "table_name": dataset['table_name']}
+        if dashboard_id:
+            # Apply the dashboard's default filters, i.e. the exact first-view queries
+            payload["dashboard_id"] = dashboard_id
+        response = self.session.put(
+            f"{self.base_url}/api/v1/dataset/warm_up_cache",
+            json=payload,
+            timeout=self.timeout
+        )
+        if response.status_code != 200:
+            print(f"❌ Warm-up failed for {dataset['table_name']}: {response.text}")
+            return False
+
+        results = response.json().get('result', [])
+        failed = [r for r in results if r.get('viz_error') or r.get('viz_status') == 'failed']
+        print(f"🔥 {dataset['table_name']}: warmed {len(results) - len(failed)} chart(s)"
+              f"{f', {len(failed)} failed' if failed else ''}")
+        return not failed
+
+    def refresh(self, table_names: Optional[List[str]] = None, dashboard_id: Optional[int] = None) -> bool:
+        """
+        Invalidate + warm the datasets
+
+        Args:
+            table_names: Tables to warm; None = the dashboard's datasets when
+                         dashboard_id is given (falling back to DEFAULT_TABLES)
+            dashboard_id: Dashboard whose default filters the warm-up applies
+
+        Returns False when the invalidation or any dataset's warm-up failed
+        """
+        if not table_names and dashboard_id:
+            table_names = self.dashboard_tables(dashboard_id)
+        datasets = self.find_datasets(table_names or DEFAULT_TABLES)
+        if not datasets:
+            return False
+        ok = self.invalidate(datasets)
+        for dataset in datasets:
+            # Warm every dataset even after a failure
+            ok = self.warm_up(dataset, dashboard_id) and ok
+        return ok
+
+
+def warm_from_env(table_names: Optional[List[str]] = None, dashboard_id: Optional[int] = None) -> bool:
+    """Invalidate + warm using SUPERSET_* environment variables (used by refresh_bi_tables.py)"""
+    base_url = os.getenv("SUPERSET_URL")
+    if not base_url:
+        print("⚠️  SUPERSET_URL not set - skipping Superset cache warm-up")
+        return False
+    if dashboard_id is None and os.getenv("SUPERSET_WARM_DASHBOARD_ID"):
+        dashboard_id = int(os.getenv("SUPERSET_WARM_DASHBOARD_ID"))
+    warmer = SupersetCacheWarmer(
+        base_url,
+        api_token=os.getenv("SUPERSET_API_TOKEN"),
+        username=os.getenv("SUPERSET_ADMIN_USERNAME"),
+        password=os.getenv("SUPERSET_ADMIN_PASSWORD"),
+    )
+    return warmer.refresh(table_names, dashboard_id)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Invalidate and re-warm Superset caches for the BI tables")
+    parser.add_argument("--tables", nargs="+",
+                        help="Tables to warm (default: the --dashboard-id datasets, else DEFAULT_TABLES)")
+    parser.add_argument("--dashboard-id", type=int, help="Warm this dashboard's datasets with its filters")
+    args = parser.parse_args(argv)
+
+    try:
+        ok = warm_from_env(args.tables, args.dashboard_id)
+    except Exception as ex:
+        print(f"❌ Cache warm-up failed: {ex}")
+        return 1
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())